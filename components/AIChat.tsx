@@ -1,6 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
-import { GoogleGenerativeAI } from '@google/generative-ai';
 import { useAuth } from '../contexts/AuthContext';
+import { streamGeminiText } from '../lib/gemini';
 import { useAIContext } from '../hooks/useAIContext';
 
 interface Message {
@@ -59,13 +59,8 @@ const AIChat: React.FC = () => {
     setInput('');
     setIsLoading(true);
 
+    const replyId = `model-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
     try {
-      const apiKey = import.meta.env.VITE_GEMINI_API_KEY || '';
-      if (!apiKey) throw new Error('API Key no configurada');
-
-      const ai = new GoogleGenerativeAI(apiKey);
-      const model = ai.getGenerativeModel({ model: 'gemini-2.0-flash' });
-
       // Construct Real-time Data String
       const contextString = `
       DATOS EN TIEMPO REAL:
@@ -79,17 +74,17 @@ const AIChat: React.FC = () => {
       // Inject System Context with Real Data
       const prompt = `${SYSTEM_CONTEXT_BASE}\n${contextString}\n\nUser Query: ${textToSend}`;
 
-      const result = await model.generateContent(prompt);
-      const response = await result.response;
-      setMessages(prev => [...prev, { 
-        role: 'model', 
-        text: response.text() || 'Sin respuesta táctica.',
-        id: `model-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
-        timestamp: Date.now()
-      }]);
+      // Stream the reply into one message as tokens arrive
+      const showReply = (text: string) => setMessages(prev =>
+        prev.some(m => m.id === replyId)
+          ? prev.map(m => m.id === replyId ? { ...m, text } : m)
+          : [...prev, { role: 'model', text, id: replyId, timestamp: Date.now() }]
+      );
+      const reply = await streamGeminiText(prompt, showReply, 'squadai-chat');
+      if (!reply) showReply('Sin respuesta táctica.');
     } catch (e: any) {
       console.error(e);
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...prev.filter(m => m.id !== replyId), { 
         role: 'model', 
         text: '⚠️ ERROR DE ENLACE: Verifique conexión y API Key.',
         id: `error-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
@@ -176,7 +171,7 @@ const AIChat: React.FC = () => {
                 </div>
               ))}
 
-              {isLoading && (
+              {isLoading && messages[messages.length - 1]?.role === 'user' && (
                 <div className="flex justify-start animate-in fade-in">
                   <div className="bg-zinc-900 border border-white/5 p-4 rounded-2xl rounded-tl-sm flex items-center gap-1.5">
                     <div className="size-1.5 bg-neon rounded-full animate-bounce"></div>
@@ -601,29 +601,37 @@ export const ClientProvider: React.FC<{ children: React.ReactNode }> = ({ childr
                 const sessionType = qrContext?.node_type || orderChannel || 'generic';
                 const tableId = qrContext?.node_id || null;
 
-                // 1. PARALLEL: Fetch categories + resolve menu at the same time
+                // Last menu snapshot seen in this tab; its etag lets the server answer "not modified"
+                const snapshotCacheKey = `menu_snapshot_${store.id}`;
+                let cachedSnapshot: { etag: string; products: any[] } | null = null;
+                try {
+                    const rawSnapshot = sessionStorage.getItem(snapshotCacheKey);
+                    if (rawSnapshot) cachedSnapshot = JSON.parse(rawSnapshot);
+                } catch {}
+
+                // 1. PARALLEL: Fetch categories + resolved menu snapshot at the same time
                 const [catsResult, menuResult] = await Promise.all([
                     (supabase.from('categories' as any).select('id, name').eq('store_id', store.id)),
-                    resolvedMenuId
-                        ? Promise.resolve({ data: resolvedMenuId, error: null })
-                        : (supabase.rpc as any)('resolve_menu', {
-                            p_store_id: store.id,
-                            p_session_type: sessionType,
-                            p_table_id: tableId,
-                            p_bar_id: null
-                        })
+                    (supabase.rpc as any)('get_menu_snapshot', {
+                        p_store_id: store.id,
+                        p_session_type: sessionType,
+                        p_table_id: tableId,
+                        p_menu_id: resolvedMenuId,
+                        p_if_none_match: cachedSnapshot?.etag ?? null
+                    })
                 ]);
 
                 if (cancelled) return;
 
                 if (catsResult.error) console.error('[ClientContext] Error fetching categories:', catsResult.error);
-                if (menuResult.error) console.error('[ClientContext] Error resolving menu:', menuResult.error);
+                if (menuResult.error) console.error('[ClientContext] Error fetching menu snapshot:', menuResult.error);
 
                 const dbCategories = catsResult.data || [];
                 const categoryMap: Record<string, string> = {};
                 dbCategories.forEach((c: any) => { categoryMap[c.id] = c.name; });
 
-                if (!resolvedMenuId) resolvedMenuId = menuResult.data;
+                const snapshot = menuResult.data;
+                resolvedMenuId = snapshot?.menu_id || null;
 
                 // 2. Load products (from menu or fallback)
                 let finalProducts: MenuItem[] = [];
@@ -632,12 +640,12 @@ export const ClientProvider: React.FC<{ children: React.ReactNode }> = ({ childr
                     console.log('[ClientContext] Resolved menu:', resolvedMenuId, 'for context:', sessionType);
                     setMenuId(resolvedMenuId);
 
-                    const { data: menuProducts, error: productsError } = await (supabase.rpc as any)('get_menu_products', {
-                        p_menu_id: resolvedMenuId
-                    });
-                    if (cancelled) return;
-
-                    if (productsError) console.error('[ClientContext] Error fetching menu products:', productsError);
+                    const menuProducts = snapshot.not_modified ? cachedSnapshot?.products : snapshot.products;
+                    if (!snapshot.not_modified) {
+                        try {
+                            sessionStorage.setItem(snapshotCacheKey, JSON.stringify({ etag: snapshot.etag, products: snapshot.products || [] }));
+                        } catch {}
+                    }
 
                     if (menuProducts && menuProducts.length > 0) {
                         // Fetch variants + addons for menu product IDs
@@ -13,84 +13,184 @@ export interface AIContextData {
     isLoading: boolean;
 }
 
+const SALES_STATUSES = ['paid', 'completed'];
+const LOW_STOCK_THRESHOLD = 10; // Fallback threshold if min_stock_alert is null
+const LOW_STOCK_SHOWN = 5;
+// Realtime can miss events while the tab sleeps; refetch after being hidden this long
+const REFETCH_AFTER_HIDDEN_MS = 5 * 60 * 1000;
+
+// Per-store snapshot: fetched once, then kept current from realtime events.
+// Kept across mounts, so reopening the chat shows it immediately.
+interface ContextSnapshot {
+    day: string;                        // Date.toDateString() of the sales it holds
+    sales: Map<string, number>;         // today's paid/completed order id -> total_amount
+    occupiedNodes: Set<string>;
+    lowStock: Map<string, string>;      // inventory item id -> name
+    lastUpdated: Date;
+}
+
+const snapshots = new Map<string, ContextSnapshot>();
+
+const INITIAL_CONTEXT: AIContextData = {
+    dailySales: 0,
+    ordersCount: 0,
+    avgTicket: 0,
+    activeTables: 0,
+    lowStockItems: [],
+    topSellingItem: null,
+    lastUpdated: new Date(),
+    isLoading: true
+};
+
+const startOfToday = () => {
+    const todayStart = new Date();
+    todayStart.setHours(0, 0, 0, 0);
+    return todayStart;
+};
+
+function toContextData(snapshot: ContextSnapshot): AIContextData {
+    const amounts = [...snapshot.sales.values()];
+    const totalRevenue = amounts.reduce((sum, amount) => sum + amount, 0);
+    return {
+        dailySales: totalRevenue,
+        ordersCount: amounts.length,
+        avgTicket: amounts.length > 0 ? totalRevenue / amounts.length : 0,
+        activeTables: snapshot.occupiedNodes.size,
+        lowStockItems: [...snapshot.lowStock.values()].slice(0, LOW_STOCK_SHOWN),
+        topSellingItem: null, // Harder to calc on fly without tailored RPC
+        lastUpdated: snapshot.lastUpdated,
+        isLoading: false
+    };
+}
+
+async function fetchSnapshot(storeId: string): Promise<ContextSnapshot> {
+    const todayStart = startOfToday();
+
+    // Today's sales, occupied nodes and low stock, in parallel
+    const [sales, nodes, lowStock] = await Promise.all([
+        supabase
+            .from('orders')
+            .select('id, total_amount')
+            .eq('store_id', storeId)
+            .gte('created_at', todayStart.toISOString())
+            .in('status', SALES_STATUSES),
+        supabase
+            .from('venue_nodes')
+            .select('id')
+            .eq('store_id', storeId)
+            .eq('status', 'occupied'),
+        supabase
+            .from('inventory_items')
+            .select('id, name')
+            .eq('store_id', storeId)
+            .lt('current_stock', LOW_STOCK_THRESHOLD)
+    ]);
+
+    const failed = sales.error || nodes.error || lowStock.error;
+    if (failed) throw failed;
+
+    return {
+        day: todayStart.toDateString(),
+        sales: new Map((sales.data || []).map((o: any) => [o.id, o.total_amount || 0])),
+        occupiedNodes: new Set((nodes.data || []).map((n: any) => n.id)),
+        lowStock: new Map((lowStock.data || []).map((i: any) => [i.id, i.name])),
+        lastUpdated: new Date()
+    };
+}
+
+function applyOrder(snapshot: ContextSnapshot, payload: any) {
+    if (payload.eventType === 'DELETE') {
+        snapshot.sales.delete(payload.old?.id);
+        return;
+    }
+    const order = payload.new;
+    const counted = SALES_STATUSES.includes(order.status) && new Date(order.created_at) >= startOfToday();
+    if (counted) snapshot.sales.set(order.id, order.total_amount || 0);
+    else snapshot.sales.delete(order.id);
+}
+
+function applyNode(snapshot: ContextSnapshot, payload: any) {
+    const node = payload.eventType === 'DELETE' ? payload.old : payload.new;
+    if (payload.eventType !== 'DELETE' && node.status === 'occupied') snapshot.occupiedNodes.add(node.id);
+    else snapshot.occupiedNodes.delete(node?.id);
+}
+
+function applyInventoryItem(snapshot: ContextSnapshot, payload: any) {
+    const item = payload.eventType === 'DELETE' ? payload.old : payload.new;
+    if (payload.eventType !== 'DELETE' && item.current_stock < LOW_STOCK_THRESHOLD) snapshot.lowStock.set(item.id, item.name);
+    else snapshot.lowStock.delete(item?.id);
+}
+
 export const useAIContext = () => {
     const { profile } = useAuth();
-    const [context, setContext] = useState<AIContextData>({
-        dailySales: 0,
-        ordersCount: 0,
-        avgTicket: 0,
-        activeTables: 0,
-        lowStockItems: [],
-        topSellingItem: null,
-        lastUpdated: new Date(),
-        isLoading: true
+    const storeId = profile?.store_id;
+    const [context, setContext] = useState<AIContextData>(() => {
+        const cached = storeId ? snapshots.get(storeId) : undefined;
+        return cached ? toContextData(cached) : INITIAL_CONTEXT;
     });
 
-    const fetchContext = async () => {
-        if (!profile?.store_id) return;
-
-        try {
-            // 1. Fetch Today's Orders (Paid/Completed)
-            // Note: We need to filter by date. Timestamps are ISO.
-            const todayStart = new Date();
-            todayStart.setHours(0, 0, 0, 0);
-
-            const { data: salesData } = await supabase
-                .from('orders')
-                .select('total_amount, status, created_at')
-                .eq('store_id', profile.store_id)
-                .gte('created_at', todayStart.toISOString())
-                .in('status', ['paid', 'completed']);
-
-            const totalRevenue = salesData?.reduce((sum, o) => sum + (o.total_amount || 0), 0) || 0;
-            const count = salesData?.length || 0;
-            const ticket = count > 0 ? totalRevenue / count : 0;
-
-            // 2. Fetch Active Tables (Occupied Nodes)
-            const { count: activeNodes } = await supabase
-                .from('venue_nodes')
-                .select('*', { count: 'exact', head: true })
-                .eq('store_id', profile.store_id)
-                .eq('status', 'occupied');
-
-            // 3. Fetch Low Stock Items (Simple limit check)
-            // This assumes we have an inventory_items table with quantity and min_quantity
-            const { data: lowStock } = await supabase
-                .from('inventory_items')
-                .select('name, current_stock, min_stock_alert')
-                .eq('store_id', profile.store_id)
-                .lt('current_stock', 10) // Fallback threshold if min_stock_alert is null
-                .limit(5);
-
-            // Filter strictly if min_quantity exists, else use raw low count logic
-            const criticalItems = lowStock?.map(i => i.name) || [];
-
-            setContext({
-                dailySales: totalRevenue,
-                ordersCount: count,
-                avgTicket: ticket,
-                activeTables: activeNodes || 0,
-                lowStockItems: criticalItems,
-                topSellingItem: null, // Harder to calc on fly without tailored RPC
-                lastUpdated: new Date(),
-                isLoading: false
-            });
-
-        } catch (e) {
-            console.error('Error fetching AI Context:', e);
-            setContext(prev => ({ ...prev, isLoading: false }));
-        }
-    };
-
     useEffect(() => {
-        fetchContext();
-
-        // Optional: Realtime subscription could be added here
-        // For now, fetch once on mount is enough for a chat session interact
-        // or set an interval
-        const interval = setInterval(fetchContext, 60000); // Update every minute
-        return () => clearInterval(interval);
-    }, [profile?.store_id]);
+        if (!storeId) return;
+        let active = true;
+        let hiddenAt: number | null = null;
+
+        const publish = () => {
+            const snapshot = snapshots.get(storeId);
+            if (snapshot && active) setContext(toContextData(snapshot));
+        };
+
+        const refresh = async () => {
+            try {
+                snapshots.set(storeId, await fetchSnapshot(storeId));
+                publish();
+            } catch (e) {
+                console.error('Error fetching AI Context:', e);
+                if (active) setContext(prev => ({ ...prev, isLoading: false }));
+            }
+        };
+
+        const update = (apply: (snapshot: ContextSnapshot, payload: any) => void) => (payload: any) => {
+            const snapshot = snapshots.get(storeId);
+            if (!snapshot) return; // The fetch in flight will include it
+            if (snapshot.day !== new Date().toDateString()) {
+                refresh(); // New day: sales start over
+                return;
+            }
+            apply(snapshot, payload);
+            snapshot.lastUpdated = new Date();
+            publish();
+        };
+
+        // Show the cached snapshot (if any) now; refetch once since events were missed while unmounted
+        publish();
+        refresh();
+
+        const channel = supabase
+            .channel(`ai-context-${storeId}`)
+            .on('postgres_changes', { event: '*', schema: 'public', table: 'orders', filter: `store_id=eq.${storeId}` },
+                update(applyOrder))
+            .on('postgres_changes', { event: '*', schema: 'public', table: 'venue_nodes', filter: `store_id=eq.${storeId}` },
+                update(applyNode))
+            .on('postgres_changes', { event: '*', schema: 'public', table: 'inventory_items', filter: `store_id=eq.${storeId}` },
+                update(applyInventoryItem))
+            .subscribe();
+
+        const onVisibilityChange = () => {
+            if (document.hidden) {
+                hiddenAt = Date.now();
+                return;
+            }
+            if (hiddenAt !== null && Date.now() - hiddenAt > REFETCH_AFTER_HIDDEN_MS) refresh();
+            hiddenAt = null;
+        };
+        document.addEventListener('visibilitychange', onVisibilityChange);
+
+        return () => {
+            active = false;
+            supabase.removeChannel(channel);
+            document.removeEventListener('visibilitychange', onVisibilityChange);
+        };
+    }, [storeId]);
 
     return context;
 };
@@ -0,0 +1,122 @@
+// Gemini helpers - shared model client, streamed replies and memoized one-shot prompts
+// Latency of every call (time to first token and total) is kept for inspection:
+// getAILatencySamples() in code, or the `ai:*` entries in the Performance panel.
+
+import { GoogleGenerativeAI, GenerativeModel } from '@google/generative-ai';
+
+const DEFAULT_MODEL = 'gemini-2.0-flash';
+// Points the SDK at a local mock LLM (testsprite_tests/perf/ai_stream.py); unset in production
+const API_BASE_URL = import.meta.env.VITE_GEMINI_API_BASE_URL || undefined;
+
+const MEMO_LIMIT = 100;         // memoized prompts kept per page load
+const LATENCY_SAMPLES = 50;
+
+export interface AILatencySample {
+    label: string;
+    ttftMs: number | null;      // null when nothing was produced
+    totalMs: number;
+    chars: number;
+    memoized: boolean;
+}
+
+const models = new Map<string, GenerativeModel>();
+const memo = new Map<string, Promise<string>>();
+const samples: AILatencySample[] = [];
+
+/**
+ * The model client for `name`, created once per page load. Null without VITE_GEMINI_API_KEY.
+ */
+export function getGeminiModel(name: string = DEFAULT_MODEL): GenerativeModel | null {
+    const apiKey = import.meta.env.VITE_GEMINI_API_KEY || '';
+    if (!apiKey) return null;
+
+    let model = models.get(name);
+    if (!model) {
+        model = new GoogleGenerativeAI(apiKey).getGenerativeModel(
+            { model: name },
+            API_BASE_URL ? { baseUrl: API_BASE_URL } : undefined
+        );
+        models.set(name, model);
+    }
+    return model;
+}
+
+export function getAILatencySamples(): AILatencySample[] {
+    return [...samples];
+}
+
+function recordLatency(sample: AILatencySample, startedAt: number) {
+    samples.push(sample);
+    if (samples.length > LATENCY_SAMPLES) samples.shift();
+    try {
+        performance.measure(`ai:${sample.label}`, { start: startedAt, duration: sample.totalMs });
+        if (sample.ttftMs !== null) {
+            performance.measure(`ai:${sample.label}:ttft`, { start: startedAt, duration: sample.ttftMs });
+        }
+    } catch {
+        // performance.measure with options is missing in old browsers
+    }
+}
+
+/**
+ * Stream a reply, calling onText with the text so far as tokens arrive. Resolves with the full text.
+ */
+export async function streamGeminiText(
+    prompt: string,
+    onText: (textSoFar: string) => void,
+    label = 'chat',
+    model: GenerativeModel | null = getGeminiModel()
+): Promise<string> {
+    if (!model) throw new Error('API Key no configurada');
+
+    const startedAt = performance.now();
+    let ttftMs: number | null = null;
+    let text = '';
+
+    const result = await model.generateContentStream(prompt);
+    for await (const chunk of result.stream) {
+        const piece = chunk.text();
+        if (!piece) continue;
+        if (ttftMs === null) ttftMs = performance.now() - startedAt;
+        text += piece;
+        onText(text);
+    }
+
+    recordLatency({ label, ttftMs, totalMs: performance.now() - startedAt, chars: text.length, memoized: false }, startedAt);
+    return text;
+}
+
+/**
+ * Like streamGeminiText, but an identical prompt (same model) returns the first answer
+ * instead of calling the model again, including while that first call is in flight.
+ * Failed calls are not memoized.
+ */
+export function generateMemoized(
+    prompt: string,
+    onText?: (textSoFar: string) => void,
+    label = 'description',
+    model: GenerativeModel | null = getGeminiModel()
+): Promise<string> {
+    if (!model) return Promise.reject(new Error('API Key no configurada'));
+
+    const key = `${model.model}\n${prompt}`;
+    const hit = memo.get(key);
+    if (hit) {
+        // Refresh its place in the LRU order
+        memo.delete(key);
+        memo.set(key, hit);
+        const startedAt = performance.now();
+        return hit.then(text => {
+            onText?.(text);
+            const totalMs = performance.now() - startedAt;
+            recordLatency({ label, ttftMs: totalMs, totalMs, chars: text.length, memoized: true }, startedAt);
+            return text;
+        });
+    }
+
+    const pending = streamGeminiText(prompt, onText ?? (() => { }), label, model);
+    memo.set(key, pending);
+    pending.catch(() => memo.delete(key));
+    if (memo.size > MEMO_LIMIT) memo.delete(memo.keys().next().value!);
+    return pending;
+}
@@ -0,0 +1,48 @@
+// Invoice image helpers - shrink phone photos before upload
+// The model reads a 1600px invoice as well as a 4000px one; smaller uploads
+// mean faster storage, download and model calls in process-invoice.
+
+const MAX_SIDE = 1600;          // px, longest side
+const JPEG_QUALITY = 0.82;
+const MIN_BYTES_TO_SHRINK = 400 * 1024;
+
+/**
+ * Downscale a JPEG/PNG so its longest side is at most MAX_SIDE, re-encoded as JPEG.
+ * PDFs, small files and anything the browser cannot decode are returned unchanged,
+ * as is a result that would not be smaller than the original.
+ */
+export async function downscaleInvoiceImage(file: File): Promise<File> {
+    if (!file.type.startsWith('image/') || file.size < MIN_BYTES_TO_SHRINK) return file;
+    if (typeof createImageBitmap !== 'function') return file;
+
+    let bitmap: ImageBitmap;
+    try {
+        bitmap = await createImageBitmap(file);
+    } catch {
+        return file;
+    }
+
+    try {
+        const scale = Math.min(1, MAX_SIDE / Math.max(bitmap.width, bitmap.height));
+        const width = Math.round(bitmap.width * scale);
+        const height = Math.round(bitmap.height * scale);
+
+        const canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const ctx = canvas.getContext('2d');
+        if (!ctx) return file;
+        // PNG transparency would turn black in JPEG
+        ctx.fillStyle = '#fff';
+        ctx.fillRect(0, 0, width, height);
+        ctx.drawImage(bitmap, 0, 0, width, height);
+
+        const blob = await new Promise<Blob | null>(resolve => canvas.toBlob(resolve, 'image/jpeg', JPEG_QUALITY));
+        if (!blob || blob.size >= file.size) return file;
+
+        const name = file.name.replace(/\.[^.]+$/, '') + '.jpg';
+        return new File([blob], name, { type: 'image/jpeg', lastModified: file.lastModified });
+    } finally {
+        bitmap.close();
+    }
+}
@@ -20,6 +20,10 @@ const STORAGE_KEY = 'qr_context';
 const TTL_TABLE = 4 * 60 * 60 * 1000;      // 4 hours
 const TTL_OTHER = 30 * 60 * 1000;          // 30 minutes
 
+// A re-scan of the same code this soon reuses the stored context instead of resolving again.
+// Same window as resolve-qr's code cache; the scan is still logged (and re-checked) in the background.
+const RESCAN_REUSE_MS = 30 * 1000;        // 30 seconds
+
 /**
  * Calculate TTL based on channel type
  */
@@ -141,6 +145,17 @@ export function getQRContextForStore(storeId: string): QRContext | null {
     return ctx;
 }
 
+/**
+ * Get the stored context if it came from this QR hash recently enough to skip
+ * resolution on a re-scan. Returns null otherwise.
+ */
+export function getRecentQRContext(qrHash: string): QRContext | null {
+    const ctx = getQRContext();
+    if (!ctx || ctx.qr_hash !== qrHash) return null;
+    if (Date.now() - ctx.started_at > RESCAN_REUSE_MS) return null;
+    return ctx;
+}
+
 /**
  * Get remaining time in context (for display)
  */
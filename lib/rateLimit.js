@@ -1,59 +1,40 @@
 // Rate Limiting Utility for Production
 // Supports both in-memory (development) and Redis (production)
+// Redis needs the optional @upstash/redis package (npm install @upstash/redis) plus
+// UPSTASH_REDIS_REST_URL/TOKEN; without the package every instance limits on its own.
+// Sliding window, same implementation as the Edge Functions (see slidingWindow.js)
 
-class InMemoryStore {
-  constructor() {
-    this.store = new Map();
-    this.cleanup();
-  }
+import { SlidingWindowLimiter, checkRedisSlidingWindow } from './slidingWindow.js';
 
-  async get(key) {
-    const data = this.store.get(key);
-    if (!data || Date.now() > data.resetTime) {
-      return null;
-    }
-    return data;
-  }
+// Bounded: at most MAX_KEYS identifiers, least recently seen dropped first
+const MAX_KEYS = 10000;
+const memoryLimiter = new SlidingWindowLimiter({ maxKeys: MAX_KEYS });
 
-  async set(key, value, ttl) {
-    this.store.set(key, {
-      ...value,
-      resetTime: Date.now() + (ttl * 1000)
-    });
-  }
+let redisClientPromise = null;
 
-  cleanup() {
-    setInterval(() => {
-      const now = Date.now();
-      for (const [key, data] of this.store.entries()) {
-        if (now > data.resetTime) {
-          this.store.delete(key);
-        }
-      }
-    }, 60000); // Cleanup every minute
+// Lazily resolve the Redis client; null means use memory
+function getRedisClient() {
+  if (!process.env.UPSTASH_REDIS_REST_URL || !process.env.UPSTASH_REDIS_REST_TOKEN) {
+    return null;
   }
-}
-
-let store;
-let redisClient;
-
-// Initialize store based on environment
-if (process.env.UPSTASH_REDIS_REST_URL && process.env.UPSTASH_REDIS_REST_TOKEN) {
-  try {
-    const { Redis } = require('@upstash/redis');
-    redisClient = new Redis({
-      url: process.env.UPSTASH_REDIS_REST_URL,
-      token: process.env.UPSTASH_REDIS_REST_TOKEN,
-    });
-    store = 'redis';
-    console.log('[RATE_LIMIT] Using Redis store');
-  } catch (e) {
-    console.warn('[RATE_LIMIT] Redis unavailable, falling back to memory');
-    store = new InMemoryStore();
+  if (!redisClientPromise) {
+    redisClientPromise = import('@upstash/redis')
+      .then(({ Redis }) => {
+        console.log('[RATE_LIMIT] Using Redis store');
+        return new Redis({
+          url: process.env.UPSTASH_REDIS_REST_URL,
+          token: process.env.UPSTASH_REDIS_REST_TOKEN,
+        });
+      })
+      .catch((error) => {
+        console.warn(
+          '[RATE_LIMIT] UPSTASH_REDIS_REST_URL is set but @upstash/redis could not be loaded ' +
+          `(${error.message}); falling back to per-instance in-memory limits. Install @upstash/redis to share them.`
+        );
+        return null;
+      });
   }
-} else {
-  store = new InMemoryStore();
-  console.log('[RATE_LIMIT] Using in-memory store');
+  return redisClientPromise;
 }
 
 /**
@@ -67,44 +48,22 @@ export async function rateLimit(identifier, limit = 100, window = 60, prefix = '
   const key = `${prefix}:${identifier}`;
   
   try {
-    let current, resetTime;
-
-    if (store === 'redis') {
-      // Redis implementation
-      const multi = redisClient.multi();
-      multi.incr(key);
-      multi.expire(key, window);
-      const results = await multi.exec();
-      current = results[0];
-      resetTime = Date.now() + (window * 1000);
-    } else {
-      // In-memory implementation
-      const existing = await store.get(key);
-      if (existing) {
-        current = existing.current + 1;
-        resetTime = existing.resetTime;
-        await store.set(key, { current }, Math.max(0, (resetTime - Date.now()) / 1000));
-      } else {
-        current = 1;
-        resetTime = Date.now() + (window * 1000);
-        await store.set(key, { current }, window);
-      }
-    }
-
-    const isAllowed = current <= limit;
-    const remaining = Math.max(0, limit - current);
+    const redisClient = await getRedisClient();
+    const result = redisClient
+      ? await checkRedisSlidingWindow(redisClient, key, limit, window * 1000)
+      : memoryLimiter.check(key, limit, window * 1000);
 
     // Log rate limit violations for monitoring
-    if (!isAllowed) {
-      console.warn(`[RATE_LIMIT_EXCEEDED] ${key} - ${current}/${limit} - ${new Date().toISOString()}`);
+    if (!result.allowed) {
+      console.warn(`[RATE_LIMIT_EXCEEDED] ${key} - ${result.count}/${limit} - ${new Date().toISOString()}`);
     }
 
     return {
-      success: isAllowed,
+      success: result.allowed,
       limit,
-      current,
-      remaining,
-      resetTime
+      current: result.count,
+      remaining: result.remaining,
+      resetTime: result.resetAt
     };
   } catch (error) {
     console.error('[RATE_LIMIT_ERROR]', error);
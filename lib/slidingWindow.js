@@ -0,0 +1,7 @@
+// Sliding-window limiter for Node code (Vercel API routes, perf tools)
+// The implementation lives in supabase/functions/_shared/sliding-window.js: Edge
+// Function deploys only bundle files under supabase/functions, while the Vercel
+// bundler follows imports anywhere in the repo. This is the one Node-side file
+// that knows that path.
+
+export { DEFAULT_MAX_KEYS, SlidingWindowLimiter, checkRedisSlidingWindow } from '../supabase/functions/_shared/sliding-window.js';
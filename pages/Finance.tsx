@@ -242,15 +242,12 @@ const Finance: React.FC = () => {
         const startOfDay = dateRange.start.toISOString();
         const endOfDay = dateRange.end.toISOString();
 
-        // 1. Fetch orders for the store (with pagination limit)
-        const { data: orders, error } = await safeQuery(
-          supabase
-            .from('orders')
-            .select('total_amount, created_at, status')
-            .eq('store_id', profile.store_id)
-            .gte('created_at', startOfDay)
-            .lte('created_at', endOfDay)
-        );
+        // 1. Sales totals + hourly profile from the rollups (O(hours), not O(orders))
+        const { data: summary, error } = await (supabase as any).rpc('get_sales_summary', {
+          p_store_id: profile.store_id,
+          p_start_date: startOfDay,
+          p_end_date: endOfDay
+        });
 
         if (error) throw error;
 
@@ -277,14 +274,12 @@ const Finance: React.FC = () => {
 
         if (clientError) console.error('Error fetching clients liability', clientError);
 
-        // Calculate metrics - use canonical revenue filter (matches is_revenue_order() in DB)
-        const NON_REVENUE_STATUSES = ['draft', 'pending', 'cancelled', 'refunded', 'rejected'];
-        const completedOrders = orders?.filter(o => !NON_REVENUE_STATUSES.includes(o.status)) || [];
-        const totalSales = completedOrders.reduce((sum, o) => sum + (o.total_amount || 0), 0);
+        // Rollups already apply the canonical revenue filter (is_revenue_order() in DB)
+        const totalSales = Number(summary?.totals?.revenue) || 0;
         const totalTopups = (topups || []).reduce((sum: number, t: any) => sum + (Number(t.amount) || 0), 0);
         const totalLiability = (clientsData || []).reduce((sum, c) => sum + (c.wallet_balance || 0), 0);
 
-        const orderCount = completedOrders.length;
+        const orderCount = Number(summary?.totals?.orders_count) || 0;
         const avgTicket = orderCount > 0 ? totalSales / orderCount : 0;
 
         setMetrics({
@@ -297,17 +292,10 @@ const Finance: React.FC = () => {
           loyaltyCost: metrics.loyaltyCost // Preserve existing if not updated here (it is updated in advanced)
         });
 
-        // Generate performance data by hour (Client Side fallback)
-        const hourlyData: Record<string, number> = {};
-        completedOrders.forEach(o => {
-          const hour = new Date(o.created_at).getHours();
-          const key = `${hour.toString().padStart(2, '0')}:00`;
-          hourlyData[key] = (hourlyData[key] || 0) + (o.total_amount || 0);
-        });
-
-        const chartData = Object.entries(hourlyData).map(([timeStr, revenue]) => ({
-          name: timeStr, // Recharts XAxis key (e.g., "14:00")
-          total_revenue: revenue, // Match Area dataKey
+        // Generate performance data by hour (fallback until the chart RPC answers)
+        const chartData = (summary?.by_hour || []).map((h: any) => ({
+          name: `${String(h.hour).padStart(2, '0')}:00`, // Recharts XAxis key (e.g., "14:00")
+          total_revenue: Number(h.revenue) || 0, // Match Area dataKey
           // Add other keys as 0 for safety/tooltip
           mercadopago: 0,
           cash_sales: 0,
@@ -1121,17 +1109,15 @@ const OperationalInsights: React.FC<{ dateRange: { start: string | Date; end: st
           .gte('created_at', start)
           .lte('created_at', end);
 
-        // 2. Fetch Orders for total revenue and count in the period
-        const { data: orders } = await supabase
-          .from('orders')
-          .select('total_amount')
-          .eq('store_id', profile.store_id)
-          .gte('created_at', start)
-          .lte('created_at', end)
-          .not('status', 'eq', 'cancelled');
+        // 2. Total revenue and count in the period, from the sales rollups
+        const { data: summary } = await (supabase as any).rpc('get_sales_summary', {
+          p_store_id: profile.store_id,
+          p_start_date: start,
+          p_end_date: end
+        });
 
-        const totalRevenue = (orders || []).reduce((acc, o) => acc + (o.total_amount || 0), 0);
-        const orderCount = orders?.length || 0;
+        const totalRevenue = Number(summary?.totals?.revenue) || 0;
+        const orderCount = Number(summary?.totals?.orders_count) || 0;
         const totalDiscrepancy = (closures || []).reduce((acc, c) => acc + (Number(c.real_cash) - Number(c.expected_cash)), 0);
         const sessionsCount = closures?.length || 0;
         const avgTicket = orderCount > 0 ? totalRevenue / orderCount : 0;
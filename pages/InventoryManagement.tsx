@@ -7,7 +7,7 @@ import { useToast } from '../components/ToastSystem';
 import {
   InventoryItem, UnitType, Category, RecipeComponent
 } from '../types';
-import { GoogleGenerativeAI } from "@google/generative-ai";
+import { getGeminiModel, generateMemoized } from '../lib/gemini';
 import InvoiceProcessor from './InvoiceProcessor';
 import { useOffline } from '../contexts/OfflineContext';
 import { Tab, TabGroup } from '../components/ui/Tab';
@@ -1162,13 +1162,11 @@ const InventoryManagement: React.FC = () => {
     if (!selectedItem || aiGenerating) return;
     setAiGenerating(true);
     try {
-      const apiKey = import.meta.env.VITE_GEMINI_API_KEY || '';
-      if (!apiKey) {
+      const model = getGeminiModel();
+      if (!model) {
         addToast("Configuración de IA no detectada.", "info");
         return;
       }
-      const genAI = new GoogleGenerativeAI(apiKey);
-      const model = genAI.getGenerativeModel({ model: "gemini-2.0-flash" });
       const ingredientsList = selectedItem.recipe?.map(r => {
         const ing = items.find(i => i.id === r.ingredientId);
         return ing?.name;
@@ -1176,12 +1174,20 @@ const InventoryManagement: React.FC = () => {
 
       const prompt = `Escribe una descripción gourmet corta (máx 150 caracteres) para un producto de cafetería/restaurante llamado "${selectedItem.name}". Utiliza estos ingredientes: ${ingredientsList}. Sé tentador y profesional.`;
 
-      const result = await model.generateContent(prompt);
-      const response = await result.response;
-      const description = response.text() || '';
+      // Same product and ingredients -> same prompt, answered from memory after the first time.
+      // Tokens are shown as they stream in.
+      const isProduct = selectedItem.item_type === 'sellable';
+      const description = (await generateMemoized(
+        prompt,
+        text => {
+          if (isProduct) setSelectedItem(prev => prev && prev.id === selectedItem.id ? { ...prev, description: text } : prev);
+        },
+        'product-description',
+        model
+      )).trim();
 
       // Update in DB if it's a product
-      if (selectedItem.item_type === 'sellable') {
+      if (isProduct) {
         const { error } = await supabase
           .from('products')
           .update({ description })
@@ -3,6 +3,7 @@ import { useAuth } from '../contexts/AuthContext';
 import { useToast } from '../components/ToastSystem';
 import { Invoice, InvoiceItem, InvoiceStatus, InventoryItem } from '../types';
 import { supabase } from '../lib/supabase';
+import { downscaleInvoiceImage } from '../lib/invoiceImages';
 
 // Status badge config
 const statusConfig: Record<InvoiceStatus, { label: string; color: string; animate?: boolean }> = {
@@ -13,6 +14,9 @@ const statusConfig: Record<InvoiceStatus, { label: string; color: string; animat
     error: { label: 'Error', color: 'bg-red-500/20 text-red-400' }
 };
 
+// process-invoice accepts up to INVOICE_BATCH_MAX (50) invoices per request
+const INVOICE_BATCH_SIZE = 50;
+
 interface InvoiceProcessorProps {
     isOpen?: boolean;
     onClose?: () => void;
@@ -110,16 +114,19 @@ const InvoiceProcessor: React.FC<InvoiceProcessorProps> = ({ isOpen = true, onCl
         }
 
         setUploading(true);
+        const toProcess: { invoice_id: string; image_url: string }[] = [];
 
         for (let i = 0; i < files.length; i++) {
-            const file = files[i];
+            const selected = files[i];
 
-            if (!['image/jpeg', 'image/png', 'application/pdf'].includes(file.type)) {
-                addToast(`Archivo no soportado: ${file.name}`, 'error');
+            if (!['image/jpeg', 'image/png', 'application/pdf'].includes(selected.type)) {
+                addToast(`Archivo no soportado: ${selected.name}`, 'error');
                 continue;
             }
 
             try {
+                // Phone photos are several MB; the model does not need them at full size
+                const file = await downscaleInvoiceImage(selected);
                 const ext = file.name.split('.').pop();
                 const fileName = `${storeId}/${Date.now()}-${Math.random().toString(36).slice(2)}.${ext}`;
 
@@ -158,8 +165,7 @@ const InvoiceProcessor: React.FC<InvoiceProcessorProps> = ({ isOpen = true, onCl
                 setInvoices(prev => [invoiceData, ...prev]);
                 addToast(`Documento añadido`, 'success');
 
-                // Auto-process
-                processInvoice(invoiceData.id, publicUrl);
+                toProcess.push({ invoice_id: invoiceData.id, image_url: publicUrl });
 
             } catch (err: any) {
                 console.error('Upload error:', err);
@@ -169,15 +175,30 @@ const InvoiceProcessor: React.FC<InvoiceProcessorProps> = ({ isOpen = true, onCl
 
         setUploading(false);
         if (fileInputRef.current) fileInputRef.current.value = '';
+
+        // Auto-process the selection in batches; progress streams back per invoice
+        (async () => {
+            for (let i = 0; i < toProcess.length; i += INVOICE_BATCH_SIZE) {
+                await processInvoices(toProcess.slice(i, i + INVOICE_BATCH_SIZE));
+            }
+        })();
     };
 
-    const processInvoice = async (invoiceId: string, imageUrl: string) => {
+    const processInvoices = async (batch: { invoice_id: string; image_url: string }[]) => {
+        const ids = new Set(batch.map(b => b.invoice_id));
+        const markError = (invoiceIds: Set<string>) => setInvoices(prev => prev.map(inv =>
+            invoiceIds.has(inv.id) && inv.status === 'processing' ? { ...inv, status: 'error' as InvoiceStatus } : inv
+        ));
         setInvoices(prev => prev.map(inv =>
-            inv.id === invoiceId ? { ...inv, status: 'processing' as InvoiceStatus } : inv
+            ids.has(inv.id) ? { ...inv, status: 'processing' as InvoiceStatus } : inv
         ));
+        // Once the server accepted the batch it may finish invoices the stream did not
+        // report (cut connection, unreadable line): reload those instead of failing them
+        let accepted = false;
+        const recheckPending = () => ids.forEach(id => fetchInvoiceDetails(id));
 
         try {
-            console.log('[ProcessInvoice] Starting with:', { invoiceId, imageUrl });
+            console.log('[ProcessInvoice] Starting batch of', batch.length);
 
             const response = await fetch(
                 `${import.meta.env.VITE_SUPABASE_URL}/functions/v1/process-invoice`,
@@ -187,26 +208,61 @@ const InvoiceProcessor: React.FC<InvoiceProcessorProps> = ({ isOpen = true, onCl
                         'Content-Type': 'application/json',
                         'Authorization': `Bearer ${import.meta.env.VITE_SUPABASE_ANON_KEY}`
                     },
-                    body: JSON.stringify({ invoice_id: invoiceId, image_url: imageUrl })
+                    body: JSON.stringify({ invoices: batch })
                 }
             );
 
-            const responseText = await response.text();
-            console.log('[ProcessInvoice] Response:', response.status, responseText);
-
-            if (!response.ok) {
-                throw new Error(`Processing failed: ${response.status} - ${responseText}`);
+            if (!response.ok || !response.body) {
+                throw new Error(`Processing failed: ${response.status} - ${await response.text()}`);
+            }
+            accepted = true;
+
+            // NDJSON: one line per invoice as it finishes, then a summary line
+            let extracted = 0;
+            const handleLine = (line: string) => {
+                if (!line.trim()) return;
+                let event: any;
+                try {
+                    event = JSON.parse(line);
+                } catch {
+                    console.warn('[ProcessInvoice] Skipping unreadable stream line:', line.slice(0, 200));
+                    return;
+                }
+                if (event.type === 'progress') {
+                    ids.delete(event.invoice_id);
+                    if (event.status === 'extracted') {
+                        extracted++;
+                        fetchInvoiceDetails(event.invoice_id);
+                    } else {
+                        markError(new Set([event.invoice_id]));
+                        addToast(`Error: ${event.error}`, 'error');
+                    }
+                } else if (event.type === 'error') {
+                    throw new Error(event.error);
+                }
+            };
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            for (;;) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop() || '';
+                lines.forEach(handleLine);
             }
+            handleLine(buffered + decoder.decode());
 
-            await fetchInvoiceDetails(invoiceId);
-            addToast('✅ Procesado con IA', 'success');
+            if (extracted > 0) addToast(`✅ ${extracted} procesada${extracted > 1 ? 's' : ''} con IA`, 'success');
+            recheckPending();
 
         } catch (err: any) {
             console.error('[ProcessInvoice] Error:', err);
             addToast(`Error: ${err.message}`, 'error');
-            setInvoices(prev => prev.map(inv =>
-                inv.id === invoiceId ? { ...inv, status: 'error' as InvoiceStatus } : inv
-            ));
+            if (accepted) recheckPending();
+            else markError(ids);
         }
     };
 
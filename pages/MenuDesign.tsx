@@ -1,6 +1,6 @@
 import React, { useState, useMemo, useRef, useEffect } from 'react';
 import { InventoryItem, ProductVariant, ProductAddon, UnitType, RecipeComponent, Store, MenuTheme } from '../types';
-import { GoogleGenerativeAI } from "@google/generative-ai";
+import { getGeminiModel, generateMemoized } from '../lib/gemini';
 import { PaymentCapabilityBadge } from '../components/PaymentCapabilityBadge';
 import { MenuRenderer } from '../components/MenuRenderer';
 import { supabase } from '../lib/supabase';
@@ -1999,17 +1999,14 @@ const MenuDesign: React.FC = () => {
         if (!selectedItem) return;
         setIsGeneratingAI(true);
         try {
-            const apiKey = import.meta.env.VITE_GEMINI_API_KEY || '';
-            if (!apiKey) {
+            const model = getGeminiModel();
+            if (!model) {
                 alert('Configuración de IA no detectada. Solicite activación al soporte.');
                 return;
             }
-            const ai = new GoogleGenerativeAI(apiKey);
-            const model = ai.getGenerativeModel({ model: "gemini-2.0-flash" });
             const prompt = `Eres un experto redactor gourmet para cafeterías de especialidad. Escribe una descripción corta (máximo 120 caracteres), sensorial e irresistible para el producto: "${selectedItem.name}". Si el producto es café, menciona notas de cata. No uses comillas.`;
-            const result = await model.generateContent(prompt);
-            const response = await result.response;
-            const text = response.text();
+            // Identical prompts (same product name) reuse the first description
+            const text = await generateMemoized(prompt, undefined, 'menu-description', model);
             if (text) updateItemImmediate(selectedItem.id, { description: text.trim() });
         } catch (e) {
             console.error("AI Error:", e);
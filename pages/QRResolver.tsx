@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { supabase } from '../lib/supabase';
-import { setQRContext, QRContext } from '../lib/qrContext';
+import { setQRContext, getRecentQRContext, clearQRContext, QRContext } from '../lib/qrContext';
 import { QrCode, AlertCircle, Loader2, Home } from 'lucide-react';
 
 interface QRLinkData {
@@ -46,6 +46,22 @@ const QRResolver: React.FC = () => {
         try {
             setState('loading');
 
+            // 0. Re-scan of the same code (guest scanning again at the table): reuse the context,
+            // but still log the scan; if the code was deactivated meanwhile, drop the context
+            const recent = getRecentQRContext(qrHash);
+            if (recent && localStorage.getItem('client_session_id')) {
+                (supabase.rpc as any)('secure_log_qr_scan', {
+                    p_qr_hash: qrHash,
+                    p_client_ip: 'anonymous_client',
+                    p_user_agent: navigator.userAgent
+                }).then(({ data }: any) => {
+                    if (data && !data.success && data.error !== 'TOO_MANY_REQUESTS') clearQRContext();
+                }, (err: any) => console.warn('[QRResolver] Re-scan log failed:', err));
+                setState('success');
+                navigate(`/m/${recent.store_slug}`, { replace: true });
+                return;
+            }
+
             // 1. Call the SECURE SQL RPC with TIMEOUT
             const rpcPromise = (supabase.rpc as any)('secure_log_qr_scan', {
                 p_qr_hash: qrHash,
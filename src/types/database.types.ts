@@ -1875,6 +1875,7 @@ export type Database = {
           created_at: string | null
           fecha_factura: string | null
           id: string
+          image_hash: string | null
           image_url: string | null
           iva_total: number | null
           nro_factura: string | null
@@ -1892,6 +1893,7 @@ export type Database = {
           created_at?: string | null
           fecha_factura?: string | null
           id?: string
+          image_hash?: string | null
           image_url?: string | null
           iva_total?: number | null
           nro_factura?: string | null
@@ -1909,6 +1911,7 @@ export type Database = {
           created_at?: string | null
           fecha_factura?: string | null
           id?: string
+          image_hash?: string | null
           image_url?: string | null
           iva_total?: number | null
           nro_factura?: string | null
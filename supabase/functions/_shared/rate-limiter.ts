@@ -1,17 +1,15 @@
 /**
  * Rate Limiter for Edge Functions
  * Prevents DDoS and abuse by limiting requests per IP/store
- * Uses in-memory Map (simple, no Redis needed for MVP)
+ * Sliding window per isolate, shared with lib/rateLimit.js (see sliding-window.js)
  */
 
-interface RateLimitEntry {
-  count: number;
-  resetAt: number;
-}
+import { SlidingWindowLimiter } from './sliding-window.js';
 
-// In-memory rate limit store
+// In-memory, bounded to MAX_KEYS identifiers (least recently seen dropped first)
 // Note: This resets when Edge Function cold-starts, but that's acceptable for MVP
-const rateLimitStore = new Map<string, RateLimitEntry>();
+const MAX_KEYS = 10000;
+const limiter = new SlidingWindowLimiter({ maxKeys: MAX_KEYS });
 
 export interface RateLimitConfig {
   windowMs: number;   // Time window in milliseconds
@@ -46,32 +44,12 @@ export function isRateLimited(
   identifier: string,
   config: RateLimitConfig = RATE_LIMITS.api
 ): { limited: boolean; remaining: number; resetAt: number } {
-  const now = Date.now();
-  const key = `ratelimit:${identifier}`;
-
-  // Get or create entry
-  let entry = rateLimitStore.get(key);
-
-  // Reset if window expired
-  if (!entry || now >= entry.resetAt) {
-    entry = {
-      count: 0,
-      resetAt: now + config.windowMs
-    };
-    rateLimitStore.set(key, entry);
-  }
-
-  // Increment count
-  entry.count++;
-
-  // Check if over limit
-  const limited = entry.count > config.maxRequests;
-  const remaining = Math.max(0, config.maxRequests - entry.count);
+  const result = limiter.check(`ratelimit:${identifier}`, config.maxRequests, config.windowMs);
 
   return {
-    limited,
-    remaining,
-    resetAt: entry.resetAt
+    limited: !result.allowed,
+    remaining: result.remaining,
+    resetAt: result.resetAt
   };
 }
 
@@ -129,19 +107,11 @@ export function getClientIdentifier(
 }
 
 /**
- * Cleanup expired entries (call periodically)
- * Prevents memory leak from abandoned entries
+ * Drop identifiers idle for two windows
+ * Not required for memory (the limiter is bounded); frees it early
  */
 export function cleanupExpiredEntries(): number {
-  const now = Date.now();
-  let removed = 0;
-
-  for (const [key, entry] of rateLimitStore.entries()) {
-    if (now >= entry.resetAt + 60000) { // Keep for 1 min after reset for safety
-      rateLimitStore.delete(key);
-      removed++;
-    }
-  }
+  const removed = limiter.prune();
 
   if (removed > 0) {
     console.log(`[RateLimiter] Cleaned up ${removed} expired entries`);
@@ -150,9 +120,6 @@ export function cleanupExpiredEntries(): number {
   return removed;
 }
 
-// Run cleanup every 5 minutes
-setInterval(cleanupExpiredEntries, 5 * 60 * 1000);
-
 /**
  * Example usage in Edge Function:
  *
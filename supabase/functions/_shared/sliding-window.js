@@ -0,0 +1,120 @@
+/**
+ * Sliding-window rate limiter shared by lib/rateLimit.js (Vercel API routes)
+ * and _shared/rate-limiter.ts (Edge Functions).
+ *
+ * Sliding window counter: a key keeps the hit count of the current fixed
+ * window and of the one before, and the estimate is
+ *   previous * (1 - elapsed / window) + current
+ * which is O(1) per check and three numbers per key. Unlike a fixed window
+ * it does not let a client spend its limit twice around a window boundary.
+ *
+ * Memory is bounded: keys live in a Map used as an LRU, and at maxKeys the
+ * least recently seen key is dropped. Dropping a key can only let that
+ * client through early; it never blocks anyone else.
+ *
+ * Plain JavaScript (no dependencies) so Node and Deno import it as is. It
+ * lives here because Edge Function deploys only bundle supabase/functions;
+ * Node code imports it through lib/slidingWindow.js.
+ */
+
+export const DEFAULT_MAX_KEYS = 10000;
+
+function decide(limit, windowMs, now, windowStart, previous, current) {
+  const weight = Math.max(0, 1 - (now - windowStart) / windowMs);
+  const count = previous * weight + current;
+  return {
+    allowed: count <= limit,
+    limit,
+    count: Math.ceil(count),
+    remaining: Math.max(0, Math.floor(limit - count)),
+    resetAt: windowStart + windowMs,
+  };
+}
+
+export class SlidingWindowLimiter {
+  /**
+   * @param {{ maxKeys?: number, now?: () => number }} [options]
+   */
+  constructor({ maxKeys = DEFAULT_MAX_KEYS, now = Date.now } = {}) {
+    this.maxKeys = maxKeys;
+    this.now = now;
+    this.entries = new Map();
+    this.evictions = 0;
+  }
+
+  get size() {
+    return this.entries.size;
+  }
+
+  /**
+   * Count one hit for `key` and decide it.
+   * @param {string} key
+   * @param {number} limit - max hits per window
+   * @param {number} windowMs
+   */
+  check(key, limit, windowMs) {
+    const now = this.now();
+    const windowStart = now - (now % windowMs);
+    let entry = this.entries.get(key);
+
+    if (entry) {
+      // Re-inserted below, so the Map stays ordered by last use
+      this.entries.delete(key);
+      if (entry.windowStart !== windowStart || entry.windowMs !== windowMs) {
+        const adjacent = entry.windowMs === windowMs && entry.windowStart === windowStart - windowMs;
+        entry.previous = adjacent ? entry.current : 0;
+        entry.current = 0;
+        entry.windowStart = windowStart;
+        entry.windowMs = windowMs;
+      }
+    } else {
+      if (this.entries.size >= this.maxKeys) {
+        this.entries.delete(this.entries.keys().next().value);
+        this.evictions++;
+      }
+      entry = { windowStart, windowMs, previous: 0, current: 0 };
+    }
+
+    entry.current++;
+    this.entries.set(key, entry);
+    return decide(limit, windowMs, now, windowStart, entry.previous, entry.current);
+  }
+
+  /**
+   * Drop keys idle for two windows (they would count as fresh anyway).
+   * Optional: the LRU bound already caps memory.
+   */
+  prune() {
+    const now = this.now();
+    let removed = 0;
+    for (const [key, entry] of this.entries) {
+      if (now >= entry.windowStart + 2 * entry.windowMs) {
+        this.entries.delete(key);
+        removed++;
+      }
+    }
+    return removed;
+  }
+}
+
+/**
+ * Same algorithm on Redis: one pipeline (INCR + PEXPIRE of the current
+ * window's key, GET of the previous one) per check. Keys expire after two
+ * windows, so Redis holds at most two keys per active client.
+ *
+ * @param {{ pipeline: () => any }} redis - an @upstash/redis client or equivalent
+ * @param {string} key
+ * @param {number} limit
+ * @param {number} windowMs
+ * @param {number} [now]
+ */
+export async function checkRedisSlidingWindow(redis, key, limit, windowMs, now = Date.now()) {
+  const windowStart = now - (now % windowMs);
+  const currentKey = `${key}:${windowStart}`;
+  const pipeline = redis.pipeline();
+  pipeline.incr(currentKey);
+  pipeline.pexpire(currentKey, windowMs * 2);
+  pipeline.get(`${key}:${windowStart - windowMs}`);
+  const [current, , previous] = await pipeline.exec();
+  return decide(limit, windowMs, now, windowStart, Number(previous) || 0, Number(current));
+}
@@ -10,6 +10,9 @@ import {
 const FUNCTION_NAME = 'mp-webhook';
 initMonitoring(FUNCTION_NAME);
 
+// Overridable so load tests can point the function at a local MP stand-in
+const MP_API_URL = Deno.env.get('MP_API_URL') || 'https://api.mercadopago.com';
+
 interface MercadoPagoPayment {
   id: number | string;
   status: 'approved' | 'rejected' | 'refunded' | 'cancelled' | 'pending' | 'in_process';
@@ -143,7 +146,7 @@ serve(async (req) => {
 
       if (accessToken) {
         // Fetch payment details from MP
-        const mpRes = await fetch(`https://api.mercadopago.com/v1/payments/${id}`, {
+        const mpRes = await fetch(`${MP_API_URL}/v1/payments/${id}`, {
           headers: { 'Authorization': `Bearer ${accessToken}` }
         });
 
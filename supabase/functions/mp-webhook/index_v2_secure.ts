@@ -7,6 +7,9 @@ import { rateLimitMiddleware, getClientIdentifier, RATE_LIMITS } from "../_share
 const FUNCTION_NAME = 'mp-webhook-v2';
 initMonitoring(FUNCTION_NAME);
 
+// Overridable so load tests can point the function at a local MP stand-in
+const MP_API_URL = Deno.env.get('MP_API_URL') || 'https://api.mercadopago.com';
+
 serve(async (req) => {
   try {
     // PART 1: Rate Limiting (P1-2 FIX)
@@ -100,7 +103,7 @@ serve(async (req) => {
 
     // Fetch payment details from MP
     const mpResponse = await fetch(
-      `https://api.mercadopago.com/v1/payments/${paymentId}`,
+      `${MP_API_URL}/v1/payments/${paymentId}`,
       {
         headers: {
           'Authorization': `Bearer ${accessToken}`,
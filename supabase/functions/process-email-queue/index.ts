@@ -8,117 +8,177 @@ initMonitoring(FUNCTION_NAME);
 
 const BACKOFF_MINUTES = [1, 5, 30, 120]; // 1m, 5m, 30m, 2h
 
+const RESEND_API_URL = Deno.env.get('RESEND_API_URL') || 'https://api.resend.com/emails';
+
+// Worker mode: claim batches (claim_email_batch, FOR UPDATE SKIP LOCKED) until the
+// queue is drained or the time budget is spent. Several invocations can run at once.
+const BATCH_SIZE = Number(Deno.env.get('EMAIL_BATCH_SIZE') || 50);
+const SEND_CONCURRENCY = Number(Deno.env.get('EMAIL_SEND_CONCURRENCY') || 4);
+// Resend allows 2 req/s per API key by default; 0 disables pacing. Paced per
+// invocation: with several workers, a 429 goes through the normal backoff.
+const SEND_RATE_PER_SEC = Number(Deno.env.get('EMAIL_SEND_RATE_PER_SEC') ?? 2);
+const LEASE_SECONDS = Number(Deno.env.get('EMAIL_LEASE_SECONDS') || 300);
+const MAX_RUN_MS = Number(Deno.env.get('EMAIL_WORKER_MAX_MS') || 50000);
+
+interface QueueItem {
+    id: string;
+    order_id: string;
+    recipient: string;
+    subject: string;
+    attempts: number;
+    order: {
+        is_paid: boolean;
+        order_number: number;
+        total_amount: number;
+        store: { name: string | null; logo_url: string | null };
+        client: { full_name: string | null };
+    } | null;
+}
+
+interface Outcome {
+    id: string;
+    status: 'sent' | 'cancelled' | 'failed' | 'pending';
+    attempts?: number;
+    next_retry_at?: string;
+    last_error: string | null;
+}
+
+const delay = (ms: number) => new Promise(r => setTimeout(r, ms));
+
+// Spaces send start times 1/SEND_RATE_PER_SEC apart across the concurrent senders
+let nextSendAt = 0;
+async function paceSend() {
+    if (SEND_RATE_PER_SEC <= 0) return;
+    const now = Date.now();
+    const at = Math.max(now, nextSendAt);
+    nextSendAt = at + 1000 / SEND_RATE_PER_SEC;
+    if (at > now) await delay(at - now);
+}
+
+async function processItem(item: QueueItem, resendKey: string): Promise<Outcome> {
+    try {
+        // DOUBLE CHECK: the order (prefetched by the claim) must still be paid
+        const order = item.order;
+        if (!order || !order.is_paid) {
+            console.warn(`Skipping email for order ${item.order_id}: Not paid or not found`);
+            return { id: item.id, status: 'cancelled', last_error: 'Order not paid' };
+        }
+
+        // Send directly via Resend API (avoids inter-function auth issues)
+        if (!resendKey) throw new Error('RESEND_API_KEY not configured');
+
+        const storeName = order.store?.name || 'Tu Tienda';
+        const storeLogoUrl = order.store?.logo_url || null;
+        const customerName = order.client?.full_name || 'Cliente';
+
+        const emailHtml = generatePaymentQueueHtml({
+            store_name: storeName,
+            store_logo_url: storeLogoUrl,
+            customer_name: customerName,
+            order_number: order.order_number,
+            total_amount: order.total_amount
+        });
+
+        await paceSend();
+        const emailRes = await fetch(RESEND_API_URL, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${resendKey}`,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                from: `${storeName} <no-reply@payperapp.io>`,
+                to: item.recipient,
+                subject: item.subject,
+                html: emailHtml,
+                text: `Tu pedido #${order.order_number} ha sido confirmado. Total: $${order.total_amount}`
+            })
+        });
+
+        const emailResult = await emailRes.json().catch(() => null);
+        if (!emailRes.ok) {
+            throw new Error(JSON.stringify(emailResult) || 'Failed to send');
+        }
+        return { id: item.id, status: 'sent', attempts: item.attempts + 1, last_error: null };
+
+    } catch (err) {
+        // Backoff logic
+        const attempts = item.attempts + 1;
+        if (attempts >= BACKOFF_MINUTES.length) {
+            return { id: item.id, status: 'failed', attempts, last_error: err.message };
+        }
+        const nextRetry = new Date();
+        nextRetry.setMinutes(nextRetry.getMinutes() + BACKOFF_MINUTES[attempts]);
+        return {
+            id: item.id,
+            status: 'pending',
+            attempts,
+            next_retry_at: nextRetry.toISOString(),
+            last_error: err.message
+        };
+    }
+}
+
+// Runs processItem over the batch with at most SEND_CONCURRENCY in flight
+async function processBatch(items: QueueItem[], resendKey: string): Promise<Outcome[]> {
+    const outcomes: Outcome[] = [];
+    let next = 0;
+    const worker = async () => {
+        while (next < items.length) {
+            const item = items[next++];
+            outcomes.push(await processItem(item, resendKey));
+        }
+    };
+    await Promise.all(Array.from({ length: Math.max(1, Math.min(SEND_CONCURRENCY, items.length)) }, worker));
+    return outcomes;
+}
+
 serve(async (req) => {
     const supabaseUrl = Deno.env.get('SUPABASE_URL')!;
     const supabaseServiceKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!;
     const supabase = createClient(supabaseUrl, supabaseServiceKey);
+    const resendKey = Deno.env.get('RESEND_API_KEY') || '';
 
     try {
-        // 1. Fetch pending emails that are ready for retry
-        const { data: queueItems, error: fetchError } = await supabase
-            .from('email_queue')
-            .select('*')
-            .eq('status', 'pending')
-            .lte('next_retry_at', new Date().toISOString())
-            .limit(10); // Process in small batches
-
-        if (fetchError) throw fetchError;
-        if (!queueItems || queueItems.length === 0) {
-            return new Response(JSON.stringify({ message: "No pending emails" }), { status: 200 });
-        }
-
-        const results = [];
-        const delay = (ms: number) => new Promise(r => setTimeout(r, ms));
-
-        for (const item of queueItems) {
-            try {
-                // 2. DOUBLE CHECK: Verify the order is still paid before sending
-                const { data: order, error: orderError } = await supabase
-                    .from('orders')
-                    .select('is_paid, order_number, total_amount, items, store:stores(name, logo_url), client:clients(full_name)')
-                    .eq('id', item.order_id)
-                    .single();
-
-                if (orderError || !order || !order.is_paid) {
-                    console.warn(`Skipping email for order ${item.order_id}: Not paid or not found`);
-                    await supabase.from('email_queue').update({ status: 'cancelled', last_error: 'Order not paid' }).eq('id', item.id);
-                    continue;
-                }
-
-                // 3. Send directly via Resend API (avoids inter-function auth issues)
-                const resendKey = Deno.env.get('RESEND_API_KEY') || '';
-                if (!resendKey) throw new Error('RESEND_API_KEY not configured');
-
-                const storeName = (order.store as any)?.name || 'Tu Tienda';
-                const storeLogoUrl = (order.store as any)?.logo_url || null;
-                const customerName = (order.client as any)?.full_name || 'Cliente';
-
-                const emailHtml = generatePaymentQueueHtml({
-                    store_name: storeName,
-                    store_logo_url: storeLogoUrl,
-                    customer_name: customerName,
-                    order_number: order.order_number,
-                    total_amount: order.total_amount
-                });
-
-                const emailRes = await fetch('https://api.resend.com/emails', {
-                    method: 'POST',
-                    headers: {
-                        'Authorization': `Bearer ${resendKey}`,
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        from: `${storeName} <no-reply@payperapp.io>`,
-                        to: item.recipient,
-                        subject: item.subject,
-                        html: emailHtml,
-                        text: `Tu pedido #${order.order_number} ha sido confirmado. Total: $${order.total_amount}`
-                    })
-                });
-
-                const emailResult = await emailRes.json();
-
-                if (emailRes.ok) {
-                    // Success
-                    await supabase
-                        .from('email_queue')
-                        .update({
-                            status: 'sent',
-                            attempts: item.attempts + 1,
-                            last_error: null
-                        })
-                        .eq('id', item.id);
-                    results.push({ id: item.id, status: 'sent' });
-                    // Rate limit: Resend allows 2 req/s
-                    await delay(600);
-                } else {
-                    throw new Error(JSON.stringify(emailResult) || 'Failed to send');
-                }
-
-            } catch (err) {
-                // 5. Backoff logic
-                const attempts = item.attempts + 1;
-                if (attempts >= BACKOFF_MINUTES.length) {
-                    await supabase.from('email_queue').update({
-                        status: 'failed',
-                        attempts: attempts,
-                        last_error: err.message
-                    }).eq('id', item.id);
-                    results.push({ id: item.id, status: 'failed', error: err.message });
-                } else {
-                    const nextRetry = new Date();
-                    nextRetry.setMinutes(nextRetry.getMinutes() + BACKOFF_MINUTES[attempts]);
-                    await supabase.from('email_queue').update({
-                        attempts: attempts,
-                        next_retry_at: nextRetry.toISOString(),
-                        last_error: err.message
-                    }).eq('id', item.id);
-                    results.push({ id: item.id, status: 'retrying', attempt: attempts });
-                }
+        const started = Date.now();
+        const totals = { batches: 0, claimed: 0, sent: 0, retrying: 0, failed: 0, cancelled: 0 };
+
+        while (Date.now() - started < MAX_RUN_MS) {
+            // 1. Claim due emails, with their orders, in one round trip
+            const { data: claim, error: claimError } = await supabase.rpc('claim_email_batch', {
+                p_limit: BATCH_SIZE,
+                p_lease_seconds: LEASE_SECONDS
+            });
+            if (claimError) throw claimError;
+
+            const items = (claim?.items || []) as QueueItem[];
+            if (items.length === 0) break;
+
+            // 2. Send with bounded concurrency
+            const outcomes = await processBatch(items, resendKey);
+
+            // 3. Record every outcome in one update
+            const { error: completeError } = await supabase.rpc('complete_email_batch', {
+                p_lease: claim.lease,
+                p_results: outcomes
+            });
+            if (completeError) throw completeError;
+
+            totals.batches++;
+            totals.claimed += items.length;
+            for (const outcome of outcomes) {
+                if (outcome.status === 'sent') totals.sent++;
+                else if (outcome.status === 'pending') totals.retrying++;
+                else if (outcome.status === 'failed') totals.failed++;
+                else totals.cancelled++;
             }
+            if (items.length < BATCH_SIZE) break;
         }
 
-        return new Response(JSON.stringify(results), { status: 200 });
+        if (totals.claimed === 0) {
+            return new Response(JSON.stringify({ message: "No pending emails" }), { status: 200 });
+        }
+        return new Response(JSON.stringify({ ...totals, elapsed_ms: Date.now() - started }), { status: 200 });
 
     } catch (error) {
         console.error("Queue Processor Error:", error);
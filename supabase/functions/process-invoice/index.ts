@@ -1,9 +1,16 @@
 // supabase/functions/process-invoice/index.ts
 // Edge Function para procesar facturas con Gemini AI
+//
+// Single mode: { invoice_id, image_url } -> JSON, as before.
+// Batch mode:  { invoices: [{ invoice_id, image_url }, ...] } -> NDJSON stream,
+// one progress line per invoice as it finishes, then a summary line.
+// Images are hashed (SHA-256); identical images in a batch go to the model once,
+// and an image this store already extracted reuses that result (invoices.image_hash).
 
 import { serve } from 'https://deno.land/std@0.168.0/http/server.ts'
-import { createClient } from 'https://esm.sh/@supabase/supabase-js@2'
-import { GoogleGenerativeAI } from 'https://esm.sh/@google/generative-ai@0.24.1'
+import { encode as encodeBase64 } from 'https://deno.land/std@0.168.0/encoding/base64.ts'
+import { createClient, SupabaseClient } from 'https://esm.sh/@supabase/supabase-js@2'
+import { GoogleGenerativeAI, GenerativeModel } from 'https://esm.sh/@google/generative-ai@0.24.1'
 import { initMonitoring, captureException } from '../_shared/monitoring.ts'
 
 const FUNCTION_NAME = 'process-invoice'
@@ -14,90 +21,15 @@ const corsHeaders = {
     'Access-Control-Allow-Headers': 'authorization, x-client-info, apikey, content-type',
 }
 
-serve(async (req) => {
-    // Handle CORS preflight
-    if (req.method === 'OPTIONS') {
-        return new Response('ok', { headers: corsHeaders })
-    }
-
-    try {
-        const { invoice_id, image_url } = await req.json()
-
-        if (!invoice_id || !image_url) {
-            return new Response(
-                JSON.stringify({ error: 'Missing invoice_id or image_url' }),
-                { status: 400, headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
-            )
-        }
-
-        // Initialize Supabase client
-        const supabaseUrl = Deno.env.get('SUPABASE_URL')!
-        const supabaseServiceKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!
-        const supabase = createClient(supabaseUrl, supabaseServiceKey)
-
-        // Update status to processing
-        await supabase
-            .from('invoices')
-            .update({ status: 'processing' })
-            .eq('id', invoice_id)
-
-        // Download image from storage using service role
-        // Extract path from URL: https://xxx.supabase.co/storage/v1/object/public/invoices-files/store_id/filename.ext
-        let imagePath = ''
-        if (image_url.includes('/object/public/')) {
-            // Public URL format
-            imagePath = image_url.split('/object/public/invoices-files/')[1]
-        } else if (image_url.includes('/object/')) {
-            // Authenticated URL format
-            imagePath = image_url.split('/object/invoices-files/')[1]
-        }
-
-        console.log('Downloading image from path:', imagePath)
-
-        let imageData: Uint8Array
-        let mimeType = 'image/jpeg'
-
-        if (imagePath) {
-            // Download using Supabase Storage API (works for private buckets)
-            const { data: downloadData, error: downloadError } = await supabase.storage
-                .from('invoices-files')
-                .download(imagePath)
-
-            if (downloadError) {
-                console.error('Storage download error:', downloadError)
-                throw new Error(`Failed to download image: ${downloadError.message}`)
-            }
-
-            const arrayBuffer = await downloadData.arrayBuffer()
-            imageData = new Uint8Array(arrayBuffer)
-            mimeType = downloadData.type || 'image/jpeg'
-        } else {
-            // Fallback to direct fetch for external URLs
-            const imageResponse = await fetch(image_url)
-            if (!imageResponse.ok) {
-                throw new Error('Failed to download image from URL')
-            }
-            const imageBlob = await imageResponse.blob()
-            const arrayBuffer = await imageBlob.arrayBuffer()
-            imageData = new Uint8Array(arrayBuffer)
-            mimeType = imageBlob.type || 'image/jpeg'
-        }
-
-        const base64Image = btoa(
-            imageData.reduce((data, byte) => data + String.fromCharCode(byte), '')
-        )
+const GEMINI_MODEL = 'gemini-2.5-flash'
+// Local model stand-ins (testsprite_tests/perf/invoice_batch.py) set this; unset in production
+const GEMINI_API_BASE_URL = Deno.env.get('GEMINI_API_BASE_URL') || undefined
+// Model calls (and downloads) in flight per batch request
+const MODEL_CONCURRENCY = Number(Deno.env.get('INVOICE_MODEL_CONCURRENCY') || 4)
+const MAX_BATCH_SIZE = Number(Deno.env.get('INVOICE_BATCH_MAX') || 50)
 
-        // Initialize Gemini
-        const geminiApiKey = Deno.env.get('GEMINI_API_KEY')
-        if (!geminiApiKey) {
-            throw new Error('GEMINI_API_KEY not configured')
-        }
-
-        const genAI = new GoogleGenerativeAI(geminiApiKey)
-        const model = genAI.getGenerativeModel({ model: 'gemini-2.5-flash' })
-
-        // System prompt for Argentine invoice extraction (Spanish is required for the model context)
-        const systemPrompt = `Eres un experto contable argentino especializado en OCR de facturas. 
+// System prompt for Argentine invoice extraction (Spanish is required for the model context)
+const SYSTEM_PROMPT = `Eres un experto contable argentino especializado en OCR de facturas. 
         
         // --- INICIO DE PROMPT PARA IA (NO MODIFICAR TEXTO) ---
 TAREA: Extrae todos los datos de esta factura y devuélvelos en formato JSON.
@@ -135,111 +67,339 @@ NOTAS:
 - Asegúrate de que la suma de los items coincida aproximadamente con el subtotal
 - Devuelve SOLO el JSON, sin markdown ni explicaciones adicionales`
 
-        // Call Gemini with image
-        const result = await model.generateContent([
-            systemPrompt,
-            {
-                inlineData: {
-                    mimeType: mimeType,
-                    data: base64Image
-                }
+interface InvoiceRequest {
+    invoice_id: string
+    image_url: string
+}
+
+type Source = 'model' | 'cache' | 'duplicate'
+
+interface Extraction {
+    data: any
+    source: Source
+}
+
+const jsonHeaders = { ...corsHeaders, 'Content-Type': 'application/json' }
+
+async function downloadImage(supabase: SupabaseClient, image_url: string): Promise<{ data: Uint8Array; mimeType: string }> {
+    // Download image from storage using service role
+    // Extract path from URL: https://xxx.supabase.co/storage/v1/object/public/invoices-files/store_id/filename.ext
+    let imagePath = ''
+    if (image_url.includes('/object/public/')) {
+        // Public URL format
+        imagePath = image_url.split('/object/public/invoices-files/')[1]
+    } else if (image_url.includes('/object/')) {
+        // Authenticated URL format
+        imagePath = image_url.split('/object/invoices-files/')[1]
+    }
+
+    if (imagePath) {
+        // Download using Supabase Storage API (works for private buckets)
+        const { data: downloadData, error: downloadError } = await supabase.storage
+            .from('invoices-files')
+            .download(imagePath)
+
+        if (downloadError) {
+            console.error('Storage download error:', downloadError)
+            throw new Error(`Failed to download image: ${downloadError.message}`)
+        }
+
+        return { data: new Uint8Array(await downloadData.arrayBuffer()), mimeType: downloadData.type || 'image/jpeg' }
+    }
+
+    // Fallback to direct fetch for external URLs
+    const imageResponse = await fetch(image_url)
+    if (!imageResponse.ok) {
+        throw new Error('Failed to download image from URL')
+    }
+    const imageBlob = await imageResponse.blob()
+    return { data: new Uint8Array(await imageBlob.arrayBuffer()), mimeType: imageBlob.type || 'image/jpeg' }
+}
+
+async function sha256Hex(data: Uint8Array): Promise<string> {
+    const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', data))
+    return Array.from(digest, b => b.toString(16).padStart(2, '0')).join('')
+}
+
+async function extractWithModel(model: GenerativeModel, data: Uint8Array, mimeType: string): Promise<any> {
+    // Call Gemini with image
+    const result = await model.generateContent([
+        SYSTEM_PROMPT,
+        {
+            inlineData: {
+                mimeType: mimeType,
+                data: encodeBase64(data)
             }
-        ])
+        }
+    ])
+
+    const responseText = result.response.text()
+
+    // Parse JSON from response (handle potential markdown wrapping)
+    try {
+        // Remove markdown code blocks if present
+        const cleanJson = responseText
+            .replace(/```json\n?/g, '')
+            .replace(/```\n?/g, '')
+            .trim()
+
+        return JSON.parse(cleanJson)
+    } catch (parseError) {
+        console.error('JSON parse error:', responseText)
+        throw new Error('Failed to parse Gemini response as JSON')
+    }
+}
+
+// An earlier extraction of the same image in this store, if any
+async function findCachedExtraction(supabase: SupabaseClient, storeId: string, imageHash: string): Promise<any | null> {
+    const { data, error } = await supabase
+        .from('invoices')
+        .select('raw_extraction')
+        .eq('store_id', storeId)
+        .eq('image_hash', imageHash)
+        .in('status', ['extracted', 'confirmed'])
+        .not('raw_extraction', 'is', null)
+        .limit(1)
+
+    if (error) {
+        console.error('Extraction cache lookup error:', error)
+        return null
+    }
+    return data?.[0]?.raw_extraction ?? null
+}
 
-        const responseText = result.response.text()
+async function saveExtraction(supabase: SupabaseClient, invoiceId: string, imageHash: string, extractedData: any) {
+    // Update invoice with extracted data
+    const { error: updateError } = await supabase
+        .from('invoices')
+        .update({
+            proveedor: extractedData.proveedor || null,
+            fecha_factura: extractedData.fecha || null,
+            nro_factura: extractedData.nro_factura || null,
+            subtotal: extractedData.subtotal || 0,
+            iva_total: extractedData.iva || 0,
+            total: extractedData.total || 0,
+            status: 'extracted',
+            raw_extraction: extractedData,
+            image_hash: imageHash
+        })
+        .eq('id', invoiceId)
+
+    if (updateError) {
+        throw new Error(`Failed to update invoice: ${updateError.message}`)
+    }
 
-        // Parse JSON from response (handle potential markdown wrapping)
-        let extractedData
+    // Insert invoice items
+    if (extractedData.items && Array.isArray(extractedData.items)) {
+        const itemsToInsert = extractedData.items.map((item: any) => ({
+            invoice_id: invoiceId,
+            name: item.descripcion || 'Item sin nombre',
+            quantity: item.cantidad || 0,
+            unit: item.unidad || 'un',
+            unit_price: item.precio_unitario || 0,
+            bonification: item.bonificacion || 0,
+            tax_amount: 0, // Will be calculated if needed
+            total_line: item.total_linea || 0,
+            is_new_item: false,
+            matched_inventory_id: null
+        }))
+
+        const { error: itemsError } = await supabase
+            .from('invoice_items')
+            .insert(itemsToInsert)
+
+        if (itemsError) {
+            console.error('Error inserting items:', itemsError)
+            // Don't fail the whole operation, just log
+        }
+    }
+}
+
+// Extracts a set of invoices. Each image is downloaded and hashed once; the model
+// runs once per new (store, hash) and at most MODEL_CONCURRENCY tasks are in flight.
+async function processInvoices(
+    req: Request,
+    supabase: SupabaseClient,
+    model: GenerativeModel,
+    requests: InvoiceRequest[],
+    onDone: (invoiceId: string, outcome: { source?: Source; data?: any; error?: string }) => void
+) {
+    // Update status to processing (and learn each invoice's store for the cache)
+    const { data: rows, error: statusError } = await supabase
+        .from('invoices')
+        .update({ status: 'processing' })
+        .in('id', requests.map(r => r.invoice_id))
+        .select('id, store_id')
+
+    if (statusError) {
+        throw new Error(`Failed to mark invoices as processing: ${statusError.message}`)
+    }
+    const storeOf = new Map((rows || []).map((r: any) => [r.id, r.store_id as string]))
+
+    // `${store_id}:${hash}` -> extraction shared by every invoice with that image
+    const extractions = new Map<string, Promise<Extraction>>()
+
+    const processOne = async ({ invoice_id, image_url }: InvoiceRequest) => {
         try {
-            // Remove markdown code blocks if present
-            let cleanJson = responseText
-                .replace(/```json\n?/g, '')
-                .replace(/```\n?/g, '')
-                .trim()
-
-            extractedData = JSON.parse(cleanJson)
-        } catch (parseError) {
-            console.error('JSON parse error:', responseText)
-            throw new Error('Failed to parse Gemini response as JSON')
+            const storeId = storeOf.get(invoice_id)
+            if (!storeId) throw new Error('Invoice not found')
+
+            const image = await downloadImage(supabase, image_url)
+            const imageHash = await sha256Hex(image.data)
+            const key = `${storeId}:${imageHash}`
+
+            let extraction: Extraction
+            const pending = extractions.get(key)
+            if (pending) {
+                extraction = { ...(await pending), source: 'duplicate' }
+            } else {
+                const promise = (async (): Promise<Extraction> => {
+                    const cached = await findCachedExtraction(supabase, storeId, imageHash)
+                    if (cached) return { data: cached, source: 'cache' }
+                    return { data: await extractWithModel(model, image.data, image.mimeType), source: 'model' }
+                })()
+                extractions.set(key, promise)
+                extraction = await promise
+            }
+
+            await saveExtraction(supabase, invoice_id, imageHash, extraction.data)
+            onDone(invoice_id, { source: extraction.source, data: extraction.data })
+        } catch (error) {
+            console.error(`Process invoice ${invoice_id} error:`, error)
+            await captureException(error, req, FUNCTION_NAME)
+            await supabase.from('invoices').update({ status: 'error' }).eq('id', invoice_id)
+            onDone(invoice_id, { error: error.message || 'Unknown error' })
         }
+    }
 
-        // Update invoice with extracted data
-        const { error: updateError } = await supabase
-            .from('invoices')
-            .update({
-                proveedor: extractedData.proveedor || null,
-                fecha_factura: extractedData.fecha || null,
-                nro_factura: extractedData.nro_factura || null,
-                subtotal: extractedData.subtotal || 0,
-                iva_total: extractedData.iva || 0,
-                total: extractedData.total || 0,
-                status: 'extracted',
-                raw_extraction: extractedData
-            })
-            .eq('id', invoice_id)
-
-        if (updateError) {
-            throw new Error(`Failed to update invoice: ${updateError.message}`)
+    let next = 0
+    const worker = async () => {
+        while (next < requests.length) {
+            await processOne(requests[next++])
         }
+    }
+    await Promise.all(Array.from({ length: Math.max(1, Math.min(MODEL_CONCURRENCY, requests.length)) }, worker))
+}
 
-        // Insert invoice items
-        if (extractedData.items && Array.isArray(extractedData.items)) {
-            const itemsToInsert = extractedData.items.map((item: any) => ({
-                invoice_id: invoice_id,
-                name: item.descripcion || 'Item sin nombre',
-                quantity: item.cantidad || 0,
-                unit: item.unidad || 'un',
-                unit_price: item.precio_unitario || 0,
-                bonification: item.bonificacion || 0,
-                tax_amount: 0, // Will be calculated if needed
-                total_line: item.total_linea || 0,
-                is_new_item: false,
-                matched_inventory_id: null
-            }))
-
-            const { error: itemsError } = await supabase
-                .from('invoice_items')
-                .insert(itemsToInsert)
-
-            if (itemsError) {
-                console.error('Error inserting items:', itemsError)
-                // Don't fail the whole operation, just log
-            }
+serve(async (req) => {
+    // Handle CORS preflight
+    if (req.method === 'OPTIONS') {
+        return new Response('ok', { headers: corsHeaders })
+    }
+
+    let invoiceIds: string[] = []
+    try {
+        const body = await req.json()
+        const batch = Array.isArray(body.invoices)
+        const requests: InvoiceRequest[] = batch ? body.invoices : [body]
+
+        if (requests.length === 0 || requests.some(r => !r?.invoice_id || !r?.image_url)) {
+            return new Response(
+                JSON.stringify({ error: 'Missing invoice_id or image_url' }),
+                { status: 400, headers: jsonHeaders }
+            )
+        }
+        if (requests.length > MAX_BATCH_SIZE) {
+            return new Response(
+                JSON.stringify({ error: `At most ${MAX_BATCH_SIZE} invoices per batch` }),
+                { status: 400, headers: jsonHeaders }
+            )
         }
+        invoiceIds = requests.map(r => r.invoice_id)
 
-        return new Response(
-            JSON.stringify({
-                success: true,
-                message: 'Invoice processed successfully',
-                data: extractedData
-            }),
-            { status: 200, headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
+        // Initialize Supabase client
+        const supabaseUrl = Deno.env.get('SUPABASE_URL')!
+        const supabaseServiceKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!
+        const supabase = createClient(supabaseUrl, supabaseServiceKey)
+
+        // Initialize Gemini
+        const geminiApiKey = Deno.env.get('GEMINI_API_KEY')
+        if (!geminiApiKey) {
+            throw new Error('GEMINI_API_KEY not configured')
+        }
+
+        const genAI = new GoogleGenerativeAI(geminiApiKey)
+        const model = genAI.getGenerativeModel(
+            { model: GEMINI_MODEL },
+            GEMINI_API_BASE_URL ? { baseUrl: GEMINI_API_BASE_URL } : undefined
         )
 
+        if (!batch) {
+            let outcome: { data?: any; error?: string } = {}
+            await processInvoices(req, supabase, model, requests, (_, o) => { outcome = o })
+            if (outcome.error) {
+                return new Response(JSON.stringify({ error: outcome.error }), { status: 500, headers: jsonHeaders })
+            }
+            return new Response(
+                JSON.stringify({
+                    success: true,
+                    message: 'Invoice processed successfully',
+                    data: outcome.data
+                }),
+                { status: 200, headers: jsonHeaders }
+            )
+        }
+
+        // Batch: stream one NDJSON line per finished invoice, then the totals
+        const encoder = new TextEncoder()
+        const stream = new ReadableStream({
+            async start(controller) {
+                const send = (event: Record<string, unknown>) =>
+                    controller.enqueue(encoder.encode(JSON.stringify(event) + '\n'))
+                const started = Date.now()
+                const totals = { model: 0, cache: 0, duplicate: 0, error: 0 }
+                let done = 0
+
+                try {
+                    await processInvoices(req, supabase, model, requests, (invoiceId, outcome) => {
+                        done++
+                        if (outcome.error) totals.error++
+                        else totals[outcome.source!]++
+                        send({
+                            type: 'progress',
+                            invoice_id: invoiceId,
+                            status: outcome.error ? 'error' : 'extracted',
+                            source: outcome.source ?? null,
+                            error: outcome.error ?? null,
+                            done,
+                            total: requests.length
+                        })
+                    })
+                    send({ type: 'done', total: requests.length, ...totals, elapsed_ms: Date.now() - started })
+                } catch (error) {
+                    console.error('Process invoice batch error:', error)
+                    await captureException(error, req, FUNCTION_NAME)
+                    send({ type: 'error', error: error.message || 'Unknown error' })
+                }
+                controller.close()
+            }
+        })
+
+        return new Response(stream, {
+            status: 200,
+            headers: { ...corsHeaders, 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-cache' }
+        })
+
     } catch (error) {
         console.error('Process invoice error:', error)
         await captureException(error, req, FUNCTION_NAME)
 
-        // Try to update status to error if we have invoice_id
-        try {
-            const { invoice_id } = await req.json()
-            if (invoice_id) {
-                const supabaseUrl = Deno.env.get('SUPABASE_URL')!
-                const supabaseServiceKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!
-                const supabase = createClient(supabaseUrl, supabaseServiceKey)
-
+        // Try to update status to error for the invoices of this request
+        if (invoiceIds.length > 0) {
+            try {
+                const supabase = createClient(Deno.env.get('SUPABASE_URL')!, Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!)
                 await supabase
                     .from('invoices')
                     .update({ status: 'error' })
-                    .eq('id', invoice_id)
+                    .in('id', invoiceIds)
+            } catch {
+                // Ignore cleanup errors
             }
-        } catch {
-            // Ignore cleanup errors
         }
 
         return new Response(
             JSON.stringify({ error: error.message || 'Unknown error' }),
-            { status: 500, headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
+            { status: 500, headers: jsonHeaders }
         )
     }
 })
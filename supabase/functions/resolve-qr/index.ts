@@ -24,6 +24,48 @@ const ratelimit = new Ratelimit({
     analytics: true,
 });
 
+// Short-lived cache of resolved codes (per isolate). A table of guests scans the
+// same code within seconds; unknown/inactive codes and session-less lookups are
+// answered from here, everything else still opens its own session.
+// Failures (404/403) expire quickly, so a code reactivated by staff works again at once.
+const QR_CACHE_TTL_MS = 30 * 1000;
+const QR_NEGATIVE_CACHE_TTL_MS = 3 * 1000;
+const QR_CACHE_MAX_ENTRIES = 5000;
+
+interface CachedQR {
+    expiresAt: number;
+    status: number;
+    body: Record<string, unknown>;
+}
+
+const qrCache = new Map<string, CachedQR>();
+
+function getCachedQR(hash: string): CachedQR | null {
+    const entry = qrCache.get(hash);
+    if (!entry) return null;
+    if (Date.now() >= entry.expiresAt) {
+        qrCache.delete(hash);
+        return null;
+    }
+    return entry;
+}
+
+function setCachedQR(hash: string, status: number, body: Record<string, unknown>) {
+    if (qrCache.size >= QR_CACHE_MAX_ENTRIES) {
+        // Map keeps insertion order: drop the oldest entry
+        qrCache.delete(qrCache.keys().next().value!);
+    }
+    const ttl = status === 200 ? QR_CACHE_TTL_MS : QR_NEGATIVE_CACHE_TTL_MS;
+    qrCache.set(hash, { expiresAt: Date.now() + ttl, status, body });
+}
+
+function jsonResponse(status: number, body: Record<string, unknown>, cache: 'HIT' | 'MISS') {
+    return new Response(JSON.stringify(body), {
+        status,
+        headers: { ...corsHeaders, 'Content-Type': 'application/json', 'X-QR-Cache': cache },
+    });
+}
+
 Deno.serve(async (req) => {
     // Handle CORS
     if (req.method === 'OPTIONS') {
@@ -31,7 +73,7 @@ Deno.serve(async (req) => {
     }
 
     try {
-        const { hash, source, userAgent } = await req.json();
+        const { hash, source, userAgent, createSession = true } = await req.json();
         const clientIP = req.headers.get('x-forwarded-for') || 'anonymous';
 
         // 1. Check Rate Limit
@@ -47,62 +89,43 @@ Deno.serve(async (req) => {
             );
         }
 
-        // 2. Initialize Supabase Client (Service Role for internal ops)
+        // 2. Cached answer: unknown/inactive codes, or a lookup without a session
+        const cached = getCachedQR(hash);
+        if (cached && (cached.status !== 200 || !createSession)) {
+            return jsonResponse(cached.status, { ...cached.body, ratelimit: { limit, remaining, reset } }, 'HIT');
+        }
+
+        // 3. Initialize Supabase Client (Service Role for internal ops)
         const supabaseClient = createClient(
             Deno.env.get('SUPABASE_URL') ?? '',
             Deno.env.get('SUPABASE_SERVICE_ROLE_KEY') ?? ''
         );
 
-        // 3. Resolve QR
-        const { data: qr, error: qrError } = await supabaseClient
-            .from('qr_codes')
-            .select('id, store_id, is_active, qr_type, table_id, bar_id, location_id, label')
-            .eq('code_hash', hash)
-            .maybeSingle();
-
-        if (qrError || !qr) {
-            return new Response(
-                JSON.stringify({ error: 'QR not found' }),
-                { status: 404, headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
-            );
-        }
-
-        if (!qr.is_active) {
-            return new Response(
-                JSON.stringify({ error: 'QR inactive' }),
-                { status: 403, headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
-            );
-        }
-
-        // 4. Get Store Data
-        const { data: store } = await supabaseClient
-            .from('stores')
-            .select('id, slug, name')
-            .eq('id', qr.store_id)
-            .single();
-
-        // 5. Log Scan & Create Session via RPC
-        const { data: scanResult, error: scanError } = await supabaseClient.rpc('log_qr_scan', {
-            p_qr_id: qr.id,
+        // 4. Resolve QR + store + node, open the session and log the scan (one round trip)
+        const { data: resolved, error: resolveError } = await supabaseClient.rpc('resolve_qr_context', {
+            p_qr_hash: hash,
             p_source: source || 'camera',
+            p_client_ip: null,
             p_user_agent: userAgent || 'unknown',
-            p_create_session: true
+            p_create_session: createSession
         });
 
-        if (scanError) {
-            console.error('Scan log error:', scanError);
+        if (resolveError) {
+            throw new Error(resolveError.message);
         }
 
-        return new Response(
-            JSON.stringify({
-                success: true,
-                qr: qr,
-                store: store,
-                session: scanResult,
-                ratelimit: { limit, remaining, reset }
-            }),
-            { headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
-        );
+        if (!resolved?.success) {
+            const notFound = resolved?.error === 'NOT_FOUND';
+            const status = notFound ? 404 : 403;
+            const body = { error: notFound ? 'QR not found' : 'QR inactive' };
+            setCachedQR(hash, status, body);
+            return jsonResponse(status, body, 'MISS');
+        }
+
+        const { session, ...context } = resolved;
+        setCachedQR(hash, 200, { ...context, session: null });
+
+        return jsonResponse(200, { ...context, session, ratelimit: { limit, remaining, reset } }, 'MISS');
 
     } catch (error) {
         await captureException(error, req, FUNCTION_NAME);
@@ -0,0 +1,1389 @@
+-- =============================================
+-- MIGRATION: Incremental Sales Rollups
+-- Date: 2026-10-17
+-- Purpose: Dashboard, Finance and insights aggregated raw orders ranges
+-- on every load (O(orders) rows over the wire). Per-store hourly, daily
+-- and product-daily aggregates are now kept up to date by triggers as
+-- orders are paid, completed, refunded or cancelled, and the screens read
+-- O(days) rows through get_sales_summary() / get_sales_insights().
+-- The triggers only append to delta tables, so concurrent orders of a
+-- store never wait on a shared rollup row; refresh_daily_sales_summary()
+-- folds the deltas into the rollups, and the read RPCs add the ones not
+-- folded yet. A nightly job re-derives the last two days store by store,
+-- which repairs anything written with triggers disabled (bulk loads with
+-- session_replication_role = replica).
+-- =============================================
+
+-- Rules (same as the rest of Finance):
+--   * revenue       = is_revenue_order(status), paid or not
+--   * paid_revenue  = revenue AND is_paid, split by payment method
+--                     (cash includes '%efectivo%', as get_financial_chart_data())
+--                     and, in sales_rollup_methods_hourly, by raw payment_method
+--   * refunded / cancelled orders leave revenue and are counted apart
+--   * sale_date     = local date in America/Argentina/Buenos_Aires, as in
+--                     daily_sales_summary; bucket = UTC hour start
+--   * product revenue = quantity * unit_price, as get_top_products()
+--   * tables        = revenue orders by table_number (orders without one
+--                     are left out)
+
+-- =============================================
+-- PART 1: Rollup tables
+-- =============================================
+CREATE TABLE IF NOT EXISTS public.sales_rollup_hourly (
+    store_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    sale_date DATE NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    paid_orders INTEGER NOT NULL DEFAULT 0,
+    paid_revenue NUMERIC NOT NULL DEFAULT 0,
+    mercadopago_revenue NUMERIC NOT NULL DEFAULT 0,
+    cash_revenue NUMERIC NOT NULL DEFAULT 0,
+    wallet_revenue NUMERIC NOT NULL DEFAULT 0,
+    card_revenue NUMERIC NOT NULL DEFAULT 0,
+    transfer_revenue NUMERIC NOT NULL DEFAULT 0,
+    other_revenue NUMERIC NOT NULL DEFAULT 0,
+    refunded_orders INTEGER NOT NULL DEFAULT 0,
+    refunded_amount NUMERIC NOT NULL DEFAULT 0,
+    cancelled_orders INTEGER NOT NULL DEFAULT 0,
+    cancelled_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (store_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS public.sales_rollup_daily (
+    store_id UUID NOT NULL,
+    sale_date DATE NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    paid_orders INTEGER NOT NULL DEFAULT 0,
+    paid_revenue NUMERIC NOT NULL DEFAULT 0,
+    mercadopago_revenue NUMERIC NOT NULL DEFAULT 0,
+    cash_revenue NUMERIC NOT NULL DEFAULT 0,
+    wallet_revenue NUMERIC NOT NULL DEFAULT 0,
+    card_revenue NUMERIC NOT NULL DEFAULT 0,
+    transfer_revenue NUMERIC NOT NULL DEFAULT 0,
+    other_revenue NUMERIC NOT NULL DEFAULT 0,
+    refunded_orders INTEGER NOT NULL DEFAULT 0,
+    refunded_amount NUMERIC NOT NULL DEFAULT 0,
+    cancelled_orders INTEGER NOT NULL DEFAULT 0,
+    cancelled_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (store_id, sale_date)
+);
+
+CREATE TABLE IF NOT EXISTS public.sales_rollup_products_daily (
+    store_id UUID NOT NULL,
+    sale_date DATE NOT NULL,
+    product_id UUID NOT NULL,
+    quantity NUMERIC NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    order_lines INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (store_id, sale_date, product_id)
+);
+
+-- Paid orders per raw payment_method, the breakdown get_financial_metrics()
+-- reports. Orders without a method are only in sales_rollup_hourly.
+CREATE TABLE IF NOT EXISTS public.sales_rollup_methods_hourly (
+    store_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    sale_date DATE NOT NULL,
+    payment_method TEXT NOT NULL,
+    paid_orders INTEGER NOT NULL DEFAULT 0,
+    paid_revenue NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (store_id, bucket, payment_method)
+);
+
+CREATE TABLE IF NOT EXISTS public.sales_rollup_tables_daily (
+    store_id UUID NOT NULL,
+    sale_date DATE NOT NULL,
+    table_number TEXT NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (store_id, sale_date, table_number)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_rollup_hourly_date
+ON public.sales_rollup_hourly(store_id, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_rollup_methods_hourly_date
+ON public.sales_rollup_methods_hourly(store_id, sale_date);
+
+-- Append-only queues written by the triggers (one row per order or line
+-- change) and emptied by fold_sales_rollup_deltas().
+CREATE TABLE IF NOT EXISTS public.sales_rollup_deltas (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    store_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    sale_date DATE NOT NULL,
+    payment_method TEXT,
+    table_number TEXT,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    paid_orders INTEGER NOT NULL DEFAULT 0,
+    paid_revenue NUMERIC NOT NULL DEFAULT 0,
+    mercadopago_revenue NUMERIC NOT NULL DEFAULT 0,
+    cash_revenue NUMERIC NOT NULL DEFAULT 0,
+    wallet_revenue NUMERIC NOT NULL DEFAULT 0,
+    card_revenue NUMERIC NOT NULL DEFAULT 0,
+    transfer_revenue NUMERIC NOT NULL DEFAULT 0,
+    other_revenue NUMERIC NOT NULL DEFAULT 0,
+    refunded_orders INTEGER NOT NULL DEFAULT 0,
+    refunded_amount NUMERIC NOT NULL DEFAULT 0,
+    cancelled_orders INTEGER NOT NULL DEFAULT 0,
+    cancelled_amount NUMERIC NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS public.sales_rollup_product_deltas (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    store_id UUID NOT NULL,
+    sale_date DATE NOT NULL,
+    product_id UUID NOT NULL,
+    quantity NUMERIC NOT NULL DEFAULT 0,
+    revenue NUMERIC NOT NULL DEFAULT 0,
+    order_lines INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_rollup_deltas_bucket
+ON public.sales_rollup_deltas(store_id, bucket);
+CREATE INDEX IF NOT EXISTS idx_sales_rollup_product_deltas_date
+ON public.sales_rollup_product_deltas(store_id, sale_date);
+
+ALTER TABLE public.sales_rollup_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sales_rollup_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sales_rollup_products_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sales_rollup_methods_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sales_rollup_tables_daily ENABLE ROW LEVEL SECURITY;
+-- No policies: only the SECURITY DEFINER functions below touch the deltas.
+ALTER TABLE public.sales_rollup_deltas ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sales_rollup_product_deltas ENABLE ROW LEVEL SECURITY;
+
+-- Read-only for the store's staff; only fold_sales_rollup_deltas() and
+-- rebuild_sales_rollups() (SECURITY DEFINER) write.
+DROP POLICY IF EXISTS "Users can view sales rollups from their store" ON public.sales_rollup_hourly;
+CREATE POLICY "Users can view sales rollups from their store"
+ON public.sales_rollup_hourly FOR SELECT
+USING (store_id = public.get_user_store_id());
+
+DROP POLICY IF EXISTS "Users can view sales rollups from their store" ON public.sales_rollup_daily;
+CREATE POLICY "Users can view sales rollups from their store"
+ON public.sales_rollup_daily FOR SELECT
+USING (store_id = public.get_user_store_id());
+
+DROP POLICY IF EXISTS "Users can view sales rollups from their store" ON public.sales_rollup_products_daily;
+CREATE POLICY "Users can view sales rollups from their store"
+ON public.sales_rollup_products_daily FOR SELECT
+USING (store_id = public.get_user_store_id());
+
+DROP POLICY IF EXISTS "Users can view sales rollups from their store" ON public.sales_rollup_methods_hourly;
+CREATE POLICY "Users can view sales rollups from their store"
+ON public.sales_rollup_methods_hourly FOR SELECT
+USING (store_id = public.get_user_store_id());
+
+DROP POLICY IF EXISTS "Users can view sales rollups from their store" ON public.sales_rollup_tables_daily;
+CREATE POLICY "Users can view sales rollups from their store"
+ON public.sales_rollup_tables_daily FOR SELECT
+USING (store_id = public.get_user_store_id());
+
+GRANT SELECT ON public.sales_rollup_hourly, public.sales_rollup_daily, public.sales_rollup_products_daily,
+    public.sales_rollup_methods_hourly, public.sales_rollup_tables_daily
+TO authenticated;
+
+
+-- =============================================
+-- PART 2: Delta helpers
+-- =============================================
+CREATE OR REPLACE FUNCTION public.sales_rollup_date(p_created_at TIMESTAMPTZ)
+RETURNS DATE
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT (p_created_at AT TIME ZONE 'America/Argentina/Buenos_Aires')::DATE
+$$;
+
+-- Queues one order's contribution (p_sign = 1) or its removal
+-- (p_sign = -1) as a row of sales_rollup_deltas. Draft, pending and
+-- rejected orders contribute nothing.
+CREATE OR REPLACE FUNCTION public.apply_sales_rollup_order(p_order public.orders, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_status TEXT := p_order.status::TEXT;
+    v_amount NUMERIC := COALESCE(p_order.total_amount, 0) * p_sign;
+    v_revenue BOOLEAN := is_revenue_order(p_order.status::TEXT);
+    v_paid BOOLEAN := is_revenue_order(p_order.status::TEXT) AND COALESCE(p_order.is_paid, FALSE);
+    v_method TEXT;
+BEGIN
+    IF p_order.store_id IS NULL OR p_order.created_at IS NULL THEN
+        RETURN;
+    END IF;
+    IF NOT v_revenue AND v_status NOT IN ('refunded', 'cancelled') THEN
+        RETURN;
+    END IF;
+
+    v_method := CASE
+        WHEN p_order.payment_method = 'mercadopago' THEN 'mercadopago'
+        WHEN p_order.payment_method = 'cash' OR p_order.payment_method ILIKE '%efectivo%' THEN 'cash'
+        WHEN p_order.payment_method = 'wallet' THEN 'wallet'
+        WHEN p_order.payment_method = 'card' THEN 'card'
+        WHEN p_order.payment_method = 'transfer' THEN 'transfer'
+        ELSE 'other'
+    END;
+
+    INSERT INTO sales_rollup_deltas (
+        store_id, bucket, sale_date, payment_method, table_number, orders_count, revenue, paid_orders, paid_revenue,
+        mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+        refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+    ) VALUES (
+        p_order.store_id,
+        date_trunc('hour', p_order.created_at, 'UTC'),
+        sales_rollup_date(p_order.created_at),
+        p_order.payment_method,
+        NULLIF(p_order.table_number, ''),
+        CASE WHEN v_revenue THEN p_sign ELSE 0 END,
+        CASE WHEN v_revenue THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid THEN p_sign ELSE 0 END,
+        CASE WHEN v_paid THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'mercadopago' THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'cash' THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'wallet' THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'card' THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'transfer' THEN v_amount ELSE 0 END,
+        CASE WHEN v_paid AND v_method = 'other' THEN v_amount ELSE 0 END,
+        CASE WHEN v_status = 'refunded' THEN p_sign ELSE 0 END,
+        CASE WHEN v_status = 'refunded' THEN v_amount ELSE 0 END,
+        CASE WHEN v_status = 'cancelled' THEN p_sign ELSE 0 END,
+        CASE WHEN v_status = 'cancelled' THEN v_amount ELSE 0 END
+    );
+END;
+$$;
+
+-- Queues one product line total of a revenue order. Callers check
+-- is_revenue_order() on the parent order first.
+CREATE OR REPLACE FUNCTION public.apply_sales_rollup_product(
+    p_store_id UUID,
+    p_created_at TIMESTAMPTZ,
+    p_product_id UUID,
+    p_quantity NUMERIC,
+    p_revenue NUMERIC,
+    p_lines INTEGER
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF p_store_id IS NULL OR p_product_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO sales_rollup_product_deltas (store_id, sale_date, product_id, quantity, revenue, order_lines)
+    VALUES (p_store_id, sales_rollup_date(p_created_at), p_product_id, COALESCE(p_quantity, 0),
+            COALESCE(p_revenue, 0), p_lines);
+END;
+$$;
+
+-- All lines of one order at once, used when the order itself changes.
+CREATE OR REPLACE FUNCTION public.apply_sales_rollup_order_items(p_order public.orders, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF p_order.store_id IS NULL OR NOT is_revenue_order(p_order.status::TEXT) THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO sales_rollup_product_deltas (store_id, sale_date, product_id, quantity, revenue, order_lines)
+    SELECT
+        p_order.store_id,
+        sales_rollup_date(p_order.created_at),
+        product_id,
+        COALESCE(SUM(quantity), 0) * p_sign,
+        COALESCE(SUM(quantity * unit_price), 0) * p_sign,
+        COUNT(*)::INTEGER * p_sign
+    FROM order_items
+    WHERE order_id = p_order.id
+      AND product_id IS NOT NULL
+    GROUP BY product_id;
+END;
+$$;
+
+
+-- =============================================
+-- PART 3: Triggers
+-- =============================================
+CREATE OR REPLACE FUNCTION public.trigger_sales_rollup_orders()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_moved BOOLEAN;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_sales_rollup_order(NEW, 1);
+        PERFORM apply_sales_rollup_order_items(NEW, 1);  -- usually none yet
+        RETURN NEW;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        -- BEFORE DELETE: the cascade has not removed the lines yet.
+        PERFORM apply_sales_rollup_order(OLD, -1);
+        PERFORM apply_sales_rollup_order_items(OLD, -1);
+        RETURN OLD;
+    END IF;
+
+    PERFORM apply_sales_rollup_order(OLD, -1);
+    PERFORM apply_sales_rollup_order(NEW, 1);
+
+    -- Lines only move when the order enters/leaves revenue or changes day/store.
+    v_moved := is_revenue_order(OLD.status::TEXT) IS DISTINCT FROM is_revenue_order(NEW.status::TEXT)
+        OR OLD.store_id IS DISTINCT FROM NEW.store_id
+        OR sales_rollup_date(OLD.created_at) IS DISTINCT FROM sales_rollup_date(NEW.created_at);
+    IF v_moved THEN
+        PERFORM apply_sales_rollup_order_items(OLD, -1);
+        PERFORM apply_sales_rollup_order_items(NEW, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_orders_sales_rollup_insert ON public.orders;
+CREATE TRIGGER trg_orders_sales_rollup_insert
+    AFTER INSERT
+    ON public.orders
+    FOR EACH ROW
+    EXECUTE FUNCTION trigger_sales_rollup_orders();
+
+DROP TRIGGER IF EXISTS trg_orders_sales_rollup_update ON public.orders;
+CREATE TRIGGER trg_orders_sales_rollup_update
+    AFTER UPDATE OF status, is_paid, payment_method, total_amount, created_at, store_id, table_number
+    ON public.orders
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.is_paid IS DISTINCT FROM NEW.is_paid
+          OR OLD.payment_method IS DISTINCT FROM NEW.payment_method
+          OR OLD.total_amount IS DISTINCT FROM NEW.total_amount
+          OR OLD.created_at IS DISTINCT FROM NEW.created_at
+          OR OLD.store_id IS DISTINCT FROM NEW.store_id
+          OR OLD.table_number IS DISTINCT FROM NEW.table_number)
+    EXECUTE FUNCTION trigger_sales_rollup_orders();
+
+DROP TRIGGER IF EXISTS trg_orders_sales_rollup_delete ON public.orders;
+CREATE TRIGGER trg_orders_sales_rollup_delete
+    BEFORE DELETE
+    ON public.orders
+    FOR EACH ROW
+    EXECUTE FUNCTION trigger_sales_rollup_orders();
+
+CREATE OR REPLACE FUNCTION public.trigger_sales_rollup_order_items()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_order RECORD;
+BEGIN
+    -- FOR SHARE waits for a concurrent status change of the parent order,
+    -- so a line is counted by exactly one of the two triggers. A parent
+    -- that is gone was deleted, and its BEFORE DELETE trigger already
+    -- removed the lines.
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT store_id, created_at, status INTO v_order FROM orders WHERE id = OLD.order_id FOR SHARE;
+        IF FOUND AND is_revenue_order(v_order.status::TEXT) THEN
+            PERFORM apply_sales_rollup_product(v_order.store_id, v_order.created_at, OLD.product_id,
+                                               -OLD.quantity, -(OLD.quantity * OLD.unit_price), -1);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT store_id, created_at, status INTO v_order FROM orders WHERE id = NEW.order_id FOR SHARE;
+        IF FOUND AND is_revenue_order(v_order.status::TEXT) THEN
+            PERFORM apply_sales_rollup_product(v_order.store_id, v_order.created_at, NEW.product_id,
+                                               NEW.quantity, NEW.quantity * NEW.unit_price, 1);
+        END IF;
+    END IF;
+
+    RETURN COALESCE(NEW, OLD);
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_order_items_sales_rollup ON public.order_items;
+CREATE TRIGGER trg_order_items_sales_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF product_id, quantity, unit_price, order_id
+    ON public.order_items
+    FOR EACH ROW
+    EXECUTE FUNCTION trigger_sales_rollup_order_items();
+
+-- The delta helpers queue deltas for any store from their arguments; only
+-- the triggers (running as the owner) may call them.
+REVOKE EXECUTE ON FUNCTION public.apply_sales_rollup_order(public.orders, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.apply_sales_rollup_product(UUID, TIMESTAMPTZ, UUID, NUMERIC, NUMERIC, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.apply_sales_rollup_order_items(public.orders, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.trigger_sales_rollup_orders() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.trigger_sales_rollup_order_items() FROM PUBLIC, anon, authenticated;
+
+
+-- =============================================
+-- PART 4: Fold, rebuild and reconciliation
+-- =============================================
+-- Moves every queued delta into the rollups in one statement (one
+-- snapshot, so a delta is either folded or still queued, never both).
+-- Called by refresh_daily_sales_summary(); the read RPCs add the queued
+-- deltas, so how often this runs changes cost, not results.
+CREATE OR REPLACE FUNCTION public.fold_sales_rollup_deltas()
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_deltas INTEGER;
+    v_product_deltas INTEGER;
+BEGIN
+    -- Taken by rebuild_sales_rollups() too; order writes never take it.
+    PERFORM pg_advisory_xact_lock(hashtextextended('sales_rollups', 0));
+
+    WITH batch AS (
+        DELETE FROM sales_rollup_deltas RETURNING *
+    ),
+    hours AS (
+        INSERT INTO sales_rollup_hourly AS r (
+            store_id, bucket, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        )
+        SELECT
+            store_id, bucket, MIN(sale_date), SUM(orders_count), SUM(revenue), SUM(paid_orders), SUM(paid_revenue),
+            SUM(mercadopago_revenue), SUM(cash_revenue), SUM(wallet_revenue), SUM(card_revenue),
+            SUM(transfer_revenue), SUM(other_revenue),
+            SUM(refunded_orders), SUM(refunded_amount), SUM(cancelled_orders), SUM(cancelled_amount)
+        FROM batch
+        GROUP BY store_id, bucket
+        ON CONFLICT (store_id, bucket) DO UPDATE SET
+            orders_count = r.orders_count + EXCLUDED.orders_count,
+            revenue = r.revenue + EXCLUDED.revenue,
+            paid_orders = r.paid_orders + EXCLUDED.paid_orders,
+            paid_revenue = r.paid_revenue + EXCLUDED.paid_revenue,
+            mercadopago_revenue = r.mercadopago_revenue + EXCLUDED.mercadopago_revenue,
+            cash_revenue = r.cash_revenue + EXCLUDED.cash_revenue,
+            wallet_revenue = r.wallet_revenue + EXCLUDED.wallet_revenue,
+            card_revenue = r.card_revenue + EXCLUDED.card_revenue,
+            transfer_revenue = r.transfer_revenue + EXCLUDED.transfer_revenue,
+            other_revenue = r.other_revenue + EXCLUDED.other_revenue,
+            refunded_orders = r.refunded_orders + EXCLUDED.refunded_orders,
+            refunded_amount = r.refunded_amount + EXCLUDED.refunded_amount,
+            cancelled_orders = r.cancelled_orders + EXCLUDED.cancelled_orders,
+            cancelled_amount = r.cancelled_amount + EXCLUDED.cancelled_amount,
+            updated_at = NOW()
+    ),
+    days AS (
+        INSERT INTO sales_rollup_daily AS r (
+            store_id, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        )
+        SELECT
+            store_id, sale_date, SUM(orders_count), SUM(revenue), SUM(paid_orders), SUM(paid_revenue),
+            SUM(mercadopago_revenue), SUM(cash_revenue), SUM(wallet_revenue), SUM(card_revenue),
+            SUM(transfer_revenue), SUM(other_revenue),
+            SUM(refunded_orders), SUM(refunded_amount), SUM(cancelled_orders), SUM(cancelled_amount)
+        FROM batch
+        GROUP BY store_id, sale_date
+        ON CONFLICT (store_id, sale_date) DO UPDATE SET
+            orders_count = r.orders_count + EXCLUDED.orders_count,
+            revenue = r.revenue + EXCLUDED.revenue,
+            paid_orders = r.paid_orders + EXCLUDED.paid_orders,
+            paid_revenue = r.paid_revenue + EXCLUDED.paid_revenue,
+            mercadopago_revenue = r.mercadopago_revenue + EXCLUDED.mercadopago_revenue,
+            cash_revenue = r.cash_revenue + EXCLUDED.cash_revenue,
+            wallet_revenue = r.wallet_revenue + EXCLUDED.wallet_revenue,
+            card_revenue = r.card_revenue + EXCLUDED.card_revenue,
+            transfer_revenue = r.transfer_revenue + EXCLUDED.transfer_revenue,
+            other_revenue = r.other_revenue + EXCLUDED.other_revenue,
+            refunded_orders = r.refunded_orders + EXCLUDED.refunded_orders,
+            refunded_amount = r.refunded_amount + EXCLUDED.refunded_amount,
+            cancelled_orders = r.cancelled_orders + EXCLUDED.cancelled_orders,
+            cancelled_amount = r.cancelled_amount + EXCLUDED.cancelled_amount,
+            updated_at = NOW()
+    ),
+    methods AS (
+        INSERT INTO sales_rollup_methods_hourly AS r (store_id, bucket, sale_date, payment_method, paid_orders, paid_revenue)
+        SELECT store_id, bucket, MIN(sale_date), payment_method, SUM(paid_orders), SUM(paid_revenue)
+        FROM batch
+        WHERE payment_method IS NOT NULL AND paid_orders <> 0
+        GROUP BY store_id, bucket, payment_method
+        ON CONFLICT (store_id, bucket, payment_method) DO UPDATE SET
+            paid_orders = r.paid_orders + EXCLUDED.paid_orders,
+            paid_revenue = r.paid_revenue + EXCLUDED.paid_revenue,
+            updated_at = NOW()
+    ),
+    tables AS (
+        INSERT INTO sales_rollup_tables_daily AS r (store_id, sale_date, table_number, orders_count, revenue)
+        SELECT store_id, sale_date, table_number, SUM(orders_count), SUM(revenue)
+        FROM batch
+        WHERE table_number IS NOT NULL AND orders_count <> 0
+        GROUP BY store_id, sale_date, table_number
+        ON CONFLICT (store_id, sale_date, table_number) DO UPDATE SET
+            orders_count = r.orders_count + EXCLUDED.orders_count,
+            revenue = r.revenue + EXCLUDED.revenue,
+            updated_at = NOW()
+    )
+    SELECT COUNT(*) INTO v_deltas FROM batch;
+
+    WITH batch AS (
+        DELETE FROM sales_rollup_product_deltas RETURNING *
+    ),
+    products AS (
+        INSERT INTO sales_rollup_products_daily AS r (store_id, sale_date, product_id, quantity, revenue, order_lines)
+        SELECT store_id, sale_date, product_id, SUM(quantity), SUM(revenue), SUM(order_lines)
+        FROM batch
+        GROUP BY store_id, sale_date, product_id
+        ON CONFLICT (store_id, sale_date, product_id) DO UPDATE SET
+            quantity = r.quantity + EXCLUDED.quantity,
+            revenue = r.revenue + EXCLUDED.revenue,
+            order_lines = r.order_lines + EXCLUDED.order_lines,
+            updated_at = NOW()
+    )
+    SELECT COUNT(*) INTO v_product_deltas FROM batch;
+
+    RETURN jsonb_build_object('deltas', v_deltas, 'product_deltas', v_product_deltas);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.fold_sales_rollup_deltas() FROM PUBLIC, anon, authenticated;
+
+-- Recomputes the rollups of one store (or each store in turn) from p_from
+-- (local date, NULL = everything) out of raw orders. Used for the backfill
+-- below, by reconcile_sales_rollups() and by the perf tools.
+--
+-- A store is rewritten in a single statement: the recount and the drop of
+-- its queued deltas share one snapshot, so a concurrent order is either in
+-- the recount (and its delta dropped) or still queued, never both. Order
+-- writes are not blocked; the advisory lock only keeps the fold out.
+CREATE OR REPLACE FUNCTION public.rebuild_sales_rollups(p_store_id UUID DEFAULT NULL, p_from DATE DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_store UUID;
+    v_store_result JSONB;
+    v_hours INTEGER := 0;
+    v_method_hours INTEGER := 0;
+    v_days INTEGER := 0;
+    v_table_days INTEGER := 0;
+    v_products INTEGER := 0;
+BEGIN
+    IF p_store_id IS NULL THEN
+        FOR v_store IN SELECT id FROM stores ORDER BY id LOOP
+            v_store_result := rebuild_sales_rollups(v_store, p_from);
+            v_hours := v_hours + (v_store_result->>'hours')::INTEGER;
+            v_method_hours := v_method_hours + (v_store_result->>'method_hours')::INTEGER;
+            v_days := v_days + (v_store_result->>'days')::INTEGER;
+            v_table_days := v_table_days + (v_store_result->>'table_days')::INTEGER;
+            v_products := v_products + (v_store_result->>'product_days')::INTEGER;
+        END LOOP;
+        RETURN jsonb_build_object('hours', v_hours, 'method_hours', v_method_hours, 'days', v_days,
+                                  'table_days', v_table_days, 'product_days', v_products);
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtextextended('sales_rollups', 0));
+
+    WITH src AS (
+        SELECT
+            date_trunc('hour', o.created_at, 'UTC') AS bucket,
+            sales_rollup_date(o.created_at) AS sale_date,
+            is_revenue_order(o.status::TEXT) AS is_revenue,
+            is_revenue_order(o.status::TEXT) AND COALESCE(o.is_paid, FALSE) AS is_paid,
+            o.status::TEXT AS status,
+            o.payment_method,
+            NULLIF(o.table_number, '') AS table_number,
+            COALESCE(o.total_amount, 0) AS amount,
+            CASE
+                WHEN o.payment_method = 'mercadopago' THEN 'mercadopago'
+                WHEN o.payment_method = 'cash' OR o.payment_method ILIKE '%efectivo%' THEN 'cash'
+                WHEN o.payment_method = 'wallet' THEN 'wallet'
+                WHEN o.payment_method = 'card' THEN 'card'
+                WHEN o.payment_method = 'transfer' THEN 'transfer'
+                ELSE 'other'
+            END AS method
+        FROM orders o
+        WHERE o.store_id = p_store_id
+          AND (p_from IS NULL OR o.created_at >= (p_from::TIMESTAMP AT TIME ZONE 'America/Argentina/Buenos_Aires'))
+          AND (is_revenue_order(o.status::TEXT) OR o.status::TEXT IN ('refunded', 'cancelled'))
+    ),
+    fresh_hours AS (
+        SELECT
+            bucket,
+            MIN(sale_date) AS sale_date,
+            COUNT(*) FILTER (WHERE is_revenue) AS orders_count,
+            COALESCE(SUM(amount) FILTER (WHERE is_revenue), 0) AS revenue,
+            COUNT(*) FILTER (WHERE is_paid) AS paid_orders,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid), 0) AS paid_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'mercadopago'), 0) AS mercadopago_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'cash'), 0) AS cash_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'wallet'), 0) AS wallet_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'card'), 0) AS card_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'transfer'), 0) AS transfer_revenue,
+            COALESCE(SUM(amount) FILTER (WHERE is_paid AND method = 'other'), 0) AS other_revenue,
+            COUNT(*) FILTER (WHERE status = 'refunded') AS refunded_orders,
+            COALESCE(SUM(amount) FILTER (WHERE status = 'refunded'), 0) AS refunded_amount,
+            COUNT(*) FILTER (WHERE status = 'cancelled') AS cancelled_orders,
+            COALESCE(SUM(amount) FILTER (WHERE status = 'cancelled'), 0) AS cancelled_amount
+        FROM src
+        GROUP BY bucket
+    ),
+    fresh_methods AS (
+        SELECT bucket, MIN(sale_date) AS sale_date, payment_method, COUNT(*) AS paid_orders,
+               SUM(amount) AS paid_revenue
+        FROM src
+        WHERE is_paid AND payment_method IS NOT NULL
+        GROUP BY bucket, payment_method
+    ),
+    fresh_days AS (
+        SELECT
+            sale_date, SUM(orders_count) AS orders_count, SUM(revenue) AS revenue,
+            SUM(paid_orders) AS paid_orders, SUM(paid_revenue) AS paid_revenue,
+            SUM(mercadopago_revenue) AS mercadopago_revenue, SUM(cash_revenue) AS cash_revenue,
+            SUM(wallet_revenue) AS wallet_revenue, SUM(card_revenue) AS card_revenue,
+            SUM(transfer_revenue) AS transfer_revenue, SUM(other_revenue) AS other_revenue,
+            SUM(refunded_orders) AS refunded_orders, SUM(refunded_amount) AS refunded_amount,
+            SUM(cancelled_orders) AS cancelled_orders, SUM(cancelled_amount) AS cancelled_amount
+        FROM fresh_hours
+        GROUP BY sale_date
+    ),
+    fresh_tables AS (
+        SELECT sale_date, table_number, COUNT(*) AS orders_count, SUM(amount) AS revenue
+        FROM src
+        WHERE is_revenue AND table_number IS NOT NULL
+        GROUP BY sale_date, table_number
+    ),
+    fresh_products AS (
+        SELECT
+            sales_rollup_date(o.created_at) AS sale_date, oi.product_id,
+            SUM(oi.quantity) AS quantity, SUM(oi.quantity * oi.unit_price) AS revenue, COUNT(*) AS order_lines
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.store_id = p_store_id
+          AND (p_from IS NULL OR o.created_at >= (p_from::TIMESTAMP AT TIME ZONE 'America/Argentina/Buenos_Aires'))
+          AND is_revenue_order(o.status::TEXT)
+          AND oi.product_id IS NOT NULL
+        GROUP BY 1, 2
+    ),
+    dropped_deltas AS (
+        DELETE FROM sales_rollup_deltas
+        WHERE store_id = p_store_id AND (p_from IS NULL OR sale_date >= p_from)
+    ),
+    dropped_product_deltas AS (
+        DELETE FROM sales_rollup_product_deltas
+        WHERE store_id = p_store_id AND (p_from IS NULL OR sale_date >= p_from)
+    ),
+    stale_hours AS (
+        DELETE FROM sales_rollup_hourly h
+        WHERE h.store_id = p_store_id AND (p_from IS NULL OR h.sale_date >= p_from)
+          AND NOT EXISTS (SELECT 1 FROM fresh_hours f WHERE f.bucket = h.bucket)
+    ),
+    stale_methods AS (
+        DELETE FROM sales_rollup_methods_hourly m
+        WHERE m.store_id = p_store_id AND (p_from IS NULL OR m.sale_date >= p_from)
+          AND NOT EXISTS (
+              SELECT 1 FROM fresh_methods f WHERE f.bucket = m.bucket AND f.payment_method = m.payment_method
+          )
+    ),
+    stale_days AS (
+        DELETE FROM sales_rollup_daily d
+        WHERE d.store_id = p_store_id AND (p_from IS NULL OR d.sale_date >= p_from)
+          AND NOT EXISTS (SELECT 1 FROM fresh_days f WHERE f.sale_date = d.sale_date)
+    ),
+    stale_tables AS (
+        DELETE FROM sales_rollup_tables_daily t
+        WHERE t.store_id = p_store_id AND (p_from IS NULL OR t.sale_date >= p_from)
+          AND NOT EXISTS (
+              SELECT 1 FROM fresh_tables f WHERE f.sale_date = t.sale_date AND f.table_number = t.table_number
+          )
+    ),
+    stale_products AS (
+        DELETE FROM sales_rollup_products_daily p
+        WHERE p.store_id = p_store_id AND (p_from IS NULL OR p.sale_date >= p_from)
+          AND NOT EXISTS (SELECT 1 FROM fresh_products f WHERE f.sale_date = p.sale_date AND f.product_id = p.product_id)
+    ),
+    put_hours AS (
+        INSERT INTO sales_rollup_hourly (
+            store_id, bucket, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        )
+        SELECT
+            p_store_id, bucket, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        FROM fresh_hours
+        ON CONFLICT (store_id, bucket) DO UPDATE SET
+            sale_date = EXCLUDED.sale_date,
+            orders_count = EXCLUDED.orders_count,
+            revenue = EXCLUDED.revenue,
+            paid_orders = EXCLUDED.paid_orders,
+            paid_revenue = EXCLUDED.paid_revenue,
+            mercadopago_revenue = EXCLUDED.mercadopago_revenue,
+            cash_revenue = EXCLUDED.cash_revenue,
+            wallet_revenue = EXCLUDED.wallet_revenue,
+            card_revenue = EXCLUDED.card_revenue,
+            transfer_revenue = EXCLUDED.transfer_revenue,
+            other_revenue = EXCLUDED.other_revenue,
+            refunded_orders = EXCLUDED.refunded_orders,
+            refunded_amount = EXCLUDED.refunded_amount,
+            cancelled_orders = EXCLUDED.cancelled_orders,
+            cancelled_amount = EXCLUDED.cancelled_amount,
+            updated_at = NOW()
+        RETURNING 1
+    ),
+    put_methods AS (
+        INSERT INTO sales_rollup_methods_hourly (store_id, bucket, sale_date, payment_method, paid_orders, paid_revenue)
+        SELECT p_store_id, bucket, sale_date, payment_method, paid_orders, paid_revenue
+        FROM fresh_methods
+        ON CONFLICT (store_id, bucket, payment_method) DO UPDATE SET
+            sale_date = EXCLUDED.sale_date,
+            paid_orders = EXCLUDED.paid_orders,
+            paid_revenue = EXCLUDED.paid_revenue,
+            updated_at = NOW()
+        RETURNING 1
+    ),
+    put_days AS (
+        INSERT INTO sales_rollup_daily (
+            store_id, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        )
+        SELECT
+            p_store_id, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount
+        FROM fresh_days
+        ON CONFLICT (store_id, sale_date) DO UPDATE SET
+            orders_count = EXCLUDED.orders_count,
+            revenue = EXCLUDED.revenue,
+            paid_orders = EXCLUDED.paid_orders,
+            paid_revenue = EXCLUDED.paid_revenue,
+            mercadopago_revenue = EXCLUDED.mercadopago_revenue,
+            cash_revenue = EXCLUDED.cash_revenue,
+            wallet_revenue = EXCLUDED.wallet_revenue,
+            card_revenue = EXCLUDED.card_revenue,
+            transfer_revenue = EXCLUDED.transfer_revenue,
+            other_revenue = EXCLUDED.other_revenue,
+            refunded_orders = EXCLUDED.refunded_orders,
+            refunded_amount = EXCLUDED.refunded_amount,
+            cancelled_orders = EXCLUDED.cancelled_orders,
+            cancelled_amount = EXCLUDED.cancelled_amount,
+            updated_at = NOW()
+        RETURNING 1
+    ),
+    put_tables AS (
+        INSERT INTO sales_rollup_tables_daily (store_id, sale_date, table_number, orders_count, revenue)
+        SELECT p_store_id, sale_date, table_number, orders_count, revenue
+        FROM fresh_tables
+        ON CONFLICT (store_id, sale_date, table_number) DO UPDATE SET
+            orders_count = EXCLUDED.orders_count,
+            revenue = EXCLUDED.revenue,
+            updated_at = NOW()
+        RETURNING 1
+    ),
+    put_products AS (
+        INSERT INTO sales_rollup_products_daily (store_id, sale_date, product_id, quantity, revenue, order_lines)
+        SELECT p_store_id, sale_date, product_id, quantity, revenue, order_lines
+        FROM fresh_products
+        ON CONFLICT (store_id, sale_date, product_id) DO UPDATE SET
+            quantity = EXCLUDED.quantity,
+            revenue = EXCLUDED.revenue,
+            order_lines = EXCLUDED.order_lines,
+            updated_at = NOW()
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM put_hours), (SELECT COUNT(*) FROM put_methods), (SELECT COUNT(*) FROM put_days),
+           (SELECT COUNT(*) FROM put_tables), (SELECT COUNT(*) FROM put_products)
+    INTO v_hours, v_method_hours, v_days, v_table_days, v_products;
+
+    RETURN jsonb_build_object('hours', v_hours, 'method_hours', v_method_hours, 'days', v_days,
+                              'table_days', v_table_days, 'product_days', v_products);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.rebuild_sales_rollups(UUID, DATE) FROM PUBLIC, anon, authenticated;
+
+-- Nightly repair of the last p_days local days (late edits, trigger-less
+-- bulk loads), committing after each store so the fold waits for one
+-- store's rebuild at most.
+CREATE OR REPLACE PROCEDURE public.reconcile_sales_rollups(p_days INTEGER DEFAULT 2)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_store UUID;
+BEGIN
+    FOR v_store IN SELECT id FROM public.stores ORDER BY id LOOP
+        PERFORM public.rebuild_sales_rollups(
+            v_store, (NOW() AT TIME ZONE 'America/Argentina/Buenos_Aires')::DATE - (p_days - 1)
+        );
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+REVOKE EXECUTE ON PROCEDURE public.reconcile_sales_rollups(INTEGER) FROM PUBLIC, anon, authenticated;
+
+SELECT cron.schedule(
+    'reconcile-sales-rollups',
+    '30 6 * * *',  -- 03:30 in Buenos Aires
+    $$CALL public.reconcile_sales_rollups();$$
+);
+
+-- The cron job keeps its name and schedule; it now also folds the queued
+-- rollup deltas.
+CREATE OR REPLACE FUNCTION public.refresh_daily_sales_summary()
+RETURNS text
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_rollups JSONB;
+BEGIN
+    -- Use CONCURRENTLY to avoid blocking reads
+    REFRESH MATERIALIZED VIEW CONCURRENTLY public.daily_sales_summary;
+
+    v_rollups := public.fold_sales_rollup_deltas();
+
+    INSERT INTO public.system_logs (
+        level,
+        category,
+        message,
+        metadata,
+        created_at
+    ) VALUES (
+        'INFO',
+        'CRON_JOB',
+        'Daily sales summary refreshed successfully',
+        jsonb_build_object(
+            'view_name', 'daily_sales_summary',
+            'refresh_type', 'CONCURRENTLY',
+            'triggered_by', 'cron',
+            'rollups', v_rollups
+        ),
+        NOW()
+    );
+
+    RETURN 'SUCCESS: daily_sales_summary refreshed at ' || NOW()::text;
+
+EXCEPTION
+    WHEN OTHERS THEN
+        INSERT INTO public.system_logs (
+            level,
+            category,
+            message,
+            metadata,
+            created_at
+        ) VALUES (
+            'ERROR',
+            'CRON_JOB',
+            'Failed to refresh daily_sales_summary: ' || SQLERRM,
+            jsonb_build_object(
+                'view_name', 'daily_sales_summary',
+                'error_code', SQLSTATE,
+                'error_message', SQLERRM
+            ),
+            NOW()
+        );
+
+        RETURN 'ERROR: ' || SQLERRM;
+END;
+$$;
+
+
+-- =============================================
+-- PART 5: Read RPCs
+-- =============================================
+CREATE OR REPLACE FUNCTION public.assert_sales_rollup_access(p_store_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    -- Service role / SQL callers have no auth.uid().
+    IF auth.uid() IS NOT NULL
+       AND p_store_id IS DISTINCT FROM get_user_store_id()
+       AND NOT EXISTS (SELECT 1 FROM profiles WHERE id = auth.uid() AND role = 'super_admin') THEN
+        RAISE EXCEPTION 'Access denied: Cannot read sales of a different store';
+    END IF;
+END;
+$$;
+
+-- Hourly rows of one store between two bucket starts, with the queued
+-- deltas added in: what sales_rollup_hourly will hold once they are folded.
+CREATE OR REPLACE FUNCTION public.sales_rollup_hours(p_store_id UUID, p_from TIMESTAMPTZ, p_to TIMESTAMPTZ)
+RETURNS SETOF public.sales_rollup_hourly
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT
+        store_id, bucket, MIN(sale_date), SUM(orders_count)::INTEGER, SUM(revenue),
+        SUM(paid_orders)::INTEGER, SUM(paid_revenue),
+        SUM(mercadopago_revenue), SUM(cash_revenue), SUM(wallet_revenue), SUM(card_revenue),
+        SUM(transfer_revenue), SUM(other_revenue),
+        SUM(refunded_orders)::INTEGER, SUM(refunded_amount), SUM(cancelled_orders)::INTEGER, SUM(cancelled_amount),
+        MAX(updated_at)
+    FROM (
+        SELECT
+            store_id, bucket, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount, updated_at
+        FROM sales_rollup_hourly
+        WHERE store_id = p_store_id AND bucket >= p_from AND bucket <= p_to
+        UNION ALL
+        SELECT
+            store_id, bucket, sale_date, orders_count, revenue, paid_orders, paid_revenue,
+            mercadopago_revenue, cash_revenue, wallet_revenue, card_revenue, transfer_revenue, other_revenue,
+            refunded_orders, refunded_amount, cancelled_orders, cancelled_amount, created_at
+        FROM sales_rollup_deltas
+        WHERE store_id = p_store_id AND bucket >= p_from AND bucket <= p_to
+    ) r
+    GROUP BY store_id, bucket
+$$;
+
+-- Per-method rows of one store between two bucket starts, queued deltas
+-- added in.
+CREATE OR REPLACE FUNCTION public.sales_rollup_methods(p_store_id UUID, p_from TIMESTAMPTZ, p_to TIMESTAMPTZ)
+RETURNS SETOF public.sales_rollup_methods_hourly
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT store_id, bucket, MIN(sale_date), payment_method, SUM(paid_orders)::INTEGER, SUM(paid_revenue),
+           MAX(updated_at)
+    FROM (
+        SELECT store_id, bucket, sale_date, payment_method, paid_orders, paid_revenue, updated_at
+        FROM sales_rollup_methods_hourly
+        WHERE store_id = p_store_id AND bucket >= p_from AND bucket <= p_to
+        UNION ALL
+        SELECT store_id, bucket, sale_date, payment_method, paid_orders, paid_revenue, created_at
+        FROM sales_rollup_deltas
+        WHERE store_id = p_store_id AND bucket >= p_from AND bucket <= p_to
+          AND payment_method IS NOT NULL AND paid_orders <> 0
+    ) r
+    GROUP BY store_id, bucket, payment_method
+$$;
+
+-- Product-daily rows of one store from a local date, queued deltas added in.
+CREATE OR REPLACE FUNCTION public.sales_rollup_products(p_store_id UUID, p_from DATE)
+RETURNS SETOF public.sales_rollup_products_daily
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT store_id, sale_date, product_id, SUM(quantity), SUM(revenue), SUM(order_lines)::INTEGER, MAX(updated_at)
+    FROM (
+        SELECT store_id, sale_date, product_id, quantity, revenue, order_lines, updated_at
+        FROM sales_rollup_products_daily
+        WHERE store_id = p_store_id AND sale_date >= p_from
+        UNION ALL
+        SELECT store_id, sale_date, product_id, quantity, revenue, order_lines, created_at
+        FROM sales_rollup_product_deltas
+        WHERE store_id = p_store_id AND sale_date >= p_from
+    ) r
+    GROUP BY store_id, sale_date, product_id
+$$;
+
+-- Per-table rows of one store from a local date, queued deltas added in.
+CREATE OR REPLACE FUNCTION public.sales_rollup_tables(p_store_id UUID, p_from DATE)
+RETURNS SETOF public.sales_rollup_tables_daily
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT store_id, sale_date, table_number, SUM(orders_count)::INTEGER, SUM(revenue), MAX(updated_at)
+    FROM (
+        SELECT store_id, sale_date, table_number, orders_count, revenue, updated_at
+        FROM sales_rollup_tables_daily
+        WHERE store_id = p_store_id AND sale_date >= p_from
+        UNION ALL
+        SELECT store_id, sale_date, table_number, orders_count, revenue, created_at
+        FROM sales_rollup_deltas
+        WHERE store_id = p_store_id AND sale_date >= p_from
+          AND table_number IS NOT NULL AND orders_count <> 0
+    ) r
+    GROUP BY store_id, sale_date, table_number
+$$;
+
+-- Called from the SECURITY DEFINER RPCs below, which check store access.
+REVOKE EXECUTE ON FUNCTION public.sales_rollup_hours(UUID, TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.sales_rollup_methods(UUID, TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.sales_rollup_products(UUID, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.sales_rollup_tables(UUID, DATE) FROM PUBLIC, anon, authenticated;
+
+-- Totals, the hour-of-day profile and the daily series of a range.
+-- Ranges are read at hour granularity (bucket >= hour of p_start_date,
+-- bucket <= p_end_date), which is exact for the day ranges the UI uses.
+CREATE OR REPLACE FUNCTION public.get_sales_summary(
+    p_store_id UUID,
+    p_start_date TIMESTAMPTZ,
+    p_end_date TIMESTAMPTZ
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    PERFORM assert_sales_rollup_access(p_store_id);
+
+    WITH hours AS (
+        SELECT * FROM sales_rollup_hours(p_store_id, date_trunc('hour', p_start_date, 'UTC'), p_end_date)
+    )
+    SELECT jsonb_build_object(
+        'totals', (
+            SELECT jsonb_build_object(
+                'orders_count', COALESCE(SUM(orders_count), 0),
+                'revenue', COALESCE(SUM(revenue), 0),
+                'paid_orders', COALESCE(SUM(paid_orders), 0),
+                'paid_revenue', COALESCE(SUM(paid_revenue), 0),
+                'mercadopago_revenue', COALESCE(SUM(mercadopago_revenue), 0),
+                'cash_revenue', COALESCE(SUM(cash_revenue), 0),
+                'wallet_revenue', COALESCE(SUM(wallet_revenue), 0),
+                'card_revenue', COALESCE(SUM(card_revenue), 0),
+                'transfer_revenue', COALESCE(SUM(transfer_revenue), 0),
+                'other_revenue', COALESCE(SUM(other_revenue), 0),
+                'refunded_orders', COALESCE(SUM(refunded_orders), 0),
+                'refunded_amount', COALESCE(SUM(refunded_amount), 0),
+                'cancelled_orders', COALESCE(SUM(cancelled_orders), 0),
+                'cancelled_amount', COALESCE(SUM(cancelled_amount), 0)
+            )
+            FROM hours
+        ),
+        'by_hour', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'hour', hour, 'orders_count', orders_count, 'revenue', revenue, 'paid_revenue', paid_revenue
+            ) ORDER BY hour)
+            FROM (
+                SELECT
+                    EXTRACT(HOUR FROM bucket AT TIME ZONE 'America/Argentina/Buenos_Aires')::INTEGER AS hour,
+                    SUM(orders_count) AS orders_count,
+                    SUM(revenue) AS revenue,
+                    SUM(paid_revenue) AS paid_revenue
+                FROM hours
+                GROUP BY 1
+            ) h
+        ), '[]'::jsonb),
+        'by_day', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'sale_date', sale_date, 'orders_count', orders_count, 'revenue', revenue,
+                'paid_revenue', paid_revenue
+            ) ORDER BY sale_date)
+            FROM (
+                SELECT sale_date, SUM(orders_count) AS orders_count, SUM(revenue) AS revenue,
+                       SUM(paid_revenue) AS paid_revenue
+                FROM hours
+                GROUP BY sale_date
+            ) d
+        ), '[]'::jsonb)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$;
+
+-- What lib/insights.ts shows: totals, peak hours, the top products with
+-- their weekday profile and the top tables by revenue over the last p_days
+-- local days (today included).
+CREATE OR REPLACE FUNCTION public.get_sales_insights(p_store_id UUID, p_days INTEGER DEFAULT 30)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_from DATE := (NOW() AT TIME ZONE 'America/Argentina/Buenos_Aires')::DATE - (p_days - 1);
+    v_result JSONB;
+BEGIN
+    PERFORM assert_sales_rollup_access(p_store_id);
+
+    WITH hours AS (
+        SELECT *
+        FROM sales_rollup_hours(p_store_id, v_from::TIMESTAMP AT TIME ZONE 'America/Argentina/Buenos_Aires',
+                                'infinity')
+    )
+    SELECT jsonb_build_object(
+        'totals', (
+            SELECT jsonb_build_object(
+                'orders_count', COALESCE(SUM(orders_count), 0),
+                'revenue', COALESCE(SUM(revenue), 0)
+            )
+            FROM hours
+        ),
+        'peak_hours', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('hour', hour, 'count', orders_count, 'revenue', revenue)
+                             ORDER BY orders_count DESC, hour)
+            FROM (
+                SELECT
+                    EXTRACT(HOUR FROM bucket AT TIME ZONE 'America/Argentina/Buenos_Aires')::INTEGER AS hour,
+                    SUM(orders_count) AS orders_count,
+                    SUM(revenue) AS revenue
+                FROM hours
+                GROUP BY 1
+                HAVING SUM(orders_count) > 0
+            ) h
+        ), '[]'::jsonb),
+        'products', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'product_id', p.product_id,
+                'name', COALESCE(ii.name, pr.name, 'Producto'),
+                'quantity', p.quantity,
+                'revenue', p.revenue,
+                'by_weekday', p.by_weekday
+            ) ORDER BY p.quantity DESC)
+            FROM (
+                SELECT
+                    product_id,
+                    SUM(quantity) AS quantity,
+                    SUM(revenue) AS revenue,
+                    jsonb_object_agg(weekday, quantity) AS by_weekday
+                FROM (
+                    SELECT product_id, EXTRACT(DOW FROM sale_date)::INTEGER AS weekday,
+                           SUM(quantity) AS quantity, SUM(revenue) AS revenue
+                    FROM sales_rollup_products(p_store_id, v_from)
+                    GROUP BY product_id, 2
+                ) w
+                GROUP BY product_id
+                ORDER BY SUM(quantity) DESC
+                LIMIT 10
+            ) p
+            LEFT JOIN inventory_items ii ON ii.id = p.product_id
+            LEFT JOIN products pr ON pr.id = p.product_id
+        ), '[]'::jsonb),
+        'tables', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'table_number', t.table_number, 'orders_count', t.orders_count, 'revenue', t.revenue
+            ) ORDER BY t.revenue DESC)
+            FROM (
+                SELECT table_number, SUM(orders_count) AS orders_count, SUM(revenue) AS revenue
+                FROM sales_rollup_tables(p_store_id, v_from)
+                GROUP BY table_number
+                HAVING SUM(orders_count) > 0
+                ORDER BY SUM(revenue) DESC
+                LIMIT 10
+            ) t
+        ), '[]'::jsonb)
+    ) INTO v_result;
+
+    RETURN v_result;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.get_sales_summary(UUID, TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION public.get_sales_insights(UUID, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.get_sales_summary(UUID, TIMESTAMPTZ, TIMESTAMPTZ) TO authenticated;
+GRANT EXECUTE ON FUNCTION public.get_sales_insights(UUID, INTEGER) TO authenticated;
+
+COMMENT ON FUNCTION public.get_sales_summary IS
+'Sales totals, hour-of-day profile and daily series of a range, read from sales_rollup_hourly (O(hours), not O(orders)).';
+COMMENT ON FUNCTION public.get_sales_insights IS
+'Insights data (totals, peak hours, top products by weekday, top tables) for the last p_days, read from the sales rollups.';
+COMMENT ON FUNCTION public.rebuild_sales_rollups IS
+'Recomputes sales rollups from raw orders for one store (or each store in turn) from a local date (or ever).';
+
+
+-- =============================================
+-- PART 6: get_financial_metrics() reads the rollups
+-- =============================================
+-- Revenue, order count, revenue by method and the non-wallet part of the
+-- cash flow now come from the rollups for the whole UTC hours of the
+-- range; the partial hours at either end are read from orders, so the
+-- range stays exact (created_at BETWEEN p_start_date AND p_end_date).
+-- Revenue and COGS both count is_revenue_order() AND is_paid orders, like
+-- the rest of Finance (this also counts paid 'preparing' orders).
+-- revenue_by_method keeps the raw payment_method values, NULL included,
+-- and orders without a method stay out of the non-wallet cash flow.
+-- Top-ups are now scoped to the store.
+DROP FUNCTION IF EXISTS public.get_financial_metrics(TIMESTAMPTZ, TIMESTAMPTZ, UUID);
+
+CREATE OR REPLACE FUNCTION public.get_financial_metrics(p_start_date TIMESTAMPTZ, p_end_date TIMESTAMPTZ, p_store_id UUID)
+ RETURNS json
+ LANGUAGE plpgsql
+ SECURITY DEFINER
+AS $function$
+DECLARE
+    v_gross_revenue numeric := 0;
+    v_net_cash_flow numeric := 0;
+    v_total_orders integer := 0;
+    v_revenue_by_method jsonb;
+
+    v_variable_expenses numeric := 0;
+    v_marketing_loss numeric := 0;
+    v_internal_loss numeric := 0;
+    v_operational_loss numeric := 0;
+
+    v_fixed_expenses_total numeric := 0;
+    v_cogs_estimated numeric := 0;
+    v_loyalty_cost numeric := 0;
+
+    v_topups_total numeric := 0;
+    v_wallet_usage numeric := 0;
+    v_sales_non_wallet numeric := 0;
+
+    -- Whole hours come from the rollups: buckets in [v_full_from, v_full_to)
+    v_full_from timestamptz := date_trunc('hour', p_start_date, 'UTC')
+        + CASE WHEN p_start_date = date_trunc('hour', p_start_date, 'UTC') THEN INTERVAL '0' ELSE INTERVAL '1 hour' END;
+    v_full_to timestamptz := date_trunc('hour', p_end_date, 'UTC');
+BEGIN
+    -- 1-2. REVENUE, ORDERS & REVENUE BY PAYMENT METHOD
+    WITH paid AS (
+        SELECT m.payment_method AS method, m.paid_orders AS orders, m.paid_revenue AS total
+        FROM public.sales_rollup_methods(p_store_id, v_full_from, v_full_to - INTERVAL '1 hour') m
+        UNION ALL
+        -- Orders without a method: the hours' paid totals minus the methods'
+        SELECT NULL, SUM(h.paid_orders), SUM(h.paid_revenue)
+        FROM public.sales_rollup_hours(p_store_id, v_full_from, v_full_to - INTERVAL '1 hour') h
+        UNION ALL
+        SELECT NULL, -SUM(m.paid_orders), -SUM(m.paid_revenue)
+        FROM public.sales_rollup_methods(p_store_id, v_full_from, v_full_to - INTERVAL '1 hour') m
+        UNION ALL
+        SELECT o.payment_method, 1, COALESCE(o.total_amount, 0)
+        FROM public.orders o
+        WHERE o.store_id = p_store_id
+        AND o.created_at BETWEEN p_start_date AND p_end_date
+        AND (o.created_at < v_full_from OR o.created_at >= v_full_to)
+        AND public.is_revenue_order(o.status::text)
+        AND o.is_paid = TRUE
+    ),
+    by_method AS (
+        SELECT method, SUM(orders) AS orders, SUM(total) AS total
+        FROM paid
+        GROUP BY method
+    )
+    SELECT
+        COALESCE(SUM(total), 0),
+        COALESCE(SUM(orders), 0),
+        COALESCE(SUM(total) FILTER (WHERE method != 'wallet'), 0),
+        jsonb_agg(jsonb_build_object('method', method, 'total', total)) FILTER (WHERE orders <> 0)
+    INTO v_gross_revenue, v_total_orders, v_sales_non_wallet, v_revenue_by_method
+    FROM by_method;
+
+    -- 3. WALLET TOPUPS
+    SELECT COALESCE(SUM(amount), 0)
+    INTO v_topups_total
+    FROM public.wallet_transactions
+    WHERE store_id = p_store_id
+    AND amount > 0
+    AND created_at BETWEEN p_start_date AND p_end_date;
+
+    -- 4. CASH FLOW
+    v_net_cash_flow := v_sales_non_wallet + v_topups_total;
+
+    -- 5. VARIABLE EXPENSES (INVENTORY LOSSES)
+    SELECT COALESCE(SUM(ABS(quantity_delta) * COALESCE(unit_cost, (SELECT cost FROM public.inventory_items WHERE id = item_id), 0)), 0)
+    INTO v_marketing_loss
+    FROM public.inventory_audit_logs
+    WHERE store_id = p_store_id
+    AND created_at BETWEEN p_start_date AND p_end_date
+    AND action_type = 'gift';
+
+    SELECT COALESCE(SUM(ABS(quantity_delta) * COALESCE(unit_cost, (SELECT cost FROM public.inventory_items WHERE id = item_id), 0)), 0)
+    INTO v_internal_loss
+    FROM public.inventory_audit_logs
+    WHERE store_id = p_store_id
+    AND created_at BETWEEN p_start_date AND p_end_date
+    AND action_type = 'internal_use';
+
+    SELECT COALESCE(SUM(ABS(quantity_delta) * COALESCE(unit_cost, (SELECT cost FROM public.inventory_items WHERE id = item_id), 0)), 0)
+    INTO v_operational_loss
+    FROM public.inventory_audit_logs
+    WHERE store_id = p_store_id
+    AND created_at BETWEEN p_start_date AND p_end_date
+    AND action_type IN ('loss', 'loss_expired', 'loss_damaged', 'loss_theft');
+
+    v_variable_expenses := v_marketing_loss + v_internal_loss + v_operational_loss;
+
+    -- 6. FIXED EXPENSES
+    SELECT COALESCE(SUM(amount), 0)
+    INTO v_fixed_expenses_total
+    FROM public.fixed_expenses
+    WHERE store_id = p_store_id
+    AND expense_date BETWEEN p_start_date::date AND p_end_date::date;
+
+    -- 7. COGS
+    SELECT COALESCE(SUM(oi.quantity * ii.cost), 0)
+    INTO v_cogs_estimated
+    FROM public.order_items oi
+    JOIN public.inventory_items ii ON oi.product_id = ii.id
+    JOIN public.orders o ON oi.order_id = o.id
+    WHERE o.store_id = p_store_id
+    AND o.created_at BETWEEN p_start_date AND p_end_date
+    AND public.is_revenue_order(o.status::text)
+    AND o.is_paid = TRUE;
+
+    -- 8. LOYALTY COST
+    SELECT COALESCE(SUM(monetary_cost), 0)
+    INTO v_loyalty_cost
+    FROM public.loyalty_transactions
+    WHERE store_id = p_store_id
+    AND created_at BETWEEN p_start_date AND p_end_date
+    AND type = 'burn'
+    AND is_rolled_back = false;
+
+    -- 9. NET PROFIT
+    DECLARE
+        v_gross_profit numeric;
+        v_net_profit numeric;
+    BEGIN
+        v_gross_profit := v_gross_revenue - v_cogs_estimated;
+        v_net_profit := v_gross_profit - v_variable_expenses - v_fixed_expenses_total - v_loyalty_cost;
+
+        RETURN json_build_object(
+            'gross_revenue', v_gross_revenue,
+            'net_cash_flow', v_net_cash_flow,
+            'total_orders', v_total_orders,
+            'revenue_by_method', COALESCE(v_revenue_by_method, '[]'::jsonb),
+            'expenses', json_build_object(
+                'variable_total', v_variable_expenses,
+                'marketing', v_marketing_loss,
+                'internal', v_internal_loss,
+                'operational_loss', v_operational_loss,
+                'fixed_total', v_fixed_expenses_total,
+                'cogs_estimated', v_cogs_estimated,
+                'loyalty_cost', v_loyalty_cost
+            ),
+            'profitability', json_build_object(
+                'gross_profit', v_gross_profit,
+                'net_profit', v_net_profit,
+                'margin_percent', CASE WHEN v_gross_revenue > 0 THEN ROUND((v_net_profit / v_gross_revenue) * 100, 2) ELSE 0 END
+            )
+        );
+    END;
+END;
+$function$;
+
+GRANT EXECUTE ON FUNCTION public.get_financial_metrics(TIMESTAMPTZ, TIMESTAMPTZ, UUID) TO authenticated;
+
+
+-- =============================================
+-- PART 7: Backfill
+-- =============================================
+SELECT public.rebuild_sales_rollups();
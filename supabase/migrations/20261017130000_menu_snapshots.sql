@@ -0,0 +1,241 @@
+-- =============================================
+-- MIGRATION: Versioned Public Menu Snapshots
+-- Date: 2026-10-17
+-- Purpose: Every QR scan ran resolve_menu() + get_menu_products(), and the
+-- latter joins products, categories and visibility and calls
+-- check_product_stock_availability() once per recipe product. A table of
+-- six scanning together ran six identical heavy queries. The public menu
+-- is now kept as a jsonb snapshot per menu, tagged with a per-store
+-- version that catalog triggers bump, and served by get_menu_snapshot()
+-- with an ETag so a client holding the current copy gets a tiny
+-- "not modified" answer.
+-- =============================================
+
+-- Invalidation (bumps menu_versions.version for the store):
+--   * inventory_items: insert/delete, or an update of anything
+--     get_menu_products() shows (name, description, price, image,
+--     visibility, category, type) or of in-stock-ness (current_stock > 0)
+--   * products: insert/delete, or an update of name, description, price,
+--     category, image, active, is_visible or is_available. is_available is
+--     kept by the stock triggers (trg_update_product_availability*), so an
+--     ingredient running out reaches the snapshot through it, while plain
+--     stock deductions do not invalidate anything
+--   * product_recipes: any change (recipe availability)
+--   * categories: insert/delete/rename
+-- A snapshot is also rebuilt after MENU_SNAPSHOT_MAX_AGE as a safety net
+-- for writes made with triggers disabled.
+-- resolve_menu() stays live: it is a few indexed lookups on menus.
+
+-- =============================================
+-- PART 1: Tables
+-- =============================================
+CREATE TABLE IF NOT EXISTS public.menu_versions (
+    store_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.menu_snapshots (
+    menu_id UUID PRIMARY KEY REFERENCES public.menus(id) ON DELETE CASCADE,
+    store_id UUID NOT NULL,
+    version BIGINT NOT NULL,
+    etag TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_menu_snapshots_store ON public.menu_snapshots (store_id);
+
+-- Only reachable through the SECURITY DEFINER functions below
+ALTER TABLE public.menu_versions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.menu_snapshots ENABLE ROW LEVEL SECURITY;
+
+-- =============================================
+-- PART 2: Invalidation
+-- =============================================
+CREATE OR REPLACE FUNCTION public.bump_menu_version(p_store_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF p_store_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO public.menu_versions (store_id, version, changed_at)
+    VALUES (p_store_id, 1, now())
+    ON CONFLICT (store_id) DO UPDATE
+    SET version = menu_versions.version + 1,
+        changed_at = now();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.menu_row_store_id(p_table TEXT, p_row JSONB)
+RETURNS UUID
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT CASE p_table
+        WHEN 'product_recipes' THEN (SELECT store_id FROM public.products WHERE id = (p_row->>'product_id')::uuid)
+        ELSE (p_row->>'store_id')::uuid
+    END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trigger_bump_menu_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_old_store UUID;
+    v_new_store UUID;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        v_old_store := public.menu_row_store_id(TG_TABLE_NAME, to_jsonb(OLD));
+        PERFORM public.bump_menu_version(v_old_store);
+    END IF;
+
+    IF TG_OP <> 'DELETE' THEN
+        v_new_store := public.menu_row_store_id(TG_TABLE_NAME, to_jsonb(NEW));
+        IF v_new_store IS DISTINCT FROM v_old_store THEN
+            PERFORM public.bump_menu_version(v_new_store);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_menu_version_inventory_items ON public.inventory_items;
+CREATE TRIGGER trg_menu_version_inventory_items
+AFTER INSERT OR DELETE ON public.inventory_items
+FOR EACH ROW EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+DROP TRIGGER IF EXISTS trg_menu_version_inventory_items_update ON public.inventory_items;
+CREATE TRIGGER trg_menu_version_inventory_items_update
+AFTER UPDATE ON public.inventory_items
+FOR EACH ROW
+WHEN ((OLD.name, OLD.description, OLD.price, OLD.image_url, OLD.is_menu_visible, OLD.category_id,
+       OLD.item_type, OLD.store_id, COALESCE(OLD.current_stock, 0) > 0)
+      IS DISTINCT FROM
+      (NEW.name, NEW.description, NEW.price, NEW.image_url, NEW.is_menu_visible, NEW.category_id,
+       NEW.item_type, NEW.store_id, COALESCE(NEW.current_stock, 0) > 0))
+EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+DROP TRIGGER IF EXISTS trg_menu_version_products ON public.products;
+CREATE TRIGGER trg_menu_version_products
+AFTER INSERT OR DELETE ON public.products
+FOR EACH ROW EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+DROP TRIGGER IF EXISTS trg_menu_version_products_update ON public.products;
+CREATE TRIGGER trg_menu_version_products_update
+AFTER UPDATE ON public.products
+FOR EACH ROW
+WHEN ((OLD.name, OLD.description, OLD.base_price, OLD.category, OLD.image, OLD.active, OLD.is_visible,
+       OLD.is_available, OLD.store_id)
+      IS DISTINCT FROM
+      (NEW.name, NEW.description, NEW.base_price, NEW.category, NEW.image, NEW.active, NEW.is_visible,
+       NEW.is_available, NEW.store_id))
+EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+DROP TRIGGER IF EXISTS trg_menu_version_product_recipes ON public.product_recipes;
+CREATE TRIGGER trg_menu_version_product_recipes
+AFTER INSERT OR UPDATE OR DELETE ON public.product_recipes
+FOR EACH ROW EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+DROP TRIGGER IF EXISTS trg_menu_version_categories ON public.categories;
+CREATE TRIGGER trg_menu_version_categories
+AFTER INSERT OR DELETE OR UPDATE OF name, store_id ON public.categories
+FOR EACH ROW EXECUTE FUNCTION public.trigger_bump_menu_version();
+
+-- =============================================
+-- PART 3: get_menu_snapshot
+-- =============================================
+CREATE OR REPLACE FUNCTION public.get_menu_snapshot(
+    p_store_id UUID,
+    p_session_type TEXT DEFAULT 'generic',
+    p_table_id UUID DEFAULT NULL,
+    p_menu_id UUID DEFAULT NULL,
+    p_if_none_match TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    MENU_SNAPSHOT_MAX_AGE CONSTANT INTERVAL := interval '15 minutes';
+    v_menu_id UUID;
+    v_store_id UUID;
+    v_version BIGINT;
+    v_snapshot public.menu_snapshots%ROWTYPE;
+    v_payload JSONB;
+BEGIN
+    v_menu_id := COALESCE(p_menu_id, public.resolve_menu(p_store_id, p_session_type, p_table_id, NULL));
+
+    SELECT store_id INTO v_store_id FROM public.menus WHERE id = v_menu_id;
+    IF v_store_id IS NULL THEN
+        RETURN jsonb_build_object('menu_id', NULL, 'store_id', p_store_id, 'not_modified', FALSE, 'products', NULL);
+    END IF;
+
+    -- Read the version before the data, so a snapshot is never newer-labelled than its rows
+    SELECT version INTO v_version FROM public.menu_versions WHERE store_id = v_store_id;
+    v_version := COALESCE(v_version, 0);
+
+    SELECT * INTO v_snapshot FROM public.menu_snapshots WHERE menu_id = v_menu_id;
+
+    IF v_snapshot.menu_id IS NULL
+       OR v_snapshot.version <> v_version
+       OR v_snapshot.built_at < now() - MENU_SNAPSHOT_MAX_AGE THEN
+        -- One builder per menu; a burst of cold scans waits and reuses its result
+        PERFORM pg_advisory_xact_lock(hashtextextended('menu_snapshot:' || v_menu_id::text, 0));
+
+        SELECT version INTO v_version FROM public.menu_versions WHERE store_id = v_store_id;
+        v_version := COALESCE(v_version, 0);
+        SELECT * INTO v_snapshot FROM public.menu_snapshots WHERE menu_id = v_menu_id;
+
+        IF v_snapshot.menu_id IS NULL
+           OR v_snapshot.version <> v_version
+           OR v_snapshot.built_at < now() - MENU_SNAPSHOT_MAX_AGE THEN
+            SELECT COALESCE(jsonb_agg(to_jsonb(mp)), '[]'::jsonb)
+            INTO v_payload
+            FROM public.get_menu_products(v_menu_id) mp;
+
+            INSERT INTO public.menu_snapshots (menu_id, store_id, version, etag, payload, built_at)
+            VALUES (v_menu_id, v_store_id, v_version, '"' || md5(v_payload::text) || '"', v_payload, now())
+            ON CONFLICT (menu_id) DO UPDATE
+            SET store_id = EXCLUDED.store_id,
+                version = EXCLUDED.version,
+                etag = EXCLUDED.etag,
+                payload = EXCLUDED.payload,
+                built_at = EXCLUDED.built_at
+            RETURNING * INTO v_snapshot;
+        END IF;
+    END IF;
+
+    -- Picked up by PostgREST for HTTP callers; ignored elsewhere
+    PERFORM set_config('response.headers', jsonb_build_array(jsonb_build_object('ETag', v_snapshot.etag))::text, TRUE);
+
+    RETURN jsonb_build_object(
+        'menu_id', v_menu_id,
+        'store_id', v_store_id,
+        'version', v_snapshot.version,
+        'etag', v_snapshot.etag,
+        'built_at', v_snapshot.built_at,
+        'not_modified', p_if_none_match IS NOT DISTINCT FROM v_snapshot.etag,
+        'products', CASE WHEN p_if_none_match IS NOT DISTINCT FROM v_snapshot.etag THEN NULL ELSE v_snapshot.payload END
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.bump_menu_version(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_menu_snapshot(UUID, TEXT, UUID, UUID, TEXT) TO anon, authenticated;
+
+COMMENT ON FUNCTION public.get_menu_snapshot IS
+'Public menu (get_menu_products rows) for the menu resolve_menu() picks, or p_menu_id. Served from menu_snapshots while menu_versions is unchanged. Pass the last etag as p_if_none_match to get not_modified = true and no products.';
+COMMENT ON FUNCTION public.bump_menu_version IS
+'Invalidates every cached menu snapshot of a store. Called by catalog triggers; run it (service role) after bulk edits made with triggers disabled.';
@@ -0,0 +1,122 @@
+-- =============================================
+-- MIGRATION: QR Resolution Fast Path
+-- Date: 2026-10-17
+-- Purpose: resolve-qr made three sequential round trips per scan (qr_codes
+-- by hash, stores by id, then log_qr_scan(), which read qr_codes and
+-- stores again for the session TTL). resolve_qr_context() resolves code,
+-- store and node in one query on the code_hash unique index, then opens
+-- the session and logs the scan in the same call.
+-- =============================================
+
+-- =============================================
+-- PART 1: Lookup index
+-- =============================================
+-- qr_sessions_system.sql declares code_hash UNIQUE and indexes it; keep the
+-- lookup indexed on databases where qr_codes was created before that file.
+CREATE INDEX IF NOT EXISTS idx_qr_codes_hash ON public.qr_codes (code_hash);
+
+-- =============================================
+-- PART 2: resolve_qr_context
+-- =============================================
+CREATE OR REPLACE FUNCTION public.resolve_qr_context(
+    p_qr_hash TEXT,
+    p_source TEXT DEFAULT 'link',
+    p_client_ip TEXT DEFAULT NULL,
+    p_user_agent TEXT DEFAULT NULL,
+    p_create_session BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_ctx RECORD;
+    v_session_id UUID;
+    v_expires_at TIMESTAMPTZ;
+    v_context JSONB;
+BEGIN
+    SELECT
+        q.id, q.store_id, q.qr_type, q.table_id, q.bar_id, q.location_id, q.label, q.is_active,
+        s.slug AS store_slug, s.name AS store_name,
+        COALESCE((s.menu_logic->>'qr_session_ttl_minutes')::integer, 90) AS ttl_minutes,
+        n.label AS node_label, n.type AS node_type
+    INTO v_ctx
+    FROM public.qr_codes q
+    JOIN public.stores s ON s.id = q.store_id
+    LEFT JOIN public.venue_nodes n ON n.id = COALESCE(q.table_id, q.bar_id)
+    WHERE q.code_hash = p_qr_hash;
+
+    IF v_ctx.id IS NULL THEN
+        RETURN jsonb_build_object('success', FALSE, 'error', 'NOT_FOUND');
+    END IF;
+
+    IF NOT COALESCE(v_ctx.is_active, FALSE) THEN
+        RETURN jsonb_build_object('success', FALSE, 'error', 'INACTIVE');
+    END IF;
+
+    -- Same shape log_qr_scan() writes
+    v_context := jsonb_build_object(
+        'type', v_ctx.qr_type::text,
+        'table_id', v_ctx.table_id,
+        'bar_id', v_ctx.bar_id,
+        'location_id', v_ctx.location_id,
+        'label', v_ctx.label
+    );
+
+    IF p_create_session THEN
+        v_expires_at := now() + make_interval(mins => v_ctx.ttl_minutes);
+
+        INSERT INTO public.client_sessions (
+            store_id, qr_id, session_type, table_id, bar_id, location_id, expires_at
+        ) VALUES (
+            v_ctx.store_id, v_ctx.id, v_ctx.qr_type::text::session_type,
+            v_ctx.table_id, v_ctx.bar_id, v_ctx.location_id, v_expires_at
+        ) RETURNING id INTO v_session_id;
+
+        INSERT INTO public.qr_scan_logs (
+            qr_id, store_id, session_id, source, client_ip, user_agent, resolved_context
+        ) VALUES (
+            v_ctx.id, v_ctx.store_id, v_session_id,
+            COALESCE(p_source, 'link')::scan_source, NULLIF(p_client_ip, '')::inet, p_user_agent, v_context
+        );
+
+        UPDATE public.qr_codes
+        SET scan_count = COALESCE(scan_count, 0) + 1,
+            last_scanned_at = now()
+        WHERE id = v_ctx.id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', TRUE,
+        'qr', jsonb_build_object(
+            'id', v_ctx.id,
+            'store_id', v_ctx.store_id,
+            'qr_type', v_ctx.qr_type,
+            'table_id', v_ctx.table_id,
+            'bar_id', v_ctx.bar_id,
+            'location_id', v_ctx.location_id,
+            'label', v_ctx.label
+        ),
+        'store', jsonb_build_object('id', v_ctx.store_id, 'slug', v_ctx.store_slug, 'name', v_ctx.store_name),
+        'node', CASE WHEN v_ctx.node_type IS NULL THEN NULL ELSE jsonb_build_object(
+            'id', COALESCE(v_ctx.table_id, v_ctx.bar_id),
+            'label', v_ctx.node_label,
+            'type', v_ctx.node_type
+        ) END,
+        'context', v_context,
+        'session', CASE WHEN v_session_id IS NULL THEN NULL ELSE jsonb_build_object(
+            'session_id', v_session_id,
+            'expires_at', v_expires_at,
+            'ttl_minutes', v_ctx.ttl_minutes
+        ) END
+    );
+END;
+$$;
+
+-- Called by the resolve-qr Edge Function (service role), which rate limits per IP
+REVOKE EXECUTE ON FUNCTION public.resolve_qr_context(TEXT, TEXT, TEXT, TEXT, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.resolve_qr_context(TEXT, TEXT, TEXT, TEXT, BOOLEAN) TO service_role;
+
+COMMENT ON FUNCTION public.resolve_qr_context IS
+'QR hash -> qr, store, node and (optionally) a new client session, in one indexed lookup. Errors: NOT_FOUND, INACTIVE.';
@@ -0,0 +1,131 @@
+-- =============================================
+-- MIGRATION: Batched email queue claims
+-- Date: 2026-10-17
+-- Purpose:
+--   process-email-queue read 10 pending rows, then per row re-fetched the
+--   order with joins, called Resend, slept 600ms and updated the row. Two
+--   overlapping runs could also pick the same rows and send twice.
+--   These functions let any number of workers share the queue:
+--   1. claim_email_batch(): FOR UPDATE SKIP LOCKED claim of due rows,
+--      leased by moving next_retry_at forward, returned with their order,
+--      store and client in the same query
+--   2. complete_email_batch(): writes a whole batch of outcomes in one
+--      statement, only for rows still under this worker's lease
+--   A worker that dies mid-batch leaves its rows pending; they are due
+--   again when the lease ends. Retry backoff stays in the worker
+--   (BACKOFF_MINUTES in process-email-queue).
+-- =============================================
+
+-- =============================================
+-- PART 1: Index for the due-rows scan
+-- =============================================
+
+CREATE INDEX IF NOT EXISTS idx_email_queue_pending_retry
+    ON public.email_queue (next_retry_at)
+    WHERE status = 'pending';
+
+-- =============================================
+-- PART 2: claim_email_batch
+-- =============================================
+
+CREATE OR REPLACE FUNCTION public.claim_email_batch(
+    p_limit INTEGER DEFAULT 50,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_lease TIMESTAMPTZ := date_trunc('milliseconds', now() + make_interval(secs => p_lease_seconds));
+    v_items JSONB;
+BEGIN
+    WITH due AS (
+        SELECT q.id
+        FROM email_queue q
+        WHERE q.status = 'pending'
+          AND q.next_retry_at <= now()
+        ORDER BY q.next_retry_at
+        LIMIT GREATEST(p_limit, 0)
+        FOR UPDATE SKIP LOCKED
+    ), leased AS (
+        UPDATE email_queue q
+        SET next_retry_at = v_lease,
+            updated_at = now()
+        FROM due
+        WHERE q.id = due.id
+        RETURNING q.id, q.order_id, q.store_id, q.recipient, q.subject, q.payload, q.attempts
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'id', l.id,
+        'order_id', l.order_id,
+        'store_id', l.store_id,
+        'recipient', l.recipient,
+        'subject', l.subject,
+        'payload', l.payload,
+        'attempts', COALESCE(l.attempts, 0),
+        'order', CASE WHEN o.id IS NULL THEN NULL ELSE jsonb_build_object(
+            'is_paid', o.is_paid,
+            'order_number', o.order_number,
+            'total_amount', o.total_amount,
+            'store', jsonb_build_object('name', s.name, 'logo_url', s.logo_url),
+            'client', jsonb_build_object('full_name', c.full_name)
+        ) END
+    )), '[]'::jsonb)
+    INTO v_items
+    FROM leased l
+    LEFT JOIN orders o ON o.id = l.order_id
+    LEFT JOIN stores s ON s.id = o.store_id
+    LEFT JOIN clients c ON c.id = o.client_id;
+
+    RETURN jsonb_build_object('lease', v_lease, 'items', v_items);
+END;
+$$;
+
+-- =============================================
+-- PART 3: complete_email_batch
+-- =============================================
+
+-- p_results: [{id, status: sent|cancelled|failed|pending, attempts?, next_retry_at?, last_error?}]
+CREATE OR REPLACE FUNCTION public.complete_email_batch(
+    p_lease TIMESTAMPTZ,
+    p_results JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE email_queue q
+    SET status = r.status,
+        attempts = COALESCE(r.attempts, q.attempts),
+        next_retry_at = COALESCE(r.next_retry_at, q.next_retry_at),
+        last_error = r.last_error,
+        updated_at = now()
+    FROM jsonb_to_recordset(p_results)
+        AS r(id UUID, status TEXT, attempts INTEGER, next_retry_at TIMESTAMPTZ, last_error TEXT)
+    WHERE q.id = r.id
+      AND r.status IN ('sent', 'cancelled', 'failed', 'pending')
+      -- Still ours: another worker re-claims a row only after the lease ends
+      AND q.status = 'pending'
+      AND q.next_retry_at = p_lease;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.claim_email_batch(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.complete_email_batch(TIMESTAMPTZ, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_email_batch(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.complete_email_batch(TIMESTAMPTZ, JSONB) TO service_role;
+
+COMMENT ON FUNCTION public.claim_email_batch IS
+'Claims up to p_limit due email_queue rows (FOR UPDATE SKIP LOCKED) by leasing them for p_lease_seconds, and returns {lease, items[]} with each row''s order, store and client. Used by process-email-queue.';
+
+COMMENT ON FUNCTION public.complete_email_batch IS
+'Applies a batch of process-email-queue outcomes to rows still held under p_lease. Returns the rows updated.';
@@ -0,0 +1,30 @@
+-- =============================================
+-- MIGRATION: Invoice extraction cache key
+-- Date: 2026-10-17
+-- Purpose:
+--   process-invoice sent every uploaded image to Gemini, including
+--   re-uploads of an invoice the store had already extracted. It now
+--   stores the SHA-256 of the image it extracted in invoices.image_hash
+--   and, before calling the model, looks for an extracted or confirmed
+--   invoice of the same store with the same hash and reuses its
+--   raw_extraction. The lookup is per store, so one tenant's results
+--   never answer another's upload.
+-- =============================================
+
+-- =============================================
+-- PART 1: Column
+-- =============================================
+
+ALTER TABLE public.invoices
+    ADD COLUMN IF NOT EXISTS image_hash TEXT;
+
+COMMENT ON COLUMN public.invoices.image_hash IS
+'Hex SHA-256 of the image bytes process-invoice extracted. Key of the per-store extraction cache.';
+
+-- =============================================
+-- PART 2: Index for the cache lookup
+-- =============================================
+
+CREATE INDEX IF NOT EXISTS idx_invoices_store_image_hash
+    ON public.invoices (store_id, image_hash)
+    WHERE image_hash IS NOT NULL;
@@ -1,97 +1,48 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
-    try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try to clear the input fields first and then input invalid credentials again
-        frame = context.pages[-1]
-        # Click on email input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+from harness import Steps, run_standalone
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Interact with the page elements to simulate user flow
+    # -> Try to clear the input fields first and then input invalid credentials again
+    frame = context.pages[-1]
+    # Click on email input field to focus
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
+    await steps.click(elem, 'Click on email input field to focus')
 
-        frame = context.pages[-1]
-        # Input invalid email after clearing
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
+    frame = context.pages[-1]
+    # Input invalid email after clearing
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
+    await steps.fill(elem, 'livveneas@gmail.com', 'Input invalid email after clearing')
 
-        frame = context.pages[-1]
-        # Click on password input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    frame = context.pages[-1]
+    # Click on password input field to focus
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
+    await steps.click(elem, 'Click on password input field to focus')
 
-        frame = context.pages[-1]
-        # Input invalid password after clearing
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
+    frame = context.pages[-1]
+    # Input invalid password after clearing
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
+    await steps.fill(elem, 'test124', 'Input invalid password after clearing')
+
+    frame = context.pages[-1]
+    # Click the login button 'AUTENTICAR'
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
+    await steps.click(elem, "Click the login button 'AUTENTICAR'")
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
+    try:
+        await expect(frame.locator('text=Login Successful').first).to_be_visible(timeout=5000)
+    except AssertionError:
+        raise AssertionError("Test case failed: Login should be rejected with invalid credentials, but 'Login Successful' message was not expected and indicates a failure in the login validation.")
 
-        frame = context.pages[-1]
-        # Click the login button 'AUTENTICAR'
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
 
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Login Successful').first).to_be_visible(timeout=5000)
-        except AssertionError:
-            raise AssertionError("Test case failed: Login should be rejected with invalid credentials, but 'Login Successful' message was not expected and indicates a failure in the login validation.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test)
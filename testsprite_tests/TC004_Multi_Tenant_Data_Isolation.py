@@ -1,109 +1,34 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
-    try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try inputting username and password using a different approach or element, or try clicking the username field first before inputting text
-        frame = context.pages[-1]
-        # Click username input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+from harness import Steps, run_standalone
+
+ROLE = "owner"
 
-        frame = context.pages[-1]
-        # Input username for Tenant A user after focusing field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
 
-        frame = context.pages[-1]
-        # Click password input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
 
-        frame = context.pages[-1]
-        # Input password for Tenant A user after focusing field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Attempt to access inventory or orders of Tenant B via direct URL or API to verify access control
+    await steps.goto(page, '/inventario?tenant=TenantB')
 
-        frame = context.pages[-1]
-        # Click login button to authenticate
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # -> Check for any UI elements or messages indicating access denial or tenant mismatch, or try to navigate to orders page of Tenant B to further verify access restrictions
+    frame = context.pages[-1]
+    # Click on 'Despacho [G]' (Orders) to check if Tenant B orders are accessible
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a').nth(0)
+    await steps.click(elem, "Click on 'Despacho [G]' (Orders) to check if Tenant B orders are accessible")
 
-        # -> Attempt to access inventory or orders of Tenant B via direct URL or API to verify access control
-        await page.goto('http://localhost:3005/inventario?tenant=TenantB', timeout=10000)
-        await asyncio.sleep(3)
-        
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
+    try:
+        await expect(frame.locator('text=Access Granted to Tenant B Inventory').first).to_be_visible(timeout=5000)
+    except AssertionError:
+        raise AssertionError("Test failed: Access control violation - User assigned to Tenant A was able to access Tenant B's inventory or orders, violating strict data segregation between tenants.")
 
-        # -> Check for any UI elements or messages indicating access denial or tenant mismatch, or try to navigate to orders page of Tenant B to further verify access restrictions
-        frame = context.pages[-1]
-        # Click on 'Despacho [G]' (Orders) to check if Tenant B orders are accessible
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
 
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Access Granted to Tenant B Inventory').first).to_be_visible(timeout=5000)
-        except AssertionError:
-            raise AssertionError("Test failed: Access control violation - User assigned to Tenant A was able to access Tenant B's inventory or orders, violating strict data segregation between tenants.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
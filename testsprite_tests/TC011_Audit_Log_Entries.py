@@ -1,113 +1,49 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Perform key action: Navigate to inventory to simulate inventory changes
+    frame = context.pages[-1]
+    # Click on Inventario to perform inventory changes
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[2]/a').nth(0)
+    await steps.click(elem, 'Click on Inventario to perform inventory changes')
+
+    # -> Perform an inventory change by clicking on an item or edit button to modify stock or details
+    frame = context.pages[-1]
+    # Click on the inventory item 'TEST' to edit or change stock
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[4]/div/table/tbody/tr[5]/td[3]/div').nth(0)
+    await steps.click(elem, "Click on the inventory item 'TEST' to edit or change stock")
+
+    # -> Try alternative inventory change action such as marking loss, purchase, adjustment, or transfer if available, or try clicking 'NUEVO REGISTRO' to create a new inventory record
+    frame = context.pages[-1]
+    # Click 'NUEVO REGISTRO' button to create a new inventory record as alternative inventory change action
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/button[3]').nth(0)
+    await steps.click(elem, "Click 'NUEVO REGISTRO' button to create a new inventory record as alternative inventory change action")
+
+    # -> Navigate to audit log page as authorized user to verify audit log entries for performed actions
+    frame = context.pages[-1]
+    # Click on Audit log or related button to access audit logs
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[4]/div/table/tbody/tr/td[7]/button').nth(0)
+    await steps.click(elem, 'Click on Audit log or related button to access audit logs')
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
     try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try inputting username in the email input field at index 2 again or try alternative approach
-        frame = context.pages[-1]
-        # Try inputting username email again in the email input field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
+        await expect(frame.locator('text=Audit log entry for unauthorized action').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError("Test case failed: Audit log entries for critical user actions such as login, inventory changes, order creation, and role changes are not properly generated or accessible to authorized users as per the test plan.")
 
-        frame = context.pages[-1]
-        # Input the password
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
 
-        frame = context.pages[-1]
-        # Click the authenticate button to login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Perform key action: Navigate to inventory to simulate inventory changes
-        frame = context.pages[-1]
-        # Click on Inventario to perform inventory changes
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[2]/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Perform an inventory change by clicking on an item or edit button to modify stock or details
-        frame = context.pages[-1]
-        # Click on the inventory item 'TEST' to edit or change stock
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[4]/div/table/tbody/tr[5]/td[3]/div').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Try alternative inventory change action such as marking loss, purchase, adjustment, or transfer if available, or try clicking 'NUEVO REGISTRO' to create a new inventory record
-        frame = context.pages[-1]
-        # Click 'NUEVO REGISTRO' button to create a new inventory record as alternative inventory change action
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/button[3]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to audit log page as authorized user to verify audit log entries for performed actions
-        frame = context.pages[-1]
-        # Click on Audit log or related button to access audit logs
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[4]/div/table/tbody/tr/td[7]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Audit log entry for unauthorized action').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError("Test case failed: Audit log entries for critical user actions such as login, inventory changes, order creation, and role changes are not properly generated or accessible to authorized users as per the test plan.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
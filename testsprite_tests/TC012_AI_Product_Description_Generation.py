@@ -1,185 +1,100 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
-    try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try inputting username and password into the respective fields using a different approach or try clicking the email field first to focus then input text
-        frame = context.pages[-1]
-        # Click email input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        frame = context.pages[-1]
-        # Try inputting username after focusing email field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
-
-        frame = context.pages[-1]
-        # Click password input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        frame = context.pages[-1]
-        # Try inputting password after focusing password field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
-
-        frame = context.pages[-1]
-        # Click authenticate button to login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click on the menu or button that leads to product description generation section
-        frame = context.pages[-1]
-        # Click 'Diseño Menú' menu to navigate to product description generation section
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[2]/a[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Abrir SquadAI' button to open AI assistant for product description generation
-        frame = context.pages[-1]
-        # Click 'Abrir SquadAI' button to open AI assistant for product description generation
-        elem = frame.locator('xpath=html/body/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Input sample product name or select a sample product and request AI to generate description
-        frame = context.pages[-1]
-        # Click on product search input to focus for sample product selection
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[3]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        frame = context.pages[-1]
-        # Input sample product name for AI description generation
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[3]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('Jamon cocido Tradicional Campo Austral')
-        
-
-        frame = context.pages[-1]
-        # Click add button next to sample product to select it for description generation
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        frame = context.pages[-1]
-        # Click 'Abrir SquadAI' button again if needed to confirm AI description generation interface is active
-        elem = frame.locator('xpath=html/body/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click the button to generate AI product description and verify it appears timely without UI blocking
-        frame = context.pages[-1]
-        # Click 'add' button to trigger AI description generation for the selected product
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Try alternative approach to trigger AI description generation or simulate API failure for error handling test
-        frame = context.pages[-1]
-        # Click 'Abrir SquadAI' button to ensure AI assistant is active
-        elem = frame.locator('xpath=html/body/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'add' button (index 15) next to the sample product to trigger AI description generation and verify output appears timely without UI freeze
-        frame = context.pages[-1]
-        # Click 'add' button next to 'Jamon cocido Tradicional Campo Austral' to trigger AI description generation
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Simulate AI API failure or timeout to verify system displays user-friendly error message and fallback option
-        frame = context.pages[-1]
-        # Click 'Abrir SquadAI' button to open AI assistant interface for error simulation
-        elem = frame.locator('xpath=html/body/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Simulate AI API failure or timeout to verify system displays user-friendly error message and fallback option
-        frame = context.pages[-1]
-        # Input command to simulate AI API failure
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[4]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('simulate api failure')
-        
-
-        frame = context.pages[-1]
-        # Click send button to execute API failure simulation command
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[4]/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Perform final verification to ensure all AI assistant interactions are stable and then complete the task
-        frame = context.pages[-1]
-        # Click user profile button to check for any additional AI assistant or error notifications
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        await expect(frame.locator('text=Jamon cocido Tradicional Campo Austral').first).to_be_visible(timeout=30000)
-        await expect(frame.locator('text=CIRO UPDATED').first).to_be_visible(timeout=30000)
-        await expect(frame.locator('text=Sin Filas').first).to_be_visible(timeout=30000)
-        await expect(frame.locator('text=Pide desde tu mesa - Pedí desde acá o pedí sin fila').first).to_be_visible(timeout=30000)
-        await expect(frame.locator('text=simulate api failure').first).to_be_visible(timeout=30000)
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Click on the menu or button that leads to product description generation section
+    frame = context.pages[-1]
+    # Click 'Diseño Menú' menu to navigate to product description generation section
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[2]/a[2]').nth(0)
+    await steps.click(elem, "Click 'Diseño Menú' menu to navigate to product description generation section")
+
+    # -> Click 'Abrir SquadAI' button to open AI assistant for product description generation
+    frame = context.pages[-1]
+    # Click 'Abrir SquadAI' button to open AI assistant for product description generation
+    elem = frame.locator('xpath=html/body/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir SquadAI' button to open AI assistant for product description generation")
+
+    # -> Input sample product name or select a sample product and request AI to generate description
+    frame = context.pages[-1]
+    # Click on product search input to focus for sample product selection
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[3]/div/input').nth(0)
+    await steps.click(elem, 'Click on product search input to focus for sample product selection')
+
+    frame = context.pages[-1]
+    # Input sample product name for AI description generation
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[3]/div/input').nth(0)
+    await steps.fill(elem, 'Jamon cocido Tradicional Campo Austral', 'Input sample product name for AI description generation')
+
+    frame = context.pages[-1]
+    # Click add button next to sample product to select it for description generation
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div/button').nth(0)
+    await steps.click(elem, 'Click add button next to sample product to select it for description generation')
+
+    frame = context.pages[-1]
+    # Click 'Abrir SquadAI' button again if needed to confirm AI description generation interface is active
+    elem = frame.locator('xpath=html/body/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir SquadAI' button again if needed to confirm AI description generation interface is active")
+
+    # -> Click the button to generate AI product description and verify it appears timely without UI blocking
+    frame = context.pages[-1]
+    # Click 'add' button to trigger AI description generation for the selected product
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div[3]/button').nth(0)
+    await steps.click(elem, "Click 'add' button to trigger AI description generation for the selected product")
+
+    # -> Try alternative approach to trigger AI description generation or simulate API failure for error handling test
+    frame = context.pages[-1]
+    # Click 'Abrir SquadAI' button to ensure AI assistant is active
+    elem = frame.locator('xpath=html/body/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir SquadAI' button to ensure AI assistant is active")
+
+    # -> Click 'add' button (index 15) next to the sample product to trigger AI description generation and verify output appears timely without UI freeze
+    frame = context.pages[-1]
+    # Click 'add' button next to 'Jamon cocido Tradicional Campo Austral' to trigger AI description generation
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/div/div[2]/div/div[6]/div/div[3]/button').nth(0)
+    await steps.click(elem, "Click 'add' button next to 'Jamon cocido Tradicional Campo Austral' to trigger AI description generation")
+
+    # -> Simulate AI API failure or timeout to verify system displays user-friendly error message and fallback option
+    frame = context.pages[-1]
+    # Click 'Abrir SquadAI' button to open AI assistant interface for error simulation
+    elem = frame.locator('xpath=html/body/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir SquadAI' button to open AI assistant interface for error simulation")
+
+    # -> Simulate AI API failure or timeout to verify system displays user-friendly error message and fallback option
+    frame = context.pages[-1]
+    # Input command to simulate AI API failure
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[4]/div/input').nth(0)
+    await steps.fill(elem, 'simulate api failure', 'Input command to simulate AI API failure')
+
+    frame = context.pages[-1]
+    # Click send button to execute API failure simulation command
+    elem = frame.locator('xpath=html/body/div/div/div[2]/div[4]/div/button').nth(0)
+    await steps.click(elem, 'Click send button to execute API failure simulation command')
+
+    # -> Perform final verification to ensure all AI assistant interactions are stable and then complete the task
+    frame = context.pages[-1]
+    # Click user profile button to check for any additional AI assistant or error notifications
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
+    await steps.click(elem, 'Click user profile button to check for any additional AI assistant or error notifications')
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
+    await expect(frame.locator('text=Jamon cocido Tradicional Campo Austral').first).to_be_visible(timeout=30000)
+    await expect(frame.locator('text=CIRO UPDATED').first).to_be_visible(timeout=30000)
+    await expect(frame.locator('text=Sin Filas').first).to_be_visible(timeout=30000)
+    await expect(frame.locator('text=Pide desde tu mesa - Pedí desde acá o pedí sin fila').first).to_be_visible(timeout=30000)
+    await expect(frame.locator('text=simulate api failure').first).to_be_visible(timeout=30000)
+
+
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
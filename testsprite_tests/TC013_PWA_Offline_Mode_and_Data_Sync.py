@@ -1,99 +1,37 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
-    try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Input username and password, then click the authenticate button to login and load data online.
-        frame = context.pages[-1]
-        # Input the username in the email field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
 
-        frame = context.pages[-1]
-        # Input the password in the password field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
 
-        frame = context.pages[-1]
-        # Click the authenticate button to login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Switch network to offline mode to test offline functionality.
+    frame = context.pages[-1]
+    # Click user menu to check for offline mode or network settings
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
+    await steps.click(elem, 'Click user menu to check for offline mode or network settings')
 
-        # -> Switch network to offline mode to test offline functionality.
-        frame = context.pages[-1]
-        # Click user menu to check for offline mode or network settings
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # -> Simulate switching network to offline mode and verify the UI reflects offline status without errors.
+    frame = context.pages[-1]
+    # Click 'Ajustes Local' to open local settings for network or offline mode options
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/div/a').nth(0)
+    await steps.click(elem, "Click 'Ajustes Local' to open local settings for network or offline mode options")
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
+    try:
+        await expect(frame.locator('text=Offline Sync Successful').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError('Test failed: Offline mode functionality did not work as expected. The application did not sync changes correctly after reconnecting the network.')
 
-        # -> Simulate switching network to offline mode and verify the UI reflects offline status without errors.
-        frame = context.pages[-1]
-        # Click 'Ajustes Local' to open local settings for network or offline mode options
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/div/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
 
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Offline Sync Successful').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError('Test failed: Offline mode functionality did not work as expected. The application did not sync changes correctly after reconnecting the network.')
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
@@ -1,162 +1,85 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Navigate to 'Finanzas' (Finance) section to perform cash shift operations and complete payments including MercadoPago transactions.
+    frame = context.pages[-1]
+    # Click on 'Finanzas' to access finance module for cash shift and payments
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[3]/a[3]').nth(0)
+    await steps.click(elem, "Click on 'Finanzas' to access finance module for cash shift and payments")
+
+    # -> Click on 'Caja y Turnos' to access cash shift operations and perform necessary cash shifts and payments.
+    frame = context.pages[-1]
+    # Click on 'Caja y Turnos' to access cash shift and turn operations
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
+    await steps.click(elem, "Click on 'Caja y Turnos' to access cash shift and turn operations")
+
+    # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
+    frame = context.pages[-1]
+    # Click 'Abrir Caja' for 'Salón Principal' to open cash register
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div[2]/div/div/div').nth(0)
+    await steps.click(elem, "Click 'Abrir Caja' for 'Salón Principal' to open cash register")
+
+    # -> Navigate to 'Caja y Turnos' section to perform cash shift operations and complete payments including MercadoPago transactions.
+    frame = context.pages[-1]
+    # Click on 'Caja y Turnos' to access cash shift operations
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
+    await steps.click(elem, "Click on 'Caja y Turnos' to access cash shift operations")
+
+    # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
+    frame = context.pages[-1]
+    # Click 'Abrir Caja' for 'Salón Principal' to open cash register
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir Caja' for 'Salón Principal' to open cash register")
+
+    # -> Locate and click the 'Caja y Turnos' button to access cash shift operations again or find an alternative way to perform cash shift operations and complete payments including MercadoPago transactions.
+    frame = context.pages[-1]
+    # Click on 'Caja y Turnos' to access cash shift operations
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
+    await steps.click(elem, "Click on 'Caja y Turnos' to access cash shift operations")
+
+    # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
+    frame = context.pages[-1]
+    # Click 'Abrir Caja' for 'Salón Principal' to open cash register
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir Caja' for 'Salón Principal' to open cash register")
+
+    # -> Click 'Caja y Turnos' to access cash shift operations and retry opening the cash register with initial amount input.
+    frame = context.pages[-1]
+    # Click 'Caja y Turnos' to access cash shift operations
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
+    await steps.click(elem, "Click 'Caja y Turnos' to access cash shift operations")
+
+    # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
+    frame = context.pages[-1]
+    # Click 'Abrir Caja' for 'Salón Principal' to open cash register
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
+    await steps.click(elem, "Click 'Abrir Caja' for 'Salón Principal' to open cash register")
+
+    # -> Use keyboard input to enter initial amount '1000' into the input field and then click 'Confirmar Apertura' to open the cash register.
+    frame = context.pages[-1]
+    # Click input field for initial amount to focus
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div[2]/div/div/div/input').nth(0)
+    await steps.click(elem, 'Click input field for initial amount to focus')
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
     try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Input email and password, then click authenticate button to login to finance module.
-        frame = context.pages[-1]
-        # Input email for login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
-
-        # -> Retry login by inputting credentials again and clicking authenticate button.
-        frame = context.pages[-1]
-        # Re-input email for login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
-
-        frame = context.pages[-1]
-        # Re-input password for login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
-
-        frame = context.pages[-1]
-        # Click authenticate button to login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to 'Finanzas' (Finance) section to perform cash shift operations and complete payments including MercadoPago transactions.
-        frame = context.pages[-1]
-        # Click on 'Finanzas' to access finance module for cash shift and payments
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[3]/a[3]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click on 'Caja y Turnos' to access cash shift operations and perform necessary cash shifts and payments.
-        frame = context.pages[-1]
-        # Click on 'Caja y Turnos' to access cash shift and turn operations
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
-        frame = context.pages[-1]
-        # Click 'Abrir Caja' for 'Salón Principal' to open cash register
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div[2]/div/div/div').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to 'Caja y Turnos' section to perform cash shift operations and complete payments including MercadoPago transactions.
-        frame = context.pages[-1]
-        # Click on 'Caja y Turnos' to access cash shift operations
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
-        frame = context.pages[-1]
-        # Click 'Abrir Caja' for 'Salón Principal' to open cash register
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Locate and click the 'Caja y Turnos' button to access cash shift operations again or find an alternative way to perform cash shift operations and complete payments including MercadoPago transactions.
-        frame = context.pages[-1]
-        # Click on 'Caja y Turnos' to access cash shift operations
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
-        frame = context.pages[-1]
-        # Click 'Abrir Caja' for 'Salón Principal' to open cash register
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Caja y Turnos' to access cash shift operations and retry opening the cash register with initial amount input.
-        frame = context.pages[-1]
-        # Click 'Caja y Turnos' to access cash shift operations
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/header/div[2]/div[2]/button[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Abrir Caja' for 'Salón Principal' to open the cash register and start cash shift operations.
-        frame = context.pages[-1]
-        # Click 'Abrir Caja' for 'Salón Principal' to open cash register
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/div/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Use keyboard input to enter initial amount '1000' into the input field and then click 'Confirmar Apertura' to open the cash register.
-        frame = context.pages[-1]
-        # Click input field for initial amount to focus
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div[2]/div/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Financial Report Totals Verified Successfully').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError("Test case failed: Financial reports did not display accurate totals, cash shifts and MercadoPago payments were not correctly processed, or payment gateways were not properly integrated as per the test plan.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+        await expect(frame.locator('text=Financial Report Totals Verified Successfully').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError("Test case failed: Financial reports did not display accurate totals, cash shifts and MercadoPago payments were not correctly processed, or payment gateways were not properly integrated as per the test plan.")
+
+
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
@@ -1,133 +1,61 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Navigate to the public client interface or POS to create a new order
+    frame = context.pages[-1]
+    # Click on 'Despacho [G]' to access order management or POS interface
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a').nth(0)
+    await steps.click(elem, "Click on 'Despacho [G]' to access order management or POS interface")
+
+    # -> Navigate to public client interface or POS to create a new order
+    frame = context.pages[-1]
+    # Click on 'Clientes' to access public client interface or client order creation
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[3]/a').nth(0)
+    await steps.click(elem, "Click on 'Clientes' to access public client interface or client order creation")
+
+    # -> Find or create a client to create a new order via public client interface
+    frame = context.pages[-1]
+    # Click NUEVA MISIÓN [N] to create a new order or mission for a client
+    elem = frame.locator('xpath=html/body/div/div/main/header/div[2]/a[2]').nth(0)
+    await steps.click(elem, 'Click NUEVA MISIÓN [N] to create a new order or mission for a client')
+
+    # -> Add products to the order and confirm the sale to create a new order
+    frame = context.pages[-1]
+    # Add product 'Jamon cocido Tradicional Campo Austral' to the order
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/main/div/div[2]/div').nth(0)
+    await steps.click(elem, "Add product 'Jamon cocido Tradicional Campo Austral' to the order")
+
+    # -> Add 'Panceta con cuero Tapalque' product, select 'Para llevar' option, and confirm the sale to create the order
+    frame = context.pages[-1]
+    # Add product 'Panceta con cuero Tapalque' to the order
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/main/div/div[2]/div[2]').nth(0)
+    await steps.click(elem, "Add product 'Panceta con cuero Tapalque' to the order")
+
+    # -> Click 'CONFIRMAR VENTA' button at index 30 to finalize and create the new order
+    frame = context.pages[-1]
+    # Click 'CONFIRMAR VENTA' to confirm and create the order
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/main/aside/div/div[3]/button').nth(0)
+    await steps.click(elem, "Click 'CONFIRMAR VENTA' to confirm and create the order")
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
     try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try to input password text into the password field using a different approach or skip and try login with only email input
-        frame = context.pages[-1]
-        # Input email for login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
+        await expect(frame.locator('text=Order Status Updated Successfully').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError("Test failed: Order status changes are not propagated correctly or not displayed on both staff Kanban board and public client order tracking in real time as required by the test plan.")
 
-        frame = context.pages[-1]
-        # Click password field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
 
-        frame = context.pages[-1]
-        # Try input password again after focusing field
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
-
-        frame = context.pages[-1]
-        # Click login button to authenticate
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to the public client interface or POS to create a new order
-        frame = context.pages[-1]
-        # Click on 'Despacho [G]' to access order management or POS interface
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to public client interface or POS to create a new order
-        frame = context.pages[-1]
-        # Click on 'Clientes' to access public client interface or client order creation
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div[3]/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Find or create a client to create a new order via public client interface
-        frame = context.pages[-1]
-        # Click NUEVA MISIÓN [N] to create a new order or mission for a client
-        elem = frame.locator('xpath=html/body/div/div/main/header/div[2]/a[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Add products to the order and confirm the sale to create a new order
-        frame = context.pages[-1]
-        # Add product 'Jamon cocido Tradicional Campo Austral' to the order
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/main/div/div[2]/div').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Add 'Panceta con cuero Tapalque' product, select 'Para llevar' option, and confirm the sale to create the order
-        frame = context.pages[-1]
-        # Add product 'Panceta con cuero Tapalque' to the order
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/main/div/div[2]/div[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'CONFIRMAR VENTA' button at index 30 to finalize and create the new order
-        frame = context.pages[-1]
-        # Click 'CONFIRMAR VENTA' to confirm and create the order
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/main/aside/div/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Order Status Updated Successfully').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError("Test failed: Order status changes are not propagated correctly or not displayed on both staff Kanban board and public client order tracking in real time as required by the test plan.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
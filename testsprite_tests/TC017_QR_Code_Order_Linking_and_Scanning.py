@@ -1,112 +1,43 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
-    try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Try inputting email into index 2 again or try alternative input method, then input password and click login
-        frame = context.pages[-1]
-        # Click email input field to focus
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+from harness import Steps, run_standalone
+
+ROLE = "owner"
 
-        frame = context.pages[-1]
-        # Try inputting email address again
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
 
-        frame = context.pages[-1]
-        # Input password
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
 
-        frame = context.pages[-1]
-        # Click authenticate button to log in
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Click on 'Mesas y Salón' to access tables and generate QR code
+    frame = context.pages[-1]
+    # Click on 'Mesas y Salón' to access tables and generate QR code
+    elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a[2]').nth(0)
+    await steps.click(elem, "Click on 'Mesas y Salón' to access tables and generate QR code")
 
-        # -> Click on 'Mesas y Salón' to access tables and generate QR code
-        frame = context.pages[-1]
-        # Click on 'Mesas y Salón' to access tables and generate QR code
-        elem = frame.locator('xpath=html/body/div/div/aside/div[2]/div/a[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # -> Click on table M-2 (index 25) to generate QR code for that table
+    frame = context.pages[-1]
+    # Click on table M-2 to generate QR code
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/main/div[2]/div/div[2]/div[2]/div[4]').nth(0)
+    await steps.click(elem, 'Click on table M-2 to generate QR code')
 
-        # -> Click on table M-2 (index 25) to generate QR code for that table
-        frame = context.pages[-1]
-        # Click on table M-2 to generate QR code
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/main/div[2]/div/div[2]/div[2]/div[4]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
+    # -> Locate and click the button or option to generate or display the QR code for table M-2
+    frame = context.pages[-1]
+    # Click on 'Pedidos' button to check for QR code generation or order linking options
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/main/div[2]/div[2]/div/div[2]/button[2]').nth(0)
+    await steps.click(elem, "Click on 'Pedidos' button to check for QR code generation or order linking options")
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
+    try:
+        await expect(frame.locator('text=QR Code for Table X-99').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError("Test case failed: QR code generation and linking for tables did not succeed as expected. The QR code with the correct table identifier was not found, indicating failure in QR code rendering or order linking after scanning.")
 
-        # -> Locate and click the button or option to generate or display the QR code for table M-2
-        frame = context.pages[-1]
-        # Click on 'Pedidos' button to check for QR code generation or order linking options
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div/div/main/div[2]/div[2]/div/div[2]/button[2]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
 
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=QR Code for Table X-99').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError("Test case failed: QR code generation and linking for tables did not succeed as expected. The QR code with the correct table identifier was not found, indicating failure in QR code rendering or order linking after scanning.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
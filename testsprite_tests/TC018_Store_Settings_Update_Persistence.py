@@ -1,166 +1,93 @@
-import asyncio
-from playwright import async_api
 from playwright.async_api import expect
 
-async def run_test():
-    pw = None
-    browser = None
-    context = None
-    
+from harness import Steps, run_standalone
+
+ROLE = "owner"
+
+
+async def run_test(context):
+    # The harness owns the shared browser; this context is fresh and isolated
+    page = await context.new_page()
+    steps = Steps(context)
+    await steps.goto(page)
+
+    # Session restored from the cached owner storage state; no login form
+    # Interact with the page elements to simulate user flow
+    # -> Navigate to business details settings page to modify contact info and business name.
+    frame = context.pages[-1]
+    # Open user/store owner menu for settings navigation
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
+    await steps.click(elem, 'Open user/store owner menu for settings navigation')
+
+    # -> Click on 'Ajustes Local' to open the local settings page for modifying business details.
+    frame = context.pages[-1]
+    # Click 'Ajustes Local' to open local settings page
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/div/a').nth(0)
+    await steps.click(elem, "Click 'Ajustes Local' to open local settings page")
+
+    # -> Modify business details: update commercial name and contact info fields.
+    frame = context.pages[-1]
+    # Update commercial name to 'CIRO Updated'
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div/input').nth(0)
+    await steps.fill(elem, 'CIRO Updated', "Update commercial name to 'CIRO Updated'")
+
+    frame = context.pages[-1]
+    # Update operational address
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div[3]/input').nth(0)
+    await steps.fill(elem, '123 New Address, City', 'Update operational address')
+
+    frame = context.pages[-1]
+    # Update fiscal info (CUIT/NIT)
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div[4]/input').nth(0)
+    await steps.fill(elem, '20-12345678-9', 'Update fiscal info (CUIT/NIT)')
+
+    frame = context.pages[-1]
+    # Click 'Actualizar Configuración' to save changes
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/button').nth(0)
+    await steps.click(elem, "Click 'Actualizar Configuración' to save changes")
+
+    # -> Navigate to payment settings section to adjust payment options and add a new location.
+    frame = context.pages[-1]
+    # Click 'PASARELA' button to open payment settings
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/nav/button[5]').nth(0)
+    await steps.click(elem, "Click 'PASARELA' button to open payment settings")
+
+    # -> Modify payment settings if needed and proceed to add a new location in multi-location configuration.
+    frame = context.pages[-1]
+    # Click 'NEGOCIO' button to navigate to business multi-location configuration section
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/nav/button').nth(0)
+    await steps.click(elem, "Click 'NEGOCIO' button to navigate to business multi-location configuration section")
+
+    # -> Scroll to 'NEGOCIO' button to ensure it is visible and then retry clicking it to proceed with multi-location configuration.
+    await page.mouse.wheel(0, 300)
+
+    frame = context.pages[-1]
+    # Retry clicking 'NEGOCIO' button to navigate to multi-location configuration
+    elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[2]/div/div').nth(0)
+    await steps.click(elem, "Retry clicking 'NEGOCIO' button to navigate to multi-location configuration")
+
+    # -> Scroll down to find multi-location configuration section or button and click to add a new location.
+    await page.mouse.wheel(0, 400)
+
+    # -> Navigate back to the local settings page or appropriate settings section to access multi-location configuration and add a new location.
+    frame = context.pages[-1]
+    # Click user/store owner menu button to open settings navigation
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
+    await steps.click(elem, 'Click user/store owner menu button to open settings navigation')
+
+    # -> Click 'Ajustes Local' in the sidebar to reopen local settings and verify all changes persist, including business details, payment settings, and multi-location configurations.
+    frame = context.pages[-1]
+    # Click 'Ajustes Local' in sidebar to open local settings page for verification
+    elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
+    await steps.click(elem, "Click 'Ajustes Local' in sidebar to open local settings page for verification")
+
+    # --> Assertions to verify final state
+    frame = context.pages[-1]
     try:
-        # Start a Playwright session in asynchronous mode
-        pw = await async_api.async_playwright().start()
-        
-        # Launch a Chromium browser in headless mode with custom arguments
-        browser = await pw.chromium.launch(
-            headless=True,
-            args=[
-                "--window-size=1280,720",         # Set the browser window size
-                "--disable-dev-shm-usage",        # Avoid using /dev/shm which can cause issues in containers
-                "--ipc=host",                     # Use host-level IPC for better stability
-                "--single-process"                # Run the browser in a single process mode
-            ],
-        )
-        
-        # Create a new browser context (like an incognito window)
-        context = await browser.new_context()
-        context.set_default_timeout(5000)
-        
-        # Open a new page in the browser context
-        page = await context.new_page()
-        
-        # Navigate to your target URL and wait until the network request is committed
-        await page.goto("http://localhost:3005", wait_until="commit", timeout=10000)
-        
-        # Wait for the main page to reach DOMContentLoaded state (optional for stability)
-        try:
-            await page.wait_for_load_state("domcontentloaded", timeout=3000)
-        except async_api.Error:
-            pass
-        
-        # Iterate through all iframes and wait for them to load as well
-        for frame in page.frames:
-            try:
-                await frame.wait_for_load_state("domcontentloaded", timeout=3000)
-            except async_api.Error:
-                pass
-        
-        # Interact with the page elements to simulate user flow
-        # -> Input email and password, then click login button to authenticate as store owner.
-        frame = context.pages[-1]
-        # Input email for store owner login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('livveneas@gmail.com')
-        
-
-        frame = context.pages[-1]
-        # Input password for store owner login
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/div/div[2]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('test124')
-        
-
-        frame = context.pages[-1]
-        # Click login button to authenticate
-        elem = frame.locator('xpath=html/body/div/div/div[2]/div[2]/form/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to business details settings page to modify contact info and business name.
-        frame = context.pages[-1]
-        # Open user/store owner menu for settings navigation
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click on 'Ajustes Local' to open the local settings page for modifying business details.
-        frame = context.pages[-1]
-        # Click 'Ajustes Local' to open local settings page
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/div/a').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Modify business details: update commercial name and contact info fields.
-        frame = context.pages[-1]
-        # Update commercial name to 'CIRO Updated'
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('CIRO Updated')
-        
-
-        frame = context.pages[-1]
-        # Update operational address
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div[3]/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('123 New Address, City')
-        
-
-        frame = context.pages[-1]
-        # Update fiscal info (CUIT/NIT)
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[3]/div[4]/input').nth(0)
-        await page.wait_for_timeout(3000); await elem.fill('20-12345678-9')
-        
-
-        frame = context.pages[-1]
-        # Click 'Actualizar Configuración' to save changes
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div[2]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Navigate to payment settings section to adjust payment options and add a new location.
-        frame = context.pages[-1]
-        # Click 'PASARELA' button to open payment settings
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/nav/button[5]').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Modify payment settings if needed and proceed to add a new location in multi-location configuration.
-        frame = context.pages[-1]
-        # Click 'NEGOCIO' button to navigate to business multi-location configuration section
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/nav/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Scroll to 'NEGOCIO' button to ensure it is visible and then retry clicking it to proceed with multi-location configuration.
-        await page.mouse.wheel(0, 300)
-        
-
-        frame = context.pages[-1]
-        # Retry clicking 'NEGOCIO' button to navigate to multi-location configuration
-        elem = frame.locator('xpath=html/body/div/div/main/div/div/div[2]/div/div/div/div[2]/div/div').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Scroll down to find multi-location configuration section or button and click to add a new location.
-        await page.mouse.wheel(0, 400)
-        
-
-        # -> Navigate back to the local settings page or appropriate settings section to access multi-location configuration and add a new location.
-        frame = context.pages[-1]
-        # Click user/store owner menu button to open settings navigation
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # -> Click 'Ajustes Local' in the sidebar to reopen local settings and verify all changes persist, including business details, payment settings, and multi-location configurations.
-        frame = context.pages[-1]
-        # Click 'Ajustes Local' in sidebar to open local settings page for verification
-        elem = frame.locator('xpath=html/body/div/div/aside/div[3]/button').nth(0)
-        await page.wait_for_timeout(3000); await elem.click(timeout=5000)
-        
-
-        # --> Assertions to verify final state
-        frame = context.pages[-1]
-        try:
-            await expect(frame.locator('text=Nonexistent Business Update Confirmation').first).to_be_visible(timeout=1000)
-        except AssertionError:
-            raise AssertionError("Test case failed: Updates to store business details, payment settings, and multi-location configurations did not persist correctly after saving and reloading the settings page.")
-        await asyncio.sleep(5)
-    
-    finally:
-        if context:
-            await context.close()
-        if browser:
-            await browser.close()
-        if pw:
-            await pw.stop()
-            
-asyncio.run(run_test())
-    
\ No newline at end of file
+        await expect(frame.locator('text=Nonexistent Business Update Confirmation').first).to_be_visible(timeout=1000)
+    except AssertionError:
+        raise AssertionError("Test case failed: Updates to store business details, payment settings, and multi-location configurations did not persist correctly after saving and reloading the settings page.")
+
+
+if __name__ == "__main__":
+    run_standalone(run_test, role=ROLE)
@@ -0,0 +1,30 @@
+"""Shared Playwright harness for the TestSprite TC scripts."""
+
+from .auth import ROLES, AuthCache, credentials_for
+from .browser import BrowserPool, TestResult, run_standalone
+from .config import HarnessConfig, get_config
+from .profiler import SupabaseProfiler
+from .suite import TestCase, discover
+from .vitals import PageVitals, VitalsCollector
+from .waits import StepTiming, Steps, SupabaseIdle, open_app, wait_for_app_ready
+
+__all__ = [
+    "ROLES",
+    "AuthCache",
+    "BrowserPool",
+    "HarnessConfig",
+    "PageVitals",
+    "StepTiming",
+    "Steps",
+    "SupabaseIdle",
+    "SupabaseProfiler",
+    "TestCase",
+    "TestResult",
+    "VitalsCollector",
+    "credentials_for",
+    "discover",
+    "get_config",
+    "open_app",
+    "run_standalone",
+    "wait_for_app_ready",
+]
@@ -0,0 +1,11 @@
+"""``python -m harness`` is an alias for ``python -m harness.runner``.
+
+    python -m harness -n 1 TC001 TC008  # a subset on one worker
+"""
+
+import sys
+
+from .runner import main
+
+if __name__ == "__main__":
+    sys.exit(main())
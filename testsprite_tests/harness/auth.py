@@ -0,0 +1,151 @@
+"""Per-role storage-state cache so TC scripts start already signed in.
+
+Each role logs in once through the real login form (``pages/Login.tsx`` for
+staff roles, ``pages/client/AuthPage.tsx`` for clients). The Playwright
+storage state is then saved to ``<auth_dir>/<role>.json`` (``tmp/auth`` unless
+``PAYPER_AUTH_DIR`` says otherwise). That file holds the supabase-js session
+in localStorage (the ``sb-<ref>-auth-token`` key). Later contexts are created
+from the file and skip the login form. A role logs in again only when its
+access token is within ``refresh_margin_s`` of expiry.
+
+Only the owner has credentials in ``tmp/config.json``. The other roles read
+``PAYPER_<ROLE>_EMAIL`` / ``PAYPER_<ROLE>_PASSWORD`` from the environment
+(TC008 runs as ``cashier``, TC015 as ``staff``, the client flows as
+``client``). Without them the staff roles sign in as the owner, as the
+scripts did before they had roles, and warn once per role; the role's own
+restrictions are then not exercised.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import time
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .config import HarnessConfig, get_config
+from .waits import open_app
+
+if TYPE_CHECKING:
+    from .browser import BrowserPool
+
+ROLES = ("owner", "cashier", "staff", "client")
+OWNER_FALLBACK_ROLES = ("cashier", "staff")
+_warned_fallback: set[str] = set()
+
+SESSION_KEY_JS = """() => Object.keys(localStorage).some(
+    (k) => k.startsWith('sb-') && k.endsWith('-auth-token')
+)"""
+
+
+@dataclass(frozen=True)
+class RoleCredentials:
+    role: str
+    email: str
+    password: str
+    login_path: str
+
+
+def credentials_for(role: str, config: Optional[HarnessConfig] = None) -> RoleCredentials:
+    if role not in ROLES:
+        raise ValueError(f"Unknown role {role!r}; expected one of {', '.join(ROLES)}")
+    config = config or get_config()
+    prefix = f"PAYPER_{role.upper()}"
+    email = os.environ.get(f"{prefix}_EMAIL", config.login_user if role == "owner" else "")
+    password = os.environ.get(f"{prefix}_PASSWORD", config.login_password if role == "owner" else "")
+    if (not email or not password) and role in OWNER_FALLBACK_ROLES:
+        owner = credentials_for("owner", config)
+        if role not in _warned_fallback:
+            _warned_fallback.add(role)
+            warnings.warn(f"{prefix}_EMAIL/{prefix}_PASSWORD are not set; signing in as the owner for role "
+                          f"{role!r} (its restrictions are not tested)", stacklevel=2)
+        return RoleCredentials(role, owner.email, owner.password, owner.login_path)
+    if not email or not password:
+        raise RuntimeError(f"No credentials for role {role!r}: set {prefix}_EMAIL and {prefix}_PASSWORD")
+
+    login_path = "/"
+    if role == "client":
+        slug = os.environ.get("PAYPER_CLIENT_STORE_SLUG")
+        if not slug:
+            raise RuntimeError("Client login needs PAYPER_CLIENT_STORE_SLUG (the store whose menu the client uses)")
+        login_path = f"/#/m/{slug}/auth"
+    return RoleCredentials(role, email, password, login_path)
+
+
+def _jwt_exp(token: str) -> Optional[float]:
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def session_expiry(state: dict) -> Optional[float]:
+    """Epoch seconds at which the saved Supabase access token expires."""
+    for origin in state.get("origins", []):
+        for item in origin.get("localStorage", []):
+            name = item.get("name", "")
+            if not (name.startswith("sb-") and name.endswith("-auth-token")):
+                continue
+            try:
+                session = json.loads(item["value"])
+            except (KeyError, ValueError):
+                continue
+            if session.get("expires_at"):
+                return float(session["expires_at"])
+            if session.get("access_token"):
+                return _jwt_exp(session["access_token"])
+    return None
+
+
+class AuthCache:
+    """Logs each role in once and hands out the saved storage-state path."""
+
+    def __init__(self, pool: "BrowserPool", directory: Optional[Path] = None, refresh_margin_s: int = 300):
+        self.pool = pool
+        self.directory = directory or pool.config.auth_dir
+        self.refresh_margin_s = refresh_margin_s
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def path(self, role: str) -> Path:
+        return self.directory / f"{role}.json"
+
+    def is_fresh(self, role: str) -> bool:
+        path = self.path(role)
+        if not path.exists():
+            return False
+        try:
+            expiry = session_expiry(json.loads(path.read_text(encoding="utf-8")))
+        except ValueError:
+            return False
+        return expiry is not None and expiry - time.time() > self.refresh_margin_s
+
+    async def storage_state(self, role: str) -> str:
+        lock = self._locks.setdefault(role, asyncio.Lock())
+        async with lock:
+            if not self.is_fresh(role):
+                await self._login(credentials_for(role, self.pool.config))
+        return str(self.path(role))
+
+    async def _login(self, creds: RoleCredentials) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        async with self.pool.new_context() as context:
+            page = await context.new_page()
+            await open_app(page, creds.login_path)
+            form = page.locator("form").filter(has=page.locator("input[type=email]")).first
+            await form.locator("input[type=email]").fill(creds.email)
+            await form.locator("input[type=password]").fill(creds.password)
+            await form.locator("button[type=submit]").click()
+            await page.wait_for_function(SESSION_KEY_JS, timeout=self.pool.config.navigation_timeout_ms)
+
+            # Write next to the target and rename, so a parallel worker never
+            # reads a half-written file.
+            tmp_path = self.path(creds.role).with_suffix(f".{os.getpid()}.tmp")
+            await context.storage_state(path=str(tmp_path))
+            os.replace(tmp_path, self.path(creds.role))
@@ -0,0 +1,139 @@
+"""Shared browser lifecycle for the TC scripts.
+
+Each worker process starts Playwright and Chromium once and keeps them in a
+``BrowserPool``. A test gets a fresh ``BrowserContext`` (its own cookies,
+localStorage and cache), so tests stay isolated from each other. Only the
+context is created and closed per test, not the browser.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import traceback
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from playwright import async_api
+from playwright.async_api import Browser, BrowserContext, Playwright
+
+from .auth import AuthCache
+from .config import HarnessConfig, get_config
+from .profiler import SupabaseProfiler
+from .vitals import PageVitals, VitalsCollector
+from .waits import StepTiming, current_steps
+
+TestFn = Callable[[BrowserContext], Awaitable[None]]
+
+
+@dataclass
+class TestResult:
+    name: str
+    status: str  # "passed" | "failed" | "error"
+    duration_s: float
+    error: Optional[str] = None
+    steps: list[StepTiming] = field(default_factory=list)
+    vitals: list[PageVitals] = field(default_factory=list)
+    supabase: dict = field(default_factory=dict)  # route -> SupabaseProfiler.report()
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "passed"
+
+
+class BrowserPool:
+    """Owns the single Playwright/Chromium instance of a worker."""
+
+    def __init__(self, config: Optional[HarnessConfig] = None):
+        self.config = config or get_config()
+        self._pw: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self.auth = AuthCache(self)
+
+    @property
+    def browser(self) -> Browser:
+        if self._browser is None:
+            raise RuntimeError("BrowserPool.start() has not been called")
+        return self._browser
+
+    async def start(self) -> "BrowserPool":
+        if self._browser is None:
+            self._pw = await async_api.async_playwright().start()
+            self._browser = await self._pw.chromium.launch(
+                headless=self.config.headless,
+                args=list(self.config.browser_args),
+            )
+        return self
+
+    async def stop(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @asynccontextmanager
+    async def new_context(self, **options) -> AsyncIterator[BrowserContext]:
+        """Yield an isolated context that is always closed afterwards."""
+        options.setdefault("viewport", {"width": 1280, "height": 720})
+        context = await self.browser.new_context(**options)
+        context.set_default_timeout(self.config.default_timeout_ms)
+        context.set_default_navigation_timeout(self.config.navigation_timeout_ms)
+        try:
+            yield context
+        finally:
+            await context.close()
+
+    async def run(self, name: str, test_fn: TestFn, role: Optional[str] = None, **context_options) -> TestResult:
+        """Run one test function in its own context and record the outcome.
+
+        With ``role`` the context starts from that role's cached session.
+        """
+        steps: list[StepTiming] = []
+        vitals = VitalsCollector()
+        profiler = SupabaseProfiler()
+        supabase: dict = {}
+        token = current_steps.set(steps)
+        started = time.perf_counter()
+
+        def result(status: str, error: Optional[str] = None) -> TestResult:
+            return TestResult(name, status, time.perf_counter() - started, error, steps, vitals.pages, supabase)
+
+        try:
+            if role:
+                context_options.setdefault("storage_state", await self.auth.storage_state(role))
+            async with self.new_context(**context_options) as context:
+                await vitals.attach(context)
+                profiler.attach(context)
+                try:
+                    await test_fn(context)
+                finally:
+                    await vitals.collect(context)
+                    supabase.update(await profiler.report())
+        except AssertionError as exc:
+            return result("failed", str(exc))
+        except Exception:
+            return result("error", traceback.format_exc())
+        finally:
+            current_steps.reset(token)
+        return result("passed")
+
+
+def run_standalone(test_fn: TestFn, role: Optional[str] = None, name: Optional[str] = None) -> None:
+    """Entry point used by ``python TCxxx_*.py``; raises like the old scripts."""
+
+    async def _main() -> TestResult:
+        async with BrowserPool() as pool:
+            return await pool.run(name or test_fn.__module__, test_fn, role=role)
+
+    result = asyncio.run(_main())
+    if not result.passed:
+        raise AssertionError(result.error) if result.status == "failed" else RuntimeError(result.error)
@@ -0,0 +1,76 @@
+"""Harness configuration.
+
+Values come from ``tmp/config.json`` (written by TestSprite) and can be
+overridden through ``PAYPER_*`` environment variables so CI does not need to
+edit the generated file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent.parent
+TMP_DIR = TESTS_DIR / "tmp"
+CONFIG_PATH = TMP_DIR / "config.json"
+
+# Same launch flags the generated scripts used, minus --single-process: a
+# shared browser has to survive many contexts being opened and closed.
+DEFAULT_BROWSER_ARGS = (
+    "--window-size=1280,720",
+    "--disable-dev-shm-usage",
+    "--ipc=host",
+)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "")
+
+
+@dataclass(frozen=True)
+class HarnessConfig:
+    base_url: str = "http://localhost:3005"
+    login_user: str = ""
+    login_password: str = ""
+    headless: bool = True
+    default_timeout_ms: int = 5000
+    navigation_timeout_ms: int = 10000
+    browser_args: tuple[str, ...] = field(default=DEFAULT_BROWSER_ARGS)
+    # Set per worker by the runner so parallel shards never share a tenant
+    # or a cached session.
+    store_id: str = ""
+    auth_dir: Path = TMP_DIR / "auth"
+
+    @classmethod
+    def load(cls, path: Path = CONFIG_PATH) -> "HarnessConfig":
+        raw: dict = {}
+        if path.exists():
+            raw = json.loads(path.read_text(encoding="utf-8"))
+
+        return cls(
+            base_url=os.environ.get("PAYPER_BASE_URL", raw.get("localEndpoint", cls.base_url)).rstrip("/"),
+            login_user=os.environ.get("PAYPER_LOGIN_USER", raw.get("loginUser", "")),
+            login_password=os.environ.get("PAYPER_LOGIN_PASSWORD", raw.get("loginPassword", "")),
+            headless=_env_flag("PAYPER_HEADLESS", True),
+            default_timeout_ms=int(os.environ.get("PAYPER_DEFAULT_TIMEOUT_MS", cls.default_timeout_ms)),
+            navigation_timeout_ms=int(os.environ.get("PAYPER_NAVIGATION_TIMEOUT_MS", cls.navigation_timeout_ms)),
+            store_id=os.environ.get("PAYPER_STORE_ID", ""),
+            auth_dir=Path(os.environ.get("PAYPER_AUTH_DIR", TMP_DIR / "auth")),
+        )
+
+    def url(self, path: str = "/") -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+
+@lru_cache(maxsize=1)
+def get_config() -> HarnessConfig:
+    """Process-wide config, loaded once."""
+    return HarnessConfig.load()
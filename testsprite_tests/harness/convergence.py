@@ -0,0 +1,338 @@
+"""Multi-browser Kanban convergence check (TC008/TC016 at scale).
+
+    python -m harness.convergence --staff 6 --clients 12 --orders 3 --rate 2
+    python -m harness.convergence --tenant 1 --client-view tracking --lag-ms 2000
+
+One Chromium, many contexts: ``--staff`` signed-in staff contexts on the
+Kanban board (``/#/orders``, ``pages/OrderBoard.tsx``) and ``--clients``
+client contexts, each following one order on ``OrderStatusPage``
+(``/#/m/<slug>/order/<id>``) or ``TrackingPage`` (``/#/m/<slug>/tracking/<id>``).
+
+A writer inserts ``--orders`` paid cash orders and walks each one through
+``preparing -> ready -> served`` with the service key, one status change
+every ``1/--rate`` seconds. Before each write, every context that should
+see the change gets a DOM probe. A ``MutationObserver`` installed by an
+init script stamps the moment each probe first holds:
+
+* staff: the ``#<order_number>`` card sits in the column for the new
+  status (PENDIENTES, PROCESO, LISTO), or has left the active board once
+  the order is ``served``;
+* OrderStatusPage: the ticket headline for the status (``CREANDO``,
+  ``PREPARANDO``, ``ESPERÁNDOTE``, ``DISFRUTA``);
+* TrackingPage: the status pill text. That page has no label for
+  ``served``, so that change is not probed there.
+
+Latency is DOM time minus write time, both wall clock on this machine.
+The report (``tmp/perf/convergence.json``) holds a latency histogram and
+the contexts that missed a change or whose p95 exceeded ``--lag-ms``.
+Guest clients have no realtime access to ``orders``; they converge through
+the pages' polling fallback (4 s and 15 s), so expect their tail to be long.
+
+Store and logins come from the ``PAYPER_*`` environment, or from tenant
+``--tenant`` of ``tmp/tenants.json`` like a runner worker. The writer needs
+``SUPABASE_URL``/``SUPABASE_ANON_KEY``/``SUPABASE_SERVICE_ROLE_KEY``
+(``python -m perf.stack up`` prints them).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Optional
+
+from playwright.async_api import Page
+
+from perf.client import SupabaseClient
+from perf.stats import LatencyStats, write_report
+
+from .browser import BrowserPool
+from .runner import use_tenant
+from .waits import open_app
+
+STATUS_FLOW = ("preparing", "ready", "served")
+ACTIVE_COLUMNS = {"pending": "PENDIENTES", "preparing": "PROCESO", "ready": "LISTO"}
+TICKET_HEADLINES = {"pending": "CREANDO", "preparing": "PREPARANDO", "ready": "ESPERÁNDOTE", "served": "DISFRUTA"}
+TRACKING_LABELS = {"preparing": "En Preparación", "ready": "¡Listo para Retirar!"}
+HISTOGRAM_BOUNDS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# Column lookup follows OrderBoard's Column markup: <h3>{title}</h3> sits
+# three levels below the column's root div.
+WATCHER_JS = """(() => {
+    if (window.__convergence) return;
+    const pending = new Map();
+    const seen = {};
+    const columnOf = (title) => {
+        const h3 = [...document.querySelectorAll('h3')].find((e) => e.textContent.trim() === title);
+        return h3 ? h3.parentElement?.parentElement?.parentElement : null;
+    };
+    const hasCard = (column, card) => !!column
+        && [...column.querySelectorAll('span')].some((s) => s.textContent.trim() === card);
+    const holds = (probe) => {
+        if (probe.kind === 'column') return hasCard(columnOf(probe.column), probe.card);
+        if (probe.kind === 'absent') {
+            const columns = probe.columns.map(columnOf);
+            return columns.some(Boolean) && !columns.some((c) => hasCard(c, probe.card));
+        }
+        return [...document.querySelectorAll(probe.selector)].some((e) => e.textContent.includes(probe.text));
+    };
+    const check = () => {
+        if (!pending.size) return;
+        const now = performance.timeOrigin + performance.now();
+        for (const [key, probe] of pending) {
+            if (holds(probe)) { seen[key] = now; pending.delete(key); }
+        }
+    };
+    new MutationObserver(check).observe(document, { subtree: true, childList: true, characterData: true });
+    window.__convergence = {
+        expect(key, probe) { pending.set(key, probe); check(); },
+        drop(key) { pending.delete(key); },
+        seen: () => seen,
+        pending: () => pending.size,
+    };
+})()"""
+
+
+@dataclass
+class Watcher:
+    name: str
+    kind: str  # "staff" | "client"
+    view: str  # "board" | "order" | "tracking"
+    page: Page
+    order_id: Optional[str] = None
+    expected: list[str] = field(default_factory=list)
+
+    def probe(self, status: str, card: str) -> Optional[dict]:
+        if self.view == "board":
+            if status in ACTIVE_COLUMNS:
+                return {"kind": "column", "column": ACTIVE_COLUMNS[status], "card": card}
+            return {"kind": "absent", "columns": list(ACTIVE_COLUMNS.values()), "card": card}
+        if self.view == "order":
+            return {"kind": "text", "selector": "h1", "text": TICKET_HEADLINES[status]}
+        if status in TRACKING_LABELS:
+            return {"kind": "text", "selector": "#root", "text": TRACKING_LABELS[status]}
+        return None
+
+    async def expect(self, key: str, status: str, card: str) -> None:
+        probe = self.probe(status, card)
+        if probe is not None:
+            self.expected.append(key)
+            await self.page.evaluate("([key, probe]) => window.__convergence.expect(key, probe)", [key, probe])
+
+
+@dataclass
+class Order:
+    id: str
+    card: str
+    watchers: list[Watcher] = field(default_factory=list)
+
+
+def _card(row: dict) -> str:
+    """``#`` plus OrderBoard's ``getDisplayId``."""
+    number = row.get("order_number")
+    return f"#{number}" if number and int(number) > 0 else f"#{row['id'][:4]}"
+
+
+class Convergence:
+    def __init__(self, pool: BrowserPool, client: SupabaseClient, staff: int, clients: int, orders: int,
+                 rate: float, timeout_s: float, lag_ms: float, staff_role: str = "staff",
+                 client_role: Optional[str] = None, client_view: str = "both"):
+        self.pool = pool
+        self.client = client
+        self.staff = staff
+        self.clients = clients
+        self.orders = orders
+        self.rate = rate
+        self.timeout_s = timeout_s
+        self.lag_ms = lag_ms
+        self.staff_role = staff_role
+        self.client_role = client_role
+        self.views = ("order", "tracking") if client_view == "both" else (client_view,)
+        self.watchers: list[Watcher] = []
+        self.sent: dict[str, float] = {}
+        self.write_errors = 0
+
+    async def _open(self, stack: AsyncExitStack, name: str, kind: str, view: str, path: str,
+                    role: Optional[str], order_id: Optional[str] = None) -> Watcher:
+        options = {"storage_state": await self.pool.auth.storage_state(role)} if role else {}
+        context = await stack.enter_async_context(self.pool.new_context(**options))
+        await context.add_init_script(WATCHER_JS)
+        page = await context.new_page()
+        await open_app(page, path)
+        watcher = Watcher(name, kind, view, page, order_id)
+        self.watchers.append(watcher)
+        return watcher
+
+    async def _publish(self, order: Order, status: str) -> None:
+        key = f"{order.id}:{status}"
+        values = {"status": status}
+        if status == "served":
+            values["delivery_status"] = "delivered"
+        await asyncio.gather(*(w.expect(key, status, order.card) for w in order.watchers))
+        self.sent[key] = time.time() * 1000
+        try:
+            await self.client.update("orders", {"id": f"eq.{order.id}"}, values, self.client.service_token)
+        except Exception:
+            self.write_errors += 1
+            del self.sent[key]
+            for w in order.watchers:
+                if key in w.expected:
+                    w.expected.remove(key)
+                    await w.page.evaluate("(key) => window.__convergence.drop(key)", key)
+
+    async def _create(self, store_id: str, board: list[Watcher]) -> Order:
+        order_id = str(uuid.uuid4())
+        # The card label needs order_number, which the insert assigns; the
+        # board probe is registered against the returned row right away.
+        rows = await self.client.insert("orders", {
+            "id": order_id, "store_id": store_id, "status": "pending", "channel": "qr",
+            "payment_method": "cash", "payment_status": "paid", "is_paid": True, "subtotal": 1000,
+            "tax_amount": 0, "discount_amount": 0, "total_amount": 1000, "delivery_status": "pending",
+        }, self.client.service_token)
+        written = time.time() * 1000
+        order = Order(order_id, _card(rows[0]))
+        key = f"{order_id}:pending"
+        await asyncio.gather(*(w.expect(key, "pending", order.card) for w in board))
+        self.sent[key] = written
+        return order
+
+    async def _wait(self) -> None:
+        deadline = time.perf_counter() + self.timeout_s
+        while time.perf_counter() < deadline:
+            left = await asyncio.gather(*(w.page.evaluate("() => window.__convergence.pending()")
+                                          for w in self.watchers))
+            if not any(left):
+                return
+            await asyncio.sleep(0.25)
+
+    async def run(self) -> dict:
+        config = self.pool.config
+        slug = os.environ.get("PAYPER_CLIENT_STORE_SLUG")
+        if not config.store_id or not slug:
+            raise RuntimeError("Set PAYPER_STORE_ID and PAYPER_CLIENT_STORE_SLUG, or pass --tenant")
+
+        async with AsyncExitStack() as stack:
+            board = await asyncio.gather(*(
+                self._open(stack, f"staff-{i}", "staff", "board", "/#/orders", self.staff_role)
+                for i in range(self.staff)
+            ))
+            orders = [await self._create(config.store_id, board) for _ in range(self.orders)]
+            client_watchers = await asyncio.gather(*(
+                self._open(stack, f"client-{i}", "client", self.views[i % len(self.views)],
+                           f"/#/m/{slug}/{self.views[i % len(self.views)]}/{orders[i % len(orders)].id}",
+                           self.client_role, orders[i % len(orders)].id)
+                for i in range(self.clients)
+            ))
+            for order in orders:
+                order.watchers = [*board, *(w for w in client_watchers if w.order_id == order.id)]
+
+            # Interleave orders so consecutive writes hit different cards.
+            for status in STATUS_FLOW:
+                for order in orders:
+                    await self._publish(order, status)
+                    await asyncio.sleep(1 / self.rate)
+            await self._wait()
+            seen = await asyncio.gather(*(w.page.evaluate("() => window.__convergence.seen()")
+                                          for w in self.watchers))
+        return self.report(dict(zip((w.name for w in self.watchers), seen)))
+
+    def report(self, seen: dict[str, dict]) -> dict:
+        overall = LatencyStats("convergence")
+        contexts = []
+        for watcher in self.watchers:
+            stats = LatencyStats(watcher.name)
+            missed = []
+            for key in watcher.expected:
+                at = seen[watcher.name].get(key)
+                if at is None:
+                    missed.append(key)
+                    stats.error("missed")
+                    overall.error("missed")
+                    continue
+                latency = max(0.0, at - self.sent[key])
+                stats.add(latency)
+                overall.add(latency)
+            row = stats.to_dict()
+            contexts.append({
+                "name": watcher.name, "kind": watcher.kind, "view": watcher.view, "order_id": watcher.order_id,
+                "expected": len(watcher.expected), "missed": missed, "p95_ms": row["p95_ms"],
+                "max_ms": row["max_ms"],
+                "lagging": row["p95_ms"] is not None and row["p95_ms"] > self.lag_ms,
+            })
+
+        samples = sorted(overall.samples_ms)
+        histogram, lower = [], 0
+        for bound in (*HISTOGRAM_BOUNDS_MS, None):
+            count = sum(1 for s in samples if s >= lower and (bound is None or s < bound))
+            histogram.append({"le_ms": bound, "count": count})
+            lower = bound or lower
+        return {
+            "config": {
+                "store_id": self.pool.config.store_id, "staff": self.staff, "clients": self.clients,
+                "orders": self.orders, "rate": self.rate, "timeout_s": self.timeout_s, "lag_ms": self.lag_ms,
+                "staff_role": self.staff_role, "client_role": self.client_role, "views": list(self.views),
+            },
+            "latency": overall.to_dict(),
+            "histogram": histogram,
+            "write_errors": self.write_errors,
+            "lagging": [c["name"] for c in contexts if c["lagging"]],
+            "missed": [c["name"] for c in contexts if c["missed"]],
+            "contexts": contexts,
+        }
+
+
+def format_histogram(report: dict, width: int = 40) -> str:
+    rows = report["histogram"]
+    peak = max((r["count"] for r in rows), default=0) or 1
+    lines = []
+    for row in rows:
+        label = f"< {row['le_ms']} ms" if row["le_ms"] is not None else "slower"
+        lines.append(f"{label:>11} {row['count']:6d} {'#' * round(row['count'] / peak * width)}")
+    return "\n".join(lines)
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    async with BrowserPool() as pool, SupabaseClient.from_env() as client:
+        bench = Convergence(pool, client, args.staff, args.clients, args.orders, args.rate, args.timeout,
+                            args.lag_ms, args.staff_role, args.client_role, args.client_view)
+        return await bench.run()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m harness.convergence", description=__doc__.splitlines()[0])
+    parser.add_argument("--staff", type=int, default=4, help="staff contexts on the Kanban board")
+    parser.add_argument("--clients", type=int, default=8, help="client contexts following an order")
+    parser.add_argument("--orders", type=int, default=2, help="orders walked through the board")
+    parser.add_argument("--rate", type=float, default=1.0, help="status changes per second")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for stragglers")
+    parser.add_argument("--lag-ms", type=float, default=1500.0, help="p95 above which a context is lagging")
+    parser.add_argument("--staff-role", default="staff", help="role of the board contexts")
+    parser.add_argument("--client-role", default=None, help="sign clients in with this role (default: guest)")
+    parser.add_argument("--client-view", choices=("both", "order", "tracking"), default="both")
+    parser.add_argument("--tenant", type=int, default=None, help="use tenant N of tmp/tenants.json")
+    args = parser.parse_args(argv)
+
+    if args.tenant is not None:
+        use_tenant(args.tenant)
+
+    report = asyncio.run(_main(args))
+    path = write_report("convergence", report)
+    latency = report["latency"]
+    print(f"{latency['count']} changes seen, {latency['errors']} missed, "
+          f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, max {latency['max_ms']} ms")
+    print(format_histogram(report))
+    for name in report["lagging"]:
+        print(f"lagging: {name}")
+    for name in report["missed"]:
+        print(f"missed:  {name}")
+    print(f"report: {path}")
+    return 0 if not report["lagging"] and not report["missed"] and not report["write_errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
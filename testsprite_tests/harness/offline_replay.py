@@ -0,0 +1,332 @@
+"""Offline sync-queue replay benchmark for ``OfflineContext`` (TC013 at scale).
+
+    python -m harness.offline_replay --tenant 0 -k 10 100 1000 5000
+    python -m harness.offline_replay -k 500 --conflict-share 0.05
+
+For each K, a fresh signed-in context opens the app and is taken offline
+with ``context.set_offline(True)``. K ``CREATE_ORDER`` events are then
+queued into IndexedDB (``CoffeeSquadDB``: ``orders`` plus ``sync_queue``),
+written the same way ``createOrder``'s offline branch writes them through
+``dbOps``. Typing 5,000 orders into the POS is not practical. Going back
+online fires the app's ``online`` handler, and ``triggerSync`` replays the
+queue through ``sync_offline_order``.
+
+Per K the report records:
+
+* ``drain_s``: reconnect until ``sync_queue`` is empty. The run stops early
+  when the queue has not shrunk for ``--stall`` seconds, because the app
+  backs off up to 60 s between passes, or stops for good on a hard error;
+* every Supabase request made during the replay, by RPC or table;
+  ``sync_offline_order`` calls per event shows the retry overhead;
+* ``failed_sync_events``: events moved to the failed store, plus events
+  still queued with a ``retryCount``;
+* jank while syncing: long tasks (count, total, longest) and
+  ``requestAnimationFrame`` gaps over 50 ms.
+
+``--conflict-share`` orders ask for far more of an inventory item than is
+in stock. That exercises the ``INSUFFICIENT_STOCK`` path, which moves the
+event to ``failed_sync_events`` on the next pass. Orders created by the
+replay stay in the tenant's store. Products are read with the service key
+(``SUPABASE_URL``/``SUPABASE_SERVICE_ROLE_KEY``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Request, Response
+
+from perf.client import SupabaseClient
+from perf.stats import write_report
+
+from .browser import BrowserPool
+from .runner import use_tenant
+from .waits import SUPABASE_PATHS, open_app, wait_for_app_ready
+
+INJECT_BATCH = 500
+SYNC_RPC = "sync_offline_order"
+
+DB_READY_JS = """async () => (await indexedDB.databases())
+    .some((d) => d.name === 'CoffeeSquadDB' && d.version >= 4)"""
+
+# Opened without a version so an uninitialised database is never upgraded
+# behind the app's back; DB_READY_JS has already checked it exists.
+IDB_JS = """
+window.__payperIdb = (stores, mode, fn) => new Promise((resolve, reject) => {
+    const open = indexedDB.open('CoffeeSquadDB');
+    open.onerror = () => reject(open.error);
+    open.onsuccess = () => {
+        const db = open.result;
+        const tx = db.transaction(stores, mode);
+        const result = fn(tx);
+        tx.oncomplete = () => { db.close(); resolve(result.value); };
+        tx.onerror = () => { db.close(); reject(tx.error); };
+    };
+});
+"""
+
+JANK_JS = """(() => {
+    if (window.__payperJank) return;
+    let last = performance.now();
+    const fresh = () => ({ longTasks: 0, longTaskMs: 0, maxTaskMs: 0, frames: 0, slowFrames: 0, maxFrameGapMs: 0 });
+    const jank = window.__payperJank = { stats: fresh(), reset() { jank.stats = fresh(); last = performance.now(); } };
+    try {
+        new PerformanceObserver((list) => list.getEntries().forEach((e) => {
+            const s = jank.stats;
+            s.longTasks += 1; s.longTaskMs += e.duration; s.maxTaskMs = Math.max(s.maxTaskMs, e.duration);
+        })).observe({ type: 'longtask' });
+    } catch (e) { /* longtask not supported */ }
+    const frame = (t) => {
+        const s = jank.stats, gap = t - last;
+        last = t; s.frames += 1;
+        if (gap > 50) s.slowFrames += 1;
+        s.maxFrameGapMs = Math.max(s.maxFrameGapMs, gap);
+        requestAnimationFrame(frame);
+    };
+    requestAnimationFrame(frame);
+})()"""
+
+INJECT_JS = """(batch) => window.__payperIdb(['orders', 'sync_queue'], 'readwrite', (tx) => {
+    for (const { order, event } of batch) {
+        tx.objectStore('orders').put(order);
+        tx.objectStore('sync_queue').put(event);
+    }
+    return {};
+})"""
+
+COUNT_JS = """() => window.__payperIdb(['sync_queue', 'failed_sync_events'], 'readonly', (tx) => {
+    const out = {};
+    const q = tx.objectStore('sync_queue').count();
+    const f = tx.objectStore('failed_sync_events').count();
+    q.onsuccess = () => { out.value = Object.assign(out.value || {}, { queued: q.result }); };
+    f.onsuccess = () => { out.value = Object.assign(out.value || {}, { failed: f.result }); };
+    return out;
+})"""
+
+RETRIED_JS = """() => window.__payperIdb(['sync_queue'], 'readonly', (tx) => {
+    const out = { value: {} };
+    const all = tx.objectStore('sync_queue').getAll();
+    all.onsuccess = () => {
+        for (const e of all.result) {
+            if (!e.retryCount) continue;
+            const reason = (e.lastError || 'unknown').split(':')[0].slice(0, 60);
+            out.value[reason] = (out.value[reason] || 0) + 1;
+        }
+    };
+    return out;
+})"""
+
+
+class RequestTally:
+    """Counts Supabase requests by RPC or table while ``active``."""
+
+    def __init__(self, context: BrowserContext):
+        self.active = False
+        self.by_path: Counter = Counter()
+        self.errors: Counter = Counter()
+        context.on("request", self._on_request)
+        context.on("response", self._on_response)
+        context.on("requestfailed", self._on_failed)
+
+    @staticmethod
+    def _name(url: str) -> Optional[str]:
+        path = urlparse(url).path
+        if not any(p in path for p in SUPABASE_PATHS):
+            return None
+        if "/rest/v1/rpc/" in path:
+            return "rpc/" + path.rsplit("/", 1)[-1]
+        return path.split("/v1/", 1)[-1].split("/", 1)[0] if "/rest/v1/" in path else path
+
+    def _on_request(self, request: Request) -> None:
+        name = self._name(request.url)
+        if self.active and name:
+            self.by_path[name] += 1
+
+    def _on_response(self, response: Response) -> None:
+        name = self._name(response.url)
+        if self.active and name and response.status >= 400:
+            self.errors[f"{name} {response.status}"] += 1
+
+    def _on_failed(self, request: Request) -> None:
+        name = self._name(request.url)
+        if self.active and name:
+            self.errors[f"{name} failed"] += 1
+
+
+class OfflineReplay:
+    def __init__(self, pool: BrowserPool, products: list[dict], stock_items: list[str], role: str = "owner",
+                 path: str = "/#/orders", conflict_share: float = 0.0, stall_s: float = 90.0,
+                 timeout_s: float = 900.0, seed: int = 1):
+        self.pool = pool
+        self.products = products
+        self.stock_items = stock_items
+        self.role = role
+        self.path = path
+        self.conflict_share = conflict_share
+        self.stall_s = stall_s
+        self.timeout_s = timeout_s
+        self.rng = random.Random(seed)
+
+    def _queued_order(self, index: int, now_ms: int) -> dict:
+        """A ``DBOrder`` plus its ``SyncEvent``, shaped like ``createOrder`` offline."""
+        order_id = str(uuid.uuid4())
+        if self.stock_items and self.rng.random() < self.conflict_share:
+            items = [{"id": str(uuid.uuid4()), "productId": self.rng.choice(self.stock_items),
+                      "name": "conflict", "quantity": 1_000_000, "price_unit": 1, "inventory_items_to_deduct": []}]
+        else:
+            items = []
+            for product in self.rng.sample(self.products, k=min(len(self.products), self.rng.choice([1, 1, 2, 3]))):
+                items.append({"id": str(uuid.uuid4()), "productId": product["id"], "name": product["name"],
+                              "quantity": self.rng.choice([1, 1, 2]), "price_unit": float(product["base_price"]),
+                              "inventory_items_to_deduct": []})
+        amount = sum(i["quantity"] * i["price_unit"] for i in items)
+        created = datetime.fromtimestamp(now_ms / 1000, timezone.utc)
+        order = {
+            "id": order_id, "store_id": self.pool.config.store_id, "customer": f"Offline {index}",
+            "items": items, "status": "pending", "type": "takeaway", "paid": True, "is_paid": True,
+            "payment_status": "paid", "paymentMethod": "cash", "amount": amount,
+            "created_at": created.isoformat(), "time": created.strftime("%H:%M"),
+            "syncStatus": "pending", "lastModified": now_ms,
+        }
+        event = {"id": f"evt-{now_ms}-{index}", "type": "CREATE_ORDER", "payload": order, "timestamp": now_ms}
+        return {"order": order, "event": event}
+
+    async def _counts(self, page: Page) -> dict:
+        return await page.evaluate(COUNT_JS)
+
+    async def _drain(self, page: Page, k: int) -> tuple[Optional[float], dict]:
+        started = time.perf_counter()
+        last_change, last_queued = started, k
+        while True:
+            counts = await self._counts(page)
+            now = time.perf_counter()
+            if counts["queued"] == 0:
+                return now - started, counts
+            if counts["queued"] != last_queued:
+                last_change, last_queued = now, counts["queued"]
+            if now - last_change > self.stall_s or now - started > self.timeout_s:
+                return None, counts
+            await asyncio.sleep(0.25)
+
+    async def run_one(self, k: int) -> dict:
+        storage_state = await self.pool.auth.storage_state(self.role)
+        async with self.pool.new_context(storage_state=storage_state) as context:
+            await context.add_init_script(IDB_JS)
+            await context.add_init_script(JANK_JS)
+            tally = RequestTally(context)
+            page = await context.new_page()
+            await open_app(page, self.path)
+            await wait_for_app_ready(page, self.pool.config.navigation_timeout_ms)
+            await page.wait_for_function(DB_READY_JS, timeout=self.pool.config.navigation_timeout_ms)
+
+            await context.set_offline(True)
+            enqueue_started = time.perf_counter()
+            now_ms = int(time.time() * 1000)
+            queued = [self._queued_order(i, now_ms + i) for i in range(k)]
+            for start in range(0, k, INJECT_BATCH):
+                await page.evaluate(INJECT_JS, queued[start:start + INJECT_BATCH])
+            enqueue_s = time.perf_counter() - enqueue_started
+            before = await self._counts(page)
+
+            await page.evaluate("() => window.__payperJank.reset()")
+            tally.active = True
+            await context.set_offline(False)
+            drain_s, after = await self._drain(page, before["queued"])
+            tally.active = False
+            jank = await page.evaluate("() => window.__payperJank.stats")
+            retried = await page.evaluate(RETRIED_JS)
+
+        sync_calls = tally.by_path[f"rpc/{SYNC_RPC}"]
+        return {
+            "k": k,
+            "enqueue_s": round(enqueue_s, 2),
+            "drained": drain_s is not None,
+            "drain_s": None if drain_s is None else round(drain_s, 2),
+            "events_per_s": round(k / drain_s, 1) if drain_s else None,
+            "remaining": after["queued"],
+            "failed_sync_events": after["failed"] - before["failed"],
+            "retried": retried,
+            "sync_rpc_calls": sync_calls,
+            "sync_rpc_per_event": round(sync_calls / k, 2) if k else 0.0,
+            "requests": sum(tally.by_path.values()),
+            "requests_by_path": dict(tally.by_path.most_common()),
+            "request_errors": dict(tally.errors),
+            "jank": {key: round(value, 1) for key, value in jank.items()},
+        }
+
+    async def run(self, ks: list[int]) -> list[dict]:
+        # One K at a time: several sync loops in one browser would share a
+        # renderer budget and blur the jank numbers.
+        return [await self.run_one(k) for k in ks]
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [f"{'K':>6} {'drain s':>8} {'ev/s':>7} {'left':>5} {'failed':>6} {'rpc/ev':>6} "
+             f"{'req':>6} {'longtask ms':>11} {'max gap':>8}"]
+    for r in rows:
+        drain = "stalled" if r["drain_s"] is None else f"{r['drain_s']:.1f}"
+        rate = "-" if r["events_per_s"] is None else f"{r['events_per_s']:.1f}"
+        lines.append(f"{r['k']:6d} {drain:>8} {rate:>7} {r['remaining']:5d} {r['failed_sync_events']:6d} "
+                     f"{r['sync_rpc_per_event']:6.2f} {r['requests']:6d} {r['jank']['longTaskMs']:11.0f} "
+                     f"{r['jank']['maxFrameGapMs']:8.0f}")
+    return "\n".join(lines)
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    async with BrowserPool() as pool:
+        store_id = pool.config.store_id
+        if not store_id:
+            raise RuntimeError("Set PAYPER_STORE_ID or pass --tenant")
+        async with SupabaseClient.from_env() as client:
+            token = client.service_token
+            products = await client.select("products", {
+                "store_id": f"eq.{store_id}", "active": "eq.true", "select": "id,name,base_price", "order": "id",
+            }, token)
+            stock_items = [row["id"] for row in await client.select("inventory_items", {
+                "store_id": f"eq.{store_id}", "select": "id", "order": "id", "limit": "50",
+            }, token)]
+        if not products:
+            raise RuntimeError(f"store {store_id} has no active products; run python -m perf.datagen")
+        replay = OfflineReplay(pool, products, stock_items, args.role, args.path, args.conflict_share,
+                               args.stall, args.timeout, args.seed)
+        rows = await replay.run(args.k)
+    return {
+        "config": {"store_id": store_id, "role": args.role, "path": args.path,
+                   "conflict_share": args.conflict_share, "stall_s": args.stall},
+        "runs": rows,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m harness.offline_replay", description=__doc__.splitlines()[0])
+    parser.add_argument("-k", type=int, nargs="+", default=[10, 100, 1000, 5000], help="queued orders per run")
+    parser.add_argument("--role", default="owner", help="signed-in role whose device replays the queue")
+    parser.add_argument("--path", default="/#/orders", help="route left open while syncing")
+    parser.add_argument("--conflict-share", type=float, default=0.0, help="fraction of orders that overdraw stock")
+    parser.add_argument("--stall", type=float, default=90.0, help="give up after this long without progress")
+    parser.add_argument("--timeout", type=float, default=900.0, help="hard limit per K, seconds")
+    parser.add_argument("--tenant", type=int, default=None, help="use tenant N of tmp/tenants.json")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.tenant is not None:
+        use_tenant(args.tenant)
+
+    report = asyncio.run(_main(args))
+    path = write_report("offline_replay", report)
+    print(format_rows(report["runs"]))
+    print(f"report: {path}")
+    return 0 if all(r["drained"] for r in report["runs"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
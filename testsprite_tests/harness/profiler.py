@@ -0,0 +1,230 @@
+"""Supabase traffic profiler attached to each test context.
+
+Every Supabase call is grouped by the route of the page that made it. The
+group key is the kind and the target:
+
+* ``rest``      ``/rest/v1/<table>``       -> table name
+* ``rpc``       ``/rest/v1/rpc/<fn>``      -> function name
+* ``functions`` ``/functions/v1/<name>``   -> edge function name
+* ``auth`` / ``storage``                   -> first path segment
+* ``realtime``  websocket frames           -> channel topic
+
+Each group records call count, HTTP errors, request/response bytes and
+latency. Two patterns are flagged per route:
+
+* duplicate: the same method, URL and body sent more than once;
+* N+1: one table queried ``N1_THRESHOLD`` or more times, where only the
+  values of equality filters differ (``id=eq.1``, ``id=eq.2``, ...). A
+  loop fetching one row at a time looks like this.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qsl, urlparse
+
+from playwright import async_api
+from playwright.async_api import BrowserContext, Page, Request, WebSocket
+
+N1_THRESHOLD = 5
+
+
+@dataclass
+class CallStats:
+    kind: str
+    name: str
+    count: int = 0
+    errors: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        lat = sorted(self.latencies_ms)
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "count": self.count,
+            "errors": self.errors,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "total_ms": round(sum(lat), 1),
+            "p50_ms": round(lat[len(lat) // 2], 1) if lat else None,
+            "max_ms": round(lat[-1], 1) if lat else None,
+        }
+
+
+def classify(url: str) -> Optional[tuple[str, str]]:
+    """Return ``(kind, name)`` for a Supabase URL, ``None`` for anything else."""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if len(parts) < 3 or parts[1] != "v1":
+        return None
+    service, target = parts[0], parts[2]
+    if service == "rest":
+        if target == "rpc" and len(parts) > 3:
+            return "rpc", parts[3]
+        return "rest", target
+    if service in ("functions", "auth", "storage"):
+        return service, target
+    return None
+
+
+def _query_shape(url: str) -> tuple[str, tuple]:
+    """Split a PostgREST query into a value-free shape plus its eq. values."""
+    shape, values = [], []
+    for key, value in parse_qsl(urlparse(url).query, keep_blank_values=True):
+        if value.startswith("eq."):
+            shape.append((key, "eq.?"))
+            values.append(value)
+        else:
+            shape.append((key, value))
+    return json.dumps(sorted(shape)), tuple(values)
+
+
+def _route_of(request: Request) -> str:
+    try:
+        page_url = request.frame.page.url
+    except async_api.Error:
+        return "(worker)"
+    parsed = urlparse(page_url)
+    return parsed.fragment or parsed.path or "/"
+
+
+class SupabaseProfiler:
+    """Groups Supabase REST, RPC and realtime traffic per route."""
+
+    def __init__(self):
+        self._stats: dict[str, dict[tuple[str, str], CallStats]] = defaultdict(dict)
+        self._signatures: dict[str, Counter] = defaultdict(Counter)
+        self._shapes: dict[str, dict[tuple[str, str], set]] = defaultdict(lambda: defaultdict(set))
+        self._pending: set[asyncio.Task] = set()
+
+    def attach(self, context: BrowserContext) -> None:
+        context.on("requestfinished", lambda r: self._track(r, failed=False))
+        context.on("requestfailed", lambda r: self._track(r, failed=True))
+        context.on("page", self._on_page)
+        for page in context.pages:
+            self._on_page(page)
+
+    def _group(self, route: str, kind: str, name: str) -> CallStats:
+        key = (kind, name)
+        if key not in self._stats[route]:
+            self._stats[route][key] = CallStats(kind, name)
+        return self._stats[route][key]
+
+    def _track(self, request: Request, failed: bool) -> None:
+        target = classify(request.url)
+        if target is None:
+            return
+        task = asyncio.ensure_future(self._record(request, target, failed))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _record(self, request: Request, target: tuple[str, str], failed: bool) -> None:
+        route = _route_of(request)
+        kind, name = target
+        stats = self._group(route, kind, name)
+        stats.count += 1
+        body = request.post_data or ""
+        stats.request_bytes += len(body.encode("utf-8"))
+
+        timing = request.timing
+        if timing.get("responseEnd", -1) >= 0:
+            stats.latencies_ms.append(timing["responseEnd"])
+
+        if failed:
+            stats.errors += 1
+        else:
+            try:
+                response = await request.response()
+                if response is not None and response.status >= 400:
+                    stats.errors += 1
+                sizes = await request.sizes()
+                stats.response_bytes += sizes["responseBodySize"]
+            except async_api.Error:
+                pass
+
+        self._signatures[route][(request.method, request.url, body)] += 1
+        if kind == "rest" and request.method == "GET":
+            shape, values = _query_shape(request.url)
+            if values:
+                self._shapes[route][(name, shape)].add(values)
+
+    def _on_page(self, page: Page) -> None:
+        page.on("websocket", lambda ws: self._on_websocket(page, ws))
+
+    def _on_websocket(self, page: Page, ws: WebSocket) -> None:
+        if "/realtime/v1/" not in ws.url:
+            return
+
+        def on_frame(payload, outgoing: bool) -> None:
+            try:
+                message = json.loads(payload)
+            except (TypeError, ValueError):
+                return
+            topic = message.get("topic", "")
+            if topic in ("", "phoenix"):
+                return
+            parsed = urlparse(page.url)
+            stats = self._group(parsed.fragment or parsed.path or "/", "realtime", topic)
+            size = len(payload if isinstance(payload, bytes) else payload.encode("utf-8"))
+            if outgoing:
+                stats.request_bytes += size
+                if message.get("event") == "phx_join":
+                    stats.count += 1
+            else:
+                stats.response_bytes += size
+                if message.get("event") == "phx_reply" and message.get("payload", {}).get("status") == "error":
+                    stats.errors += 1
+
+        ws.on("framesent", lambda payload: on_frame(payload, True))
+        ws.on("framereceived", lambda payload: on_frame(payload, False))
+
+    async def report(self) -> dict:
+        """Per-route stats plus flagged duplicates and N+1 patterns."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        out = {}
+        for route, groups in self._stats.items():
+            duplicates = [
+                {"method": method, "url": url, "count": n}
+                for (method, url, _body), n in self._signatures[route].items()
+                if n > 1
+            ]
+            n_plus_one = [
+                {"table": table, "shape": json.loads(shape), "distinct_values": len(values)}
+                for (table, shape), values in self._shapes[route].items()
+                if len(values) >= N1_THRESHOLD
+            ]
+            out[route] = {
+                "calls": sorted((s.to_dict() for s in groups.values()), key=lambda d: d["count"], reverse=True),
+                "duplicates": sorted(duplicates, key=lambda d: d["count"], reverse=True),
+                "n_plus_one": n_plus_one,
+            }
+        return out
+
+
+def format_profile(results: list[dict], limit: int = 10) -> str:
+    """Chattiest routes of a run (runner result dicts) as a plain-text table."""
+    rows = []
+    for r in results:
+        for route, data in r.get("supabase", {}).items():
+            http = [c for c in data["calls"] if c["kind"] != "realtime"]
+            rows.append((
+                sum(c["count"] for c in http),
+                sum(c["errors"] for c in http),
+                sum(d["count"] - 1 for d in data["duplicates"]),
+                len(data["n_plus_one"]),
+                r["name"][:12],
+                route,
+            ))
+    rows.sort(reverse=True)
+    lines = [f"{'calls':>6} {'errors':>6} {'dupes':>6} {'n+1':>4}  {'test':<12} route"]
+    for calls, errors, dupes, n1, name, route in rows[:limit]:
+        lines.append(f"{calls:6d} {errors:6d} {dupes:6d} {n1:4d}  {name:<12} {route}")
+    return "\n".join(lines)
@@ -0,0 +1,261 @@
+"""Parallel, sharded runner for the TC suite.
+
+    python -m harness.runner -n 4              # every TC*.py on 4 workers
+    python -m harness.runner -n 2 TC008 TC016  # a subset
+
+Each worker is a separate process with its own ``BrowserPool``, so Chromium
+starts once per worker. Shards are balanced by the durations of the previous
+run (longest test first onto the least-loaded worker).
+
+Tenant isolation: ``tmp/tenants.json`` lists seeded stores and their
+per-role users. Worker ``i`` gets tenant ``i % len(tenants)``, its own
+``PAYPER_STORE_ID`` and its own session cache directory. If there are fewer
+tenants than workers, tests that create orders (``ORDER_WRITERS``) are pinned
+to worker 0, so they never run at the same time against a shared store.
+
+Results are merged into ``tmp/runner_results.json`` and ``tmp/junit.xml``;
+status, per-page web vitals and the Supabase traffic profile also go into
+``tmp/test_results.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .config import TMP_DIR
+from .profiler import format_profile
+from .suite import TestCase, discover
+from .vitals import write_test_results
+from .waits import format_report
+
+TENANTS_PATH = TMP_DIR / "tenants.json"
+RESULTS_PATH = TMP_DIR / "runner_results.json"
+JUNIT_PATH = TMP_DIR / "junit.xml"
+STEP_REPORT_PATH = TMP_DIR / "step_latency.json"
+
+# Tests that insert orders into the tenant they run against.
+ORDER_WRITERS = frozenset({"TC008", "TC016", "TC017"})
+
+DEFAULT_DURATION_S = 30.0
+
+
+@dataclass(frozen=True)
+class Tenant:
+    store_id: str
+    slug: str = ""
+    users: dict = field(default_factory=dict)  # role -> {"email": ..., "password": ...}
+
+    def env(self) -> dict[str, str]:
+        env = {
+            "PAYPER_STORE_ID": self.store_id,
+            "PAYPER_AUTH_DIR": str(TMP_DIR / "auth" / self.store_id),
+        }
+        if self.slug:
+            env["PAYPER_CLIENT_STORE_SLUG"] = self.slug
+        for role, creds in self.users.items():
+            env[f"PAYPER_{role.upper()}_EMAIL"] = creds["email"]
+            env[f"PAYPER_{role.upper()}_PASSWORD"] = creds["password"]
+        return env
+
+
+def load_tenants(path: Path = TENANTS_PATH) -> list[Tenant]:
+    if not path.exists():
+        return []
+    return [Tenant(**item) for item in json.loads(path.read_text(encoding="utf-8"))]
+
+
+def use_tenant(index: int, path: Path = TENANTS_PATH) -> Tenant:
+    """Point this process at tenant ``index`` the way a runner worker is."""
+    tenants = load_tenants(path)
+    if not tenants:
+        raise RuntimeError(f"{path} is missing; run python -m perf.stack up --tenants N "
+                           "or python -m perf.datagen --dsn <local postgres>")
+    tenant = tenants[index % len(tenants)]
+    os.environ.update(tenant.env())
+    from .config import get_config
+
+    get_config.cache_clear()
+    return tenant
+
+
+def _previous_durations(path: Path = RESULTS_PATH) -> dict[str, float]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+    return {r["name"]: r["duration_s"] for r in data.get("results", [])}
+
+
+def shard(cases: list[TestCase], workers: int, pin_order_writers: bool) -> list[list[TestCase]]:
+    """Longest-processing-time-first assignment of cases to ``workers`` shards."""
+    durations = _previous_durations()
+    shards: list[list[TestCase]] = [[] for _ in range(workers)]
+    loads = [0.0] * workers
+
+    def cost(case: TestCase) -> float:
+        return durations.get(case.name, DEFAULT_DURATION_S)
+
+    pending = sorted(cases, key=cost, reverse=True)
+    if pin_order_writers:
+        for case in [c for c in pending if c.id in ORDER_WRITERS]:
+            shards[0].append(case)
+            loads[0] += cost(case)
+        pending = [c for c in pending if c.id not in ORDER_WRITERS]
+
+    for case in pending:
+        target = loads.index(min(loads))
+        shards[target].append(case)
+        loads[target] += cost(case)
+    return shards
+
+
+def _error_result(case: TestCase, worker: int, store_id: str, error: str) -> dict:
+    """Result row for a case the worker could not run (import error, crashed worker)."""
+    return {
+        "id": case.id,
+        "name": case.name,
+        "status": "error",
+        "duration_s": 0.0,
+        "error": error,
+        "worker": worker,
+        "store_id": store_id,
+        "steps": [],
+        "vitals": [],
+        "supabase": {},
+    }
+
+
+def _run_shard(worker: int, cases: list[tuple[str, str]], env: dict[str, str]) -> list[dict]:
+    """Worker-process entry point: one browser, every case of the shard."""
+    os.environ.update(env)
+
+    from .browser import BrowserPool
+    from .config import get_config
+
+    get_config.cache_clear()
+
+    async def _main() -> list[dict]:
+        out = []
+        async with BrowserPool() as pool:
+            for case_id, path in cases:
+                case = TestCase(case_id, Path(path))
+                try:
+                    module = case.load()
+                except Exception:
+                    print(f"[w{worker}] ERROR   {case.name} (import failed)", flush=True)
+                    out.append(_error_result(case, worker, env.get("PAYPER_STORE_ID", ""), traceback.format_exc()))
+                    continue
+                result = await pool.run(case.name, module.run_test, role=getattr(module, "ROLE", None))
+                print(f"[w{worker}] {result.status.upper():7} {case.name} ({result.duration_s:.1f}s)", flush=True)
+                out.append({
+                    "id": case.id,
+                    "name": result.name,
+                    "status": result.status,
+                    "duration_s": round(result.duration_s, 3),
+                    "error": result.error,
+                    "worker": worker,
+                    "store_id": env.get("PAYPER_STORE_ID", ""),
+                    "steps": [s.to_dict() for s in result.steps],
+                    "vitals": [v.to_dict() for v in result.vitals],
+                    "supabase": result.supabase,
+                })
+        return out
+
+    return asyncio.run(_main())
+
+
+def write_junit(results: list[dict], elapsed_s: float, path: Path = JUNIT_PATH) -> None:
+    suite = ET.Element(
+        "testsuite",
+        name="testsprite",
+        tests=str(len(results)),
+        failures=str(sum(r["status"] == "failed" for r in results)),
+        errors=str(sum(r["status"] == "error" for r in results)),
+        time=f"{elapsed_s:.3f}",
+    )
+    for r in results:
+        case = ET.SubElement(suite, "testcase", classname="testsprite_tests", name=r["name"], time=f"{r['duration_s']:.3f}")
+        props = ET.SubElement(case, "properties")
+        ET.SubElement(props, "property", name="worker", value=str(r["worker"]))
+        ET.SubElement(props, "property", name="store_id", value=r["store_id"])
+        if r["status"] == "failed":
+            message = (r["error"] or "").strip().splitlines()[0] if r["error"] else ""
+            ET.SubElement(case, "failure", message=message).text = r["error"]
+        elif r["status"] == "error":
+            ET.SubElement(case, "error").text = r["error"]
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def run(ids: Optional[list[str]] = None, workers: int = 1) -> list[dict]:
+    cases = discover(only=ids or None)
+    unknown = sorted({i.upper() for i in ids or []} - {c.id for c in cases})
+    if unknown or not cases:
+        available = ", ".join(c.id for c in discover())
+        raise ValueError(f"No test matches {', '.join(unknown) or 'the selection'}; available: {available}")
+    tenants = load_tenants()
+    workers = max(1, min(workers, len(cases)))
+    shards = [s for s in shard(cases, workers, pin_order_writers=len(tenants) < workers) if s]
+
+    started = time.perf_counter()
+    results: list[dict] = []
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx) as pool:
+        envs = [tenants[i % len(tenants)].env() if tenants else {} for i in range(len(shards))]
+        futures = [
+            pool.submit(_run_shard, i, [(c.id, str(c.path)) for c in cases_], envs[i])
+            for i, cases_ in enumerate(shards)
+        ]
+        for i, future in enumerate(futures):
+            try:
+                results.extend(future.result())
+            except Exception:
+                # The worker died (browser launch, crash): its cases error, the other shards still count
+                error = traceback.format_exc()
+                print(f"[w{i}] worker failed; {len(shards[i])} tests marked as errors", flush=True)
+                results.extend(_error_result(c, i, envs[i].get("PAYPER_STORE_ID", ""), error) for c in shards[i])
+    elapsed = time.perf_counter() - started
+
+    results.sort(key=lambda r: r["name"])
+    RESULTS_PATH.write_text(
+        json.dumps({"workers": len(shards), "elapsed_s": round(elapsed, 3), "results": results}, indent=2),
+        encoding="utf-8",
+    )
+    STEP_REPORT_PATH.write_text(json.dumps({r["name"]: r["steps"] for r in results}, indent=2), encoding="utf-8")
+    write_junit(results, elapsed)
+    write_test_results(results)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m harness.runner", description=__doc__.splitlines()[0])
+    parser.add_argument("ids", nargs="*", help="TC ids to run (default: all)")
+    parser.add_argument("-n", "--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    try:
+        results = run(args.ids, args.workers)
+    except ValueError as exc:
+        parser.error(str(exc))
+    failed = [r for r in results if r["status"] != "passed"]
+    print("\nSlowest steps:\n" + format_report(results))
+    print("\nChattiest routes (Supabase):\n" + format_profile(results))
+    print(f"\n{len(results) - len(failed)}/{len(results)} passed -> {RESULTS_PATH.name}, {JUNIT_PATH.name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
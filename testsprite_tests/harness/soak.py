@@ -0,0 +1,383 @@
+"""Memory-leak soak test for a long-lived POS/OrderBoard tab.
+
+    python -m harness.soak --tenant 0 --hours 14 --rate 40
+    python -m harness.soak --hours 1 --cycle /#/orders /#/tables / --cycle-every 60
+
+One signed-in page stays open (``--path``, OrderBoard by default; the
+``OfflineContext`` provider is mounted on every staff route). Meanwhile a
+writer creates ``--rate`` orders per minute in the tenant's store with the
+service key and walks each through ``preparing -> ready -> served``, which
+is the realtime and refetch traffic a shift produces. With ``--cycle`` the
+tab also moves between routes inside the SPA, so components mount and
+unmount all day.
+
+Every ``--interval`` seconds the tab is sampled after a forced GC
+(``HeapProfiler.collectGarbage``). Each sample records the CDP
+``Performance.getMetrics`` values (JS heap, DOM nodes, event listeners,
+documents), ``performance.memory`` and the live realtime channels. A
+channel is live between its ``phx_join`` and ``phx_leave`` frames on the
+page's websockets.
+
+The baseline is the median of the first three samples after ``--warmup``.
+The final value is the median of the last three, taken on the first route.
+The run fails when retained heap grows more than ``--max-growth-mb``, or
+the live channel count grows more than ``--max-channel-growth``. It also
+fails when the writer completed no order, or more than
+``--max-write-error-rate`` of its orders failed: without that traffic the
+heap numbers say nothing. On
+failure the baseline and final heap snapshots are kept under
+``tmp/perf/soak/`` (compare them in DevTools > Memory > Comparison),
+together with the window/document listeners by type and the channel
+topics at both points.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from playwright.async_api import CDPSession, Page, WebSocket
+
+from perf.client import SupabaseClient
+from perf.stats import REPORT_DIR, write_report
+
+from .browser import BrowserPool
+from .runner import use_tenant
+from .waits import open_app, wait_for_app_ready
+
+SNAPSHOT_DIR = REPORT_DIR / "soak"
+STATUS_FLOW = ("preparing", "ready", "served")
+CDP_METRICS = {
+    "JSHeapUsedSize": "heap_used",
+    "JSHeapTotalSize": "heap_total",
+    "Nodes": "dom_nodes",
+    "JSEventListeners": "listeners",
+    "Documents": "documents",
+}
+
+
+@dataclass
+class Sample:
+    t_s: float
+    route: str
+    heap_used: int
+    heap_total: int
+    dom_nodes: int
+    listeners: int
+    documents: int
+    perf_memory: Optional[int]
+    channels: int
+    websockets: int
+
+
+class ChannelTracker:
+    """Live realtime channel topics, from the frames the page sends.
+
+    Handles both serializers realtime-js uses: JSON objects (``vsn=1.0.0``)
+    and ``[join_ref, ref, topic, event, payload]`` arrays (``vsn=2.0.0``).
+    """
+
+    def __init__(self, page: Page):
+        self.topics: dict[WebSocket, set[str]] = {}
+        self.joins = Counter()
+        page.on("websocket", self._on_socket)
+
+    def _on_socket(self, ws: WebSocket) -> None:
+        if "/realtime/" not in ws.url:
+            return
+        self.topics[ws] = set()
+        ws.on("framesent", lambda payload: self._on_frame(ws, payload))
+        ws.on("close", lambda _ws: self.topics.pop(ws, None))
+
+    def _on_frame(self, ws: WebSocket, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            return
+        if isinstance(message, list) and len(message) >= 4:
+            topic, event = message[2], message[3]
+        elif isinstance(message, dict):
+            topic, event = message.get("topic"), message.get("event")
+        else:
+            return
+        live = self.topics.get(ws)
+        if live is None or topic == "phoenix":
+            return
+        if event == "phx_join":
+            live.add(topic)
+            self.joins[topic] += 1
+        elif event == "phx_leave":
+            live.discard(topic)
+
+    def live(self) -> list[str]:
+        return sorted(t for topics in self.topics.values() for t in topics)
+
+
+class Soak:
+    def __init__(self, pool: BrowserPool, client: SupabaseClient, hours: float, rate_per_min: float,
+                 interval_s: float, warmup_s: float, max_growth_mb: float, max_channel_growth: int,
+                 role: str = "owner", path: str = "/#/orders", cycle: Optional[list[str]] = None,
+                 cycle_every_s: float = 60.0, max_write_error_rate: float = 0.05):
+        self.pool = pool
+        self.client = client
+        self.duration_s = hours * 3600
+        self.rate_per_min = rate_per_min
+        self.interval_s = interval_s
+        self.warmup_s = warmup_s
+        self.max_growth_mb = max_growth_mb
+        self.max_channel_growth = max_channel_growth
+        self.max_write_error_rate = max_write_error_rate
+        self.role = role
+        self.routes = cycle or [path]
+        self.cycle_every_s = cycle_every_s
+        self.samples: list[Sample] = []
+        self.writes = Counter()
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+
+    async def _order(self, store_id: str) -> None:
+        order_id = str(uuid.uuid4())
+        token = self.client.service_token
+        try:
+            await self.client.insert("orders", {
+                "id": order_id, "store_id": store_id, "status": "pending", "channel": "takeaway",
+                "payment_method": "cash", "payment_status": "paid", "is_paid": True, "subtotal": 1000,
+                "tax_amount": 0, "discount_amount": 0, "total_amount": 1000, "delivery_status": "pending",
+            }, token)
+            for status in STATUS_FLOW:
+                await asyncio.sleep(20)
+                values = {"status": status, **({"delivery_status": "delivered"} if status == "served" else {})}
+                await self.client.update("orders", {"id": f"eq.{order_id}"}, values, token)
+            self.writes["ok"] += 1
+        except Exception as exc:
+            self.writes[getattr(exc, "code", type(exc).__name__)] += 1
+
+    async def _traffic(self, store_id: str, stop: asyncio.Event) -> None:
+        tasks: set[asyncio.Task] = set()
+        while not stop.is_set():
+            task = asyncio.create_task(self._order(store_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=60 / self.rate_per_min)
+            except asyncio.TimeoutError:
+                pass
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _cycle(self, page: Page, stop: asyncio.Event) -> None:
+        index = 0
+        while len(self.routes) > 1 and not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.cycle_every_s)
+            except asyncio.TimeoutError:
+                index = (index + 1) % len(self.routes)
+                await self._navigate(page, self.routes[index])
+
+    async def _navigate(self, page: Page, route: str) -> None:
+        # Hash change only: a reload would free everything and hide the leak.
+        await page.evaluate("(hash) => { location.hash = hash; }", route.split("#", 1)[-1] or "/")
+        await wait_for_app_ready(page, self.pool.config.navigation_timeout_ms)
+
+    async def _sample(self, page: Page, cdp: CDPSession, channels: ChannelTracker, started: float) -> Sample:
+        await cdp.send("HeapProfiler.collectGarbage")
+        metrics = {m["name"]: m["value"] for m in (await cdp.send("Performance.getMetrics"))["metrics"]}
+        perf_memory = await page.evaluate("() => performance.memory ? performance.memory.usedJSHeapSize : null")
+        values = {field_name: int(metrics.get(name, 0)) for name, field_name in CDP_METRICS.items()}
+        sample = Sample(
+            t_s=round(time.perf_counter() - started, 1),
+            route=page.url.split("#", 1)[-1] if "#" in page.url else "/",
+            perf_memory=perf_memory,
+            channels=len(channels.live()),
+            websockets=len(channels.topics),
+            **values,
+        )
+        self.samples.append(sample)
+        return sample
+
+    async def _listeners(self, cdp: CDPSession) -> dict[str, dict[str, int]]:
+        out = {}
+        for target in ("window", "document"):
+            handle = await cdp.send("Runtime.evaluate", {"expression": target})
+            object_id = handle["result"]["objectId"]
+            try:
+                listeners = (await cdp.send("DOMDebugger.getEventListeners", {"objectId": object_id}))["listeners"]
+            finally:
+                await cdp.send("Runtime.releaseObject", {"objectId": object_id})
+            out[target] = dict(Counter(listener["type"] for listener in listeners).most_common())
+        return out
+
+    async def _snapshot(self, cdp: CDPSession, name: str) -> Path:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        path = SNAPSHOT_DIR / f"{self.run_id}-{name}.heapsnapshot"
+        with path.open("w", encoding="utf-8") as fh:
+            def on_chunk(params: dict) -> None:
+                fh.write(params["chunk"])
+
+            cdp.on("HeapProfiler.addHeapSnapshotChunk", on_chunk)
+            try:
+                await cdp.send("HeapProfiler.takeHeapSnapshot", {"reportProgress": False})
+            finally:
+                cdp.remove_listener("HeapProfiler.addHeapSnapshotChunk", on_chunk)
+        return path
+
+    async def _checkpoint(self, page: Page, cdp: CDPSession, channels: ChannelTracker, started: float,
+                          name: str) -> dict:
+        """Three samples, listeners, channel topics and a heap snapshot."""
+        samples = []
+        for _ in range(3):
+            samples.append(await self._sample(page, cdp, channels, started))
+            await asyncio.sleep(2)
+        return {
+            "heap_used": statistics.median(s.heap_used for s in samples),
+            "channels": statistics.median(s.channels for s in samples),
+            "listeners": await self._listeners(cdp),
+            "topics": channels.live(),
+            "snapshot": str(await self._snapshot(cdp, name)),
+        }
+
+    async def run(self) -> dict:
+        store_id = self.pool.config.store_id
+        if not store_id:
+            raise RuntimeError("Set PAYPER_STORE_ID or pass --tenant")
+        storage_state = await self.pool.auth.storage_state(self.role)
+        stop = asyncio.Event()
+        async with self.pool.new_context(storage_state=storage_state) as context:
+            page = await context.new_page()
+            channels = ChannelTracker(page)
+            cdp = await context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+            await cdp.send("HeapProfiler.enable")
+            await open_app(page, self.routes[0])
+            await wait_for_app_ready(page, self.pool.config.navigation_timeout_ms)
+
+            started = time.perf_counter()
+            background = [asyncio.create_task(self._traffic(store_id, stop)),
+                          asyncio.create_task(self._cycle(page, stop))]
+            try:
+                await asyncio.sleep(self.warmup_s)
+                baseline = await self._checkpoint(page, cdp, channels, started, "baseline")
+                deadline = started + self.duration_s
+                while time.perf_counter() < deadline:
+                    await asyncio.sleep(min(self.interval_s, max(0.0, deadline - time.perf_counter())))
+                    await self._sample(page, cdp, channels, started)
+            finally:
+                stop.set()
+                await asyncio.gather(*background)
+            await self._navigate(page, self.routes[0])
+            final = await self._checkpoint(page, cdp, channels, started, "final")
+            await cdp.detach()
+
+        growth_mb = (final["heap_used"] - baseline["heap_used"]) / 2**20
+        channel_growth = final["channels"] - baseline["channels"]
+        failures = []
+        if growth_mb > self.max_growth_mb:
+            failures.append(f"retained heap grew {growth_mb:.1f} MB (limit {self.max_growth_mb} MB)")
+        if channel_growth > self.max_channel_growth:
+            failures.append(f"live realtime channels grew by {channel_growth:g} (limit {self.max_channel_growth})")
+        attempted = sum(self.writes.values())
+        write_error_rate = (attempted - self.writes["ok"]) / attempted if attempted else 1.0
+        if self.writes["ok"] == 0:
+            failures.append(f"the writer completed no order ({dict(self.writes)})")
+        elif write_error_rate > self.max_write_error_rate:
+            failures.append(f"{write_error_rate:.1%} of the writer's orders failed "
+                            f"(limit {self.max_write_error_rate:.1%}): {dict(self.writes)}")
+        if not failures:
+            for checkpoint in (baseline, final):
+                Path(checkpoint["snapshot"]).unlink(missing_ok=True)
+                checkpoint["snapshot"] = None
+
+        hours = (self.samples[-1].t_s - self.samples[0].t_s) / 3600 if len(self.samples) > 1 else 0
+        return {
+            "config": {
+                "store_id": store_id, "role": self.role, "routes": self.routes, "hours": self.duration_s / 3600,
+                "rate_per_min": self.rate_per_min, "interval_s": self.interval_s, "warmup_s": self.warmup_s,
+                "max_growth_mb": self.max_growth_mb, "max_channel_growth": self.max_channel_growth,
+                "max_write_error_rate": self.max_write_error_rate,
+            },
+            "passed": not failures,
+            "failures": failures,
+            "heap_growth_mb": round(growth_mb, 2),
+            "heap_slope_mb_per_h": round(_slope(self.samples) * 3600 / 2**20, 2) if hours else None,
+            "channel_growth": channel_growth,
+            "new_topics": sorted(set(final["topics"]) - set(baseline["topics"])),
+            "topic_joins": dict(channels.joins.most_common()),
+            "listener_growth": {
+                target: {t: n - baseline["listeners"][target].get(t, 0)
+                         for t, n in final["listeners"][target].items()
+                         if n != baseline["listeners"][target].get(t, 0)}
+                for target in ("window", "document")
+            },
+            "baseline": baseline,
+            "final": final,
+            "writes": dict(self.writes),
+            "samples": [asdict(s) for s in self.samples],
+        }
+
+
+def _slope(samples: list[Sample]) -> float:
+    """Least-squares heap growth in bytes per second."""
+    xs = [s.t_s for s in samples]
+    ys = [s.heap_used for s in samples]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    denom = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denom if denom else 0.0
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    async with BrowserPool() as pool, SupabaseClient.from_env() as client:
+        soak = Soak(pool, client, args.hours, args.rate, args.interval, args.warmup, args.max_growth_mb,
+                    args.max_channel_growth, args.role, args.path, args.cycle, args.cycle_every,
+                    args.max_write_error_rate)
+        return await soak.run()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m harness.soak", description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--rate", type=float, default=20.0, help="orders per minute written to the store")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=120.0, help="seconds before the baseline")
+    parser.add_argument("--max-growth-mb", type=float, default=50.0, help="allowed retained-heap growth")
+    parser.add_argument("--max-channel-growth", type=int, default=2, help="allowed growth in live channels")
+    parser.add_argument("--max-write-error-rate", type=float, default=0.05,
+                        help="allowed share of writer orders that fail")
+    parser.add_argument("--role", default="owner")
+    parser.add_argument("--path", default="/#/orders", help="route kept open")
+    parser.add_argument("--cycle", nargs="+", default=None, help="routes to rotate through instead of --path")
+    parser.add_argument("--cycle-every", type=float, default=60.0, help="seconds per route when cycling")
+    parser.add_argument("--tenant", type=int, default=None, help="use tenant N of tmp/tenants.json")
+    args = parser.parse_args(argv)
+
+    if args.tenant is not None:
+        use_tenant(args.tenant)
+
+    report = asyncio.run(_main(args))
+    path = write_report("soak", report)
+    print(f"heap {report['heap_growth_mb']:+.1f} MB ({report['heap_slope_mb_per_h']} MB/h), "
+          f"channels {report['channel_growth']:+g}, writes {report['writes']}")
+    for failure in report["failures"]:
+        print(f"FAIL: {failure}")
+    for topic in report["new_topics"]:
+        print(f"  channel never left: {topic}")
+    for target, growth in report["listener_growth"].items():
+        for kind, delta in growth.items():
+            print(f"  {target} '{kind}' listeners {delta:+d}")
+    for name in ("baseline", "final"):
+        if report[name]["snapshot"]:
+            print(f"  {name} heap snapshot: {report[name]['snapshot']}")
+    print(f"report: {path}")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Discovery and loading of the generated ``TC*.py`` scripts."""
+
+from __future__ import annotations
+
+import importlib.util
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Iterable, Optional
+
+from .config import TESTS_DIR
+
+TC_PATTERN = re.compile(r"^(TC\d+)_.*\.py$")
+
+
+@dataclass(frozen=True)
+class TestCase:
+    id: str
+    path: Path
+
+    @property
+    def name(self) -> str:
+        return self.path.stem
+
+    def load(self) -> ModuleType:
+        """Import the script without running it.
+
+        The module exposes ``run_test(context)`` and optionally ``ROLE``, the
+        cached session the context should start with.
+        """
+        # The scripts do ``from harness import ...``; make that resolvable
+        # when the runner is started from another directory.
+        if str(TESTS_DIR) not in sys.path:
+            sys.path.insert(0, str(TESTS_DIR))
+        spec = importlib.util.spec_from_file_location(self.name, self.path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot import {self.path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+def discover(directory: Path = TESTS_DIR, only: Optional[Iterable[str]] = None) -> list[TestCase]:
+    """Return the TC scripts in ``directory`` sorted by id, optionally filtered."""
+    wanted = {item.upper() for item in only} if only else None
+    cases = []
+    for path in sorted(directory.glob("TC*.py")):
+        match = TC_PATTERN.match(path.name)
+        if not match:
+            continue
+        if wanted and match.group(1) not in wanted:
+            continue
+        cases.append(TestCase(match.group(1), path))
+    return cases
@@ -0,0 +1,205 @@
+"""Core Web Vitals and navigation timing for every page a test visits.
+
+``VitalsCollector`` adds an init script to the context. The script runs
+PerformanceObservers for LCP, CLS, INP (the slowest interaction), long
+tasks and navigation timing. The app is a HashRouter SPA, so the script
+starts a new page record on each route change (pushState, replaceState,
+hashchange, popstate) and sends the finished record to Python through an
+exposed binding. Records for the routes still open are read when the test
+ends.
+
+LCP and TTFB only exist for hard navigations. Soft (route) navigations
+report ``None`` for them.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright import async_api
+from playwright.async_api import BrowserContext
+
+from .config import TMP_DIR
+
+TEST_RESULTS_PATH = TMP_DIR / "test_results.json"
+
+VITALS_INIT_JS = """(() => {
+  if (window.__payperVitals || window.top !== window) return;
+  const route = () => location.pathname + location.hash;
+  let current = null;
+
+  const start = (kind) => {
+    current = { route: route(), kind, startedMs: performance.now(), lcpMs: null,
+                cls: 0, inpMs: null, longTasks: 0, longTaskMs: 0 };
+  };
+  const finish = () => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const rec = Object.assign({}, current, {
+      durationMs: performance.now() - current.startedMs,
+      ttfbMs: current.kind === 'navigation' && nav ? nav.responseStart : null,
+      domContentLoadedMs: current.kind === 'navigation' && nav ? nav.domContentLoadedEventEnd || null : null,
+      heapUsedBytes: performance.memory ? performance.memory.usedJSHeapSize : null,
+      domNodes: document.getElementsByTagName('*').length,
+    });
+    delete rec.startedMs;
+    return rec;
+  };
+  const report = (rec) => {
+    if (window.__payperReportVitals) window.__payperReportVitals(JSON.stringify(rec)).catch(() => {});
+  };
+  const observe = (type, cb, opts) => {
+    try { new PerformanceObserver((list) => list.getEntries().forEach(cb)).observe(Object.assign({ type, buffered: true }, opts)); }
+    catch (e) { /* entry type not supported */ }
+  };
+
+  start('navigation');
+  observe('largest-contentful-paint', (e) => {
+    if (current.kind === 'navigation') current.lcpMs = e.renderTime || e.startTime;
+  });
+  observe('layout-shift', (e) => { if (!e.hadRecentInput) current.cls += e.value; });
+  observe('event', (e) => {
+    if (e.interactionId) current.inpMs = Math.max(current.inpMs || 0, e.duration);
+  }, { durationThreshold: 16 });
+  observe('longtask', (e) => { current.longTasks += 1; current.longTaskMs += e.duration; });
+
+  const onRoute = () => {
+    if (route() === current.route) return;
+    report(finish());
+    start('route');
+  };
+  for (const name of ['pushState', 'replaceState']) {
+    const original = history[name];
+    history[name] = function () { const r = original.apply(this, arguments); onRoute(); return r; };
+  }
+  window.addEventListener('hashchange', onRoute);
+  window.addEventListener('popstate', onRoute);
+  window.addEventListener('pagehide', () => report(finish()));
+
+  window.__payperVitals = { snapshot: () => JSON.stringify(finish()) };
+})();"""
+
+
+@dataclass
+class PageVitals:
+    route: str
+    kind: str  # "navigation" | "route"
+    duration_ms: float
+    lcp_ms: Optional[float]
+    cls: float
+    inp_ms: Optional[float]
+    ttfb_ms: Optional[float]
+    dom_content_loaded_ms: Optional[float]
+    heap_used_bytes: Optional[int]
+    long_tasks: int
+    long_task_ms: float
+    dom_nodes: int
+
+    @classmethod
+    def from_js(cls, raw: dict) -> "PageVitals":
+        def ms(key: str) -> Optional[float]:
+            value = raw.get(key)
+            return None if value is None else round(float(value), 1)
+
+        return cls(
+            route=raw["route"],
+            kind=raw["kind"],
+            duration_ms=ms("durationMs") or 0.0,
+            lcp_ms=ms("lcpMs"),
+            cls=round(float(raw.get("cls") or 0), 4),
+            inp_ms=ms("inpMs"),
+            ttfb_ms=ms("ttfbMs"),
+            dom_content_loaded_ms=ms("domContentLoadedMs"),
+            heap_used_bytes=raw.get("heapUsedBytes"),
+            long_tasks=int(raw.get("longTasks") or 0),
+            long_task_ms=ms("longTaskMs") or 0.0,
+            dom_nodes=int(raw.get("domNodes") or 0),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class VitalsCollector:
+    """Collects ``PageVitals`` for every route visited in one context."""
+
+    def __init__(self):
+        self.pages: list[PageVitals] = []
+
+    async def attach(self, context: BrowserContext) -> None:
+        await context.expose_binding("__payperReportVitals", self._on_report)
+        await context.add_init_script(VITALS_INIT_JS)
+
+    def _on_report(self, _source, payload: str) -> None:
+        self.pages.append(PageVitals.from_js(json.loads(payload)))
+
+    async def collect(self, context: BrowserContext) -> list[PageVitals]:
+        """Read the route still open on each page; call before closing the context."""
+        for page in context.pages:
+            try:
+                raw = await page.evaluate("() => window.__payperVitals && window.__payperVitals.snapshot()")
+            except async_api.Error:
+                continue
+            if raw:
+                self.pages.append(PageVitals.from_js(json.loads(raw)))
+        return self.pages
+
+
+def _route_label(route: str) -> str:
+    parsed = urlparse(route)
+    return parsed.fragment or parsed.path or "/"
+
+
+def summarize(pages: list[dict]) -> dict:
+    """Worst value per metric across the pages of one test."""
+    def worst(key: str) -> Optional[float]:
+        values = [p[key] for p in pages if p.get(key) is not None]
+        return max(values) if values else None
+
+    return {
+        "lcp_ms": worst("lcp_ms"),
+        "cls": worst("cls"),
+        "inp_ms": worst("inp_ms"),
+        "ttfb_ms": worst("ttfb_ms"),
+        "heap_used_bytes": worst("heap_used_bytes"),
+        "long_tasks": sum(p["long_tasks"] for p in pages),
+        "routes": sorted({_route_label(p["route"]) for p in pages}),
+    }
+
+
+def _title(name: str) -> str:
+    case_id, _, rest = name.partition("_")
+    return f"{case_id}-{rest.replace('_', ' ')}"
+
+
+def write_test_results(results: list[dict], path: Path = TEST_RESULTS_PATH) -> None:
+    """Merge status and vitals into TestSprite's ``tmp/test_results.json``.
+
+    Entries are matched on their ``TCxxx-`` title prefix and keep every field
+    TestSprite wrote. Tests TestSprite never ran get a minimal entry.
+    """
+    entries: list[dict] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+    by_id = {e.get("title", "").split("-", 1)[0]: e for e in entries}
+    now = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    for r in results:
+        entry = by_id.get(r["id"])
+        if entry is None:
+            entry = {"title": _title(r["name"]), "testType": "FRONTEND", "createFrom": "harness"}
+            entries.append(entry)
+            by_id[r["id"]] = entry
+        entry["testStatus"] = "PASSED" if r["status"] == "passed" else "FAILED"
+        entry["testError"] = r["error"] or ""
+        entry["modified"] = now
+        entry["performance"] = {
+            "duration_s": r["duration_s"],
+            "summary": summarize(r["vitals"]),
+            "pages": r["vitals"],
+            "supabase": r.get("supabase", {}),
+        }
+
+    path.write_text(json.dumps(entries, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
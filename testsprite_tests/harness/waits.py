@@ -0,0 +1,201 @@
+"""Condition-based waits for the TC scripts.
+
+The generated scripts slept a fixed 3 s before every click and fill. ``Steps``
+replaces that sleep with three checks:
+
+* locator actionability, which Playwright already does inside ``click``/``fill``;
+* Supabase quiet: no ``/rest/v1``, ``/auth/v1``, ``/functions/v1`` or
+  ``/storage/v1`` request in flight for ``quiet_ms``;
+* app ready: ``#root`` has rendered, and neither the global "Cargando..."
+  barrier, the "Configurando Cuenta" barrier nor a spinner is visible.
+
+Each action is recorded as a ``StepTiming``. ``BrowserPool.run`` attaches the
+timings to the ``TestResult``, which gives a per-step latency report.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright import async_api
+from playwright.async_api import BrowserContext, Locator, Page, Request
+
+from .config import HarnessConfig, get_config
+
+SUPABASE_PATHS = ("/rest/v1/", "/auth/v1/", "/functions/v1/", "/storage/v1/")
+
+# Realtime uses a websocket, and long-polling endpoints never finish, so they
+# must not keep the page "busy".
+IGNORED_PATHS = ("/realtime/v1/",)
+
+APP_READY_JS = """() => {
+    const root = document.getElementById('root');
+    if (!root || root.childElementCount === 0) return false;
+    const text = root.innerText || '';
+    if (text.includes('Cargando...') || text.includes('Configurando Cuenta')) return false;
+    const spinner = root.querySelector('.animate-spin');
+    return !spinner || spinner.offsetParent === null;
+}"""
+
+
+@dataclass
+class StepTiming:
+    label: str
+    action: str
+    path: str
+    action_ms: float
+    settle_ms: float
+    settled: bool
+
+    @property
+    def total_ms(self) -> float:
+        return self.action_ms + self.settle_ms
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["total_ms"] = round(self.total_ms, 1)
+        return data
+
+
+# Set by BrowserPool.run for the duration of one test.
+current_steps: ContextVar[Optional[list[StepTiming]]] = ContextVar("current_steps", default=None)
+
+
+def _is_supabase(request: Request) -> bool:
+    path = urlparse(request.url).path
+    if any(p in path for p in IGNORED_PATHS):
+        return False
+    return any(p in path for p in SUPABASE_PATHS)
+
+
+class SupabaseIdle:
+    """Counts in-flight Supabase HTTP requests across every page of a context."""
+
+    def __init__(self, context: BrowserContext):
+        self._inflight: set[Request] = set()
+        self._changed = asyncio.Event()
+        context.on("request", self._on_start)
+        context.on("requestfinished", self._on_end)
+        context.on("requestfailed", self._on_end)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _on_start(self, request: Request) -> None:
+        if _is_supabase(request):
+            self._inflight.add(request)
+            self._changed.set()
+
+    def _on_end(self, request: Request) -> None:
+        if request in self._inflight:
+            self._inflight.discard(request)
+            self._changed.set()
+
+    async def wait(self, quiet_ms: int = 250, timeout_ms: int = 10000) -> bool:
+        """Wait until no Supabase request has been in flight for ``quiet_ms``."""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._changed.clear()
+            if not self._inflight:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), min(quiet_ms / 1000, remaining))
+                except asyncio.TimeoutError:
+                    return True
+                continue
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+
+
+async def wait_for_app_ready(page: Page, timeout_ms: int = 10000) -> bool:
+    try:
+        await page.wait_for_function(APP_READY_JS, timeout=timeout_ms)
+        return True
+    except async_api.Error:
+        return False
+
+
+async def open_app(page: Page, path: str = "/", config: Optional[HarnessConfig] = None) -> None:
+    """Navigate to the app and wait for the document (and iframes) to parse."""
+    config = config or get_config()
+    await page.goto(config.url(path), wait_until="commit", timeout=config.navigation_timeout_ms)
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=3000)
+    except async_api.Error:
+        pass
+    for frame in page.frames:
+        try:
+            await frame.wait_for_load_state("domcontentloaded", timeout=3000)
+        except async_api.Error:
+            pass
+
+
+def record_step(step: StepTiming) -> None:
+    steps = current_steps.get()
+    if steps is not None:
+        steps.append(step)
+
+
+def _path_of(page: Page) -> str:
+    parsed = urlparse(page.url)
+    return parsed.path + (f"#{parsed.fragment}" if parsed.fragment else "")
+
+
+class Steps:
+    """Drives actions on a context and waits for the app to settle after each one."""
+
+    def __init__(self, context: BrowserContext, quiet_ms: int = 250, settle_timeout_ms: int = 10000):
+        self.network = SupabaseIdle(context)
+        self.quiet_ms = quiet_ms
+        self.settle_timeout_ms = settle_timeout_ms
+
+    async def settle(self, page: Page) -> bool:
+        ready = await wait_for_app_ready(page, self.settle_timeout_ms)
+        idle = await self.network.wait(self.quiet_ms, self.settle_timeout_ms)
+        return ready and idle
+
+    async def _run(self, action: str, label: str, page: Page, coro) -> None:
+        started = time.perf_counter()
+        await coro
+        acted = time.perf_counter()
+        settled = await self.settle(page)
+        record_step(StepTiming(
+            label=label or action,
+            action=action,
+            path=_path_of(page),
+            action_ms=(acted - started) * 1000,
+            settle_ms=(time.perf_counter() - acted) * 1000,
+            settled=settled,
+        ))
+
+    async def goto(self, page: Page, path: str = "/") -> None:
+        await self._run("goto", f"open {path}", page, open_app(page, path))
+
+    async def click(self, locator: Locator, label: str = "", timeout: int = 5000) -> None:
+        await self._run("click", label, locator.page, locator.click(timeout=timeout))
+
+    async def fill(self, locator: Locator, value: str, label: str = "", timeout: int = 5000) -> None:
+        await self._run("fill", label, locator.page, locator.fill(value, timeout=timeout))
+
+
+def format_report(results: list[dict], limit: int = 20) -> str:
+    """Render the slowest steps of a run (runner result dicts) as a table."""
+    rows = [(r["name"], step) for r in results for step in r["steps"]]
+    rows.sort(key=lambda row: row[1]["total_ms"], reverse=True)
+    lines = [f"{'total ms':>9} {'settle ms':>9}  {'test':<12} {'path':<24} step"]
+    for name, step in rows[:limit]:
+        flag = "" if step["settled"] else "  (not settled)"
+        lines.append(
+            f"{step['total_ms']:9.0f} {step['settle_ms']:9.0f}  {name[:12]:<12} {step['path'][:24]:<24} {step['label']}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,5 @@
+"""Database-level performance tooling for Payper.
+
+Unlike ``harness`` this package does not need Playwright. It talks to
+Postgres (``psycopg`` 3) and to PostgREST/GoTrue-compatible HTTP endpoints.
+"""
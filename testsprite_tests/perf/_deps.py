@@ -0,0 +1,13 @@
+"""Optional third-party imports with an actionable error message."""
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+
+
+def require(module: str, package: str) -> ModuleType:
+    try:
+        return importlib.import_module(module)
+    except ImportError as exc:
+        raise ImportError(f"{module} is required for this tool: pip install '{package}'") from exc
@@ -0,0 +1,341 @@
+"""Time-to-first-token and total latency of the app's AI calls against a mock LLM.
+
+    python -m perf.ai_stream
+    python -m perf.ai_stream --workloads descriptions --products 30 --requests 200 --concurrency 8
+    python -m perf.ai_stream --ttft-ms 800 --tokens-per-s 40 --reply-words 120
+    python -m perf.ai_stream --serve-only
+
+The model is ``GeminiTextStub`` (``perf.stubs``): a fixed reply per prompt,
+first chunk after ``--ttft-ms``, then ``--tokens-per-s``. The tool calls it
+over the REST protocol the browser SDK uses, the way ``lib/gemini.ts``
+does, so no Supabase stack or browser is needed. There are two workloads:
+
+* ``chat``: ``--chats`` SquadAI prompts (``components/AIChat.tsx``: system
+  rules, the live context and a question), each one different;
+* ``descriptions``: ``--requests`` gourmet-description prompts
+  (``pages/InventoryManagement.tsx``) over ``--products`` products, so the
+  same product is asked for again, as when TC012 regenerates one.
+
+Each runs in these modes, with ``--concurrency`` calls in flight:
+
+* ``blocking``: ``generateContent``, the former code. Nothing shows until
+  the whole reply is there, so the time to first token is the total;
+* ``stream``: ``streamGenerateContent?alt=sse``, read as it arrives
+  (``streamGeminiText``);
+* ``memo`` (descriptions only): ``stream`` behind the same memo as
+  ``generateMemoized``: an LRU of 100 prompts per page load that also
+  shares a call still in flight. A hit's first token is its whole reply.
+
+The report gives the time to first token and the total per mode (p50/p95),
+model calls and the memo hit rate. Every reply must equal the stand-in's
+reply for its prompt, and in ``memo`` mode no prompt may reach the model
+twice while the LRU holds them all. Any violation makes the run exit
+non-zero.
+
+``--serve-only`` runs just the stand-in (on ``--port``, 54430 by default)
+until interrupted. Set ``VITE_GEMINI_API_BASE_URL`` to its URL and any
+``VITE_GEMINI_API_KEY`` to use the app against it; the browser's
+Performance panel then shows the ``ai:*`` measures.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from ._deps import require
+from .stats import LatencyStats, format_table, write_report
+from .stubs import GeminiTextStub
+
+WORKLOADS = {"chat": ("blocking", "stream"), "descriptions": ("blocking", "stream", "memo")}
+MODEL = "gemini-2.0-flash"
+MEMO_LIMIT = 100  # MEMO_LIMIT in lib/gemini.ts
+SERVE_PORT = 54430  # VITE_GEMINI_API_BASE_URL in .env.example
+
+SYSTEM_CONTEXT_BASE = """
+ROL: Eres SquadAI, el copiloto operativo del local.
+REGLAS:
+1. SOLO respondes sobre ESTE local. No tienes acceso global.
+2. NO inventes funcionalidades. Bésate en: Dashboard, Menú, Inventario, Lealtad, Configuración.
+3. Si algo no existe (como historial financiero histórico), dilo.
+4. Sé breve, táctico y "militar/futurista" en tu tono.
+"""
+QUESTIONS = (
+    "Analiza el rendimiento de ventas de hoy basándote en lo que sabes del sistema.",
+    "Sugiere una estrategia de lealtad táctica para retener clientes.",
+    "¿Cómo puedo verificar mi stock crítico y hacer transferencias?",
+    "Revisa si mi configuración de Mercado Pago y Roles es correcta según las mejores prácticas.",
+    "Guíame paso a paso para crear una nueva recompensa de lealtad.",
+)
+INGREDIENTS = ("Café", "Leche", "Cacao", "Vainilla", "Canela", "Crema", "Caramelo", "Avena", "Miel", "Naranja")
+
+
+def chat_prompts(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        orders = rng.randint(5, 300)
+        sales = orders * rng.randint(2000, 9000)
+        context = (f"\nDATOS EN TIEMPO REAL:\n- Ventas Hoy: ${sales:,}\n- Pedidos Hoy: {orders}\n"
+                   f"- Ticket Promedio: ${sales / orders:.2f}\n- Mesas Activas: {rng.randint(0, 30)}\n"
+                   f"- Stock Bajo: {', '.join(rng.sample(INGREDIENTS, 2))}\n")
+        prompts.append(f"{SYSTEM_CONTEXT_BASE}\n{context}\n\nUser Query: {QUESTIONS[i % len(QUESTIONS)]}")
+    return prompts
+
+
+def description_prompts(products: int, requests: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    catalog = []
+    for i in range(products):
+        ingredients = ", ".join(f"{name} (1 un)" for name in rng.sample(INGREDIENTS, rng.randint(1, 4)))
+        catalog.append(f"Escribe una descripción gourmet corta (máx 150 caracteres) para un producto de "
+                       f"cafetería/restaurante llamado \"Producto {i + 1}\". Utiliza estos ingredientes: "
+                       f"{ingredients}. Sé tentador y profesional.")
+    return [rng.choice(catalog) for _ in range(requests)]
+
+
+def _text(response: dict) -> str:
+    return "".join(part.get("text", "") for candidate in response.get("candidates", [])
+                   for part in candidate.get("content", {}).get("parts", []))
+
+
+class PromptMemo:
+    """The memo of ``generateMemoized``: an LRU of settled or in-flight replies per prompt."""
+
+    def __init__(self, limit: int = MEMO_LIMIT):
+        self.limit = limit
+        self.entries: OrderedDict[str, asyncio.Task] = OrderedDict()
+        self.hits = 0
+
+    def get(self, prompt: str, call: Callable[[], Awaitable[str]]) -> tuple[asyncio.Task, bool]:
+        task = self.entries.get(prompt)
+        if task is not None:
+            self.entries.move_to_end(prompt)
+            self.hits += 1
+            return task, True
+        task = asyncio.ensure_future(call())
+        self.entries[prompt] = task
+
+        def forget_failure(done: asyncio.Task) -> None:
+            if (done.cancelled() or done.exception()) and self.entries.get(prompt) is done:
+                del self.entries[prompt]
+
+        task.add_done_callback(forget_failure)
+        if len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+        return task, False
+
+
+@dataclass
+class Phase:
+    workload: str
+    mode: str
+    prompts: list[str]
+    ttft: LatencyStats = field(init=False)
+    total: LatencyStats = field(init=False)
+    model_calls: int = 0
+    memo_hits: int = 0
+    mismatches: int = 0
+    elapsed_s: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.ttft = LatencyStats(f"{self.workload}/{self.mode} ttft")
+        self.total = LatencyStats(f"{self.workload}/{self.mode} total")
+
+
+class ModelClient:
+    def __init__(self, http, stub: GeminiTextStub):
+        self.http = http
+        self.stub = stub
+        self.base = f"{stub.url}/v1beta/models/{MODEL}"
+        self.headers = {"x-goog-api-key": "perf-gemini-key"}
+
+    @staticmethod
+    def _body(prompt: str) -> dict:
+        return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.http.post(f"{self.base}:generateContent", json=self._body(prompt), headers=self.headers)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return _text(response.json())
+
+    async def stream(self, prompt: str, first_token: list[float]) -> str:
+        """Read the SSE reply, appending the time of the first text to ``first_token``."""
+        text = ""
+        async with self.http.stream("POST", f"{self.base}:streamGenerateContent", params={"alt": "sse"},
+                                    json=self._body(prompt), headers=self.headers) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise RuntimeError(f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                piece = _text(json.loads(line[len("data: "):]))
+                if piece and not first_token:
+                    first_token.append(time.perf_counter())
+                text += piece
+        return text
+
+    async def run(self, phase: Phase, concurrency: int) -> None:
+        queue = list(reversed(phase.prompts))
+        memo = PromptMemo() if phase.mode == "memo" else None
+        calls_before = sum(self.stub.calls.values())
+
+        async def worker() -> None:
+            while queue:
+                prompt = queue.pop()
+                first_token: list[float] = []
+                started = time.perf_counter()
+                try:
+                    if phase.mode == "blocking":
+                        text = await self.generate(prompt)
+                    elif memo is None:
+                        text = await self.stream(prompt, first_token)
+                    else:
+                        task, _ = memo.get(prompt, lambda: self.stream(prompt, first_token))
+                        text = await task
+                except Exception as exc:
+                    phase.ttft.error(str(exc)[:40] or type(exc).__name__)
+                    phase.total.error(str(exc)[:40] or type(exc).__name__)
+                    continue
+                finished = time.perf_counter()
+                phase.ttft.add(((first_token[0] if first_token else finished) - started) * 1000)
+                phase.total.add((finished - started) * 1000)
+                if text != self.stub.reply_for(prompt):
+                    phase.mismatches += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        phase.elapsed_s = time.perf_counter() - started
+        phase.model_calls = sum(self.stub.calls.values()) - calls_before
+        phase.memo_hits = memo.hits if memo else 0
+
+
+def phase_row(phase: Phase) -> dict:
+    ttft, total = phase.ttft.to_dict(), phase.total.to_dict()
+    return {
+        "workload": phase.workload,
+        "mode": phase.mode,
+        "requests": len(phase.prompts),
+        "distinct_prompts": len(set(phase.prompts)),
+        "elapsed_s": round(phase.elapsed_s, 2),
+        "ttft_p50_ms": ttft["p50_ms"],
+        "ttft_p95_ms": ttft["p95_ms"],
+        "total_p50_ms": total["p50_ms"],
+        "total_p95_ms": total["p95_ms"],
+        "model_calls": phase.model_calls,
+        "memo_hit_rate": round(phase.memo_hits / len(phase.prompts), 4) if phase.prompts else 0.0,
+        "mismatches": phase.mismatches,
+        "ttft": ttft,
+        "total": total,
+    }
+
+
+def _violations(rows: list[dict]) -> list[str]:
+    violations = []
+    for row in rows:
+        name = f"{row['workload']}/{row['mode']}"
+        if row["total"]["errors"]:
+            violations.append(f"{name}: {row['total']['errors']} calls failed ({row['total']['errors_by_code']})")
+        if row["mismatches"]:
+            violations.append(f"{name}: {row['mismatches']} replies differ from the model's")
+        if row["mode"] == "memo" and row["distinct_prompts"] <= MEMO_LIMIT \
+                and row["model_calls"] > row["distinct_prompts"]:
+            violations.append(f"{name}: {row['model_calls']} model calls for {row['distinct_prompts']} prompts")
+    return violations
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    httpx = require("httpx", "httpx")
+    prompts = {
+        "chat": chat_prompts(args.chats, args.seed),
+        "descriptions": description_prompts(args.products, args.requests, args.seed),
+    }
+    stub = GeminiTextStub(args.port, args.ttft_ms, args.tokens_per_s, args.chunk_tokens, args.reply_words).start()
+    rows = []
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as http:
+            client = ModelClient(http, stub)
+            for workload in args.workloads.split(","):
+                for mode in WORKLOADS[workload]:
+                    phase = Phase(workload, mode, prompts[workload])
+                    await client.run(phase, args.concurrency)
+                    row = phase_row(phase)
+                    rows.append(row)
+                    print(f"{workload}/{mode}: {row['requests']} calls in {row['elapsed_s']}s, "
+                          f"ttft p50 {row['ttft_p50_ms']} ms, total p50 {row['total_p50_ms']} ms, "
+                          f"{row['model_calls']} model calls, memo hit {row['memo_hit_rate']:.1%}", flush=True)
+    finally:
+        stub.stop()
+
+    return {
+        "config": {
+            "chats": args.chats, "products": args.products, "requests": args.requests,
+            "concurrency": args.concurrency, "ttft_ms": args.ttft_ms, "tokens_per_s": args.tokens_per_s,
+            "chunk_tokens": args.chunk_tokens, "reply_words": args.reply_words, "memo_limit": MEMO_LIMIT,
+        },
+        "phases": rows,
+        "model_peak_in_flight": stub.peak_in_flight,
+        "violations": _violations(rows),
+    }
+
+
+def serve(args: argparse.Namespace) -> int:
+    stub = GeminiTextStub(args.port or SERVE_PORT, args.ttft_ms, args.tokens_per_s, args.chunk_tokens,
+                          args.reply_words).start()
+    print(f"mock LLM on {stub.url}: set VITE_GEMINI_API_BASE_URL={stub.url} and restart the dev server. "
+          f"Ctrl-C stops it.", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+    print(f"served: {dict(stub.requests)}")
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.ai_stream", description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--chats", type=int, default=40, help="chat prompts, all different")
+    parser.add_argument("--products", type=int, default=30, help="products the descriptions are asked for")
+    parser.add_argument("--requests", type=int, default=120, help="description requests, drawn from the products")
+    parser.add_argument("--concurrency", type=int, default=4, help="calls in flight")
+    parser.add_argument("--ttft-ms", type=float, default=600.0, help="stand-in time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=60.0, help="stand-in generation rate")
+    parser.add_argument("--chunk-tokens", type=int, default=8, help="tokens per streamed chunk")
+    parser.add_argument("--reply-words", type=int, default=60, help="reply length in words (a token each)")
+    parser.add_argument("--port", type=int, default=0, help=f"stand-in port (0 = any; --serve-only: {SERVE_PORT})")
+    parser.add_argument("--serve-only", action="store_true", help="only run the stand-in, for the browser app")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds per call")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.serve_only:
+        return serve(args)
+    unknown = set(args.workloads.split(",")) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(_main(args))
+    path = write_report("ai_stream", report)
+    print(format_table([row[kind] for row in report["phases"] for kind in ("ttft", "total")],
+                       "time to first token and total per call"))
+    for violation in report["violations"]:
+        print(f"AI: {violation}")
+    print(f"report: {path}")
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Minimal async Supabase REST/RPC client for the load tools.
+
+supabase-py is not used: it adds its own retries and connection handling,
+and we want to time raw requests. ``SupabaseClient.from_env()`` reads the
+variables ``perf.stack`` prints (``SUPABASE_URL``, ``SUPABASE_ANON_KEY``,
+``SUPABASE_SERVICE_ROLE_KEY``), falling back to the ``VITE_`` names the
+frontend uses, so the same tool runs against the local stack or a project.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ._deps import require
+
+# SQLSTATEs worth retrying: deadlock_detected, serialization_failure.
+RETRYABLE_SQLSTATES = {"40P01": "deadlock", "40001": "serialization"}
+RETRYABLE_MESSAGES = {"deadlock detected": "deadlock", "could not serialize access": "serialization"}
+
+
+class RpcError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(f"{code or status}: {message}")
+        self.status = status
+        self.code = code or str(status)
+        self.message = message
+
+    @property
+    def retry_reason(self) -> Optional[str]:
+        """``"deadlock"``/``"serialization"`` when a retry may succeed."""
+        if self.code in RETRYABLE_SQLSTATES:
+            return RETRYABLE_SQLSTATES[self.code]
+        lowered = self.message.lower()
+        for needle, reason in RETRYABLE_MESSAGES.items():
+            if needle in lowered:
+                return reason
+        return None
+
+
+def unwrap(result: Any) -> Any:
+    """Raise for ``{"success": false, ...}`` results.
+
+    Many Payper RPCs catch every exception and return it as JSON with a 200
+    status. Deadlocks would be invisible without this.
+    """
+    if isinstance(result, dict) and result.get("success") is False:
+        raise RpcError(200, result.get("sqlstate") or result.get("error") or "",
+                       str(result.get("message") or result.get("error") or result))
+    return result
+
+
+@dataclass(frozen=True)
+class Session:
+    access_token: str
+    user_id: str
+    email: str
+
+
+class SupabaseClient:
+    def __init__(self, url: str, anon_key: str, service_key: Optional[str] = None,
+                 max_connections: int = 200, timeout_s: float = 30):
+        httpx = require("httpx", "httpx")
+        self.url = url.rstrip("/")
+        self.anon_key = anon_key
+        self.service_key = service_key
+        self.http = httpx.AsyncClient(
+            timeout=timeout_s,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "SupabaseClient":
+        env = os.environ
+        url = env.get("SUPABASE_URL") or env.get("VITE_SUPABASE_URL")
+        anon = env.get("SUPABASE_ANON_KEY") or env.get("VITE_SUPABASE_ANON_KEY")
+        if not url or not anon:
+            raise RuntimeError("Set SUPABASE_URL and SUPABASE_ANON_KEY (python -m perf.stack up prints them)")
+        return cls(url, anon, env.get("SUPABASE_SERVICE_ROLE_KEY"), **kwargs)
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+    async def __aenter__(self) -> "SupabaseClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _headers(self, token: Optional[str], prefer: Optional[str] = None) -> dict[str, str]:
+        headers = {
+            "apikey": self.anon_key,
+            "Authorization": f"Bearer {token or self.anon_key}",
+            "Content-Type": "application/json",
+        }
+        if prefer:
+            headers["Prefer"] = prefer
+        return headers
+
+    @property
+    def service_token(self) -> str:
+        if not self.service_key:
+            raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY is required for this step")
+        return self.service_key
+
+    async def _send(self, method: str, path: str, token: Optional[str], prefer: Optional[str] = None,
+                    **kwargs) -> Any:
+        response = await self.http.request(method, self.url + path, headers=self._headers(token, prefer), **kwargs)
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {"message": response.text}
+            raise RpcError(response.status_code, str(body.get("code") or body.get("error") or ""),
+                           str(body.get("message") or body.get("error_description") or body.get("msg") or body))
+        if not response.content:
+            return None
+        return response.json()
+
+    async def sign_in(self, email: str, password: str) -> Session:
+        data = await self._send("POST", "/auth/v1/token", None, params={"grant_type": "password"},
+                                json={"email": email, "password": password})
+        return Session(data["access_token"], data["user"]["id"], email)
+
+    async def rpc(self, name: str, params: Optional[dict] = None, token: Optional[str] = None) -> Any:
+        return await self._send("POST", f"/rest/v1/rpc/{name}", token, json=params or {})
+
+    async def select(self, table: str, params: dict, token: Optional[str] = None) -> list:
+        return await self._send("GET", f"/rest/v1/{table}", token, params=params)
+
+    async def insert(self, table: str, rows: Any, token: Optional[str] = None) -> list:
+        return await self._send("POST", f"/rest/v1/{table}", token, "return=representation", json=rows)
+
+    async def update(self, table: str, filters: dict, values: dict, token: Optional[str] = None) -> list:
+        return await self._send("PATCH", f"/rest/v1/{table}", token, "return=representation",
+                                params=filters, json=values)
@@ -0,0 +1,14 @@
+"""Paths shared by the perf tools."""
+
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent.parent
+REPO_ROOT = TESTS_DIR.parent
+TMP_DIR = TESTS_DIR / "tmp"
+MIGRATIONS_DIR = REPO_ROOT / "supabase" / "migrations"
+FUNCTIONS_DIR = REPO_ROOT / "supabase" / "functions"
+# Generated Supabase types: the only full description of the tables that the
+# migrations assume already exist.
+DATABASE_TYPES_PATH = REPO_ROOT / "src" / "types" / "database.types.ts"
+# Read by harness.runner to give each worker its own tenant.
+TENANTS_PATH = TMP_DIR / "tenants.json"
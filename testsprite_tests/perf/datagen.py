@@ -0,0 +1,368 @@
+"""Deterministic, scalable data generator for Finance/Dashboard-sized runs.
+
+    python -m perf.datagen --scale 100k              # against PAYPER_LOCAL_PG_DSN
+    python -m perf.datagen --scale 10m --jobs 8 --dsn postgresql://...
+
+Each store of a scale is a ``perf.seed`` tenant, so the harness logins keep
+working. The generator fills in what the app reads at volume:
+
+* catalog: categories, ingredients and direct sellables (``inventory_items``),
+  recipe products (``products`` + ``product_recipes``), a default storage
+  location with per-location stock;
+* menus as ``resolve_menu``/``get_menu_products`` read them: a fallback
+  "Carta" and a higher-priority "Barra" menu with a ``tables`` rule on
+  half of the store's ``venue_nodes``;
+* clients with wallet ``topup`` entries in ``wallet_ledger`` and a
+  ``clients.wallet_balance`` equal to their ledger sum;
+* historical ``orders``/``order_items`` over ``history_days`` ending at
+  ``--end`` (default: today 00:00 UTC). Orders follow a lunch/dinner hour
+  profile and busier weekends. Product popularity is Zipf-like.
+
+Everything is drawn from ``random.Random(f"{seed}:{store}")``. The same seed
+and scale give the same rows, and ``--jobs`` only changes the speed. Rows
+go in through COPY with ``session_replication_role = replica``, so app
+triggers (stock deduction, notifications, wallet sync) do not fire: history
+is loaded as already finalized, with ``stock_deducted`` set. The sales
+rollups those triggers would maintain are rebuilt per store afterwards
+(``rebuild_sales_rollups``). The stores' previous generated rows are
+deleted first, so a rerun replaces them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from ._deps import require
+from .seed import SeedTenant, seed_id, seed_tenants, write_tenants
+
+
+@dataclass(frozen=True)
+class Scale:
+    orders: int
+    stores: int
+    clients_per_store: int
+    history_days: int = 365
+
+
+SCALES = {
+    "1k": Scale(orders=1_000, stores=2, clients_per_store=50, history_days=90),
+    "100k": Scale(orders=100_000, stores=8, clients_per_store=2_000),
+    "10m": Scale(orders=10_000_000, stores=40, clients_per_store=25_000, history_days=730),
+}
+
+CATEGORIES = ["Cafetería", "Pastelería", "Sandwiches", "Bebidas", "Tragos", "Cervezas"]
+INGREDIENT_UNITS = ["g", "ml", "unit"]
+TABLES_PER_STORE = 12
+INGREDIENTS_PER_STORE = 60
+SELLABLES_PER_STORE = 20
+PRODUCTS_PER_STORE = 40
+
+# Relative order volume per hour of day (00..23): lunch and dinner peaks.
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 0, 1, 3, 6, 7, 6, 7, 12, 14, 9, 5, 5, 6, 8, 11, 14, 13, 8, 3]
+WEEKDAY_WEIGHTS = [0.8, 0.85, 0.9, 1.0, 1.3, 1.5, 1.2]  # Monday..Sunday
+
+STATUS_WEIGHTS = {"delivered": 70, "completed": 18, "served": 3, "cancelled": 7, "refunded": 2}
+PAYMENT_WEIGHTS = {"cash": 35, "mercadopago": 30, "card": 15, "wallet": 15, "transfer": 5}
+CHANNEL_WEIGHTS = {"table": 45, "qr": 35, "takeaway": 15, "delivery": 5}
+
+# Clears a store's generated rows, children first. The seeded login client stays.
+CLEAR_SQL = [
+    "delete from public.order_items where store_id = %(store)s",
+    "delete from public.orders where store_id = %(store)s",
+    "delete from public.wallet_ledger where store_id = %(store)s",
+    "delete from public.clients where store_id = %(store)s and id <> %(client)s",
+    "delete from public.menu_snapshots where store_id = %(store)s",
+    "delete from public.menu_rules where menu_id in (select id from public.menus where store_id = %(store)s)",
+    "delete from public.menu_products where menu_id in (select id from public.menus where store_id = %(store)s)",
+    "delete from public.menus where store_id = %(store)s",
+    "delete from public.venue_nodes where store_id = %(store)s",
+    "delete from public.inventory_location_stock where store_id = %(store)s",
+    "delete from public.storage_locations where store_id = %(store)s",
+    "delete from public.product_recipes where product_id in (select id from public.products where store_id = %(store)s)",
+    "delete from public.products where store_id = %(store)s",
+    "delete from public.inventory_items where store_id = %(store)s",
+    "delete from public.categories where store_id = %(store)s",
+]
+
+ORDER_COLUMNS = (
+    "id", "store_id", "order_number", "status", "channel", "client_id", "created_at", "placed_at",
+    "updated_at", "paid_at", "delivered_at", "is_paid", "payment_method", "payment_status",
+    "subtotal", "tax_amount", "discount_amount", "total_amount", "stock_deducted", "stock_reversed",
+    "table_number",
+)
+ORDER_ITEM_COLUMNS = (
+    "id", "order_id", "store_id", "product_id", "quantity", "unit_price", "total_price", "status", "created_at",
+)
+
+CHUNK_ORDERS = 20_000
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _weighted(weights: dict) -> tuple[list, list[float]]:
+    keys = list(weights)
+    total, cum = 0.0, []
+    for key in keys:
+        total += weights[key]
+        cum.append(total)
+    return keys, cum
+
+
+@dataclass
+class Catalog:
+    """What orders are drawn from: (product_id, price) with cumulative popularity."""
+    sellables: list[tuple[str, int]]
+    popularity: list[float]
+    clients: list[str]
+    tables: list[str]
+
+
+def _copy(conn, table: str, columns: tuple, rows) -> int:
+    count = 0
+    with conn.cursor().copy(f"COPY public.{table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    return count
+
+
+def _clear_store(conn, tenant: SeedTenant) -> None:
+    params = {"store": tenant.store_id, "client": seed_id("client", tenant.index)}
+    for sql in CLEAR_SQL:
+        conn.execute(sql, params)
+
+
+def _load_catalog(conn, tenant: SeedTenant, scale: Scale, rng: random.Random, now: datetime) -> Catalog:
+    store = tenant.store_id
+    category_ids = [_uuid(rng) for _ in CATEGORIES]
+    _copy(conn, "categories", ("id", "store_id", "name", "position", "is_active", "type"),
+          ((cid, store, name, i, True, "product") for i, (cid, name) in enumerate(zip(category_ids, CATEGORIES))))
+
+    location_id = _uuid(rng)
+    _copy(conn, "storage_locations", ("id", "store_id", "name", "type", "location_type", "is_default",
+                                      "is_consumable", "is_point_of_sale", "is_deletable"),
+          [(location_id, store, "Depósito", "warehouse", "warehouse", True, True, True, False)])
+
+    items, sellables = [], []
+    for i in range(INGREDIENTS_PER_STORE):
+        unit = INGREDIENT_UNITS[i % len(INGREDIENT_UNITS)]
+        package = 1 if unit == "unit" else rng.choice([500, 1000, 5000])
+        stock = rng.randint(50, 400) * package
+        items.append((_uuid(rng), store, f"Insumo {i:03d}", "ingredient", unit, stock, rng.randint(1, 40),
+                      None, False, False, package, stock // 10, category_ids[i % 3]))
+    for i in range(SELLABLES_PER_STORE):
+        price = rng.randint(12, 90) * 100
+        item_id = _uuid(rng)
+        items.append((item_id, store, f"Directo {i:03d}", "sellable", "unit", rng.randint(100, 2000),
+                      price // 3, price, True, True, 1, 20, category_ids[3 + i % 3]))
+        sellables.append((item_id, price))
+    _copy(conn, "inventory_items",
+          ("id", "store_id", "name", "item_type", "unit_type", "current_stock", "cost", "price",
+           "is_menu_visible", "is_sellable", "package_size", "min_stock_alert", "category_id"),
+          items)
+    ingredients = items[:INGREDIENTS_PER_STORE]
+    _copy(conn, "inventory_location_stock", ("id", "store_id", "item_id", "location_id", "closed_units", "open_packages"),
+          ((_uuid(rng), store, item[0], location_id, item[5] // item[10], "[]") for item in ingredients))
+
+    products, recipes = [], []
+    for i in range(PRODUCTS_PER_STORE):
+        product_id, price = _uuid(rng), rng.randint(20, 150) * 100
+        category = CATEGORIES[i % 3]
+        products.append((product_id, store, f"Producto {i:03d}", category, price, True, True, True, 0, now, now))
+        for ingredient in rng.sample(ingredients, rng.randint(2, 4)):
+            recipes.append((_uuid(rng), product_id, ingredient[0], rng.randint(1, 20) * (1 if ingredient[4] == "unit" else 10)))
+        sellables.append((product_id, price))
+    _copy(conn, "products", ("id", "store_id", "name", "category", "base_price", "active", "is_visible",
+                             "is_available", "tax_rate", "created_at", "updated_at"), products)
+    _copy(conn, "product_recipes", ("id", "product_id", "inventory_item_id", "quantity_required"), recipes)
+
+    tables = [_uuid(rng) for _ in range(TABLES_PER_STORE)]
+    _copy(conn, "venue_nodes", ("id", "store_id", "label", "type", "status", "position_x", "position_y"),
+          ((tid, store, f"Mesa {i + 1}", "table", "free", (i % 4) * 120, (i // 4) * 120) for i, tid in enumerate(tables)))
+
+    carta, barra = _uuid(rng), _uuid(rng)
+    _copy(conn, "menus", ("id", "store_id", "name", "is_active", "is_fallback", "priority"),
+          [(carta, store, "Carta", True, True, 0), (barra, store, "Barra", True, False, 10)])
+    _copy(conn, "menu_rules", ("id", "menu_id", "rule_type", "rule_config", "is_active"),
+          [(_uuid(rng), barra, "tables", json.dumps({"table_ids": tables[: TABLES_PER_STORE // 2]}), True)])
+    menu_rows = [(_uuid(rng), carta, p[0], True, i, None) for i, p in enumerate(products)]
+    menu_rows += [(_uuid(rng), barra, p[0], True, i, p[4] + 500) for i, p in enumerate(products[::2])]
+    _copy(conn, "menu_products", ("id", "menu_id", "product_id", "is_visible", "sort_order", "price_override"), menu_rows)
+
+    clients, ledger = [], []
+    since = now - timedelta(days=scale.history_days)
+    for i in range(scale.clients_per_store):
+        client_id = _uuid(rng)
+        joined = since + timedelta(seconds=rng.randrange(scale.history_days * 86400))
+        balance = 0
+        for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+            amount = rng.randint(1, 20) * 1000
+            balance += amount
+            ledger.append((_uuid(rng), client_id, store, "topup", amount, balance, "ARS", "mercadopago", joined))
+        clients.append((client_id, store, f"Cliente {i:06d}", f"Cliente {i:06d}",
+                        f"cliente{i:06d}.{tenant.index:03d}@payper.local", balance, rng.randint(0, 500), True, joined))
+    _copy(conn, "clients", ("id", "store_id", "name", "full_name", "email", "wallet_balance", "loyalty_points",
+                            "is_active", "created_at"), clients)
+    _copy(conn, "wallet_ledger", ("id", "wallet_id", "store_id", "entry_type", "amount", "balance_after",
+                                  "currency", "source", "created_at"), ledger)
+
+    # Zipf-like popularity: the n-th sellable is ordered ~1/n as often as the first.
+    # Shuffled first, so the favourites are random products rather than the first ones created.
+    rng.shuffle(sellables)
+    _, popularity = _weighted({position: 1.0 / (position + 1) for position in range(len(sellables))})
+    return Catalog(sellables, popularity, [c[0] for c in clients], tables)
+
+
+def _order_times(rng: random.Random, count: int, days: int, end: datetime) -> Iterator[datetime]:
+    start = end - timedelta(days=days)
+    day_weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=d)).weekday()] for d in range(days)]
+    hours, hour_cum = _weighted(dict(enumerate(HOUR_WEIGHTS)))
+    offsets = [
+        day * 86400 + rng.choices(hours, cum_weights=hour_cum)[0] * 3600 + rng.randrange(3600)
+        for day in rng.choices(range(days), weights=day_weights, k=count)
+    ]
+    offsets.sort()  # order_number grows with created_at, as in production
+    for seconds in offsets:
+        yield start + timedelta(seconds=seconds)
+
+
+def _orders(rng: random.Random, store_id: str, catalog: Catalog, count: int, days: int,
+            end: datetime) -> Iterator[tuple[tuple, list[tuple]]]:
+    statuses, status_cum = _weighted(STATUS_WEIGHTS)
+    methods, method_cum = _weighted(PAYMENT_WEIGHTS)
+    channels, channel_cum = _weighted(CHANNEL_WEIGHTS)
+    indices = range(len(catalog.sellables))
+
+    for number, placed in enumerate(_order_times(rng, count, days, end), start=1):
+        order_id = _uuid(rng)
+        status = rng.choices(statuses, cum_weights=status_cum)[0]
+        method = rng.choices(methods, cum_weights=method_cum)[0]
+        channel = rng.choices(channels, cum_weights=channel_cum)[0]
+        lines, subtotal = [], 0
+        for index in set(rng.choices(indices, cum_weights=catalog.popularity, k=rng.choice([1, 1, 2, 2, 3, 4]))):
+            product_id, price = catalog.sellables[index]
+            quantity = rng.choice([1, 1, 1, 2, 3])
+            subtotal += price * quantity
+            lines.append((_uuid(rng), order_id, store_id, product_id, quantity, price, price * quantity,
+                          "served", placed))
+        discount = subtotal // 10 if rng.random() < 0.05 else 0
+        paid = status != "cancelled"
+        done = placed + timedelta(minutes=rng.randint(4, 35))
+        client = rng.choice(catalog.clients) if catalog.clients and (method == "wallet" or rng.random() < 0.3) else None
+        table = rng.randrange(len(catalog.tables)) + 1 if channel == "table" else None
+        order = (
+            order_id, store_id, number, status, channel, client, placed, placed, done,
+            placed if paid else None, done if status in ("delivered", "completed", "served") else None,
+            paid, method, {"cancelled": "pending", "refunded": "refunded"}.get(status, "paid"),
+            subtotal, 0, discount, subtotal - discount, paid, status == "refunded",
+            str(table) if table else None,
+        )
+        yield order, lines
+
+
+def generate_store(dsn: str, tenant_index: int, scale_name: str, seed: int, end: datetime, orders: int) -> dict:
+    """Regenerate one store's catalog and history; returns row counts and timing."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    scale = SCALES[scale_name]
+    tenant = SeedTenant(tenant_index)
+    rng = random.Random(f"{seed}:{tenant_index}")
+    started = time.perf_counter()
+    counts = {"orders": 0, "order_items": 0}
+
+    with psycopg.connect(dsn) as conn:
+        conn.execute("set session_replication_role = replica")
+        conn.execute("set synchronous_commit = off")
+        _clear_store(conn, tenant)
+        catalog = _load_catalog(conn, tenant, scale, rng, end)
+        conn.commit()
+
+        batch: list[tuple] = []
+        items: list[tuple] = []
+        for order, lines in _orders(rng, tenant.store_id, catalog, orders, scale.history_days, end):
+            batch.append(order)
+            items.extend(lines)
+            if len(batch) >= CHUNK_ORDERS:
+                counts["orders"] += _copy(conn, "orders", ORDER_COLUMNS, batch)
+                counts["order_items"] += _copy(conn, "order_items", ORDER_ITEM_COLUMNS, items)
+                conn.commit()
+                batch, items = [], []
+        if batch:
+            counts["orders"] += _copy(conn, "orders", ORDER_COLUMNS, batch)
+            counts["order_items"] += _copy(conn, "order_items", ORDER_ITEM_COLUMNS, items)
+        conn.commit()
+        # The rollup triggers did not fire under replica; derive the store's rollups from its orders
+        conn.execute("select public.rebuild_sales_rollups(%s)", (tenant.store_id,))
+        conn.commit()
+
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def generate(dsn: str, scale_name: str = "1k", seed: int = 1, end: Optional[datetime] = None,
+             jobs: int = 1) -> dict:
+    """Seed the scale's tenants and bulk-load every store; returns totals."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    scale = SCALES[scale_name]
+    end = end or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    tenants = seed_tenants(dsn, scale.stores)
+    write_tenants(tenants)
+
+    per_store = [scale.orders // scale.stores + (1 if i < scale.orders % scale.stores else 0)
+                 for i in range(scale.stores)]
+    started = time.perf_counter()
+    args = [(dsn, t.index, scale_name, seed, end, n) for t, n in zip(tenants, per_store)]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(generate_store, *zip(*args)))
+    else:
+        results = [generate_store(*a) for a in args]
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        for table in ("orders", "order_items", "clients", "wallet_ledger", "inventory_items", "products"):
+            conn.execute(f"analyze public.{table}")
+
+    elapsed = time.perf_counter() - started
+    totals = {
+        "scale": scale_name,
+        "seed": seed,
+        "end": end.isoformat(),
+        "stores": scale.stores,
+        "orders": sum(r["orders"] for r in results),
+        "order_items": sum(r["order_items"] for r in results),
+        "seconds": round(elapsed, 1),
+    }
+    totals["orders_per_s"] = round(totals["orders"] / elapsed) if elapsed else None
+    return totals
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.datagen", description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None,
+                        help="last day of history (ISO date, UTC); default today")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+
+    end = args.end.replace(tzinfo=args.end.tzinfo or timezone.utc) if args.end else None
+    print(json.dumps(generate(args.dsn, args.scale, args.seed, end, args.jobs), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""Email queue throughput harness for ``supabase/functions/process-email-queue``.
+
+    python -m perf.email_queue --serve --emails 500 --workers 4 --send-concurrency 8
+    python -m perf.email_queue --serve --emails 300 --resend-latency-ms 150 --send-rate 2
+    python -m perf.email_queue --function-url http://127.0.0.1:54321/functions/v1/process-email-queue \\
+        --resend-port 54410 --proxy-port 54411
+
+The tool queues ``--emails`` receipts, as the payment webhook does: one
+``email_queue`` row per order, due now. ``--unpaid-share`` of the orders
+are left unpaid; the worker must cancel those. It starts two local
+servers (``perf.stubs``):
+
+* a Resend stand-in for ``POST /emails``, which the function reaches
+  through ``RESEND_API_URL``. It can add latency, answer 429 above
+  ``--resend-rate-limit`` requests/s, and fail ``--resend-fail-share`` of
+  the sends with a 500;
+* a counting proxy in front of ``SUPABASE_URL``, which counts the claim
+  and complete RPCs.
+
+``--serve`` runs the function with Deno on port 8000 with those URLs and
+the worker settings (``EMAIL_BATCH_SIZE``, ``EMAIL_SEND_CONCURRENCY``,
+``EMAIL_SEND_RATE_PER_SEC``). Without ``--serve``, give the function the
+variables written to ``tmp/perf/email_queue.env`` and pin the two ports.
+
+``--workers`` invocations run at once, as overlapping cron runs would.
+Each one is re-invoked as soon as it returns, until it answers "No
+pending emails". Reported: emails sent per second, invocation latency,
+RPC round trips per email and the most sends Resend saw in flight.
+
+Each queued row is then checked:
+
+* Resend got it exactly once, and the row is ``sent`` with one attempt;
+* an unpaid order's row is ``cancelled`` and was never sent;
+* a send that failed left the row ``pending`` with one attempt and
+  ``next_retry_at`` ``BACKOFF_MINUTES[1]`` (5 min) ahead.
+
+Any violation makes the run exit non-zero. Due rows already in the queue
+are sent too but not counted; use a fresh stack for clean numbers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from ._deps import require
+from .client import SupabaseClient
+from .config import FUNCTIONS_DIR, TENANTS_PATH
+from .mp_webhook import IN_CHUNK, DenoFunction
+from .stats import REPORT_DIR, LatencyStats, format_table, write_report
+from .stubs import CountingProxy, ResendStub
+
+RESEND_TEST_KEY = "re_payper_perf"
+RETRY_AFTER = timedelta(minutes=5)  # BACKOFF_MINUTES[1]: the wait after a first failed attempt
+INSERT_CHUNK = 500
+
+
+class QueueLoad:
+    def __init__(self, client: SupabaseClient, stub: ResendStub, function_url: str, emails: int,
+                 unpaid_share: float, workers: int, timeout_s: float, seed: int = 1):
+        self.client = client
+        self.stub = stub
+        self.function_url = function_url
+        self.emails = emails
+        self.unpaid_share = unpaid_share
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.rng = random.Random(seed)
+        self.rows: dict[str, dict] = {}  # recipient -> {order_id, paid}
+        self.stats = LatencyStats("invocation")
+        self.responses: Counter = Counter()
+
+    async def setup(self, store_id: str) -> None:
+        token = self.client.service_token
+        clients = await self.client.select("clients", {"store_id": f"eq.{store_id}", "select": "id", "limit": "1"},
+                                           token)
+        client_id = clients[0]["id"] if clients else None
+        run = uuid.uuid4().hex[:8]
+        due = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+        orders, queue = [], []
+        for i in range(self.emails):
+            order_id = str(uuid.uuid4())
+            paid = self.rng.random() >= self.unpaid_share
+            amount = float(self.rng.choice([1500, 2800, 4200, 6100]))
+            recipient = f"perf+{run}-{i:06d}@payper.local"
+            self.rows[recipient] = {"order_id": order_id, "paid": paid}
+            orders.append({
+                "id": order_id, "store_id": store_id, "client_id": client_id,
+                "status": "preparing" if paid else "pending", "channel": "qr",
+                "payment_provider": "mercadopago", "payment_method": "mercadopago",
+                "payment_status": "approved" if paid else "pending", "is_paid": paid, "subtotal": amount,
+                "tax_amount": 0, "discount_amount": 0, "total_amount": amount,
+            })
+            queue.append({
+                "order_id": order_id, "store_id": store_id, "recipient": recipient,
+                "subject": f"Tu pedido perf {run}-{i} ha sido confirmado", "payload": {"total": amount},
+                "status": "pending", "attempts": 0, "next_retry_at": due,
+            })
+        for start in range(0, len(orders), INSERT_CHUNK):
+            await self.client.insert("orders", orders[start:start + INSERT_CHUNK], token)
+            await self.client.insert("email_queue", queue[start:start + INSERT_CHUNK], token)
+
+    async def _worker(self, http, deadline: float) -> None:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await http.post(self.function_url, json={},
+                                           headers={"Authorization": f"Bearer {self.client.service_token}"})
+            except Exception as exc:
+                self.stats.error(type(exc).__name__)
+                return
+            self.stats.add((time.perf_counter() - started) * 1000)
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if response.status_code >= 400:
+                self.stats.error(str(response.status_code))
+                self.responses[f"{response.status_code} {str(body.get('error', ''))[:40]}".strip()] += 1
+                return
+            if body.get("message") == "No pending emails":
+                self.responses["drained"] += 1
+                return
+            self.responses["batch run"] += 1
+
+    async def run(self) -> float:
+        httpx = require("httpx", "httpx")
+        deadline = time.monotonic() + self.timeout_s
+        async with httpx.AsyncClient(timeout=self.timeout_s) as http:
+            started = time.perf_counter()
+            await asyncio.gather(*(self._worker(http, deadline) for _ in range(self.workers)))
+            return time.perf_counter() - started
+
+    async def verify(self, started_at: datetime) -> dict:
+        order_ids = [r["order_id"] for r in self.rows.values()]
+        rows = []
+        for start in range(0, len(order_ids), IN_CHUNK):
+            rows += await self.client.select("email_queue", {
+                "order_id": f"in.({','.join(order_ids[start:start + IN_CHUNK])})",
+                "select": "recipient,status,attempts,next_retry_at",
+            }, self.client.service_token)
+        deliveries = Counter(m.get("to") for m in self.stub.emails if m.get("to") in self.rows)
+        statuses = Counter(r["status"] for r in rows)
+        wrong = []
+        for row in rows:
+            expected = self.rows[row["recipient"]]
+            sends = deliveries.get(row["recipient"], 0)
+            if not expected["paid"]:
+                ok = row["status"] == "cancelled" and sends == 0
+            elif sends:
+                ok = row["status"] == "sent" and row["attempts"] == 1
+            else:
+                retry_at = datetime.fromisoformat(row["next_retry_at"]) if row["next_retry_at"] else None
+                ok = (row["status"] == "pending" and row["attempts"] == 1 and retry_at is not None
+                      and retry_at >= started_at + RETRY_AFTER - timedelta(seconds=5))
+            if not ok:
+                wrong.append({**row, "paid": expected["paid"], "sends": sends})
+        return {
+            "rows_checked": len(rows),
+            "statuses": dict(statuses),
+            "duplicate_sends": sum(1 for n in deliveries.values() if n > 1),
+            "rows_wrong_state": wrong[:50],
+            "rows_wrong_count": len(wrong),
+            "rows_missing": self.emails - len(rows),
+        }
+
+
+def _violations(checks: dict) -> list[str]:
+    keys = ("duplicate_sends", "rows_wrong_count", "rows_missing")
+    return [f"{key}={checks[key]}" for key in keys if checks.get(key)]
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    tenants = json.loads(TENANTS_PATH.read_text(encoding="utf-8"))
+    store_id = tenants[args.tenant % len(tenants)]["store_id"]
+
+    async with SupabaseClient.from_env() as client:
+        stub = ResendStub(args.resend_port, args.resend_latency_ms, args.resend_rate_limit,
+                          args.resend_fail_share, args.seed).start()
+        proxy = CountingProxy(client.url, args.proxy_port).start()
+        env = {
+            "SUPABASE_URL": proxy.url, "SUPABASE_SERVICE_ROLE_KEY": client.service_token,
+            "RESEND_API_URL": f"{stub.url}/emails", "RESEND_API_KEY": RESEND_TEST_KEY,
+            "EMAIL_BATCH_SIZE": str(args.batch_size), "EMAIL_SEND_CONCURRENCY": str(args.send_concurrency),
+            "EMAIL_SEND_RATE_PER_SEC": str(args.send_rate), "ENVIRONMENT": "development",
+        }
+        REPORT_DIR.mkdir(parents=True, exist_ok=True)
+        (REPORT_DIR / "email_queue.env").write_text("".join(f"{k}={v}\n" for k, v in env.items()),
+                                                    encoding="utf-8")
+
+        function = DenoFunction(FUNCTIONS_DIR / "process-email-queue" / "index.ts", env) if args.serve else None
+        try:
+            function_url = function.start().url if function else args.function_url
+            load = QueueLoad(client, stub, function_url, args.emails, args.unpaid_share, args.workers,
+                             args.timeout, args.seed)
+            await load.setup(store_id)
+            proxy.requests.clear()
+            stub.requests.clear()
+            started_at = datetime.now(timezone.utc)
+            elapsed = await load.run()
+            round_trips = dict(proxy.requests.most_common())
+            checks = await load.verify(started_at)
+        finally:
+            if function:
+                function.stop()
+            proxy.stop()
+            stub.stop()
+
+    sent = sum(1 for m in stub.emails if m.get("to") in load.rows)
+    return {
+        "config": {
+            "store_id": store_id, "function_url": function_url, "emails": args.emails,
+            "unpaid_share": args.unpaid_share, "workers": args.workers, "batch_size": args.batch_size,
+            "send_concurrency": args.send_concurrency, "send_rate": args.send_rate,
+            "resend_latency_ms": args.resend_latency_ms, "resend_rate_limit": args.resend_rate_limit,
+            "resend_fail_share": args.resend_fail_share,
+        },
+        "sent": sent,
+        "elapsed_s": round(elapsed, 2),
+        "emails_per_s": round(sent / elapsed, 1) if elapsed else None,
+        "invocations": [load.stats.to_dict()],
+        "responses": dict(load.responses.most_common()),
+        "resend_responses": dict(stub.requests.most_common()),
+        "resend_peak_in_flight": stub.peak_in_flight,
+        "round_trips": round_trips,
+        "round_trips_per_email": round(sum(round_trips.values()) / args.emails, 3) if args.emails else None,
+        "checks": checks,
+        "violations": _violations(checks),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.email_queue", description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--serve", action="store_true", help="run the function with deno on :8000")
+    target.add_argument("--function-url", help="an already served process-email-queue")
+    parser.add_argument("--emails", type=int, default=300)
+    parser.add_argument("--unpaid-share", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=2, help="concurrent invocations")
+    parser.add_argument("--batch-size", type=int, default=50, help="EMAIL_BATCH_SIZE")
+    parser.add_argument("--send-concurrency", type=int, default=4, help="EMAIL_SEND_CONCURRENCY")
+    parser.add_argument("--send-rate", type=float, default=0.0,
+                        help="EMAIL_SEND_RATE_PER_SEC (0 = unpaced; Resend's default limit is 2)")
+    parser.add_argument("--resend-latency-ms", type=float, default=100.0, help="added latency per send")
+    parser.add_argument("--resend-rate-limit", type=float, default=0.0, help="429 above this many sends/s")
+    parser.add_argument("--resend-fail-share", type=float, default=0.0, help="share of sends answered 500")
+    parser.add_argument("--resend-port", type=int, default=0, help="Resend stand-in port (0 = any)")
+    parser.add_argument("--proxy-port", type=int, default=0, help="counting proxy port (0 = any)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before the workers give up")
+    parser.add_argument("--tenant", type=int, default=0, help="tenant of tmp/tenants.json to use")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    path = write_report("email_queue", report)
+    print(format_table(report["invocations"], f"{report['sent']} emails in {report['elapsed_s']}s, "
+                                              f"{report['emails_per_s']} emails/s"))
+    print(f"round-trips/email {report['round_trips_per_email']}, "
+          f"Resend peak in flight {report['resend_peak_in_flight']}, statuses {report['checks']['statuses']}")
+    for violation in report["violations"]:
+        print(f"QUEUE: {violation}")
+    print(f"report: {path}")
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
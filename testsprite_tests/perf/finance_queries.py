@@ -0,0 +1,556 @@
+"""Finance report query benchmark at growing dataset sizes.
+
+    python -m perf.finance_queries                          # 1k, then 100k
+    python -m perf.finance_queries --scales 1k,100k,10m --windows day,month,year
+    python -m perf.finance_queries --no-generate            # whatever is loaded
+
+For each scale, ``perf.datagen`` regenerates the data (skipped with
+``--no-generate``). The RPCs the Finance and Dashboard pages call are then
+run for a few stores over the last ``day``/``week``/``month``/``year`` of
+history:
+
+* ``get_financial_metrics`` (the 3-argument P&L version);
+* ``get_financial_metrics_paginated``, after a timed refresh of
+  ``daily_sales_summary``, which it reads;
+* ``get_financial_chart_data``;
+* ``get_top_products``;
+* ``get_session_expected_cash``, for a ``bench`` cash session over the
+  last day. The last day's cash orders are assigned to it.
+
+Each call is timed ``--repeat`` times on a warm connection. One more run,
+on a connection with ``auto_explain`` loaded, captures:
+
+* the ``EXPLAIN (ANALYZE, BUFFERS)`` plan of the call;
+* the plan of every statement inside the function
+  (``log_nested_statements``), sent back as notices.
+
+These plans are written to ``tmp/perf/finance_plans/``. A sequential scan
+is flagged when it reads at least ``--seq-scan-rows`` rows of one of the
+history tables.
+
+Every result is checked against a Python aggregation of the raw rows. The
+aggregation applies the documented rules, not a copy of each function's
+SQL: ``is_revenue_order`` for revenue statuses, and store-scoped wallet
+top-ups. A function that drifts from those rules shows up as a mismatch.
+Talks to Postgres directly (``--dsn``/``PAYPER_LOCAL_PG_DSN``) as a
+superuser, which ``auto_explain`` needs. Timestamps are in UTC.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from ._deps import require
+from .datagen import SCALES, generate
+from .seed import SeedTenant, seed_id
+from .stats import REPORT_DIR, LatencyStats, write_report
+
+FUNCTIONS = (
+    "get_financial_metrics", "get_financial_metrics_paginated", "get_financial_chart_data", "get_top_products",
+    "get_session_expected_cash",
+)
+WINDOWS = {"day": 1, "week": 7, "month": 30, "year": 365}
+# is_revenue_order(): everything except these counts as revenue.
+NON_REVENUE = {"draft", "pending", "cancelled", "refunded", "rejected"}
+HISTORY_TABLES = {
+    "orders", "order_items", "wallet_ledger", "wallet_transactions", "inventory_audit_logs",
+    "loyalty_transactions", "cash_movements", "fixed_expenses", "daily_sales_summary",
+}
+SUMMARY_TZ = ZoneInfo("America/Argentina/Buenos_Aires")  # daily_sales_summary's sale_date
+PAGE_SIZE = 30
+TOP_LIMIT = 10
+TOLERANCE = 0.01
+PLAN_DIR = REPORT_DIR / "finance_plans"
+
+CALLS = {
+    "get_financial_metrics": "select public.get_financial_metrics(%(start)s, %(end)s, %(store)s)",
+    "get_financial_metrics_paginated": (
+        "select * from public.get_financial_metrics_paginated(%(store)s, %(start_date)s, %(end_date)s, "
+        f"{PAGE_SIZE}, 0)"
+    ),
+    "get_financial_chart_data": "select public.get_financial_chart_data(%(start)s, %(end)s, %(store)s)",
+    "get_top_products": f"select * from public.get_top_products(%(store)s, %(start_date)s, %(end_date)s, {TOP_LIMIT})",
+    "get_session_expected_cash": "select public.get_session_expected_cash(%(session)s)",
+}
+
+
+def is_revenue(status: str) -> bool:
+    return status not in NON_REVENUE
+
+
+def _num(value: Any) -> float:
+    return float(value or 0)
+
+
+def _close(a: Any, b: Any) -> bool:
+    return abs(_num(a) - _num(b)) <= TOLERANCE
+
+
+@dataclass
+class Window:
+    name: str
+    start: datetime
+    end: datetime
+
+    @property
+    def params(self) -> dict:
+        return {"start": self.start, "end": self.end, "start_date": self.start.date(), "end_date": self.end.date()}
+
+    def covers(self, ts: datetime) -> bool:
+        return self.start <= ts <= self.end  # BETWEEN
+
+
+@dataclass
+class StoreData:
+    """Raw rows of one store, fetched without any SQL aggregation."""
+    store_id: str
+    orders: list[dict]
+    items: dict[str, list[dict]]  # order_id -> lines
+    item_cost: dict[str, Optional[Decimal]]
+    products: set[str]
+    ledger: list[dict]
+    wallet_transactions: list[dict]
+    fixed_expenses: list[dict]
+    loyalty: list[dict]
+    session: dict = field(default_factory=dict)
+
+
+def _rows(conn, sql: str, params: Any = None) -> list[dict]:
+    cur = conn.execute(sql, params)
+    names = [c.name for c in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def load_store(conn, store_id: str, since: datetime) -> StoreData:
+    orders = _rows(conn, "select id::text, created_at, status::text, is_paid, payment_method, total_amount, "
+                         "client_id::text, cash_session_id::text from public.orders "
+                         "where store_id = %s and created_at >= %s", (store_id, since))
+    items: dict[str, list[dict]] = defaultdict(list)
+    for line in _rows(conn, "select oi.order_id::text, oi.product_id::text, oi.quantity, oi.unit_price "
+                            "from public.order_items oi join public.orders o on o.id = oi.order_id "
+                            "where o.store_id = %s and o.created_at >= %s", (store_id, since)):
+        items[line["order_id"]].append(line)
+    return StoreData(
+        store_id=store_id,
+        orders=orders,
+        items=items,
+        item_cost={r["id"]: r["cost"] for r in _rows(
+            conn, "select id::text, cost from public.inventory_items where store_id = %s", (store_id,))},
+        products={r["id"] for r in _rows(conn, "select id::text from public.products where store_id = %s",
+                                         (store_id,))},
+        ledger=_rows(conn, "select created_at, entry_type, amount, payment_method from public.wallet_ledger "
+                           "where store_id = %s and created_at >= %s", (store_id, since)),
+        wallet_transactions=_rows(conn, "select created_at, amount from public.wallet_transactions "
+                                        "where store_id = %s and created_at >= %s", (store_id, since)),
+        fixed_expenses=_rows(conn, "select expense_date, amount from public.fixed_expenses where store_id = %s",
+                             (store_id,)),
+        loyalty=_rows(conn, "select created_at, type, is_rolled_back, monetary_cost from public.loyalty_transactions "
+                            "where store_id = %s and created_at >= %s", (store_id, since)),
+    )
+
+
+def setup_cash_session(conn, tenant: SeedTenant, end: datetime) -> dict:
+    """A ``bench`` session over the last day, owning that day's cash orders."""
+    session = {
+        "id": seed_id("bench_cash_session", tenant.index),
+        "zone_id": seed_id("bench_zone", tenant.index),
+        "opened_at": end - timedelta(days=1),
+        "closed_at": end,
+        "start_amount": Decimal(50_000),
+    }
+    conn.execute("set session_replication_role = replica")  # skip the orders triggers
+    conn.execute("update public.orders set cash_session_id = null where cash_session_id = %s", (session["id"],))
+    conn.execute("delete from public.cash_sessions where id = %s", (session["id"],))
+    conn.execute("insert into public.venue_zones (id, store_id, name) values (%s, %s, 'bench') "
+                 "on conflict (id) do nothing", (session["zone_id"], tenant.store_id))
+    conn.execute(
+        "insert into public.cash_sessions (id, store_id, zone_id, opened_by, opened_at, closed_at, start_amount, "
+        "status) values (%s, %s, %s, %s, %s, %s, %s, 'closed')",
+        (session["id"], tenant.store_id, session["zone_id"], tenant.user_id("cashier"), session["opened_at"],
+         session["closed_at"], session["start_amount"]),
+    )
+    conn.execute(
+        "update public.orders set cash_session_id = %s where store_id = %s and payment_method = 'cash' "
+        "and created_at between %s and %s",
+        (session["id"], tenant.store_id, session["opened_at"], session["closed_at"]),
+    )
+    conn.execute("set session_replication_role = default")
+    conn.commit()
+    return session
+
+
+def expected_metrics(data: StoreData, window: Window) -> dict:
+    paid = [o for o in data.orders if window.covers(o["created_at"]) and is_revenue(o["status"]) and o["is_paid"]]
+    by_method: dict[Optional[str], float] = defaultdict(float)
+    for o in paid:
+        by_method[o["payment_method"]] += _num(o["total_amount"])
+    non_wallet = sum(_num(o["total_amount"]) for o in paid if o["payment_method"] not in (None, "wallet"))
+    topups = sum(_num(t["amount"]) for t in data.wallet_transactions
+                 if _num(t["amount"]) > 0 and window.covers(t["created_at"]))
+    cogs = sum(_num(line["quantity"]) * _num(data.item_cost.get(line["product_id"]))
+               for o in paid for line in data.items.get(o["id"], []))
+    fixed = sum(_num(e["amount"]) for e in data.fixed_expenses
+                if window.start.date() <= e["expense_date"] <= window.end.date())
+    loyalty = sum(_num(t["monetary_cost"]) for t in data.loyalty
+                  if t["type"] == "burn" and t["is_rolled_back"] is False and window.covers(t["created_at"]))
+    return {
+        "gross_revenue": sum(_num(o["total_amount"]) for o in paid),
+        "total_orders": len(paid),
+        "revenue_by_method": dict(by_method),
+        "net_cash_flow": non_wallet + topups,
+        "cogs_estimated": cogs,
+        "fixed_total": fixed,
+        "loyalty_cost": loyalty,
+    }
+
+
+def check_metrics(result: Any, expected: dict) -> list[str]:
+    result = result[0][0]
+    expenses = result.get("expenses") or {}
+    got = {
+        "gross_revenue": result.get("gross_revenue"),
+        "total_orders": result.get("total_orders"),
+        "net_cash_flow": result.get("net_cash_flow"),
+        "cogs_estimated": expenses.get("cogs_estimated"),
+        "fixed_total": expenses.get("fixed_total"),
+        "loyalty_cost": expenses.get("loyalty_cost"),
+    }
+    problems = [f"{k}: got {got[k]}, expected {expected[k]}" for k in got if not _close(got[k], expected[k])]
+    methods = {m["method"]: m["total"] for m in result.get("revenue_by_method") or []}
+    for method in set(methods) | set(expected["revenue_by_method"]):
+        if not _close(methods.get(method), expected["revenue_by_method"].get(method)):
+            problems.append(f"revenue_by_method[{method}]: got {methods.get(method)}, "
+                            f"expected {expected['revenue_by_method'].get(method)}")
+    return problems
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def expected_chart(data: StoreData, window: Window) -> dict[datetime, dict]:
+    buckets: dict[datetime, dict] = defaultdict(lambda: defaultdict(float))
+    for o in data.orders:
+        if not (window.covers(o["created_at"]) and is_revenue(o["status"]) and o["is_paid"]):
+            continue
+        method, amount = o["payment_method"], _num(o["total_amount"])
+        bucket = buckets[_hour(o["created_at"])]
+        if method == "mercadopago":
+            bucket["mercadopago"] += amount
+        elif method == "cash" or (method and "efectivo" in method.lower()):
+            bucket["cash_sales"] += amount
+        elif method == "wallet":
+            bucket["wallet_sales"] += amount
+    for entry in data.ledger:
+        if entry["entry_type"] == "topup" and _num(entry["amount"]) > 0 and window.covers(entry["created_at"]):
+            key = {"cash": "cash_topups", "transfer": "transfer_topups"}.get(entry["payment_method"])
+            if key:
+                buckets[_hour(entry["created_at"])][key] += _num(entry["amount"])
+    for bucket in buckets.values():
+        bucket["total_revenue"] = (bucket["mercadopago"] + bucket["cash_sales"] + bucket["cash_topups"]
+                                   + bucket["transfer_topups"])
+    return buckets
+
+
+def check_chart(result: Any, expected: dict[datetime, dict], window: Window) -> list[str]:
+    points = result[0][0] or []
+    hours = int((_hour(window.end) - _hour(window.start)).total_seconds() // 3600) + 1
+    problems = [] if len(points) == hours else [f"{len(points)} buckets, expected {hours}"]
+    seen = set()
+    for point in points:
+        bucket = _hour(datetime.fromisoformat(point["time"]))
+        seen.add(bucket)
+        want = expected.get(bucket, {})
+        for key in ("mercadopago", "cash_sales", "wallet_sales", "cash_topups", "transfer_topups", "total_revenue"):
+            if not _close(point.get(key), want.get(key)):
+                problems.append(f"{bucket:%Y-%m-%d %H}h {key}: got {point.get(key)}, expected {want.get(key, 0)}")
+    problems += [f"{bucket:%Y-%m-%d %H}h missing" for bucket in set(expected) - seen]
+    return problems[:20]
+
+
+def expected_top_products(data: StoreData, window: Window) -> dict[str, dict]:
+    totals: dict[str, dict] = {}
+    for o in data.orders:
+        day = o["created_at"].astimezone(timezone.utc).date()
+        if not (window.start.date() <= day <= window.end.date() and is_revenue(o["status"])):
+            continue
+        for line in data.items.get(o["id"], []):
+            if line["product_id"] not in data.products:
+                continue
+            row = totals.setdefault(line["product_id"], {"quantity": 0, "revenue": 0.0, "orders": set()})
+            row["quantity"] += line["quantity"]
+            row["revenue"] += line["quantity"] * _num(line["unit_price"])
+            row["orders"].add(o["id"])
+    return totals
+
+
+def check_top_products(result: Any, expected: dict[str, dict]) -> list[str]:
+    ranked = sorted((row["revenue"] for row in expected.values()), reverse=True)[:TOP_LIMIT]
+    problems = []
+    if [round(_num(r[4]), 2) for r in result] != [round(v, 2) for v in ranked]:
+        problems.append(f"top revenues {[_num(r[4]) for r in result]}, expected {ranked}")
+    for product_id, _, _, quantity, revenue, order_count in result:
+        want = expected.get(str(product_id))
+        if not want:
+            problems.append(f"{product_id}: not expected in the window")
+        elif (quantity, len(want["orders"])) != (want["quantity"], order_count) or not _close(revenue, want["revenue"]):
+            problems.append(f"{product_id}: got qty={quantity} revenue={revenue} orders={order_count}, expected "
+                            f"qty={want['quantity']} revenue={want['revenue']} orders={len(want['orders'])}")
+    return problems[:20]
+
+
+def expected_daily(data: StoreData, window: Window) -> dict[date, dict]:
+    days: dict[date, dict] = {}
+    for o in data.orders:
+        if not is_revenue(o["status"]):
+            continue
+        day = o["created_at"].astimezone(SUMMARY_TZ).date()
+        if not window.start.date() <= day <= window.end.date():
+            continue
+        row = days.setdefault(day, {"orders": 0, "revenue": 0.0, "paid": 0.0, "clients": set()})
+        row["orders"] += 1
+        row["revenue"] += _num(o["total_amount"])
+        row["paid"] += _num(o["total_amount"]) if o["is_paid"] else 0
+        if o["client_id"]:
+            row["clients"].add(o["client_id"])
+    return days
+
+
+def check_paginated(result: Any, expected: dict[date, dict]) -> list[str]:
+    page = sorted(expected, reverse=True)[:PAGE_SIZE]
+    problems = []
+    if [r[0] for r in result] != page:
+        problems.append(f"page dates {[str(r[0]) for r in result[:5]]}..., expected {[str(d) for d in page[:5]]}...")
+    if result and result[0][8] != len(expected):
+        problems.append(f"total_count {result[0][8]}, expected {len(expected)}")
+    for sale_date, total_orders, customers, revenue, paid, _, _, _, _ in result:
+        want = expected.get(sale_date)
+        if not want:
+            continue
+        if (total_orders, customers) != (want["orders"], len(want["clients"])) or not (
+                _close(revenue, want["revenue"]) and _close(paid, want["paid"])):
+            problems.append(f"{sale_date}: got orders={total_orders} customers={customers} revenue={revenue} "
+                            f"paid={paid}, expected orders={want['orders']} customers={len(want['clients'])} "
+                            f"revenue={want['revenue']} paid={want['paid']}")
+    return problems[:20]
+
+
+def expected_session_cash(data: StoreData) -> float:
+    session = data.session
+    orders = sum(
+        _num(o["total_amount"]) for o in data.orders
+        if o["cash_session_id"] == session["id"] and is_revenue(o["status"])
+        and o["payment_method"] and ("cash" in o["payment_method"].lower() or "efectivo" in o["payment_method"].lower())
+    )
+    return _num(session["start_amount"]) + orders  # the bench session has no cash_movements
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def seq_scans(plan: dict, min_rows: int) -> list[dict]:
+    """Seq Scans of history tables that read at least ``min_rows`` rows."""
+    found = []
+    for node in _walk(plan["Plan"]):
+        if node.get("Node Type") != "Seq Scan" or node.get("Relation Name") not in HISTORY_TABLES:
+            continue
+        loops = node.get("Actual Loops", 1) or 1
+        scanned = int((node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops)
+        if scanned >= min_rows:
+            found.append({
+                "relation": node["Relation Name"],
+                "rows_scanned": scanned,
+                "filter": node.get("Filter"),
+                "query": plan.get("Query Text", "").strip().splitlines()[0][:160],
+            })
+    return found
+
+
+def capture_plans(conn, sql: str, params: dict) -> tuple[dict, list[dict]]:
+    """``EXPLAIN (ANALYZE, BUFFERS)`` of the call plus auto_explain plans of its statements."""
+    nested: list[dict] = []
+
+    def on_notice(diag) -> None:
+        message = diag.message_primary or ""
+        if "plan:" in message and "{" in message:
+            plan = json.loads(message[message.index("{"):])
+            if not plan.get("Query Text", "").lstrip().lower().startswith("explain"):
+                nested.append(plan)
+
+    conn.add_notice_handler(on_notice)
+    try:
+        row = conn.execute(f"explain (analyze, buffers, format json) {sql}", params).fetchone()
+    finally:
+        conn.remove_notice_handler(on_notice)
+    outer = row[0][0] if isinstance(row[0], list) else json.loads(row[0])[0]
+    return outer, nested
+
+
+def explain_connection(dsn: str):
+    psycopg = require("psycopg", "psycopg[binary]")
+    conn = psycopg.connect(dsn, autocommit=True)
+    conn.execute("set timezone = 'UTC'")
+    conn.execute("load 'auto_explain'")
+    for setting, value in (("log_min_duration", "0"), ("log_analyze", "on"), ("log_buffers", "on"),
+                           ("log_nested_statements", "on"), ("log_format", "json"), ("log_level", "notice")):
+        conn.execute(f"set auto_explain.{setting} = {value}")
+    conn.execute("set client_min_messages = notice")
+    return conn
+
+
+CHECKS: dict[str, Callable[[StoreData, Window, Any], list[str]]] = {
+    "get_financial_metrics": lambda d, w, r: check_metrics(r, expected_metrics(d, w)),
+    "get_financial_metrics_paginated": lambda d, w, r: check_paginated(r, expected_daily(d, w)),
+    "get_financial_chart_data": lambda d, w, r: check_chart(r, expected_chart(d, w), w),
+    "get_top_products": lambda d, w, r: check_top_products(r, expected_top_products(d, w)),
+    "get_session_expected_cash": lambda d, w, r: (
+        [] if _close(r[0][0], expected_session_cash(d)) else [f"got {r[0][0]}, expected {expected_session_cash(d)}"]
+    ),
+}
+
+
+def bench_call(conn, explain_conn, name: str, sql: str, params: dict, repeat: int, min_rows: int,
+               plan_path) -> tuple[dict, Any]:
+    psycopg = require("psycopg", "psycopg[binary]")
+    stats = LatencyStats(name)
+    result: Any = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            result = conn.execute(sql, params).fetchall()
+        except psycopg.Error as exc:
+            stats.error(exc.sqlstate or type(exc).__name__)
+            return {**stats.to_dict(), "error": str(exc).splitlines()[0]}, None
+        stats.add((time.perf_counter() - started) * 1000)
+
+    outer, nested = capture_plans(explain_conn, sql, params)
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    plan_path.write_text(json.dumps({"call": outer, "statements": nested}, indent=2, default=str) + "\n",
+                         encoding="utf-8")
+    top = outer["Plan"]
+    row = stats.to_dict()
+    row.update({
+        "execution_ms": round(outer.get("Execution Time", 0), 2),
+        "shared_hit_blocks": top.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": top.get("Shared Read Blocks", 0),
+        "statements": len(nested),
+        "seq_scans": [scan for plan in nested for scan in seq_scans(plan, min_rows)] + seq_scans(outer, min_rows),
+        "plan": str(plan_path.relative_to(REPORT_DIR)),
+    })
+    return row, result
+
+
+def bench_store(dsn: str, tenant: SeedTenant, scale: str, windows: list[str], repeat: int, min_rows: int) -> list[dict]:
+    psycopg = require("psycopg", "psycopg[binary]")
+    rows = []
+    with psycopg.connect(dsn) as conn:
+        conn.execute("set timezone = 'UTC'")
+        latest = conn.execute("select max(created_at) from public.orders where store_id = %s",
+                              (tenant.store_id,)).fetchone()[0]
+        if latest is None:
+            raise RuntimeError(f"store {tenant.store_id} has no orders; run without --no-generate")
+        end = latest.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        session = setup_cash_session(conn, tenant, end)
+        spans = {name: Window(name, end - timedelta(days=WINDOWS[name]), end) for name in windows}
+        since = min(w.start for w in spans.values()) - timedelta(days=1)  # AR dates reach back 3h
+        data = load_store(conn, tenant.store_id, since)
+        data.session = session
+        conn.commit()
+
+        conn.autocommit = True
+        started = time.perf_counter()
+        conn.execute("refresh materialized view public.daily_sales_summary")
+        rows.append({"scale": scale, "store": tenant.index, "function": "refresh daily_sales_summary",
+                     "window": "-", "p50_ms": round((time.perf_counter() - started) * 1000, 1), "ok": True})
+
+        explain_conn = explain_connection(dsn)
+        try:
+            for name in FUNCTIONS:
+                targets = [Window("session", session["opened_at"], session["closed_at"])] \
+                    if name == "get_session_expected_cash" else list(spans.values())
+                for window in targets:
+                    params = {**window.params, "store": tenant.store_id, "session": session["id"]}
+                    plan_path = PLAN_DIR / scale / f"{tenant.index:03d}_{name}_{window.name}.json"
+                    row, result = bench_call(conn, explain_conn, name, CALLS[name], params, repeat, min_rows,
+                                             plan_path)
+                    problems = CHECKS[name](data, window, result) if result is not None else ["call failed"]
+                    row.update({"scale": scale, "store": tenant.index, "function": name, "window": window.name,
+                                "ok": not problems, "mismatches": problems})
+                    rows.append(row)
+                    print(format_rows([row]).splitlines()[1], flush=True)
+        finally:
+            explain_conn.close()
+    return rows
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [f"{'scale':<5} {'function':<34} {'window':<7} {'p50':>8} {'p95':>8} {'hit':>8} {'read':>7} "
+             f"{'seq':>3} check"]
+    for r in rows:
+        lines.append(
+            f"{r['scale']:<5} {r['function']:<34} {r['window']:<7} {r.get('p50_ms') or 0:8.1f} "
+            f"{r.get('p95_ms') or 0:8.1f} {r.get('shared_hit_blocks', 0):8d} {r.get('shared_read_blocks', 0):7d} "
+            f"{len(r.get('seq_scans', [])):3d} {'ok' if r['ok'] else 'MISMATCH' if 'error' not in r else 'ERROR'}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.finance_queries", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--scales", default="1k,100k", help=f"comma-separated, of {', '.join(SCALES)}")
+    parser.add_argument("--no-generate", action="store_true", help="benchmark the data already loaded")
+    parser.add_argument("--windows", default="day,month,year", help=f"comma-separated, of {', '.join(WINDOWS)}")
+    parser.add_argument("--stores", type=int, default=1, help="stores benchmarked per scale")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per function and window")
+    parser.add_argument("--seq-scan-rows", type=int, default=1000, help="flag seq scans reading this many rows")
+    parser.add_argument("--fail-on-seq-scan", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="datagen workers")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    scales = args.scales.split(",")
+    windows = args.windows.split(",")
+    unknown = (set(scales) - set(SCALES)) | (set(windows) - set(WINDOWS))
+    if unknown:
+        parser.error(f"unknown scales/windows: {', '.join(sorted(unknown))}")
+
+    print(format_rows([]))
+    rows, datasets = [], {}
+    for scale in ([scales[-1]] if args.no_generate else scales):
+        if not args.no_generate:
+            datasets[scale] = generate(args.dsn, scale, args.seed, jobs=args.jobs)
+        stores = min(args.stores, SCALES[scale].stores)
+        for index in range(stores):
+            rows += bench_store(args.dsn, SeedTenant(index), scale, windows, args.repeat, args.seq_scan_rows)
+
+    flagged = [{"scale": r["scale"], "function": r["function"], "window": r["window"], **scan}
+               for r in rows for scan in r.get("seq_scans", [])]
+    path = write_report("finance_queries", {"datasets": datasets, "calls": rows, "seq_scans": flagged})
+    for scan in flagged:
+        print(f"SEQ SCAN {scan['scale']} {scan['function']}/{scan['window']}: {scan['relation']} "
+              f"({scan['rows_scanned']} rows) in {scan['query']}")
+    for r in rows:
+        for problem in r.get("mismatches", []):
+            print(f"MISMATCH {r['scale']} {r['function']}/{r['window']}: {problem}")
+    print(f"report: {path}")
+    failed = any(not r["ok"] for r in rows) or (args.fail_on_seq_scan and flagged)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
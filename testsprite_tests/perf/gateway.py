@@ -0,0 +1,301 @@
+"""Kong-style gateway for the local stack: GoTrue mock plus PostgREST proxy.
+
+A single port serves what supabase-js expects from a Supabase project URL:
+
+* ``/auth/v1/*``: an in-process GoTrue mock. It checks password grants
+  against ``auth.users`` (bcrypt through pgcrypto ``crypt``), handles
+  refresh-token grants, ``/user``, ``/signup``, ``/logout`` and ``/recover``,
+  and issues HS256 JWTs. PostgREST accepts those JWTs, so RLS sees the
+  same ``auth.uid()`` it sees in production.
+* ``/rest/v1/*``: proxied to PostgREST. A missing ``Authorization`` header
+  is filled from ``apikey``, like Supabase's Kong does.
+* ``/functions/v1/*``: proxied to ``functions_url`` when one is configured
+  (``supabase functions serve`` or a Deno process).
+
+Realtime is not emulated.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import secrets
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from ._deps import require
+
+# Well-known development secret; the stack never listens beyond 127.0.0.1.
+DEFAULT_JWT_SECRET = "payper-local-dev-secret-at-least-32-characters"
+ACCESS_TOKEN_TTL_S = 3600
+
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "host", "content-length"}
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, PATCH, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "authorization, apikey, content-type, prefer, range, x-client-info, "
+                                    "accept-profile, content-profile, x-supabase-api-version",
+    "Access-Control-Expose-Headers": "content-range, content-location, etag",
+}
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def sign_jwt(claims: dict, secret: str = DEFAULT_JWT_SECRET) -> str:
+    header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64(signature)}"
+
+
+def verify_jwt(token: str, secret: str = DEFAULT_JWT_SECRET) -> Optional[dict]:
+    try:
+        header, payload, signature = token.split(".")
+    except ValueError:
+        return None
+    expected = _b64(hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(expected, signature):
+        return None
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    if claims.get("exp") and claims["exp"] < time.time():
+        return None
+    return claims
+
+
+def api_key(role: str, secret: str = DEFAULT_JWT_SECRET) -> str:
+    """Long-lived anon/service_role key, shaped like a Supabase project's keys."""
+    now = int(time.time())
+    return sign_jwt({"iss": "supabase-local", "role": role, "iat": now, "exp": now + 10 * 365 * 86400}, secret)
+
+
+class AuthMock:
+    """Just enough GoTrue for supabase-js password sessions."""
+
+    def __init__(self, dsn: str, secret: str = DEFAULT_JWT_SECRET):
+        psycopg = require("psycopg", "psycopg[binary]")
+        self._conn = psycopg.connect(dsn, autocommit=True)
+        self._lock = threading.Lock()
+        self._refresh: dict[str, str] = {}  # refresh token -> user id
+        self.secret = secret
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _query(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _user(self, user_id: str) -> Optional[dict]:
+        row = self._query(
+            "select id, email, raw_user_meta_data, raw_app_meta_data, created_at, updated_at, "
+            "email_confirmed_at from auth.users where id = %s",
+            (user_id,),
+        )
+        if row is None:
+            return None
+        return {
+            "id": str(row[0]),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": row[1],
+            "user_metadata": row[2] or {},
+            "app_metadata": {"provider": "email", "providers": ["email"], **(row[3] or {})},
+            "created_at": row[4].isoformat(),
+            "updated_at": row[5].isoformat(),
+            "email_confirmed_at": row[6].isoformat() if row[6] else None,
+        }
+
+    def session(self, user_id: str) -> dict:
+        user = self._user(user_id)
+        now = int(time.time())
+        claims = {
+            "aud": "authenticated",
+            "role": "authenticated",
+            "sub": user["id"],
+            "email": user["email"],
+            "iat": now,
+            "exp": now + ACCESS_TOKEN_TTL_S,
+            "session_id": str(uuid.uuid4()),
+            "app_metadata": user["app_metadata"],
+            "user_metadata": user["user_metadata"],
+        }
+        refresh = secrets.token_hex(16)
+        self._refresh[refresh] = user["id"]
+        self._query("update auth.users set last_sign_in_at = now() where id = %s returning id", (user["id"],))
+        return {
+            "access_token": sign_jwt(claims, self.secret),
+            "token_type": "bearer",
+            "expires_in": ACCESS_TOKEN_TTL_S,
+            "expires_at": claims["exp"],
+            "refresh_token": refresh,
+            "user": user,
+        }
+
+    def password_grant(self, email: str, password: str) -> Optional[dict]:
+        row = self._query(
+            "select id from auth.users where lower(email) = lower(%s) "
+            "and encrypted_password = extensions.crypt(%s, encrypted_password)",
+            (email, password),
+        )
+        return self.session(str(row[0])) if row else None
+
+    def refresh_grant(self, token: str) -> Optional[dict]:
+        user_id = self._refresh.pop(token, None)
+        return self.session(user_id) if user_id else None
+
+    def signup(self, email: str, password: str, metadata: dict) -> Optional[dict]:
+        row = self._query(
+            "insert into auth.users (email, encrypted_password, raw_user_meta_data, email_confirmed_at) "
+            "values (%s, extensions.crypt(%s, extensions.gen_salt('bf', 4)), %s, now()) "
+            "on conflict (email) do nothing returning id",
+            (email, password, json.dumps(metadata)),
+        )
+        return self.session(str(row[0])) if row else None
+
+    def user_from_token(self, authorization: str) -> Optional[dict]:
+        claims = verify_jwt(authorization.removeprefix("Bearer ").strip(), self.secret)
+        if not claims or not claims.get("sub"):
+            return None
+        return self._user(claims["sub"])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "Gateway"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:  # keep test output readable
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for key, value in {**CORS_HEADERS, **(headers or {})}.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, status: int, payload) -> None:
+        self._send(status, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_OPTIONS(self) -> None:
+        self._send(204)
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_GET
+
+    def _dispatch(self) -> None:
+        path = urlparse(self.path).path
+        if path.startswith("/auth/v1/"):
+            self._auth(path.removeprefix("/auth/v1"))
+        elif path.startswith("/rest/v1/"):
+            self._proxy(self.server.postgrest_url, self.path.removeprefix("/rest/v1"))
+        elif path.startswith("/functions/v1/") and self.server.functions_url:
+            self._proxy(self.server.functions_url, self.path.removeprefix("/functions/v1"))
+        else:
+            self._json(404, {"message": f"{path} is not served by the local stack"})
+
+    def _auth(self, path: str) -> None:
+        auth = self.server.auth
+        body = json.loads(self._body() or b"{}")
+        if path == "/token":
+            grant = parse_qs(urlparse(self.path).query).get("grant_type", [""])[0]
+            if grant == "password":
+                session = auth.password_grant(body.get("email", ""), body.get("password", ""))
+            elif grant == "refresh_token":
+                session = auth.refresh_grant(body.get("refresh_token", ""))
+            else:
+                session = None
+            if session is None:
+                self._json(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+            else:
+                self._json(200, session)
+        elif path == "/signup":
+            session = auth.signup(body.get("email", ""), body.get("password", ""), body.get("data") or {})
+            if session is None:
+                self._json(422, {"code": 422, "msg": "User already registered"})
+            else:
+                self._json(200, session)
+        elif path == "/user":
+            user = auth.user_from_token(self.headers.get("Authorization", ""))
+            if user is None:
+                self._json(401, {"code": 401, "msg": "invalid JWT"})
+            else:
+                self._json(200, user)
+        elif path == "/logout":
+            self._send(204)
+        elif path in ("/recover", "/otp", "/settings"):
+            self._json(200, {})
+        else:
+            self._json(404, {"code": 404, "msg": f"auth{path} is not mocked"})
+
+    def _proxy(self, base_url: str, path: str) -> None:
+        target = urlparse(base_url)
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP}
+        if "authorization" not in {k.lower() for k in headers} and self.headers.get("apikey"):
+            headers["Authorization"] = f"Bearer {self.headers['apikey']}"
+        body = self._body()
+
+        conn = self.server.upstream(target.hostname, target.port)
+        try:
+            conn.request(self.command, target.path.rstrip("/") + path, body=body or None, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            self.server.drop_upstream(target.hostname, target.port)
+            self._json(502, {"message": f"upstream {base_url} unavailable"})
+            return
+        out_headers = {k: v for k, v in response.getheaders() if k.lower() not in HOP_BY_HOP}
+        self._send(response.status, payload, out_headers)
+
+
+class Gateway(ThreadingHTTPServer):
+    """Serves the Supabase URL surface on ``127.0.0.1:<port>`` from a thread."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int, postgrest_url: str, auth: AuthMock, functions_url: Optional[str] = None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.postgrest_url = postgrest_url
+        self.functions_url = functions_url
+        self.auth = auth
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+
+    def upstream(self, host: str, port: int) -> http.client.HTTPConnection:
+        """Keep-alive connection to an upstream, one per handler thread."""
+        pool = self._local.__dict__.setdefault("conns", {})
+        if (host, port) not in pool:
+            pool[(host, port)] = http.client.HTTPConnection(host, port, timeout=60)
+        return pool[(host, port)]
+
+    def drop_upstream(self, host: str, port: int) -> None:
+        conn = self._local.__dict__.get("conns", {}).pop((host, port), None)
+        if conn is not None:
+            conn.close()
+
+    def start(self) -> "Gateway":
+        self._thread = threading.Thread(target=self.serve_forever, name="payper-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.auth.close()
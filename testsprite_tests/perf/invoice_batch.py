@@ -0,0 +1,388 @@
+"""Invoice extraction throughput harness for ``supabase/functions/process-invoice``.
+
+    python -m perf.invoice_batch --serve --invoices 200 --batch-size 25 --model-concurrency 4
+    python -m perf.invoice_batch --serve --modes single --client-concurrency 8
+    python -m perf.invoice_batch --serve --image-side 4000 --model-ms-per-mb 400
+    python -m perf.invoice_batch --function-url http://127.0.0.1:54321/functions/v1/process-invoice \\
+        --model-port 54420 --image-port 54421
+
+Each round uploads ``--invoices`` invoices to tenant ``--tenant``
+(``tmp/tenants.json``): one ``invoices`` row per image. ``--unique-share``
+of the images are distinct and the rest repeat earlier ones, as when a
+supplier's invoice is photographed twice. Every later round of
+``--rounds`` re-uploads the first round's images as new invoices.
+
+Images are synthetic grayscale PNGs whose longest side is
+``--image-side``. The default 1600 is what ``lib/invoiceImages.ts``
+leaves of a phone photo; 4000 is the photo as taken. Two local servers
+stand in for the outside world (``perf.stubs``):
+
+* ``GeminiStub`` for the model, reached through ``GEMINI_API_BASE_URL``.
+  A call takes ``--model-latency-ms`` plus ``--model-ms-per-mb`` per MB;
+* an image host for the ``image_url`` downloads (the function's
+  external-URL path).
+
+``--serve`` runs the function with Deno on port 8000 with those URLs,
+``INVOICE_MODEL_CONCURRENCY`` and ``INVOICE_BATCH_MAX``. Without
+``--serve``, give the function the variables written to
+``tmp/perf/invoice_batch.env`` and pin the two ports.
+
+There are two modes:
+
+* ``batch``: ``{"invoices": [...]}`` requests of ``--batch-size``, sent one
+  after the other as the invoice screen sends them. The NDJSON stream is
+  read as it arrives, so the report includes the time to the first
+  progress line;
+* ``single``: one ``{invoice_id, image_url}`` request per invoice, with
+  ``--client-concurrency`` in flight (the former screen sent them all at
+  once).
+
+Each mode uses its own images, so one mode never warms the other's
+cache. Per mode and round the report gives invoices per minute, the
+cache hit rate and per-invoice latency. The cache hit rate is the share
+of invoices answered without a model call. It also gives model calls,
+image MB sent to the model and the peak calls in flight.
+
+Every invoice is then checked. It must be ``extracted`` with the stand-in's
+extraction for its image and ``image_hash`` set to the image's SHA-256. In
+batch mode no image may reach the model twice. Any violation makes the run
+exit non-zero.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import struct
+import sys
+import time
+import uuid
+import zlib
+from collections import Counter
+from typing import Optional
+
+from ._deps import require
+from .client import SupabaseClient
+from .config import FUNCTIONS_DIR, TENANTS_PATH
+from .mp_webhook import IN_CHUNK, DenoFunction
+from .stats import REPORT_DIR, LatencyStats, format_table, write_report
+from .stubs import GeminiStub, StubServer, _StubHandler
+
+MODES = ("batch", "single")
+GEMINI_TEST_KEY = "perf-gemini-key"
+INK_SHARE = 0.25  # share of each pixel row that is "ink" (incompressible noise); the rest is paper
+
+
+def invoice_png(seed: str, side: int) -> bytes:
+    """A portrait grayscale PNG, ``side`` px tall, distinct per ``seed``."""
+    rng = random.Random(seed)
+    width, height = side * 3 // 4, side
+    ink = int(width * INK_SHARE)
+    raw = b"".join(b"\x00" + rng.randbytes(ink) + b"\xff" * (width - ink) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+class ImageHost(StubServer):
+    """Serves ``GET /images/<name>.png`` from memory, standing in for uploaded files."""
+
+    name = "image-host"
+
+    def __init__(self, port: int = 0):
+        super().__init__(port)
+        self.images: dict[str, bytes] = {}
+
+    def add(self, name: str, data: bytes) -> str:
+        self.images[name] = data
+        return f"{self.url}/images/{name}.png"
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        data = self.images.get(path.removeprefix("/images/").removesuffix(".png"))
+        if request.command != "GET" or data is None:
+            request._send(404)
+            return
+        self.count("image")
+        request._send(200, data, {"Content-Type": "image/png"})
+
+
+class Phase:
+    """One mode and round: its invoices, what the function answered and how fast."""
+
+    def __init__(self, mode: str, round_index: int, invoices: list[dict]):
+        self.mode = mode
+        self.round_index = round_index
+        self.invoices = invoices  # {id, image_url, image_hash}
+        self.latency = LatencyStats(f"{mode}/round {round_index + 1}")
+        self.sources: Counter = Counter()
+        self.first_event_ms: list[float] = []
+        self.elapsed_s = 0.0
+        self.model_calls = 0
+        self.model_bytes = 0
+
+
+class InvoiceLoad:
+    def __init__(self, client: SupabaseClient, host: ImageHost, stub: GeminiStub, function_url: str,
+                 invoices: int, unique_share: float, image_side: int, batch_size: int,
+                 client_concurrency: int, timeout_s: float, seed: int = 1):
+        self.client = client
+        self.host = host
+        self.stub = stub
+        self.function_url = function_url
+        self.invoices = invoices
+        self.unique_share = unique_share
+        self.image_side = image_side
+        self.batch_size = batch_size
+        self.client_concurrency = client_concurrency
+        self.timeout_s = timeout_s
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.images: dict[str, list[tuple[str, str]]] = {}  # mode -> [(url, hash)] per upload slot
+
+    def images_for(self, mode: str) -> list[tuple[str, str]]:
+        """The upload sequence of a mode: distinct images, then repeats of them, shuffled."""
+        if mode not in self.images:
+            distinct = max(1, round(self.invoices * self.unique_share))
+            pool = []
+            for i in range(distinct):
+                data = invoice_png(f"{self.run_id}:{mode}:{i}", self.image_side)
+                pool.append((self.host.add(f"{self.run_id}-{mode}-{i:05d}", data), hashlib.sha256(data).hexdigest()))
+            sequence = pool + [self.rng.choice(pool) for _ in range(self.invoices - distinct)]
+            self.rng.shuffle(sequence)
+            self.images[mode] = sequence
+        return self.images[mode]
+
+    async def upload(self, store_id: str, mode: str, round_index: int) -> Phase:
+        rows, invoices = [], []
+        for url, image_hash in self.images_for(mode):
+            invoice_id = str(uuid.uuid4())
+            rows.append({"id": invoice_id, "store_id": store_id, "image_url": url, "status": "pending",
+                         "proveedor": "", "nro_factura": f"perf-{self.run_id}", "subtotal": 0, "iva_total": 0,
+                         "total": 0})
+            invoices.append({"id": invoice_id, "image_url": url, "image_hash": image_hash})
+        for start in range(0, len(rows), 500):
+            await self.client.insert("invoices", rows[start:start + 500], self.client.service_token)
+        return Phase(mode, round_index, invoices)
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.client.service_token}"}
+
+    async def _run_batch(self, http, phase: Phase) -> None:
+        for start in range(0, len(phase.invoices), self.batch_size):
+            chunk = phase.invoices[start:start + self.batch_size]
+            payload = {"invoices": [{"invoice_id": i["id"], "image_url": i["image_url"]} for i in chunk]}
+            sent = time.perf_counter()
+            reported = set()
+            try:
+                async with http.stream("POST", self.function_url, json=payload, headers=self._headers()) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        phase.latency.error(str(response.status_code))
+                        continue
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        event = json.loads(line)
+                        if event.get("type") == "progress":
+                            ms = (time.perf_counter() - sent) * 1000
+                            if not reported:
+                                phase.first_event_ms.append(ms)
+                            reported.add(event["invoice_id"])
+                            if event.get("status") == "extracted":
+                                phase.latency.add(ms)
+                                phase.sources[event.get("source")] += 1
+                            else:
+                                phase.latency.error(str(event.get("error"))[:40])
+                        elif event.get("type") == "error":
+                            phase.latency.error(f"batch: {str(event.get('error'))[:40]}")
+            except Exception as exc:
+                phase.latency.error(type(exc).__name__)
+            for _ in range(len(chunk) - len(reported)):
+                phase.latency.error("not reported")
+
+    async def _run_single(self, http, phase: Phase) -> None:
+        queue = list(phase.invoices)
+
+        async def worker() -> None:
+            while queue:
+                invoice = queue.pop()
+                sent = time.perf_counter()
+                try:
+                    response = await http.post(self.function_url, headers=self._headers(),
+                                               json={"invoice_id": invoice["id"], "image_url": invoice["image_url"]})
+                except Exception as exc:
+                    phase.latency.error(type(exc).__name__)
+                    continue
+                if response.status_code >= 400:
+                    phase.latency.error(str(response.status_code))
+                else:
+                    phase.latency.add((time.perf_counter() - sent) * 1000)
+
+        await asyncio.gather(*(worker() for _ in range(self.client_concurrency)))
+
+    async def run(self, phase: Phase) -> None:
+        httpx = require("httpx", "httpx")
+        calls_before, bytes_before = sum(self.stub.calls.values()), self.stub.image_bytes
+        async with httpx.AsyncClient(timeout=self.timeout_s) as http:
+            started = time.perf_counter()
+            if phase.mode == "batch":
+                await self._run_batch(http, phase)
+            else:
+                await self._run_single(http, phase)
+            phase.elapsed_s = time.perf_counter() - started
+        phase.model_calls = sum(self.stub.calls.values()) - calls_before
+        phase.model_bytes = self.stub.image_bytes - bytes_before
+
+    async def verify(self, phase: Phase) -> dict:
+        by_id = {i["id"]: i for i in phase.invoices}
+        ids = list(by_id)
+        rows = []
+        for start in range(0, len(ids), IN_CHUNK):
+            rows += await self.client.select("invoices", {
+                "id": f"in.({','.join(ids[start:start + IN_CHUNK])})",
+                "select": "id,status,image_hash,raw_extraction",
+            }, self.client.service_token)
+        wrong = []
+        for row in rows:
+            expected = by_id[row["id"]]
+            ok = (row["status"] == "extracted" and row["image_hash"] == expected["image_hash"]
+                  and row["raw_extraction"] == GeminiStub.extraction_for(expected["image_hash"]))
+            if not ok:
+                wrong.append({"id": row["id"], "status": row["status"], "image_hash": row["image_hash"]})
+        return {
+            "statuses": dict(Counter(r["status"] for r in rows)),
+            "rows_wrong": wrong[:50],
+            "rows_wrong_count": len(wrong),
+            "rows_missing": len(ids) - len(rows),
+        }
+
+
+def phase_row(phase: Phase, checks: dict) -> dict:
+    total = len(phase.invoices)
+    return {
+        "mode": phase.mode,
+        "round": phase.round_index + 1,
+        "invoices": total,
+        "distinct_images": len({i["image_hash"] for i in phase.invoices}),
+        "elapsed_s": round(phase.elapsed_s, 2),
+        "invoices_per_min": round(total / phase.elapsed_s * 60, 1) if phase.elapsed_s else None,
+        "model_calls": phase.model_calls,
+        "cache_hit_rate": round(1 - phase.model_calls / total, 4) if total else None,
+        "sources": dict(phase.sources),
+        "model_mb": round(phase.model_bytes / 1_000_000, 2),
+        "first_progress_ms": round(min(phase.first_event_ms), 1) if phase.first_event_ms else None,
+        "latency": phase.latency.to_dict(),
+        "checks": checks,
+    }
+
+
+def _violations(rows: list[dict], stub: GeminiStub, batch_hashes: set[str]) -> list[str]:
+    out = []
+    for row in rows:
+        for key in ("rows_wrong_count", "rows_missing"):
+            if row["checks"].get(key):
+                out.append(f"{row['mode']}/round {row['round']}: {key}={row['checks'][key]}")
+    repeated = sum(n - 1 for h, n in stub.calls.items() if h in batch_hashes and n > 1)
+    if repeated:
+        out.append(f"batch: {repeated} model calls for images the model had already read")
+    return out
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    tenants = json.loads(TENANTS_PATH.read_text(encoding="utf-8"))
+    store_id = tenants[args.tenant % len(tenants)]["store_id"]
+    modes = args.modes.split(",")
+
+    async with SupabaseClient.from_env() as client:
+        stub = GeminiStub(args.model_port, args.model_latency_ms, args.model_ms_per_mb).start()
+        host = ImageHost(args.image_port).start()
+        env = {
+            "SUPABASE_URL": client.url, "SUPABASE_SERVICE_ROLE_KEY": client.service_token,
+            "GEMINI_API_KEY": GEMINI_TEST_KEY, "GEMINI_API_BASE_URL": stub.url,
+            "INVOICE_MODEL_CONCURRENCY": str(args.model_concurrency), "INVOICE_BATCH_MAX": str(args.batch_size),
+            "ENVIRONMENT": "development",
+        }
+        REPORT_DIR.mkdir(parents=True, exist_ok=True)
+        (REPORT_DIR / "invoice_batch.env").write_text("".join(f"{k}={v}\n" for k, v in env.items()),
+                                                      encoding="utf-8")
+
+        function = DenoFunction(FUNCTIONS_DIR / "process-invoice" / "index.ts", env) if args.serve else None
+        rows = []
+        try:
+            function_url = function.start().url if function else args.function_url
+            load = InvoiceLoad(client, host, stub, function_url, args.invoices, args.unique_share,
+                               args.image_side, args.batch_size, args.client_concurrency, args.timeout, args.seed)
+            for mode in modes:
+                for round_index in range(args.rounds):
+                    phase = await load.upload(store_id, mode, round_index)
+                    await load.run(phase)
+                    row = phase_row(phase, await load.verify(phase))
+                    rows.append(row)
+                    print(f"{mode:<6} round {round_index + 1}: {row['invoices']} invoices in {row['elapsed_s']}s, "
+                          f"{row['invoices_per_min']}/min, cache hit {row['cache_hit_rate']:.1%}, "
+                          f"{row['model_calls']} model calls ({row['model_mb']} MB), "
+                          f"first progress {row['first_progress_ms']} ms", flush=True)
+        finally:
+            if function:
+                function.stop()
+            host.stop()
+            stub.stop()
+
+    batch_hashes = {h for _, h in load.images.get("batch", [])}
+    return {
+        "config": {
+            "store_id": store_id, "function_url": function_url, "invoices": args.invoices,
+            "unique_share": args.unique_share, "rounds": args.rounds, "image_side": args.image_side,
+            "image_kb": round(sum(len(d) for d in host.images.values()) / max(1, len(host.images)) / 1000, 1),
+            "batch_size": args.batch_size, "model_concurrency": args.model_concurrency,
+            "client_concurrency": args.client_concurrency, "model_latency_ms": args.model_latency_ms,
+            "model_ms_per_mb": args.model_ms_per_mb,
+        },
+        "phases": rows,
+        "model_peak_in_flight": stub.peak_in_flight,
+        "violations": _violations(rows, stub, batch_hashes),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.invoice_batch", description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--serve", action="store_true", help="run the function with deno on :8000")
+    target.add_argument("--function-url", help="an already served process-invoice")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--invoices", type=int, default=100, help="invoices per round")
+    parser.add_argument("--unique-share", type=float, default=0.7, help="share of distinct images in a round")
+    parser.add_argument("--rounds", type=int, default=2, help="later rounds re-upload the first round's images")
+    parser.add_argument("--image-side", type=int, default=1600, help="longest side of the uploaded images (px)")
+    parser.add_argument("--batch-size", type=int, default=25, help="invoices per batch request (INVOICE_BATCH_MAX)")
+    parser.add_argument("--model-concurrency", type=int, default=4, help="INVOICE_MODEL_CONCURRENCY")
+    parser.add_argument("--client-concurrency", type=int, default=8, help="requests in flight in single mode")
+    parser.add_argument("--model-latency-ms", type=float, default=1500.0, help="model stand-in base latency")
+    parser.add_argument("--model-ms-per-mb", type=float, default=400.0, help="model stand-in latency per image MB")
+    parser.add_argument("--model-port", type=int, default=0, help="model stand-in port (0 = any)")
+    parser.add_argument("--image-port", type=int, default=0, help="image host port (0 = any)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per request")
+    parser.add_argument("--tenant", type=int, default=0, help="tenant of tmp/tenants.json to use")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    unknown = set(args.modes.split(",")) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(_main(args))
+    path = write_report("invoice_batch", report)
+    print(format_table([p["latency"] for p in report["phases"]], "per-invoice latency (batch: to its progress line)"))
+    for violation in report["violations"]:
+        print(f"INVOICE: {violation}")
+    print(f"report: {path}")
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Cold vs. warm public menu load under QR-scan bursts.
+
+    python -m perf.menu_snapshot                          # 1k dataset, bursts of 6
+    python -m perf.menu_snapshot --no-generate --burst 12 --bursts 100
+
+A burst is ``--burst`` guests at one table opening ``MenuPage`` together:
+one connection each, released by a barrier. Every scenario runs
+``--bursts`` bursts over random tables of the first ``--stores`` stores:
+
+* ``legacy``: ``resolve_menu`` then ``get_menu_products``, which is what
+  ``ClientContext`` ran before ``get_menu_snapshot``;
+* ``cold``: ``get_menu_snapshot`` right after ``bump_menu_version``, so the
+  burst has to rebuild the snapshot (one builder, the rest wait for it);
+* ``warm``: ``get_menu_snapshot`` with the snapshot current;
+* ``revalidate``: ``get_menu_snapshot`` with the current etag, which is a
+  revisit in the same tab and gets ``not_modified``.
+
+Per scenario the report gives latency per scan, response bytes and
+database load per scan: buffer accesses and tuples read from
+``pg_stat_database``. Those are flushed when a backend exits, and each burst
+uses fresh connections. Before the bursts, checks confirm:
+
+* the snapshot equals ``get_menu_products``;
+* the etag gives ``not_modified`` and is set as the PostgREST ``ETag``
+  header;
+* a price change invalidates the snapshot;
+* a stock deduction that keeps items in stock does not invalidate it.
+
+The checks roll back. Talks to Postgres directly
+(``--dsn``/``PAYPER_LOCAL_PG_DSN``), and the run exits non-zero if a check
+fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Optional
+
+from ._deps import require
+from .datagen import SCALES, generate
+from .seed import SeedTenant
+from .stats import LatencyStats, format_table, write_report
+
+SCENARIOS = ("legacy", "cold", "warm", "revalidate")
+STATS_FLUSH_S = 0.2  # backends report their counters on exit
+
+
+def tables_by_store(conn, store_ids: list[str]) -> dict[str, list[str]]:
+    out: dict[str, list[str]] = {}
+    for store_id in store_ids:
+        out[store_id] = [r[0] for r in conn.execute(
+            "select id::text from public.venue_nodes where store_id = %s and type = 'table'", (store_id,))]
+    return out
+
+
+def db_counters(conn) -> dict[str, int]:
+    conn.execute("select pg_stat_clear_snapshot()")
+    row = conn.execute("select blks_hit + blks_read, tup_returned + tup_fetched, xact_commit "
+                       "from pg_stat_database where datname = current_database()").fetchone()
+    return {"buffers": int(row[0]), "tuples": int(row[1]), "transactions": int(row[2])}
+
+
+def scan(conn, scenario: str, store_id: str, table_id: Optional[str], etag: Optional[str]) -> int:
+    """One guest opening the menu; returns the response size in bytes."""
+    if scenario == "legacy":
+        menu_id = conn.execute("select public.resolve_menu(%s, 'table', %s, null)", (store_id, table_id)).fetchone()[0]
+        rows = conn.execute("select coalesce(json_agg(p), '[]')::text from public.get_menu_products(%s) p",
+                            (menu_id,)).fetchone()[0]
+        return len(str(menu_id)) + len(rows)
+    body = conn.execute("select public.get_menu_snapshot(%s, 'table', %s, null, %s)::text",
+                        (store_id, table_id, etag if scenario == "revalidate" else None)).fetchone()[0]
+    return len(body)
+
+
+def run_scenario(dsn: str, scenario: str, tables: dict[str, list[str]], burst: int, bursts: int,
+                 rng: random.Random) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    stats = LatencyStats(scenario)
+    sizes: list[int] = []
+    lock = threading.Lock()
+
+    with psycopg.connect(dsn, autocommit=True) as control:
+        etags = {}
+        for store_id, store_tables in tables.items():
+            body = control.execute("select public.get_menu_snapshot(%s, 'table', %s)",
+                                   (store_id, store_tables[0] if store_tables else None)).fetchone()[0]
+            etags[store_id] = body.get("etag")
+        time.sleep(STATS_FLUSH_S)
+        before = db_counters(control)
+
+        for _ in range(bursts):
+            store_id = rng.choice(list(tables))
+            table_id = rng.choice(tables[store_id]) if tables[store_id] else None
+            if scenario == "cold":
+                control.execute("select public.bump_menu_version(%s)", (store_id,))
+            conns = [psycopg.connect(dsn, autocommit=True) for _ in range(burst)]
+            barrier = threading.Barrier(burst)
+
+            def guest(conn) -> None:
+                barrier.wait()
+                started = time.perf_counter()
+                try:
+                    size = scan(conn, scenario, store_id, table_id, etags[store_id])
+                except psycopg.Error as exc:
+                    with lock:
+                        stats.error(getattr(exc, "sqlstate", None) or type(exc).__name__)
+                    return
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    stats.add(elapsed)
+                    sizes.append(size)
+
+            threads = [threading.Thread(target=guest, args=(c,)) for c in conns]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            for c in conns:
+                c.close()
+
+        time.sleep(STATS_FLUSH_S)
+        after = db_counters(control)
+
+    scans = max(len(sizes), 1)
+    return {
+        **stats.to_dict(),
+        "bytes_per_scan": round(sum(sizes) / scans),
+        "buffers_per_scan": round((after["buffers"] - before["buffers"]) / scans, 1),
+        "tuples_per_scan": round((after["tuples"] - before["tuples"]) / scans, 1),
+    }
+
+
+def check(dsn: str, store_id: str, table_id: Optional[str]) -> dict:
+    """Correctness of the snapshot and its invalidation, all rolled back."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    results: dict[str, bool] = {}
+    with psycopg.connect(dsn) as conn:
+        snap = conn.execute("select public.get_menu_snapshot(%s, 'table', %s)", (store_id, table_id)).fetchone()[0]
+        headers = conn.execute("select current_setting('response.headers', true)").fetchone()[0]
+        raw = conn.execute("select coalesce(jsonb_agg(to_jsonb(p)), '[]') from public.get_menu_products(%s) p",
+                           (snap["menu_id"],)).fetchone()[0]
+        results["matches_get_menu_products"] = (sorted(json.dumps(r, sort_keys=True) for r in snap["products"] or [])
+                                                == sorted(json.dumps(r, sort_keys=True) for r in raw))
+        results["etag_header"] = any(h.get("ETag") == snap["etag"] for h in json.loads(headers or "[]"))
+
+        again = conn.execute("select public.get_menu_snapshot(%s, 'table', %s, null, %s)",
+                             (store_id, table_id, snap["etag"])).fetchone()[0]
+        results["not_modified"] = again["not_modified"] and again["products"] is None
+
+        def version() -> int:
+            return conn.execute("select coalesce((select version from public.menu_versions where store_id = %s), 0)",
+                                (store_id,)).fetchone()[0]
+
+        start_version = version()
+        conn.execute("update public.inventory_items set current_stock = current_stock - 1 "
+                     "where store_id = %s and is_sellable and current_stock > 10", (store_id,))
+        results["stock_deduction_keeps_version"] = version() == start_version
+
+        conn.execute("update public.products set base_price = base_price + 100 where id = "
+                     "(select id from public.products where store_id = %s and active and is_visible limit 1)",
+                     (store_id,))
+        changed = conn.execute("select public.get_menu_snapshot(%s, 'table', %s, null, %s)",
+                               (store_id, table_id, snap["etag"])).fetchone()[0]
+        results["price_change_invalidates"] = version() > start_version and not changed["not_modified"]
+        conn.rollback()
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.menu_snapshot", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--no-generate", action="store_true", help="use the data already loaded")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--stores", type=int, default=2)
+    parser.add_argument("--burst", type=int, default=6, help="guests scanning together")
+    parser.add_argument("--bursts", type=int, default=50, help="bursts per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    psycopg = require("psycopg", "psycopg[binary]")
+
+    dataset = None if args.no_generate else generate(args.dsn, args.scale, args.seed)
+    store_ids = [SeedTenant(i).store_id for i in range(min(args.stores, SCALES[args.scale].stores))]
+    with psycopg.connect(args.dsn) as conn:
+        tables = tables_by_store(conn, store_ids)
+
+    checks = check(args.dsn, store_ids[0], (tables[store_ids[0]] or [None])[0])
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+
+    rng = random.Random(args.seed)
+    rows = [run_scenario(args.dsn, s, tables, args.burst, args.bursts, rng) for s in scenarios]
+    print(format_table(rows, f"menu load, bursts of {args.burst}"))
+    for row in rows:
+        print(f"{row['name']:<11} {row['bytes_per_scan']:>8} B/scan {row['buffers_per_scan']:>9} buffers/scan "
+              f"{row['tuples_per_scan']:>9} tuples/scan")
+
+    path = write_report("menu_snapshot", {"dataset": dataset, "burst": args.burst, "bursts": args.bursts,
+                                          "checks": checks, "scenarios": rows})
+    print(f"report: {path}")
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
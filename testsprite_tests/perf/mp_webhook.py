@@ -0,0 +1,428 @@
+"""Mercado Pago webhook throughput harness for ``supabase/functions/mp-webhook``.
+
+    python -m perf.mp_webhook --serve --payments 500 --rate 200 --duplicates 3 --reorder 0.3
+    python -m perf.mp_webhook --serve --variant v2 --payments 200
+    python -m perf.mp_webhook --function-url http://127.0.0.1:54321/functions/v1/mp-webhook \\
+        --mp-port 54400 --proxy-port 54401
+
+The tool starts two local servers (``perf.stubs``):
+
+* a Mercado Pago stand-in for ``GET /v1/payments/<id>``, which the
+  function reaches through ``MP_API_URL``;
+* a counting proxy in front of ``SUPABASE_URL``. Every REST call and RPC
+  the function makes goes through it and is counted.
+
+``--serve`` runs the function itself with Deno (``index.ts`` for v1,
+``index_v2_secure.ts`` for v2) on port 8000, the ``std/http`` default, with
+those URLs, the service key and ``--secret`` as ``MP_WEBHOOK_SECRET``.
+Without ``--serve``, give the function the ``MP_API_URL``/``SUPABASE_URL``
+pair written to ``tmp/perf/mp_webhook.env``
+(``supabase functions serve --env-file``), and pin the two ports.
+
+Each of ``--payments`` pending orders gets an MP payment. The payment
+starts ``pending`` and sends a ``payment.created`` notification. It then
+turns ``approved`` (or ``rejected`` for ``--reject-share``) and sends a
+``payment.updated`` notification. Every notification is delivered
+``1 + --duplicates`` times, the way MP retries when it gets no timely
+200. For ``--reorder`` of the payments, ``updated`` arrives before
+``created``. Deliveries are signed like MP's ``x-signature`` (HMAC-SHA256
+over ``id:<data.id>;request-id:<x-request-id>;ts:<ts>``) and sent
+open-loop at ``--rate``/s with at most ``--concurrency`` in flight.
+
+Reported: processed notifications/s, latency and status codes per
+delivery kind, REST round-trips and MP fetches per delivery,
+``verify_payment`` calls per payment and, when ``PAYPER_LOCAL_PG_DSN`` is
+set, Postgres transactions per delivery. The idempotency checks are:
+
+* approved orders are paid (and ``preparing`` on v1); rejected ones are unpaid;
+* one ``payment_webhooks`` row per notification, marked processed (v1);
+* at most one ``email_queue`` row per order.
+
+Any violation makes the run exit non-zero.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ._deps import require
+from .client import SupabaseClient
+from .config import FUNCTIONS_DIR, TENANTS_PATH
+from .stats import REPORT_DIR, LatencyStats, format_table, write_report
+from .stubs import CountingProxy, MercadoPagoStub
+
+VARIANTS = {"v1": "index.ts", "v2": "index_v2_secure.ts"}
+DENO_PORT = 8000  # std/http serve() default; the functions do not take a port
+DEFAULT_SECRET = "payper-perf-webhook-secret"
+MP_TEST_TOKEN = "TEST-payper-perf-token"
+IN_CHUNK = 150
+
+
+@dataclass(frozen=True)
+class Delivery:
+    payment_id: str
+    order_id: str
+    notification_id: int
+    action: str  # "payment.created" | "payment.updated"
+    copy: int  # 0 = first delivery, >0 = MP retry
+
+
+def sign(secret: str, data_id: str, request_id: str, ts: str) -> str:
+    digest = hmac.new(secret.encode(), f"id:{data_id};request-id:{request_id};ts:{ts}".encode(),
+                      hashlib.sha256).hexdigest()
+    return f"ts={ts},v1={digest}"
+
+
+def deno_binary() -> str:
+    found = os.environ.get("PAYPER_DENO_BIN") or shutil.which("deno")
+    if not found:
+        raise FileNotFoundError("deno not found; install it, set PAYPER_DENO_BIN, or pass --function-url")
+    return found
+
+
+class DenoFunction:
+    """``deno run`` of one edge function file, waited on until it answers."""
+
+    def __init__(self, path: Path, env: dict[str, str]):
+        self.path = path
+        self.env = env
+        self._proc: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{DENO_PORT}"
+
+    def start(self, timeout_s: float = 120) -> "DenoFunction":
+        # First start downloads the esm.sh/deno.land imports, hence the long timeout.
+        self._proc = subprocess.Popen(
+            [deno_binary(), "run", "--allow-net", "--allow-env", "--allow-read", str(self.path)],
+            env={**os.environ, **self.env}, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"deno exited: {self._proc.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                urllib.request.urlopen(urllib.request.Request(self.url, method="OPTIONS"), timeout=1).close()
+                return self
+            except urllib.error.HTTPError:
+                return self  # any HTTP answer means it is listening
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.3)
+        raise TimeoutError(f"{self.path.name} did not start listening on :{DENO_PORT}")
+
+    def stop(self) -> None:
+        if self._proc is not None:
+            self._proc.terminate()
+            self._proc.wait(timeout=10)
+            self._proc = None
+
+
+class WebhookLoad:
+    def __init__(self, client: SupabaseClient, stub: MercadoPagoStub, proxy: CountingProxy, function_url: str,
+                 variant: str, payments: int, rate: float, duplicates: int, reorder: float,
+                 reject_share: float, concurrency: int, secret: Optional[str], seed: int = 1):
+        self.client = client
+        self.stub = stub
+        self.proxy = proxy
+        self.function_url = function_url
+        self.variant = variant
+        self.payments = payments
+        self.rate = rate
+        self.duplicates = duplicates
+        self.reorder = reorder
+        self.reject_share = reject_share
+        self.concurrency = concurrency
+        self.secret = secret
+        self.rng = random.Random(seed)
+        self.final_status: dict[str, str] = {}
+        self.flipped: set[str] = set()
+        self.stats = {kind: LatencyStats(kind) for kind in ("first", "retry")}
+        self.responses: Counter = Counter()
+
+    async def _preflight(self) -> None:
+        try:
+            await self.client.rpc("verify_payment", {
+                "p_mp_payment_id": "0", "p_order_id": str(uuid.uuid4()), "p_amount": 0, "p_status": "pending",
+                "p_status_detail": "", "p_payment_method": "", "p_payment_type": "", "p_payer_email": "",
+                "p_date_approved": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }, self.client.service_token)
+        except Exception as exc:
+            if getattr(exc, "status", 0) == 404:
+                raise RuntimeError("verify_payment is not in the database; apply "
+                                   "supabase/migrations/fix_verify_payment.sql first") from exc
+            raise
+
+    async def setup(self, store_id: str) -> list[Delivery]:
+        if self.variant == "v1":
+            await self._preflight()
+        token = self.client.service_token
+        await self.client.update("stores", {"id": f"eq.{store_id}"},
+                                 {"mp_access_token": MP_TEST_TOKEN, "mp_tokens_encrypted": False}, token)
+        clients = await self.client.select("clients", {"store_id": f"eq.{store_id}", "select": "id", "limit": "1"},
+                                           token)
+        client_id = clients[0]["id"] if clients else None
+
+        base = int(time.time()) * 10_000
+        orders, deliveries = [], []
+        for i in range(self.payments):
+            order_id, payment_id = str(uuid.uuid4()), str(base + i)
+            amount = float(self.rng.choice([1500, 2800, 4200, 6100]))
+            orders.append({
+                "id": order_id, "store_id": store_id, "client_id": client_id, "status": "pending",
+                "channel": "qr", "payment_provider": "mercadopago", "payment_method": "mercadopago",
+                "payment_status": "pending", "is_paid": False, "subtotal": amount, "tax_amount": 0,
+                "discount_amount": 0, "total_amount": amount, "delivery_status": "pending",
+            })
+            self.stub.add_payment(payment_id, order_id if self.variant == "v1" else f"ORDER_{order_id}", amount)
+            self.final_status[payment_id] = "rejected" if self.rng.random() < self.reject_share else "approved"
+            pair = [Delivery(payment_id, order_id, (base + i) * 10 + 1, "payment.created", 0),
+                    Delivery(payment_id, order_id, (base + i) * 10 + 2, "payment.updated", 0)]
+            if self.rng.random() < self.reorder:
+                pair.reverse()
+            deliveries.extend(pair)
+        for start in range(0, len(orders), 500):
+            await self.client.insert("orders", orders[start:start + 500], token)
+
+        # Retries land a little later than the delivery they repeat.
+        slots = []
+        for position, delivery in enumerate(deliveries):
+            slots.append((float(position), delivery))
+            for copy in range(1, self.duplicates + 1):
+                slots.append((position + self.rng.uniform(1, 20) * copy, Delivery(
+                    delivery.payment_id, delivery.order_id, delivery.notification_id, delivery.action, copy)))
+        return [delivery for _, delivery in sorted(slots, key=lambda slot: slot[0])]
+
+    def _request(self, delivery: Delivery) -> tuple[dict, dict]:
+        body = {
+            "id": delivery.notification_id, "live_mode": False, "type": "payment", "api_version": "v1",
+            "action": delivery.action, "date_created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "data": {"id": delivery.payment_id},
+        }
+        if self.variant == "v2":
+            body["external_reference"] = f"ORDER_{delivery.order_id}"
+        headers = {"Content-Type": "application/json", "x-request-id": str(uuid.uuid4())}
+        if self.secret:
+            headers["x-signature"] = sign(self.secret, delivery.payment_id, headers["x-request-id"],
+                                          str(int(time.time())))
+        return body, headers
+
+    async def _deliver(self, http, store_id: str, delivery: Delivery, gate: asyncio.Semaphore) -> None:
+        # MP changes the payment before it notifies about the change.
+        if delivery.action == "payment.updated" and delivery.payment_id not in self.flipped:
+            self.stub.set_status(delivery.payment_id, self.final_status[delivery.payment_id])
+            self.flipped.add(delivery.payment_id)
+        body, headers = self._request(delivery)
+        stats = self.stats["retry" if delivery.copy else "first"]
+        async with gate:
+            started = time.perf_counter()
+            try:
+                response = await http.post(self.function_url, params={
+                    "store_id": store_id, "type": "payment", "data.id": delivery.payment_id,
+                }, json=body, headers=headers)
+            except Exception as exc:
+                stats.error(type(exc).__name__)
+                return
+        elapsed = (time.perf_counter() - started) * 1000
+        try:
+            message = str(response.json().get("message") or "")
+        except ValueError:
+            message = ""
+        self.responses[f"{response.status_code} {message[:40]}".strip()] += 1
+        if response.status_code >= 400:
+            stats.error(str(response.status_code))
+        else:
+            stats.add(elapsed)
+
+    async def run(self, store_id: str, schedule: list[Delivery]) -> float:
+        httpx = require("httpx", "httpx")
+        gate = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=self.concurrency)) as http:
+            tasks = []
+            started = time.perf_counter()
+            for delivery in schedule:
+                tasks.append(asyncio.create_task(self._deliver(http, store_id, delivery, gate)))
+                await asyncio.sleep(self.rng.expovariate(self.rate))
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - started
+
+    async def _select_in(self, table: str, column: str, values: list[str], select: str) -> list[dict]:
+        rows = []
+        for start in range(0, len(values), IN_CHUNK):
+            chunk = ",".join(values[start:start + IN_CHUNK])
+            rows += await self.client.select(table, {column: f"in.({chunk})", "select": select},
+                                             self.client.service_token)
+        return rows
+
+    async def verify(self, schedule: list[Delivery]) -> dict:
+        by_order = {d.order_id: d.payment_id for d in schedule}
+        orders = await self._select_in("orders", "id", list(by_order), "id,is_paid,payment_status,status")
+        wrong = []
+        for row in orders:
+            expected = self.final_status[by_order[row["id"]]]
+            if expected != "approved":
+                ok = not row["is_paid"]
+            else:
+                # v2 only flips is_paid; verify_payment also moves the order to preparing.
+                ok = row["is_paid"] and (self.variant == "v2" or row["status"] == "preparing")
+            if not ok:
+                wrong.append({"order_id": row["id"], "expected": expected, "is_paid": row["is_paid"],
+                              "status": row["status"]})
+
+        notifications = sorted({str(d.notification_id) for d in schedule})
+        webhook_rows = await self._select_in("payment_webhooks", "provider_event_id", notifications,
+                                             "provider_event_id,processed")
+        per_event = Counter(r["provider_event_id"] for r in webhook_rows)
+        emails = Counter(r["order_id"] for r in await self._select_in("email_queue", "order_id", list(by_order),
+                                                                      "order_id"))
+        result = {
+            "orders_checked": len(orders),
+            "orders_wrong_state": wrong[:50],
+            "orders_wrong_count": len(wrong),
+            "duplicate_emails": sum(1 for n in emails.values() if n > 1),
+        }
+        if self.variant == "v1":
+            result.update({
+                "webhook_rows": len(webhook_rows),
+                "notifications": len(notifications),
+                "duplicate_webhook_rows": sum(n - 1 for n in per_event.values() if n > 1),
+                "missing_webhook_rows": len(set(notifications) - set(per_event)),
+                "unprocessed_webhook_rows": sum(1 for r in webhook_rows if not r["processed"]),
+            })
+        return result
+
+
+def _xact_count(dsn: Optional[str]) -> Optional[int]:
+    if not dsn:
+        return None
+    psycopg = require("psycopg", "psycopg[binary]")
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        row = conn.execute("select xact_commit + xact_rollback from pg_stat_database "
+                           "where datname = current_database()").fetchone()
+    return int(row[0])
+
+
+def _violations(checks: dict) -> list[str]:
+    keys = ("orders_wrong_count", "duplicate_emails", "duplicate_webhook_rows", "missing_webhook_rows",
+            "unprocessed_webhook_rows")
+    return [f"{key}={checks[key]}" for key in keys if checks.get(key)]
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    tenants = json.loads(TENANTS_PATH.read_text(encoding="utf-8"))
+    store_id = tenants[args.tenant % len(tenants)]["store_id"]
+    dsn = os.environ.get("PAYPER_LOCAL_PG_DSN")
+
+    async with SupabaseClient.from_env() as client:
+        stub = MercadoPagoStub(args.mp_port, args.mp_latency_ms).start()
+        proxy = CountingProxy(client.url, args.proxy_port).start()
+        env = {
+            "SUPABASE_URL": proxy.url, "SUPABASE_SERVICE_ROLE_KEY": client.service_token,
+            "MP_API_URL": stub.url, "ENVIRONMENT": "development",
+        }
+        if args.secret:
+            env["MP_WEBHOOK_SECRET"] = args.secret
+        REPORT_DIR.mkdir(parents=True, exist_ok=True)
+        (REPORT_DIR / "mp_webhook.env").write_text("".join(f"{k}={v}\n" for k, v in env.items()), encoding="utf-8")
+
+        function = DenoFunction(FUNCTIONS_DIR / "mp-webhook" / VARIANTS[args.variant], env) if args.serve else None
+        try:
+            function_url = function.start().url if function else args.function_url
+            load = WebhookLoad(client, stub, proxy, function_url, args.variant, args.payments, args.rate,
+                               args.duplicates, args.reorder, args.reject_share, args.concurrency, args.secret,
+                               args.seed)
+            schedule = await load.setup(store_id)
+            proxy.requests.clear()
+            stub.requests.clear()
+            xact_before = _xact_count(dsn)
+            elapsed = await load.run(store_id, schedule)
+            xact_after = _xact_count(dsn)
+            round_trips = dict(proxy.requests.most_common())
+            checks = await load.verify(schedule)
+        finally:
+            if function:
+                function.stop()
+            proxy.stop()
+            stub.stop()
+
+    delivered = len(schedule)
+    unique = len({d.notification_id for d in schedule})
+    verify_calls = sum(n for key, n in round_trips.items() if key.endswith("rpc/verify_payment"))
+    return {
+        "config": {
+            "variant": args.variant, "store_id": store_id, "function_url": function_url, "payments": args.payments,
+            "rate": args.rate, "duplicates": args.duplicates, "reorder": args.reorder,
+            "reject_share": args.reject_share, "concurrency": args.concurrency, "signed": bool(args.secret),
+            "mp_latency_ms": args.mp_latency_ms,
+        },
+        "deliveries": delivered,
+        "notifications": unique,
+        "elapsed_s": round(elapsed, 2),
+        "deliveries_per_s": round(delivered / elapsed, 1),
+        "processed_per_s": round(unique / elapsed, 1),
+        "latency": [s.to_dict() for s in load.stats.values()],
+        "responses": dict(load.responses.most_common()),
+        "round_trips": round_trips,
+        "round_trips_per_delivery": round(sum(round_trips.values()) / delivered, 2),
+        "mp_fetches_per_delivery": round(sum(stub.requests.values()) / delivered, 2),
+        "verify_payment_per_payment": round(verify_calls / args.payments, 2),
+        "pg_xacts_per_delivery": (round((xact_after - xact_before) / delivered, 2)
+                                  if xact_before is not None else None),
+        "checks": checks,
+        "violations": _violations(checks),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.mp_webhook", description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--serve", action="store_true", help="run the function with deno on :8000")
+    target.add_argument("--function-url", help="an already served mp-webhook")
+    parser.add_argument("--variant", choices=sorted(VARIANTS), default="v1")
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=100.0, help="deliveries per second")
+    parser.add_argument("--duplicates", type=int, default=2, help="extra deliveries per notification")
+    parser.add_argument("--reorder", type=float, default=0.25, help="share of payments delivered out of order")
+    parser.add_argument("--reject-share", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=64, help="max deliveries in flight")
+    parser.add_argument("--secret", default=DEFAULT_SECRET, help="MP_WEBHOOK_SECRET; empty to send unsigned")
+    parser.add_argument("--mp-port", type=int, default=0, help="MP stand-in port (0 = any)")
+    parser.add_argument("--proxy-port", type=int, default=0, help="counting proxy port (0 = any)")
+    parser.add_argument("--mp-latency-ms", type=float, default=0.0, help="added latency per MP API call")
+    parser.add_argument("--tenant", type=int, default=0, help="tenant of tmp/tenants.json to use")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    path = write_report(f"mp_webhook_{args.variant}", report)
+    print(format_table(report["latency"], f"{report['notifications']} notifications / {report['deliveries']} "
+                                          f"deliveries, {report['processed_per_s']} processed/s"))
+    print(f"round-trips/delivery {report['round_trips_per_delivery']}, "
+          f"MP fetches/delivery {report['mp_fetches_per_delivery']}, "
+          f"verify_payment/payment {report['verify_payment_per_payment']}, "
+          f"pg xacts/delivery {report['pg_xacts_per_delivery']}")
+    for violation in report["violations"]:
+        print(f"IDEMPOTENCY: {violation}")
+    print(f"report: {path}")
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
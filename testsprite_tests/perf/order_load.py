@@ -0,0 +1,258 @@
+"""Order-creation load generator modelled on TC008 (POS) and TC009/TC016 (QR).
+
+    python -m perf.order_load --rate 25 --duration 120 --pos 8 --qr 60
+    python -m perf.order_load --rate 60 --skew 1.2      # Friday rush on a few hot products
+
+Orders arrive open-loop: exponential inter-arrival times at ``--rate``
+orders/s, whether or not earlier orders have finished. Each arrival goes to
+a free actor, a POS terminal or a QR client (``--qr-share``). The wait for
+a free actor is reported as ``queue_wait``. Each order replays the app's
+RPC sequence:
+
+* POS: ``create_order_atomic`` (OfflineContext, paid on creation), then
+  an order UPDATE to ``ready``, then ``confirm_order_delivery``.
+* QR: ``create_order`` (useCreateOrder), then the cashier marks it paid
+  (what the MP webhook or the cash drawer does), then
+  ``confirm_order_delivery``.
+
+``finalize_order_stock`` is a BEFORE UPDATE trigger on ``orders``, not an
+RPC, so the ``finalize`` step is the UPDATE that fires it. The step fails
+if the returned row does not have ``stock_deducted`` set.
+
+Deadlocks (40P01) and serialization failures (40001) are retried with
+jittered backoff up to ``--max-retries`` times. Retries are counted per
+step and reason. Several RPCs catch exceptions and return them as
+``{"success": false}``; those count as errors too (see ``client.unwrap``).
+Tenants and logins come from ``tmp/tenants.json`` (``perf.seed``/``perf.datagen``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from .client import RpcError, Session, SupabaseClient, unwrap
+from .config import TENANTS_PATH
+from .stats import LatencyStats, format_table, write_report
+
+STEPS = ("create", "finalize", "deliver")
+
+
+@dataclass
+class StoreActors:
+    store_id: str
+    cashier: Session
+    staff: Session
+    client: Session
+    products: list[tuple[str, float]]  # (id, base_price)
+    popularity: list[float]  # cumulative weights over products
+
+
+@dataclass(frozen=True)
+class Actor:
+    kind: str  # "pos" | "qr"
+    index: int
+    store: StoreActors
+
+
+class OrderLoad:
+    def __init__(self, client: SupabaseClient, rate: float, duration_s: float, pos: int, qr: int,
+                 qr_share: float = 0.4, skew: float = 1.0, max_retries: int = 5, seed: int = 1):
+        self.client = client
+        self.rate = rate
+        self.duration_s = duration_s
+        self.pos = pos
+        self.qr = qr
+        self.qr_share = qr_share
+        self.skew = skew
+        self.max_retries = max_retries
+        self.rng = random.Random(seed)
+        self.stats = {name: LatencyStats(name) for name in (*STEPS, "flow", "queue_wait")}
+        self.offered = 0
+        self.completed = 0
+
+    async def _prepare_store(self, tenant: dict) -> StoreActors:
+        users = tenant["users"]
+        cashier, staff, client = await asyncio.gather(*(
+            self.client.sign_in(users[role]["email"], users[role]["password"])
+            for role in ("cashier", "staff", "client")
+        ))
+        rows = await self.client.select(
+            "products",
+            {"store_id": f"eq.{tenant['store_id']}", "active": "eq.true", "select": "id,base_price", "order": "id"},
+            cashier.access_token,
+        )
+        if not rows:
+            raise RuntimeError(f"store {tenant['store_id']} has no active products; run python -m perf.datagen")
+        products = [(r["id"], float(r["base_price"])) for r in rows]
+        cumulative, total = [], 0.0
+        for rank in range(len(products)):
+            total += 1.0 / (rank + 1) ** self.skew
+            cumulative.append(total)
+        return StoreActors(tenant["store_id"], cashier, staff, client, products, cumulative)
+
+    async def _step(self, name: str, call: Callable[[], Awaitable]):
+        stats = self.stats[name]
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await call()
+            except RpcError as exc:
+                reason = exc.retry_reason
+                if reason and attempt < self.max_retries:
+                    stats.retries[reason] += 1
+                    await asyncio.sleep(self.rng.uniform(0.01, 0.05) * 2 ** attempt)
+                    continue
+                stats.error(reason or exc.code)
+                raise
+            except Exception as exc:  # transport errors: timeouts, resets
+                stats.error(type(exc).__name__)
+                raise
+            stats.add((time.perf_counter() - started) * 1000)
+            return result
+
+    def _items(self, store: StoreActors) -> tuple[list[dict], float]:
+        picks = set(self.rng.choices(range(len(store.products)), cum_weights=store.popularity,
+                                     k=self.rng.choice([1, 1, 2, 2, 3])))
+        items, total = [], 0.0
+        for index in picks:
+            product_id, price = store.products[index]
+            quantity = self.rng.choice([1, 1, 2, 3])
+            items.append({"product_id": product_id, "quantity": quantity, "unit_price": price, "notes": None})
+            total += price * quantity
+        return items, total
+
+    async def _pos_order(self, store: StoreActors) -> None:
+        items, total = self._items(store)
+        order_id = str(uuid.uuid4())
+        token = store.cashier.access_token
+        await self._step("create", lambda: self._unwrap(self.client.rpc("create_order_atomic", {
+            "p_order": {
+                "id": order_id, "store_id": store.store_id, "total_amount": total, "subtotal": total,
+                "status": "preparing", "payment_method": "cash", "payment_provider": "cash",
+                "payment_status": "paid", "is_paid": True, "channel": "takeaway", "delivery_status": "pending",
+            },
+            "p_items": items,
+        }, token)))
+        await self._finalize(order_id, {"status": "ready"}, token)
+        await self._deliver(store, order_id)
+
+    async def _qr_order(self, store: StoreActors) -> None:
+        items, _total = self._items(store)
+        result = await self._step("create", lambda: self._unwrap(self.client.rpc("create_order", {
+            "p_store_id": store.store_id,
+            "p_items": [{k: v for k, v in item.items() if k != "unit_price"} for item in items],
+            "p_channel": "qr",
+            "p_delivery_mode": "local",
+        }, store.client.access_token)))
+        order_id = result["order_id"]
+        await self._finalize(order_id, {
+            "is_paid": True, "payment_status": "paid", "payment_method": "mercadopago", "status": "preparing",
+        }, store.cashier.access_token)
+        await self._deliver(store, order_id)
+
+    async def _unwrap(self, call: Awaitable):
+        return unwrap(await call)
+
+    async def _finalize(self, order_id: str, values: dict, token: str) -> None:
+        async def call():
+            rows = await self.client.update("orders", {"id": f"eq.{order_id}", "select": "id,stock_deducted"},
+                                            values, token)
+            if not rows or not rows[0].get("stock_deducted"):
+                raise RpcError(200, "stock_not_deducted", f"order {order_id} updated without stock deduction")
+            return rows
+        await self._step("finalize", call)
+
+    async def _deliver(self, store: StoreActors, order_id: str) -> None:
+        await self._step("deliver", lambda: self._unwrap(self.client.rpc(
+            "confirm_order_delivery", {"p_order_id": order_id, "p_staff_id": store.staff.user_id},
+            store.staff.access_token,
+        )))
+
+    async def _arrival(self, actors: asyncio.Queue, kind: str) -> None:
+        queued = time.perf_counter()
+        actor: Actor = await actors.get()
+        started = time.perf_counter()
+        self.stats["queue_wait"].add((started - queued) * 1000)
+        try:
+            await (self._pos_order if kind == "pos" else self._qr_order)(actor.store)
+            self.stats["flow"].add((time.perf_counter() - started) * 1000)
+            self.completed += 1
+        except Exception as exc:
+            self.stats["flow"].error(getattr(exc, "code", type(exc).__name__))
+        finally:
+            actors.put_nowait(actor)
+
+    async def run(self, tenants: list[dict]) -> dict:
+        stores = await asyncio.gather(*(self._prepare_store(t) for t in tenants))
+        pools = {"pos": asyncio.Queue(), "qr": asyncio.Queue()}
+        for kind, count in (("pos", self.pos), ("qr", self.qr)):
+            for i in range(count):
+                pools[kind].put_nowait(Actor(kind, i, stores[i % len(stores)]))
+
+        tasks: set[asyncio.Task] = set()
+        started = time.perf_counter()
+        deadline = started + self.duration_s
+        while time.perf_counter() < deadline:
+            kind = "qr" if self.qr and (not self.pos or self.rng.random() < self.qr_share) else "pos"
+            task = asyncio.create_task(self._arrival(pools[kind], kind))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.offered += 1
+            await asyncio.sleep(self.rng.expovariate(self.rate))
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "config": {
+                "rate": self.rate, "duration_s": self.duration_s, "pos": self.pos, "qr": self.qr,
+                "qr_share": self.qr_share, "skew": self.skew, "max_retries": self.max_retries,
+                "stores": [s.store_id for s in stores],
+            },
+            "offered": self.offered,
+            "completed": self.completed,
+            "throughput_per_s": round(self.completed / elapsed, 2),
+            "steps": [self.stats[name].to_dict() for name in (*STEPS, "flow", "queue_wait")],
+        }
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    tenants = json.loads(TENANTS_PATH.read_text(encoding="utf-8"))[: args.stores or None]
+    async with SupabaseClient.from_env(max_connections=args.pos + args.qr + 10) as client:
+        load = OrderLoad(client, args.rate, args.duration, args.pos, args.qr, args.qr_share,
+                         args.skew, args.max_retries, args.seed)
+        return await load.run(tenants)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.order_load", description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10.0, help="offered orders per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    parser.add_argument("--pos", type=int, default=4, help="concurrent POS terminals")
+    parser.add_argument("--qr", type=int, default=20, help="concurrent QR clients")
+    parser.add_argument("--qr-share", type=float, default=0.4, help="fraction of arrivals from QR")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for product popularity")
+    parser.add_argument("--stores", type=int, default=0, help="use the first N tenants (0 = all)")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    path = write_report("order_load", report)
+    print(format_table(report["steps"], f"{report['completed']}/{report['offered']} orders, "
+                                        f"{report['throughput_per_s']}/s"))
+    print(f"report: {path}")
+    flow = report["steps"][len(STEPS)]
+    return 0 if flow["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
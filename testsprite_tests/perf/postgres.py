@@ -0,0 +1,122 @@
+"""Throwaway Postgres cluster for local, offline runs.
+
+``LocalPostgres`` runs ``initdb`` in a temporary directory and starts a
+server on a free port. It listens only on a Unix socket and 127.0.0.1.
+Binaries come from ``PAYPER_PG_BIN``, then ``pg_config --bindir``, then
+``PATH``. To reuse a server you already run (a CI service container, for
+example), set ``PAYPER_LOCAL_PG_DSN``; nothing is started or stopped then.
+
+Durability is off by default (``fsync``, ``synchronous_commit`` and
+``full_page_writes``). That keeps latency stable and low-noise, which is
+what the perf comparisons need. Pass ``durable=True`` to measure commit
+cost as production pays it.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def _bindir() -> Optional[Path]:
+    if os.environ.get("PAYPER_PG_BIN"):
+        return Path(os.environ["PAYPER_PG_BIN"])
+    pg_config = shutil.which("pg_config")
+    if pg_config:
+        out = subprocess.run([pg_config, "--bindir"], capture_output=True, text=True)
+        if out.returncode == 0:
+            return Path(out.stdout.strip())
+    return None
+
+
+def pg_binary(name: str) -> str:
+    bindir = _bindir()
+    if bindir and (bindir / name).exists():
+        return str(bindir / name)
+    found = shutil.which(name)
+    if not found:
+        raise FileNotFoundError(f"{name} not found; install PostgreSQL or set PAYPER_PG_BIN")
+    return found
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalPostgres:
+    """A disposable cluster owned by the ``postgres`` superuser (trust auth)."""
+
+    def __init__(self, port: Optional[int] = None, durable: bool = False, database: str = "postgres"):
+        self.external_dsn = os.environ.get("PAYPER_LOCAL_PG_DSN")
+        self.port = port or free_port()
+        self.durable = durable
+        self.database = database
+        self._dir: Optional[tempfile.TemporaryDirectory] = None
+
+    @property
+    def dsn(self) -> str:
+        if self.external_dsn:
+            return self.external_dsn
+        return f"postgresql://postgres@127.0.0.1:{self.port}/{self.database}"
+
+    def start(self) -> "LocalPostgres":
+        if self.external_dsn or self._dir is not None:
+            return self
+        self._dir = tempfile.TemporaryDirectory(prefix="payper-pg-")
+        data = Path(self._dir.name) / "data"
+        subprocess.run(
+            [pg_binary("initdb"), "-D", str(data), "-U", "postgres", "-A", "trust", "--no-sync", "-E", "UTF8"],
+            check=True,
+            capture_output=True,
+        )
+        options = [
+            f"-p {self.port}",
+            "-c listen_addresses=127.0.0.1",
+            f"-c unix_socket_directories={self._dir.name}",
+            "-c max_connections=500",
+            "-c shared_buffers=256MB",
+            "-c wal_level=logical",  # realtime-style logical decoding stays possible
+        ]
+        if not self.durable:
+            options += ["-c fsync=off", "-c synchronous_commit=off", "-c full_page_writes=off"]
+        subprocess.run(
+            [pg_binary("pg_ctl"), "-D", str(data), "-l", str(Path(self._dir.name) / "postgres.log"),
+             "-o", " ".join(options), "-w", "start"],
+            check=True,
+            capture_output=True,
+        )
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout_s: float = 30) -> None:
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            ready = subprocess.run([pg_binary("pg_isready"), "-d", self.dsn], capture_output=True)
+            if ready.returncode == 0:
+                return
+            time.sleep(0.2)
+        raise TimeoutError(f"Postgres on port {self.port} did not become ready")
+
+    def stop(self) -> None:
+        if self._dir is None:
+            return
+        subprocess.run(
+            [pg_binary("pg_ctl"), "-D", str(Path(self._dir.name) / "data"), "-m", "immediate", "stop"],
+            capture_output=True,
+        )
+        self._dir.cleanup()
+        self._dir = None
+
+    def __enter__(self) -> "LocalPostgres":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
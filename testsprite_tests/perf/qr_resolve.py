@@ -0,0 +1,321 @@
+"""QR scan load test for the resolve-qr fast path.
+
+    python -m perf.qr_resolve                                   # SQL, legacy vs fast, 3000 scans/min
+    python -m perf.qr_resolve --paths fast --rate 12000 --venues 50 --duration 120
+    python -m perf.qr_resolve --function-url http://127.0.0.1:54321/functions/v1/resolve-qr
+
+Every venue (a ``perf.seed`` tenant) gets ``--tables`` bench tables, each
+with an active ``bench-qr-*`` code, plus one inactive code. Traffic is
+open-loop at ``--rate`` scans per minute for ``--duration`` seconds. It
+arrives as parties of 1-6 guests who scan the same table code within a
+few seconds. ``--invalid-share`` of the scans use unknown or inactive
+codes. ``--rescan-share`` of the guests scan again a little later, which
+``QRResolver`` answers from the stored context (``getRecentQRContext``) on
+the fast path: that is the client cache.
+
+Paths, against Postgres (``--dsn``/``PAYPER_LOCAL_PG_DSN``):
+
+* ``legacy``: the statements of the old resolve-qr flow, one round trip
+  each. That is ``qr_codes`` by hash, ``stores`` by id, then what
+  ``log_qr_scan`` did: re-read the code and store, open the session, log
+  the scan and bump ``scan_count``;
+* ``fast``: one ``resolve_qr_context`` call.
+
+With ``--function-url`` the scans go to the Edge Function instead, with a
+distinct ``x-forwarded-for`` per guest so its per-IP limit does not
+throttle the test. The ``X-QR-Cache`` header gives the server cache hits.
+
+The report gives latency percentiles per path and outcome, achieved
+scans/min, the client and server cache hit ratios and a check. Every
+successful scan must have opened exactly one ``client_sessions`` row.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from ._deps import require
+from .seed import SeedTenant, seed_id, seed_tenants
+from .stats import LatencyStats, format_table, write_report
+
+PATHS = ("legacy", "fast")
+RESCAN_REUSE_S = 10 * 60  # lib/qrContext.ts RESCAN_REUSE_MS
+USER_AGENT = "perf.qr_resolve"
+
+
+@dataclass(frozen=True)
+class Scan:
+    at: float  # seconds from start
+    guest: int
+    code: str
+    rescan: bool = False
+
+
+def setup(dsn: str, venues: int, tables: int) -> tuple[list[str], list[str], list[str]]:
+    """(Re)create bench tables and codes; returns (store ids, active codes, inactive codes)."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    tenants: list[SeedTenant] = seed_tenants(dsn, venues)
+    active, inactive = [], []
+    with psycopg.connect(dsn) as conn:
+        conn.execute("delete from public.qr_scan_logs where qr_id in "
+                     "(select id from public.qr_codes where code_hash like 'bench-qr-%')")
+        conn.execute("delete from public.client_sessions where qr_id in "
+                     "(select id from public.qr_codes where code_hash like 'bench-qr-%')")
+        conn.execute("delete from public.qr_codes where code_hash like 'bench-qr-%'")
+        for tenant in tenants:
+            for i in range(tables + 1):
+                node_id = seed_id("bench", "qr-table", tenant.index, i)
+                code = f"bench-qr-{tenant.index}-{i}"
+                conn.execute(
+                    "insert into public.venue_nodes (id, store_id, label, type, status, position_x, position_y) "
+                    "values (%s, %s, %s, 'table', 'free', 0, 0) on conflict (id) do nothing",
+                    (node_id, tenant.store_id, f"bench-Mesa {i + 1}"),
+                )
+                conn.execute(
+                    "insert into public.qr_codes (id, store_id, qr_type, code_hash, table_id, label, is_active) "
+                    "values (%s, %s, 'table', %s, %s, %s, %s)",
+                    (seed_id("bench", "qr", tenant.index, i), tenant.store_id, code, node_id,
+                     f"bench-Mesa {i + 1}", i < tables),
+                )
+                (active if i < tables else inactive).append(code)
+        conn.commit()
+    return [t.store_id for t in tenants], active, inactive
+
+
+def schedule(active: list[str], inactive: list[str], rate_per_min: float, duration_s: float,
+             invalid_share: float, rescan_share: float, rng: random.Random) -> list[Scan]:
+    """Parties scanning together; the returned scans are sorted by time."""
+    scans: list[Scan] = []
+    guests = 0
+    t = 0.0
+    mean_party = 3.5
+    while t < duration_s:
+        t += rng.expovariate(rate_per_min / 60 / mean_party)
+        if rng.random() < invalid_share:
+            code = rng.choice(inactive) if rng.random() < 0.5 else f"bench-qr-missing-{rng.randrange(10**6)}"
+        else:
+            code = rng.choice(active)
+        for _ in range(rng.randint(1, 6)):
+            guests += 1
+            first = t + rng.uniform(0, 5)
+            scans.append(Scan(first, guests, code))
+            if rng.random() < rescan_share:
+                scans.append(Scan(first + rng.uniform(10, 120), guests, code, rescan=True))
+    return sorted((s for s in scans if s.at < duration_s), key=lambda s: s.at)
+
+
+async def legacy_scan(conn, code: str) -> str:
+    """Old flow: qr by hash, store by id, then log_qr_scan's own reads and writes."""
+    qr = await (await conn.execute(
+        "select id, store_id, is_active, qr_type::text, table_id, bar_id, location_id, label "
+        "from public.qr_codes where code_hash = %s", (code,))).fetchone()
+    if qr is None:
+        return "not_found"
+    if not qr[2]:
+        return "inactive"
+    await (await conn.execute("select id, slug, name from public.stores where id = %s", (qr[1],))).fetchone()
+    await (await conn.execute("select * from public.qr_codes where id = %s and is_active = true", (qr[0],))).fetchone()
+    ttl = (await (await conn.execute(
+        "select coalesce((menu_logic->>'qr_session_ttl_minutes')::integer, 90) from public.stores where id = %s",
+        (qr[1],))).fetchone())[0]
+    session = (await (await conn.execute(
+        "insert into public.client_sessions (store_id, qr_id, session_type, table_id, bar_id, location_id, expires_at) "
+        "values (%s, %s, %s::session_type, %s, %s, %s, now() + make_interval(mins => %s)) returning id",
+        (qr[1], qr[0], qr[3], qr[4], qr[5], qr[6], ttl))).fetchone())[0]
+    await conn.execute(
+        "insert into public.qr_scan_logs (qr_id, store_id, session_id, source, user_agent, resolved_context) "
+        "values (%s, %s, %s, 'camera', %s, jsonb_build_object('type', %s::text, 'table_id', %s::uuid, "
+        "'label', %s::text))",
+        (qr[0], qr[1], session, USER_AGENT, qr[3], qr[4], qr[7]))
+    await conn.execute("update public.qr_codes set scan_count = scan_count + 1, last_scanned_at = now() "
+                       "where id = %s", (qr[0],))
+    return "ok"
+
+
+async def fast_scan(conn, code: str) -> str:
+    result = (await (await conn.execute("select public.resolve_qr_context(%s, 'camera', null, %s, true)",
+                                        (code, USER_AGENT))).fetchone())[0]
+    return "ok" if result["success"] else result["error"].lower()
+
+
+class Runner:
+    def __init__(self, path: str, concurrency: int):
+        self.path = path
+        self.concurrency = concurrency
+        self.stats: dict[str, LatencyStats] = {}
+        self.outcomes: Counter = Counter()
+        self.client_hits = 0
+        self.server_hits = 0
+        self.requests = 0
+        self.late_ms: list[float] = []
+        self.recent: dict[int, float] = {}  # guest -> time of the scan that stored the context
+
+    def _record(self, outcome: str, ms: float) -> None:
+        self.outcomes[outcome] += 1
+        self.stats.setdefault(outcome, LatencyStats(f"{self.path}:{outcome}")).add(ms)
+
+    def client_cache_hit(self, scan: Scan) -> bool:
+        if self.path == "legacy" or not scan.rescan:
+            return False
+        stored = self.recent.get(scan.guest)
+        return stored is not None and scan.at - stored <= RESCAN_REUSE_S
+
+    async def run(self, scans: list[Scan], send) -> float:
+        gate = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        started = time.perf_counter()
+
+        async def one(scan: Scan) -> None:
+            async with gate:
+                begin = time.perf_counter()
+                self.late_ms.append(max(0.0, (begin - started - scan.at) * 1000))
+                self.requests += 1
+                try:
+                    outcome, server_hit = await send(scan.code, scan.guest)
+                except Exception as exc:  # a failed scan is an outcome, not a crash
+                    self.outcomes[f"error:{type(exc).__name__}"] += 1
+                    return
+                self.server_hits += server_hit
+                self._record(outcome, (time.perf_counter() - begin) * 1000)
+                if outcome == "ok":
+                    self.recent[scan.guest] = scan.at
+
+        for scan in scans:
+            delay = started + scan.at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.client_cache_hit(scan):
+                self.client_hits += 1
+                self.outcomes["client_cache"] += 1
+                continue
+            tasks.append(asyncio.create_task(one(scan)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def summary(self, scans: list[Scan], elapsed: float) -> dict:
+        late = sorted(self.late_ms)
+        return {
+            "path": self.path,
+            "scans": len(scans),
+            "requests": self.requests,
+            "scans_per_min": round(len(scans) / elapsed * 60) if elapsed else None,
+            "outcomes": dict(self.outcomes),
+            "client_cache_hit_ratio": round(self.client_hits / len(scans), 4) if scans else 0.0,
+            "server_cache_hit_ratio": round(self.server_hits / self.requests, 4) if self.requests else 0.0,
+            "p99_schedule_lag_ms": round(late[int(len(late) * 0.99)], 1) if late else None,
+            "latency": [s.to_dict() for s in self.stats.values()],
+        }
+
+
+async def run_sql(dsn: str, path: str, scans: list[Scan], concurrency: int) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(await psycopg.AsyncConnection.connect(dsn, autocommit=True))
+    scan_fn = legacy_scan if path == "legacy" else fast_scan
+
+    async def send(code: str, guest: int) -> tuple[str, bool]:
+        conn = await pool.get()
+        try:
+            if path == "legacy":
+                async with conn.transaction():
+                    return await scan_fn(conn, code), False
+            return await scan_fn(conn, code), False
+        finally:
+            pool.put_nowait(conn)
+
+    runner = Runner(path, concurrency)
+    try:
+        elapsed = await runner.run(scans, send)
+    finally:
+        while not pool.empty():
+            await (pool.get_nowait()).close()
+    return runner.summary(scans, elapsed)
+
+
+async def run_http(url: str, scans: list[Scan], concurrency: int) -> dict:
+    httpx = require("httpx", "httpx")
+    anon = os.environ.get("SUPABASE_ANON_KEY") or os.environ.get("VITE_SUPABASE_ANON_KEY")
+    headers = {"Authorization": f"Bearer {anon}", "apikey": anon} if anon else {}
+
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as http:
+        async def send(code: str, guest: int) -> tuple[str, bool]:
+            ip = f"10.{guest >> 16 & 255}.{guest >> 8 & 255}.{guest & 255}"
+            resp = await http.post(url, json={"hash": code, "source": "camera", "userAgent": USER_AGENT},
+                                   headers={**headers, "x-forwarded-for": ip})
+            outcome = {200: "ok", 404: "not_found", 403: "inactive", 429: "rate_limited"}.get(
+                resp.status_code, f"http_{resp.status_code}")
+            return outcome, resp.headers.get("x-qr-cache") == "HIT"
+
+        runner = Runner("function", concurrency)
+        elapsed = await runner.run(scans, send)
+    return runner.summary(scans, elapsed)
+
+
+def check_sessions(dsn: str, since: float, expected: int) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    with psycopg.connect(dsn) as conn:
+        sessions = conn.execute(
+            "select count(*) from public.client_sessions s join public.qr_codes q on q.id = s.qr_id "
+            "where q.code_hash like 'bench-qr-%%' and s.started_at >= to_timestamp(%s)", (since,)).fetchone()[0]
+    return {"sessions": sessions, "successful_scans": expected, "ok": sessions == expected}
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    stores, active, inactive = setup(args.dsn, args.venues, args.tables)
+    rng = random.Random(args.seed)
+    scans = schedule(active, inactive, args.rate, args.duration, args.invalid_share, args.rescan_share, rng)
+    print(f"{len(scans)} scans over {args.duration:g}s across {len(stores)} venues / {len(active)} codes", flush=True)
+
+    results = []
+    targets = ["function"] if args.function_url else args.paths.split(",")
+    for target in targets:
+        since = time.time()
+        if target == "function":
+            result = await run_http(args.function_url, scans, args.concurrency)
+        else:
+            result = await run_sql(args.dsn, target, scans, args.concurrency)
+        result["check"] = check_sessions(args.dsn, since, result["outcomes"].get("ok", 0))
+        results.append(result)
+        print(format_table(result["latency"], f"{target}: {result['scans_per_min']} scans/min, "
+                                               f"client cache {result['client_cache_hit_ratio']:.1%}, "
+                                               f"server cache {result['server_cache_hit_ratio']:.1%}"), flush=True)
+    return {"venues": len(stores), "codes": len(active), "scans": len(scans), "paths": results}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.qr_resolve", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--function-url", help="load the resolve-qr Edge Function instead of Postgres")
+    parser.add_argument("--paths", default=",".join(PATHS))
+    parser.add_argument("--venues", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=12, help="tables (codes) per venue")
+    parser.add_argument("--rate", type=float, default=3000, help="scans per minute")
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--invalid-share", type=float, default=0.05)
+    parser.add_argument("--rescan-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    unknown = set(args.paths.split(",")) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown paths: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(_main(args))
+    path = write_report("qr_resolve", report)
+    print(f"report: {path}")
+    return 0 if all(p["check"]["ok"] for p in report["paths"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Rate limiter benchmark: overhead, false positives and memory per backend.
+
+    python -m perf.rate_limit                                  # every backend, default workload
+    python -m perf.rate_limit --backends sliding,legacy --clients 50000 --max-keys 10000
+    python -m perf.rate_limit --backends redis --redis-latency-ms 1
+
+The workload is Poisson traffic from ``--clients`` clients. Each client is
+a (tenant, IP) pair drawn from ``--tenants`` and ``--ips``, keyed as
+``lib/rateLimit.js`` keys it (``api:<tenant>:<ip>``), over ``--duration``
+virtual seconds against ``--limit`` hits per ``--window`` seconds:
+
+* steady clients run at 10-80% of the limit;
+* bursty clients (``--bursty-share``) send 50-95% of the limit within
+  two seconds, then wait at least a window;
+* abusers (``--abuser-share``) run at 3-10x the limit.
+
+``perf/rate_limit_driver.mjs`` replays it under Node with virtual time
+(``node`` must be on PATH) against each backend:
+
+* ``sliding``: ``SlidingWindowLimiter`` from
+  ``supabase/functions/_shared/sliding-window.js``, now used by
+  ``lib/rateLimit.js`` and the Edge Functions;
+* ``legacy``: the fixed-window ``InMemoryStore`` ``lib/rateLimit.js`` had;
+* ``redis``: ``checkRedisSlidingWindow`` against ``UpstashRedisStub``
+  (``perf.stubs``), replaying whole clients until ``--redis-requests``
+  checks (each check is an HTTP round trip);
+* ``legacy-redis``: the former ``INCR`` + ``EXPIRE`` per hit, same stand-in.
+
+Every decision is compared with an exact sliding log (the hits in the
+last window, the current one included, against the limit). A false
+positive is a hit the exact log allows but the backend blocks; a false
+negative is the reverse. The report also gives per-check latency,
+checks/s, retained heap and keys held (Node) or peak keys (Redis stand-in).
+
+A sliding window counter is an estimate, so a steady client close to
+its limit is sometimes blocked a hit early. The run exits non-zero if
+``sliding`` or ``redis`` blocks more than ``--max-fp-rate`` of the steady
+clients' allowed hits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Optional
+
+from .stats import REPORT_DIR, write_report
+from .stubs import UpstashRedisStub
+
+BACKENDS = ("sliding", "legacy", "redis", "legacy-redis")
+DRIVER = Path(__file__).with_name("rate_limit_driver.mjs")
+KINDS = ("steady", "bursty", "abuser")
+
+
+def generate(clients: int, tenants: int, ips: int, duration_s: float, limit: int, window_s: float,
+             bursty_share: float, abuser_share: float, rng: random.Random) -> tuple[list[tuple], dict[str, str]]:
+    """Events ``(t_ms, key)`` sorted by time, and each key's client kind."""
+    events: list[tuple[int, str]] = []
+    kinds: dict[str, str] = {}
+    base_rate = limit / window_s  # hits per second at exactly the limit
+    while len(kinds) < clients:
+        key = f"api:{rng.randrange(tenants)}:10.{rng.randrange(ips) >> 8 & 255}.{rng.randrange(256)}.{rng.randrange(256)}"
+        if key in kinds:
+            continue
+        roll = rng.random()
+        kind = "abuser" if roll < abuser_share else "bursty" if roll < abuser_share + bursty_share else "steady"
+        kinds[key] = kind
+        t = rng.uniform(0, window_s)
+        if kind == "bursty":
+            while t < duration_s:
+                for _ in range(int(limit * rng.uniform(0.5, 0.95))):
+                    events.append((int((t + rng.uniform(0, 2)) * 1000), key))
+                t += 2 + window_s * rng.uniform(1.0, 2.0)
+            continue
+        rate = base_rate * (rng.uniform(3, 10) if kind == "abuser" else rng.uniform(0.1, 0.8))
+        while True:
+            t += rng.expovariate(rate)
+            if t >= duration_s:
+                break
+            events.append((int(t * 1000), key))
+    events.sort()
+    return events, kinds
+
+
+def exact_decisions(events: list[tuple[int, str]], limit: int, window_ms: int) -> list[bool]:
+    """Sliding log over every hit (allowed or not), as the limiters count them."""
+    logs: dict[str, deque] = defaultdict(deque)
+    out = []
+    for t, key in events:
+        log = logs[key]
+        while log and log[0] <= t - window_ms:
+            log.popleft()
+        log.append(t)
+        out.append(len(log) <= limit)
+    return out
+
+
+def sample_clients(events: list[tuple[int, str]], budget: int) -> list[tuple[int, str]]:
+    """Every event of the first clients seen, up to ``budget`` events."""
+    per_key = Counter(key for _, key in events)
+    chosen, total = set(), 0
+    for _, key in events:
+        if key not in chosen and total + per_key[key] <= budget:
+            chosen.add(key)
+            total += per_key[key]
+    return [event for event in events if event[1] in chosen]
+
+
+def write_workload(path: Path, events: list[tuple[int, str]], limit: int, window_ms: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        for t, key in events:
+            fh.write(json.dumps([t, key, limit, window_ms]) + "\n")
+
+
+def run_driver(node: str, backend: str, workload: Path, max_keys: int, redis_url: Optional[str]) -> dict:
+    cmd = [node, "--expose-gc", str(DRIVER), "--backend", backend, "--workload", str(workload),
+           "--max-keys", str(max_keys)]
+    if redis_url:
+        cmd += ["--redis-url", redis_url]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} driver failed: {proc.stderr.strip()[-2000:]}")
+    return json.loads(proc.stdout)
+
+
+def score(decisions: str, exact: list[bool], events: list[tuple[int, str]], kinds: dict[str, str]) -> dict:
+    fp, fn, allowed, denied = Counter(), Counter(), Counter(), Counter()
+    for got, want, (_, key) in zip(decisions, exact, events):
+        kind = kinds[key]
+        (allowed if want else denied)[kind] += 1
+        if want and got == "0":
+            fp[kind] += 1
+        elif not want and got == "1":
+            fn[kind] += 1
+    total_allowed, total_denied = sum(allowed.values()), sum(denied.values())
+    return {
+        "steady_false_positive_rate": round(fp["steady"] / allowed["steady"], 6) if allowed["steady"] else 0.0,
+        "false_positives": sum(fp.values()),
+        "false_positive_rate": round(sum(fp.values()) / total_allowed, 6) if total_allowed else 0.0,
+        "false_negatives": sum(fn.values()),
+        "false_negative_rate": round(sum(fn.values()) / total_denied, 6) if total_denied else 0.0,
+        "false_positives_by_kind": dict(fp),
+        "false_negatives_by_kind": dict(fn),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.rate_limit", description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--ips", type=int, default=20000)
+    parser.add_argument("--duration", type=float, default=300, help="virtual seconds of traffic")
+    parser.add_argument("--limit", type=int, default=20, help="hits per window (RATE_LIMITS.CREATE_ORDER)")
+    parser.add_argument("--window", type=float, default=60, help="seconds")
+    parser.add_argument("--bursty-share", type=float, default=0.1)
+    parser.add_argument("--abuser-share", type=float, default=0.02)
+    parser.add_argument("--max-keys", type=int, default=10000, help="SlidingWindowLimiter bound")
+    parser.add_argument("--redis-requests", type=int, default=20000, help="checks replayed on the Redis backends")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0)
+    parser.add_argument("--max-fp-rate", type=float, default=0.02,
+                        help="fail if the sliding backends block more of the steady clients' allowed hits")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    backends = args.backends.split(",")
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+    node = shutil.which("node")
+    if not node:
+        parser.error("node is required to run the limiters (perf/rate_limit_driver.mjs)")
+
+    window_ms = int(args.window * 1000)
+    events, kinds = generate(args.clients, args.tenants, args.ips, args.duration, args.limit, args.window,
+                             args.bursty_share, args.abuser_share, random.Random(args.seed))
+    exact = exact_decisions(events, args.limit, window_ms)
+    workload = REPORT_DIR / "rate_limit_workload.jsonl"
+    write_workload(workload, events, args.limit, window_ms)
+    redis_events = sample_clients(events, args.redis_requests)
+    redis_exact = exact_decisions(redis_events, args.limit, window_ms)
+    redis_workload = REPORT_DIR / "rate_limit_workload_redis.jsonl"
+    write_workload(redis_workload, redis_events, args.limit, window_ms)
+    print(f"{len(events)} checks from {len(kinds)} clients ({Counter(kinds.values())}); "
+          f"exact log blocks {exact.count(False)}", flush=True)
+
+    rows = []
+    for backend in backends:
+        if backend in ("redis", "legacy-redis"):
+            with UpstashRedisStub(latency_ms=args.redis_latency_ms) as redis:
+                result = run_driver(node, backend, redis_workload, args.max_keys, redis.url)
+                result["redis_peak_keys"] = redis.peak_keys
+                result["redis_commands"] = dict(redis.requests)
+            scored = score(result.pop("decisions"), redis_exact, redis_events, kinds)
+        else:
+            result = run_driver(node, backend, workload, args.max_keys, None)
+            scored = score(result.pop("decisions"), exact, events, kinds)
+        rows.append({**result, **scored})
+        print(f"{backend:<13} {result['checks']:>8} checks {result['checks_per_s']:>10}/s "
+              f"p50 {result['p50_us']:>8.2f}us p99 {result['p99_us']:>8.2f}us "
+              f"FP {scored['false_positive_rate']:.4%} (steady {scored['steady_false_positive_rate']:.4%}) FN {scored['false_negative_rate']:.4%} "
+              f"keys {result.get('keys') if result.get('keys') is not None else result.get('redis_peak_keys')} "
+              f"heap {result.get('heap_retained_bytes')}", flush=True)
+
+    report = {
+        "workload": {"checks": len(events), "clients": dict(Counter(kinds.values())), "limit": args.limit,
+                     "window_s": args.window, "duration_s": args.duration, "max_keys": args.max_keys},
+        "backends": rows,
+    }
+    path = write_report("rate_limit", report)
+    print(f"report: {path}")
+    over = [r["backend"] for r in rows
+            if r["backend"] in ("sliding", "redis") and r["steady_false_positive_rate"] > args.max_fp_rate]
+    if over:
+        print(f"steady false positive rate above {args.max_fp_rate:.2%}: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+// Replays a perf.rate_limit workload against one limiter backend (run by perf/rate_limit.py).
+//
+//   node --expose-gc perf/rate_limit_driver.mjs --backend sliding --workload tmp/perf/rate_limit_workload.jsonl
+//
+// Workload lines are [t_ms, key, limit, window_ms], sorted by t_ms. Time is virtual: each
+// check sees t_ms as "now", so minutes of traffic replay in seconds. Prints one JSON object:
+// the decision string ("1" allowed, "0" denied, in workload order), per-check latency
+// percentiles, retained heap and key counts.
+
+import { readFileSync } from 'node:fs';
+import { SlidingWindowLimiter, checkRedisSlidingWindow } from '../../lib/slidingWindow.js';
+
+function parseArgs(argv) {
+  const args = { backend: 'sliding', maxKeys: 10000, redisUrl: null, redisToken: 'perf' };
+  for (let i = 0; i < argv.length; i += 2) {
+    const name = argv[i].replace(/^--/, '').replace(/-([a-z])/g, (_, c) => c.toUpperCase());
+    args[name] = argv[i + 1];
+  }
+  args.maxKeys = Number(args.maxKeys);
+  return args;
+}
+
+// Minimal Upstash REST client: pipeline() -> incr/pexpire/expire/get -> exec().
+// X-Perf-Now puts UpstashRedisStub's TTLs on the virtual clock.
+function upstashClient(url, token, now) {
+  return {
+    pipeline() {
+      const commands = [];
+      const builder = {
+        incr: (key) => { commands.push(['INCR', key]); return builder; },
+        pexpire: (key, ms) => { commands.push(['PEXPIRE', key, ms]); return builder; },
+        expire: (key, s) => { commands.push(['EXPIRE', key, s]); return builder; },
+        get: (key) => { commands.push(['GET', key]); return builder; },
+        async exec() {
+          const res = await fetch(`${url}/pipeline`, {
+            method: 'POST',
+            headers: {
+              Authorization: `Bearer ${token}`,
+              'Content-Type': 'application/json',
+              'X-Perf-Now': String(now()),
+            },
+            body: JSON.stringify(commands),
+          });
+          return (await res.json()).map((r) => r.result);
+        },
+      };
+      return builder;
+    },
+  };
+}
+
+// The limiter lib/rateLimit.js had before the sliding window: fixed windows in an
+// unbounded Map, swept once a minute.
+class LegacyFixedWindow {
+  constructor(now) {
+    this.now = now;
+    this.store = new Map();
+    this.lastSweep = 0;
+  }
+
+  get size() {
+    return this.store.size;
+  }
+
+  check(key, limit, windowMs) {
+    const now = this.now();
+    if (now - this.lastSweep >= 60000) {
+      for (const [k, v] of this.store) if (now > v.resetTime) this.store.delete(k);
+      this.lastSweep = now;
+    }
+    const existing = this.store.get(key);
+    let current;
+    if (existing && now <= existing.resetTime) {
+      current = existing.current + 1;
+      this.store.set(key, { current, resetTime: existing.resetTime });
+    } else {
+      current = 1;
+      this.store.set(key, { current, resetTime: now + windowMs });
+    }
+    return { allowed: current <= limit };
+  }
+}
+
+function percentile(sorted, q) {
+  if (!sorted.length) return null;
+  return sorted[Math.min(sorted.length - 1, Math.floor((q / 100) * sorted.length))];
+}
+
+async function main() {
+  const args = parseArgs(process.argv.slice(2));
+  const events = readFileSync(args.workload, 'utf8').trim().split('\n').map((line) => JSON.parse(line));
+  let virtualNow = 0;
+  const now = () => virtualNow;
+
+  let check;
+  let limiter = null;
+  if (args.backend === 'sliding') {
+    limiter = new SlidingWindowLimiter({ maxKeys: args.maxKeys, now });
+    check = (key, limit, windowMs) => limiter.check(key, limit, windowMs);
+  } else if (args.backend === 'legacy') {
+    limiter = new LegacyFixedWindow(now);
+    check = (key, limit, windowMs) => limiter.check(key, limit, windowMs);
+  } else if (args.backend === 'redis') {
+    const redis = upstashClient(args.redisUrl, args.redisToken, now);
+    check = (key, limit, windowMs) => checkRedisSlidingWindow(redis, key, limit, windowMs, virtualNow);
+  } else if (args.backend === 'legacy-redis') {
+    // lib/rateLimit.js before: INCR + EXPIRE on every hit (the TTL restarts each time)
+    const redis = upstashClient(args.redisUrl, args.redisToken, now);
+    check = async (key, limit, windowMs) => {
+      const [current] = await redis.pipeline().incr(key).expire(key, Math.ceil(windowMs / 1000)).exec();
+      return { allowed: current <= limit };
+    };
+  } else {
+    throw new Error(`unknown backend ${args.backend}`);
+  }
+
+  globalThis.gc?.();
+  const heapBefore = process.memoryUsage().heapUsed;
+  const decisions = new Array(events.length);
+  const latencyNs = new Float64Array(events.length);
+  const started = process.hrtime.bigint();
+
+  for (let i = 0; i < events.length; i++) {
+    const [t, key, limit, windowMs] = events[i];
+    virtualNow = t;
+    const begin = process.hrtime.bigint();
+    const result = await check(key, limit, windowMs);
+    latencyNs[i] = Number(process.hrtime.bigint() - begin);
+    decisions[i] = result.allowed ? '1' : '0';
+  }
+
+  const elapsedMs = Number(process.hrtime.bigint() - started) / 1e6;
+  globalThis.gc?.();
+  const heapAfter = process.memoryUsage().heapUsed;
+  const sorted = Array.from(latencyNs).sort((a, b) => a - b);
+
+  process.stdout.write(JSON.stringify({
+    backend: args.backend,
+    checks: events.length,
+    elapsed_ms: Math.round(elapsedMs),
+    checks_per_s: Math.round(events.length / (elapsedMs / 1000)),
+    p50_us: percentile(sorted, 50) / 1000,
+    p99_us: percentile(sorted, 99) / 1000,
+    max_us: sorted[sorted.length - 1] / 1000,
+    heap_retained_bytes: globalThis.gc ? heapAfter - heapBefore : null,
+    keys: limiter ? limiter.size : null,
+    evictions: limiter?.evictions ?? null,
+    decisions: decisions.join(''),
+  }));
+}
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
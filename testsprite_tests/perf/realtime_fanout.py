@@ -0,0 +1,311 @@
+"""Realtime fan-out benchmark for the order channels the app opens.
+
+    python -m perf.realtime_fanout --staff 200 --rate 5 --duration 60
+    python -m perf.realtime_fanout --stores 4 --staff 100 --clients-per-order 2
+
+Simulated subscribers hold one websocket each, like a browser tab, and join
+the same channels with the same ``postgres_changes`` filters as the app:
+
+* staff tab (``--staff`` per store): ``orders_realtime_<store_id>``
+  (INSERT, ``store_id=eq``) from OrderBoard and ``orders-changes``
+  (``*``, ``store_id=eq``) from OfflineContext;
+* client tab (``--clients-per-order``, opened once the order exists):
+  ``order-status-<order_id>`` (useOrderStatus) and ``order_qr_<order_id>``
+  (useOrderQR), both UPDATE ``id=eq``.
+
+A writer inserts orders at ``--rate``/s per store and moves each one
+through preparing, ready and served/delivered. The per-channel latency is
+the time from just before the write request to delivery of the event, on
+this machine's clock. After ``--drain`` seconds every expected (subscriber,
+channel, event) is matched: missing ones are dropped, repeats are duplicated.
+
+The local stack (``perf.stack``) does not emulate Realtime. Point
+``SUPABASE_URL`` at a project or at ``supabase start``. Inserts use
+``SUPABASE_SERVICE_ROLE_KEY``. Subscribers authenticate as the tenant's
+staff and client users, so RLS applies as in the app.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Optional
+
+from ._deps import require
+from .client import Session, SupabaseClient
+from .config import TENANTS_PATH
+from .stats import LatencyStats, write_report
+
+HEARTBEAT_S = 25
+JOIN_TIMEOUT_S = 10
+STATUS_STEPS = [("preparing", "pending"), ("ready", "pending"), ("served", "delivered")]
+CHANNEL_KINDS = ("orders_realtime", "orders-changes", "order-status", "order_qr")
+
+
+def _kind(topic: str) -> str:
+    name = topic.removeprefix("realtime:")
+    for kind in CHANNEL_KINDS:
+        if name.startswith(kind):
+            return kind
+    return name
+
+
+class RealtimeSocket:
+    """One Phoenix websocket multiplexing several realtime channels."""
+
+    def __init__(self, url: str, apikey: str, on_change: Callable[[str, dict, float], None]):
+        self.url = url.replace("https://", "wss://").replace("http://", "ws://").rstrip("/") + \
+            f"/realtime/v1/websocket?apikey={apikey}&vsn=1.0.0"
+        self.on_change = on_change
+        self._refs = itertools.count(1)
+        self._joins: dict[str, asyncio.Future] = {}
+        self._ws = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def connect(self) -> None:
+        websockets = require("websockets", "websockets")
+        self._ws = await websockets.connect(self.url, max_size=None, ping_interval=None)
+        self._tasks = [asyncio.create_task(self._reader()), asyncio.create_task(self._heartbeat())]
+
+    async def _send(self, topic: str, event: str, payload: dict, join_ref: Optional[str] = None) -> str:
+        ref = str(next(self._refs))
+        await self._ws.send(json.dumps({"topic": topic, "event": event, "payload": payload,
+                                        "ref": ref, "join_ref": join_ref or ref}))
+        return ref
+
+    async def join(self, channel: str, changes: list[dict], token: str) -> None:
+        """Join and wait until postgres_changes is active on the channel."""
+        topic = f"realtime:{channel}"
+        ready = asyncio.get_running_loop().create_future()
+        self._joins[topic] = ready
+        await self._send(topic, "phx_join", {
+            "config": {"broadcast": {"ack": False, "self": False}, "presence": {"key": ""},
+                       "postgres_changes": changes, "private": False},
+            "access_token": token,
+        })
+        await asyncio.wait_for(ready, JOIN_TIMEOUT_S)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_S)
+            await self._send("phoenix", "heartbeat", {})
+
+    async def _reader(self) -> None:
+        async for raw in self._ws:
+            received = time.perf_counter()
+            message = json.loads(raw)
+            topic, event, payload = message.get("topic", ""), message.get("event"), message.get("payload") or {}
+            if event == "postgres_changes":
+                self.on_change(topic, payload.get("data") or {}, received)
+            elif event == "system" and payload.get("extension") == "postgres_changes":
+                self._resolve(topic, payload.get("status") == "ok", payload.get("message", ""))
+            elif event == "phx_reply" and payload.get("status") == "error":
+                self._resolve(topic, False, json.dumps(payload.get("response")))
+
+    def _resolve(self, topic: str, ok: bool, message: str) -> None:
+        future = self._joins.pop(topic, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(None)
+        else:
+            future.set_exception(RuntimeError(f"{topic}: {message}"))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+
+
+def _event_key(data: dict) -> tuple[str, str]:
+    record = data.get("record") or {}
+    return record.get("id", ""), "INSERT" if data.get("type") == "INSERT" else record.get("status", "")
+
+
+class FanoutBench:
+    def __init__(self, client: SupabaseClient, staff: int, clients_per_order: int, rate: float,
+                 duration_s: float, step_interval_s: float, drain_s: float):
+        self.client = client
+        self.staff = staff
+        self.clients_per_order = clients_per_order
+        self.rate = rate
+        self.duration_s = duration_s
+        self.step_interval_s = step_interval_s
+        self.drain_s = drain_s
+        self.sent: dict[tuple[str, str], float] = {}
+        # (subscriber, kind, key) -> receive times
+        self.received: dict[tuple[str, str, tuple], list[float]] = defaultdict(list)
+        self.expected: set[tuple[str, str, tuple]] = set()
+        self.staff_by_store: dict[str, list[str]] = defaultdict(list)
+        self.join_errors: Counter = Counter()
+        self.write_errors: Counter = Counter()
+        self.sockets: list[RealtimeSocket] = []
+
+    def _listener(self, subscriber: str) -> Callable[[str, dict, float], None]:
+        def on_change(topic: str, data: dict, received: float) -> None:
+            self.received[(subscriber, _kind(topic), _event_key(data))].append(received)
+        return on_change
+
+    async def _open(self, subscriber: str, channels: list[tuple[str, list[dict]]], token: str) -> bool:
+        socket = RealtimeSocket(self.client.url, self.client.anon_key, self._listener(subscriber))
+        self.sockets.append(socket)
+        try:
+            await socket.connect()
+            for channel, changes in channels:
+                await socket.join(channel, changes, token)
+        except Exception as exc:  # connection refused, join timeout, RLS/config errors
+            self.join_errors[type(exc).__name__] += 1
+            return False
+        return True
+
+    async def _staff_tab(self, store_id: str, index: int, staff: Session) -> None:
+        subscriber = f"staff:{store_id}:{index}"
+        store_filter = f"store_id=eq.{store_id}"
+        if await self._open(subscriber, [
+            (f"orders_realtime_{store_id}",
+             [{"event": "INSERT", "schema": "public", "table": "orders", "filter": store_filter}]),
+            ("orders-changes", [{"event": "*", "schema": "public", "table": "orders", "filter": store_filter}]),
+        ], staff.access_token):
+            self.staff_by_store[store_id].append(subscriber)
+
+    async def _client_tabs(self, order_id: str, client: Session) -> list[str]:
+        subscribers = [f"client:{order_id}:{i}" for i in range(self.clients_per_order)]
+        changes = [{"event": "UPDATE", "schema": "public", "table": "orders", "filter": f"id=eq.{order_id}"}]
+        opened = await asyncio.gather(*(
+            self._open(s, [(f"order-status-{order_id}", changes), (f"order_qr_{order_id}", changes)],
+                       client.access_token)
+            for s in subscribers
+        ))
+        return [s for s, ok in zip(subscribers, opened) if ok]
+
+    async def _order_lifecycle(self, store_id: str, client_row: Optional[str], client: Session) -> None:
+        order_id = str(uuid.uuid4())
+        staff = list(self.staff_by_store[store_id])
+        for subscriber in staff:
+            for kind in ("orders_realtime", "orders-changes"):
+                self.expected.add((subscriber, kind, (order_id, "INSERT")))
+        self.sent[(order_id, "INSERT")] = time.perf_counter()
+        await self.client.insert("orders", {
+            "id": order_id, "store_id": store_id, "client_id": client_row, "status": "pending", "channel": "qr",
+            "payment_status": "pending", "is_paid": False, "subtotal": 1000, "tax_amount": 0,
+            "discount_amount": 0, "total_amount": 1000, "delivery_status": "pending",
+        }, self.client.service_token)
+
+        clients = await self._client_tabs(order_id, client)
+        for status, delivery in STATUS_STEPS:
+            await asyncio.sleep(self.step_interval_s)
+            key = (order_id, status)
+            for subscriber in staff:
+                self.expected.add((subscriber, "orders-changes", key))
+            for subscriber in clients:
+                self.expected.add((subscriber, "order-status", key))
+                self.expected.add((subscriber, "order_qr", key))
+            self.sent[key] = time.perf_counter()
+            await self.client.update("orders", {"id": f"eq.{order_id}"},
+                                     {"status": status, "delivery_status": delivery}, self.client.service_token)
+
+    async def _store(self, tenant: dict) -> None:
+        users = tenant["users"]
+        staff, client = await asyncio.gather(
+            self.client.sign_in(users["staff"]["email"], users["staff"]["password"]),
+            self.client.sign_in(users["client"]["email"], users["client"]["password"]),
+        )
+        rows = await self.client.select("clients", {"auth_user_id": f"eq.{client.user_id}",
+                                                    "store_id": f"eq.{tenant['store_id']}", "select": "id"},
+                                        client.access_token)
+        client_row = rows[0]["id"] if rows else None
+        await asyncio.gather(*(self._staff_tab(tenant["store_id"], i, staff) for i in range(self.staff)))
+
+        lifecycles = []
+        deadline = time.perf_counter() + self.duration_s
+        while time.perf_counter() < deadline:
+            lifecycles.append(asyncio.create_task(self._order_lifecycle(tenant["store_id"], client_row, client)))
+            await asyncio.sleep(1 / self.rate)
+        for result in await asyncio.gather(*lifecycles, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.write_errors[getattr(result, "code", type(result).__name__)] += 1
+
+    def report(self) -> dict:
+        stats = {kind: LatencyStats(kind) for kind in CHANNEL_KINDS}
+        dropped, duplicated = Counter(), Counter()
+        for subscriber, kind, key in self.expected:
+            times = self.received.get((subscriber, kind, key), [])
+            if not times:
+                dropped[kind] += 1
+                continue
+            stats[kind].add((min(times) - self.sent[key]) * 1000)
+            if len(times) > 1:
+                duplicated[kind] += len(times) - 1
+        unexpected = sum(len(v) for k, v in self.received.items() if k not in self.expected)
+        rows = []
+        for kind in CHANNEL_KINDS:
+            row = stats[kind].to_dict()
+            expected = sum(1 for e in self.expected if e[1] == kind)
+            row.update({"expected": expected, "dropped": dropped[kind], "duplicated": duplicated[kind],
+                        "drop_rate": round(dropped[kind] / expected, 4) if expected else 0.0})
+            rows.append(row)
+        return {"channels": rows, "unexpected_events": unexpected, "join_errors": dict(self.join_errors),
+                "write_errors": dict(self.write_errors), "subscribers": len(self.sockets)}
+
+    async def run(self, tenants: list[dict]) -> dict:
+        try:
+            await asyncio.gather(*(self._store(t) for t in tenants))
+            await asyncio.sleep(self.drain_s)
+        finally:
+            await asyncio.gather(*(s.close() for s in self.sockets), return_exceptions=True)
+        report = self.report()
+        report["config"] = {
+            "stores": [t["store_id"] for t in tenants], "staff_per_store": self.staff,
+            "clients_per_order": self.clients_per_order, "rate_per_store": self.rate,
+            "duration_s": self.duration_s, "step_interval_s": self.step_interval_s,
+        }
+        return report
+
+
+def format_channels(report: dict) -> str:
+    lines = [f"{'channel':<16} {'expected':>8} {'dropped':>7} {'dup':>5} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    for r in report["channels"]:
+        ms = ["-" if r[k] is None else f"{r[k]:.1f}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        lines.append(f"{r['name']:<16} {r['expected']:8d} {r['dropped']:7d} {r['duplicated']:5d} "
+                     f"{ms[0]:>8} {ms[1]:>8} {ms[2]:>8}")
+    return "\n".join(lines)
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    tenants = json.loads(TENANTS_PATH.read_text(encoding="utf-8"))[: args.stores]
+    async with SupabaseClient.from_env() as client:
+        bench = FanoutBench(client, args.staff, args.clients_per_order, args.rate, args.duration,
+                            args.step_interval, args.drain)
+        return await bench.run(tenants)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.realtime_fanout", description=__doc__.splitlines()[0])
+    parser.add_argument("--stores", type=int, default=1)
+    parser.add_argument("--staff", type=int, default=100, help="staff tabs per store")
+    parser.add_argument("--clients-per-order", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=2.0, help="new orders per second per store")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--step-interval", type=float, default=1.0, help="seconds between status changes")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for late events")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+    path = write_report("realtime_fanout", report)
+    print(format_channels(report))
+    for key in ("join_errors", "write_errors"):
+        if report[key]:
+            print(f"{key.replace('_', ' ')}: {report[key]}")
+    print(f"report: {path}")
+    return 0 if all(r["dropped"] == 0 and r["duplicated"] == 0 for r in report["channels"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
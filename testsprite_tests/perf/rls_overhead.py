@@ -0,0 +1,391 @@
+"""RLS overhead of the TC004 tenant queries: authenticated vs service role.
+
+    python -m perf.rls_overhead                             # 1k dataset, owner and cashier of tenant A
+    python -m perf.rls_overhead --scale 100k --max-ratio 3
+    python -m perf.rls_overhead --no-generate --roles owner,staff
+
+TC004 (Multi-Tenant Data Isolation) signs in a tenant A user and asks
+for tenant B's inventory and orders. This tool runs the SQL behind those
+screens, as PostgREST would run it, against ``perf.datagen`` data:
+
+* ``pages/InventoryManagement.tsx``: ``inventory_items``, ``products`` and
+  ``categories`` filtered by ``store_id``, and ``product_recipes``
+  unfiltered;
+* ``contexts/OfflineContext.tsx``: active orders with their items, with
+  no ``store_id`` filter (RLS alone scopes it);
+* ``pages/Clients.tsx``: the store's ``clients`` and its paid orders.
+
+Tenant A is ``SeedTenant(0)`` and tenant B is ``SeedTenant(1)``. Each
+query is timed ``--repeat`` times as ``service_role`` (bypasses RLS) and
+as ``authenticated`` with the user's JWT claims, alternating. The
+overhead ratio is authenticated p50 / service p50.
+
+With the authenticated plan (``EXPLAIN (ANALYZE, BUFFERS)``, written to
+``tmp/perf/rls_plans/``) the report gives, per query:
+
+* the policies that applied (``pg_policies``), and the functions they
+  call with their volatility (``pg_depend``);
+* how often each of those functions ran (``track_functions``). A helper
+  such as ``get_user_store_id()`` that runs once per row instead of once
+  per statement shows up here; SQL functions the planner inlines do not
+  count;
+* the plan nodes that filter rows with one of those functions, with
+  "Rows Removed by Filter".
+
+Each policy is also timed on its own: the query's filter ANDed with the
+policy's ``USING`` expression, as ``service_role`` with the same claims.
+That isolates its cost, minus the RLS of tables its subqueries read.
+
+Isolation is checked for every table involved: as each role, rows of any
+other store must not be visible, and the ``store_id``-filtered queries
+must return every row of tenant A. Exits non-zero on a leak, on hidden
+rows, on an error, or when a query's ratio exceeds ``--max-ratio``.
+Talks to Postgres directly (``--dsn``/``PAYPER_LOCAL_PG_DSN``) as a
+superuser, which ``track_functions`` needs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ._deps import require
+from .datagen import SCALES, generate
+from .seed import PROFILE_ROLES, SeedTenant
+from .stats import REPORT_DIR, LatencyStats, write_report
+
+PLAN_DIR = REPORT_DIR / "rls_plans"
+FILTER_KEYS = ("Filter", "Join Filter", "Index Cond", "Recheck Cond", "One-Time Filter")
+# Calls a helper may make when it runs once per statement (one per policy reference)
+ONCE_PER_STATEMENT = 4
+
+
+@dataclass(frozen=True)
+class TenantQuery:
+    name: str
+    table: str
+    source: str
+    sql: str
+    where: str  # the query's own filter, reused by the per-policy timings
+    scoped: bool  # filtered by store_id: both roles must see the same rows
+
+
+QUERIES = (
+    TenantQuery("inventory_items", "inventory_items", "pages/InventoryManagement.tsx",
+                "select * from public.inventory_items where store_id = %(store)s", "store_id = %(store)s", True),
+    TenantQuery("products", "products", "pages/InventoryManagement.tsx",
+                "select * from public.products where store_id = %(store)s", "store_id = %(store)s", True),
+    TenantQuery("categories", "categories", "pages/InventoryManagement.tsx",
+                "select * from public.categories where store_id = %(store)s", "store_id = %(store)s", True),
+    TenantQuery("product_recipes", "product_recipes", "pages/InventoryManagement.tsx",
+                "select * from public.product_recipes", "true", False),
+    TenantQuery(
+        "orders_active", "orders", "contexts/OfflineContext.tsx",
+        "select o.id, o.store_id, o.status, o.total_amount, o.created_at, o.payment_status, o.payment_method, "
+        "o.is_paid, o.order_number, o.table_number, o.archived_at, "
+        "(select coalesce(json_agg(json_build_object('id', i.id, 'quantity', i.quantity, "
+        "'unit_price', i.unit_price, 'product_id', i.product_id)), '[]') "
+        "from public.order_items i where i.order_id = o.id) as order_items "
+        "from public.orders o where o.archived_at is null order by o.created_at desc",
+        "archived_at is null", False,
+    ),
+    TenantQuery("orders_paid", "orders", "pages/Clients.tsx",
+                "select client_id, total_amount, created_at, is_paid from public.orders "
+                "where store_id = %(store)s and is_paid = true",
+                "store_id = %(store)s and is_paid = true", True),
+    TenantQuery("clients", "clients", "pages/Clients.tsx",
+                "select * from public.clients where store_id = %(store)s order by created_at desc",
+                "store_id = %(store)s", True),
+)
+
+# Rows of another store visible to tenant A's user: must be 0
+LEAK_PROBES = {
+    **{table: f"select count(*) from public.{table} where store_id is distinct from %(store)s"
+       for table in ("inventory_items", "products", "categories", "orders", "order_items", "clients")},
+    "product_recipes": "select count(*) from public.product_recipes where not (product_id = any(%(own_products)s))",
+}
+
+POLICIES_SQL = """
+select policyname, permissive, cmd, qual
+from pg_policies
+where schemaname = 'public' and tablename = %s and cmd in ('SELECT', 'ALL')
+  and roles && array['public', 'authenticated']::name[]
+order by policyname
+"""
+
+POLICY_FUNCTIONS_SQL = """
+select distinct p.oid, n.nspname || '.' || p.proname as name, p.provolatile, p.prosecdef, l.lanname
+from pg_policy pol
+join pg_depend d on d.classid = 'pg_policy'::regclass and d.objid = pol.oid and d.refclassid = 'pg_proc'::regclass
+join pg_proc p on p.oid = d.refobjid
+join pg_namespace n on n.oid = p.pronamespace
+join pg_language l on l.oid = p.prolang
+where pol.polrelid = %s::regclass
+order by 2
+"""
+
+VOLATILITY = {"i": "immutable", "s": "stable", "v": "volatile"}
+
+
+def claims(tenant: SeedTenant, role: str) -> str:
+    return json.dumps({"sub": tenant.user_id(role), "role": "authenticated", "aud": "authenticated",
+                       "email": tenant.email(role)})
+
+
+def _as(conn, db_role: str, jwt: str) -> None:
+    conn.execute(f"set local role {db_role}")
+    conn.execute("select set_config('request.jwt.claims', %s, true)", (jwt,))
+
+
+def timed(conn, db_role: str, jwt: str, sql: str, params: dict) -> tuple[float, int]:
+    """Run ``sql`` as ``db_role`` in its own transaction; (ms, rows)."""
+    with conn.transaction():
+        _as(conn, db_role, jwt)
+        started = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        return (time.perf_counter() - started) * 1000, len(rows)
+
+
+def explain(conn, db_role: str, jwt: str, sql: str, params: dict, functions: list[dict]) -> tuple[dict, dict]:
+    """The plan of ``sql`` as ``db_role``, and how often each policy function ran in it."""
+    with conn.transaction():
+        _as(conn, db_role, jwt)
+        row = conn.execute(f"explain (analyze, buffers, format json) {sql}", params).fetchone()
+        conn.execute("reset role")
+        counts = dict(conn.execute(
+            "select f.oid, pg_stat_get_xact_function_calls(f.oid) from unnest(%s::oid[]) as f(oid)",
+            ([f["oid"] for f in functions],),
+        ).fetchall()) if functions else {}
+    plan = row[0][0] if isinstance(row[0], list) else json.loads(row[0])[0]
+    return plan, {f["name"]: counts.get(f["oid"]) for f in functions}
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def filter_sites(plan: dict, functions: list[dict]) -> list[dict]:
+    """Plan nodes whose conditions call a policy function, outside an InitPlan."""
+    short = {f["name"].split(".", 1)[1] for f in functions}
+    sites = []
+    for node in _walk(plan["Plan"]):
+        for key in FILTER_KEYS:
+            condition = node.get(key, "")
+            called = sorted(name for name in short if f"{name}(" in condition)
+            if called:
+                sites.append({
+                    "node": node.get("Node Type"),
+                    "relation": node.get("Relation Name"),
+                    "condition": key,
+                    "functions": called,
+                    "expression": condition,
+                    "rows": node.get("Actual Rows"),
+                    "rows_removed": node.get("Rows Removed by Filter", 0),
+                    "loops": node.get("Actual Loops"),
+                })
+    return sites
+
+
+def _rows(conn, sql: str, params: Any = None) -> list[dict]:
+    cur = conn.execute(sql, params)
+    names = [c.name for c in cur.description]
+    return [dict(zip(names, r)) for r in cur.fetchall()]
+
+
+def table_policies(conn, table: str) -> tuple[list[dict], list[dict]]:
+    policies = _rows(conn, POLICIES_SQL, (table,))
+    functions = _rows(conn, POLICY_FUNCTIONS_SQL, (f"public.{table}",))
+    for f in functions:
+        f["volatility"] = VOLATILITY.get(f.pop("provolatile"), "?")
+        f["security_definer"] = f.pop("prosecdef")
+        f["language"] = f.pop("lanname")
+    return policies, functions
+
+
+def time_policies(conn, query: TenantQuery, policies: list[dict], jwt: str, params: dict,
+                  repeat: int) -> list[dict]:
+    """Each policy's USING expression on its own, as service_role."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    base_sql = f"select * from public.{query.table} where {query.where}"
+    base = LatencyStats("base")
+    for _ in range(repeat):
+        base.add(timed(conn, "service_role", jwt, base_sql, params)[0])
+    base_p50 = base.to_dict()["p50_ms"]
+    out = []
+    for policy in policies:
+        row = {"policy": policy["policyname"], "permissive": policy["permissive"], "cmd": policy["cmd"],
+               "using": policy["qual"]}
+        if not policy["qual"]:
+            out.append(row)
+            continue
+        sql = f"{base_sql} and ({policy['qual'].replace('%', '%%')})"
+        stats = LatencyStats(policy["policyname"])
+        try:
+            for _ in range(repeat):
+                ms, rows = timed(conn, "service_role", jwt, sql, params)
+                stats.add(ms)
+        except psycopg.Error as exc:
+            row["error"] = str(exc).splitlines()[0]
+            out.append(row)
+            continue
+        p50 = stats.to_dict()["p50_ms"]
+        row.update({"rows": rows, "p50_ms": p50, "base_p50_ms": base_p50,
+                    "ratio": round(p50 / base_p50, 2) if base_p50 else None})
+        out.append(row)
+    return out
+
+
+def bench_query(conn, query: TenantQuery, tenant: SeedTenant, role: str, repeat: int) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    jwt = claims(tenant, role)
+    params = {"store": tenant.store_id}
+    policies, functions = table_policies(conn, query.table)
+    row: dict[str, Any] = {"role": role, "query": query.name, "table": query.table, "source": query.source,
+                           "policies": [p["policyname"] for p in policies], "functions": functions}
+    service, authenticated = LatencyStats("service_role"), LatencyStats("authenticated")
+    try:
+        timed(conn, "service_role", jwt, query.sql, params)  # warm both plans and the cache
+        timed(conn, "authenticated", jwt, query.sql, params)
+        for _ in range(repeat):
+            ms, service_rows = timed(conn, "service_role", jwt, query.sql, params)
+            service.add(ms)
+            ms, auth_rows = timed(conn, "authenticated", jwt, query.sql, params)
+            authenticated.add(ms)
+        service_plan, _ = explain(conn, "service_role", jwt, query.sql, params, [])
+        auth_plan, calls = explain(conn, "authenticated", jwt, query.sql, params, functions)
+    except psycopg.Error as exc:
+        return {**row, "ok": False, "error": str(exc).splitlines()[0], "problems": [str(exc).splitlines()[0]]}
+
+    plan_path = PLAN_DIR / f"{role}_{query.name}.json"
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    plan_path.write_text(json.dumps({"service_role": service_plan, "authenticated": auth_plan}, indent=2,
+                                    default=str) + "\n", encoding="utf-8")
+    s, a = service.to_dict(), authenticated.to_dict()
+    per_row = sorted(name for name, n in calls.items() if n and n > ONCE_PER_STATEMENT)
+    problems = []
+    if query.scoped and auth_rows != service_rows:
+        problems.append(f"authenticated sees {auth_rows} of the store's {service_rows} rows")
+    row.update({
+        "service_rows": service_rows,
+        "authenticated_rows": auth_rows,
+        "service_p50_ms": s["p50_ms"],
+        "service_p95_ms": s["p95_ms"],
+        "authenticated_p50_ms": a["p50_ms"],
+        "authenticated_p95_ms": a["p95_ms"],
+        "ratio": round(a["p50_ms"] / s["p50_ms"], 2) if s["p50_ms"] else None,
+        "service_execution_ms": round(service_plan.get("Execution Time", 0), 2),
+        "authenticated_execution_ms": round(auth_plan.get("Execution Time", 0), 2),
+        "authenticated_shared_hit_blocks": auth_plan["Plan"].get("Shared Hit Blocks", 0),
+        "function_calls": calls,
+        "per_row_functions": per_row,
+        "filter_sites": filter_sites(auth_plan, functions),
+        "per_policy": time_policies(conn, query, policies, jwt, params, max(1, repeat // 2)),
+        "plan": str(plan_path.relative_to(REPORT_DIR)),
+        "problems": problems,
+    })
+    return row
+
+
+def leak_probes(conn, tenant: SeedTenant, role: str) -> list[dict]:
+    psycopg = require("psycopg", "psycopg[binary]")
+    own_products = [r[0] for r in conn.execute("select id from public.products where store_id = %s",
+                                               (tenant.store_id,)).fetchall()]
+    params = {"store": tenant.store_id, "own_products": own_products}
+    jwt = claims(tenant, role)
+    out = []
+    for table, sql in LEAK_PROBES.items():
+        try:
+            with conn.transaction():
+                _as(conn, "authenticated", jwt)
+                visible = conn.execute(sql, params).fetchone()[0]
+        except psycopg.Error as exc:
+            out.append({"role": role, "table": table, "error": str(exc).splitlines()[0]})
+            continue
+        out.append({"role": role, "table": table, "foreign_rows": visible})
+    return out
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [f"{'role':<8} {'query':<16} {'rows':>7} {'svc p50':>8} {'auth p50':>8} {'ratio':>6} "
+             f"{'max calls':>9} check"]
+    for r in rows:
+        calls = [n for n in r.get("function_calls", {}).values() if n]
+        check = "ERROR" if "error" in r else "PER-ROW" if r.get("per_row_functions") else "ok"
+        if r.get("problems") and "error" not in r:
+            check = "MISMATCH"
+        lines.append(
+            f"{r['role']:<8} {r['query']:<16} {r.get('authenticated_rows', 0):7d} "
+            f"{r.get('service_p50_ms') or 0:8.2f} {r.get('authenticated_p50_ms') or 0:8.2f} "
+            f"{r.get('ratio') or 0:6.2f} {max(calls, default=0):9d} {check}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.rls_overhead", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--no-generate", action="store_true", help="profile the data already loaded")
+    parser.add_argument("--roles", default="owner,cashier", help=f"tenant A users, of {', '.join(PROFILE_ROLES)}")
+    parser.add_argument("--queries", default=",".join(q.name for q in QUERIES))
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query and role")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="fail above this authenticated/service p50")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="datagen workers")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    roles = args.roles.split(",")
+    names = args.queries.split(",")
+    unknown = (set(roles) - set(PROFILE_ROLES)) | (set(names) - {q.name for q in QUERIES})
+    if unknown:
+        parser.error(f"unknown roles/queries: {', '.join(sorted(unknown))}")
+    if SCALES[args.scale].stores < 2:
+        parser.error(f"scale {args.scale} has one store; TC004 needs a tenant B")
+    psycopg = require("psycopg", "psycopg[binary]")
+
+    dataset = None if args.no_generate else generate(args.dsn, args.scale, args.seed, jobs=args.jobs)
+    tenant = SeedTenant(0)
+    rows, leaks = [], []
+    print(format_rows([]))
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        conn.execute("set track_functions = 'all'")
+        for role in roles:
+            for query in (q for q in QUERIES if q.name in names):
+                row = bench_query(conn, query, tenant, role, args.repeat)
+                rows.append(row)
+                print(format_rows([row]).splitlines()[1], flush=True)
+            leaks += leak_probes(conn, tenant, role)
+
+    slow = [r for r in rows if r.get("ratio") and r["ratio"] > args.max_ratio]
+    leaked = [p for p in leaks if p.get("foreign_rows") or "error" in p]
+    path = write_report("rls_overhead", {"dataset": dataset, "tenant": tenant.store_id,
+                                         "other_tenant": SeedTenant(1).store_id, "max_ratio": args.max_ratio,
+                                         "queries": rows, "isolation": leaks})
+    for r in rows:
+        for site in r.get("filter_sites", []):
+            print(f"FILTER {r['role']}/{r['query']}: {site['node']} on {site['relation']} calls "
+                  f"{', '.join(site['functions'])} ({site['rows_removed']} rows removed, {site['loops']} loops)")
+        if r.get("per_row_functions"):
+            print(f"PER-ROW {r['role']}/{r['query']}: "
+                  + ", ".join(f"{name} x{r['function_calls'][name]}" for name in r["per_row_functions"]))
+        for problem in r.get("problems", []):
+            print(f"MISMATCH {r['role']}/{r['query']}: {problem}")
+    for r in slow:
+        print(f"SLOW {r['role']}/{r['query']}: RLS makes it {r['ratio']}x slower (max {args.max_ratio}x)")
+    for p in leaked:
+        print(f"LEAK {p['role']}/{p['table']}: " + (p.get("error") or f"{p['foreign_rows']} rows of other stores"))
+    print(f"report: {path}")
+    failed = slow or leaked or any(r.get("problems") for r in rows)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""Verification suite for the incremental sales rollups.
+
+    python -m perf.sales_rollups                         # 1k dataset, 2000 mutations
+    python -m perf.sales_rollups --scale 100k --ops 20000 --workers 8
+    python -m perf.sales_rollups --no-generate --stores 4
+
+The rollups are ``sales_rollup_hourly``, ``sales_rollup_daily``,
+``sales_rollup_methods_hourly``, ``sales_rollup_tables_daily`` and
+``sales_rollup_products_daily``
+(``20261017120000_incremental_sales_rollups.sql``). The triggers queue
+deltas, which ``fold_sales_rollup_deltas()`` moves into the rollups. The
+suite has three phases, each compared with a Python recomputation from raw
+``orders``/``order_items``:
+
+1. ``rebuild``: ``perf.datagen`` loads history with triggers off (unless
+   ``--no-generate``), then ``rebuild_sales_rollups()`` derives the
+   rollups. This checks the batch path, which is the one the nightly
+   ``reconcile_sales_rollups`` uses. Every rollup row is compared.
+2. ``incremental``: ``--workers`` connections run ``--ops`` random order
+   lifecycle mutations through the triggers:
+
+   * checkout (pending, then lines, then paid) and POS sales (paid with
+     lines added afterwards);
+   * moving orders to delivered, refunds, cancellations;
+   * repricing, changing the payment method or table, backdating
+     ``created_at``;
+   * adding, editing and removing lines, and deleting whole orders.
+
+   A mutation that fails (a deadlock, another trigger raising) rolls back
+   and is counted; the rollups must stay exact either way. The deltas are
+   then folded (timed) and every rollup row is compared.
+3. ``rpc``: ``get_sales_summary`` and ``get_financial_metrics`` totals
+   for the last 7 days against the recomputation. This runs before the
+   fold, so the RPCs have to add the queued deltas themselves.
+
+Talks to Postgres directly (``--dsn``/``PAYPER_LOCAL_PG_DSN``). Mismatches
+are listed in ``tmp/perf/sales_rollups.json``, and the run exits non-zero
+if any phase has one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from ._deps import require
+from .datagen import SCALES, generate
+from .seed import SeedTenant
+from .stats import LatencyStats, write_report
+
+LOCAL_TZ = ZoneInfo("America/Argentina/Buenos_Aires")  # sale_date, as in the migration
+NON_REVENUE = {"draft", "pending", "cancelled", "refunded", "rejected"}
+METHODS = ("cash", "mercadopago", "wallet", "card", "transfer", "efectivo", None)
+ROLLUP_MEASURES = (
+    "orders_count", "revenue", "paid_orders", "paid_revenue", "mercadopago_revenue", "cash_revenue",
+    "wallet_revenue", "card_revenue", "transfer_revenue", "other_revenue", "refunded_orders", "refunded_amount",
+    "cancelled_orders", "cancelled_amount",
+)
+PRODUCT_MEASURES = ("quantity", "revenue", "order_lines")
+METHOD_MEASURES = ("paid_orders", "paid_revenue")
+TABLE_MEASURES = ("orders_count", "revenue")
+MUTATIONS = {
+    "checkout": 25, "pos_sale": 15, "deliver": 15, "refund": 6, "cancel": 8, "reprice": 6, "method": 5,
+    "backdate": 4, "table": 3, "add_line": 6, "edit_line": 5, "remove_line": 3, "delete": 2,
+}
+TOLERANCE = 0.005
+
+
+def method_bucket(method: Optional[str]) -> str:
+    if method == "cash" or (method and "efectivo" in method.lower()):
+        return "cash"
+    return method if method in ("mercadopago", "wallet", "card", "transfer") else "other"
+
+
+def recompute(conn, store_ids: list[str]) -> tuple[dict, dict, dict, dict, dict]:
+    """Hourly, daily, product-daily, method-hourly and table-daily rollups of ``store_ids`` from raw rows."""
+    hourly: dict[tuple, Counter] = defaultdict(Counter)
+    daily: dict[tuple, Counter] = defaultdict(Counter)
+    products: dict[tuple, Counter] = defaultdict(Counter)
+    methods: dict[tuple, Counter] = defaultdict(Counter)
+    tables: dict[tuple, Counter] = defaultdict(Counter)
+    revenue_orders: dict[str, tuple] = {}
+
+    cur = conn.execute("select id::text, store_id::text, created_at, status::text, is_paid, payment_method, "
+                       "table_number, total_amount from public.orders where store_id = any(%s::uuid[])", (store_ids,))
+    for order_id, store_id, created_at, status, is_paid, method, table, amount in cur:
+        revenue = status not in NON_REVENUE
+        if not revenue and status not in ("refunded", "cancelled"):
+            continue
+        amount = float(amount or 0)
+        day = created_at.astimezone(LOCAL_TZ).date()
+        hour = created_at.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        delta: Counter = Counter()
+        if revenue:
+            delta.update({"orders_count": 1, "revenue": amount})
+            revenue_orders[order_id] = (store_id, day)
+            if table:
+                tables[(store_id, day, table)].update({"orders_count": 1, "revenue": amount})
+            if is_paid:
+                delta.update({"paid_orders": 1, "paid_revenue": amount, f"{method_bucket(method)}_revenue": amount})
+                if method is not None:
+                    methods[(store_id, hour, method)].update({"paid_orders": 1, "paid_revenue": amount})
+        else:
+            delta.update({f"{status}_orders": 1, f"{status}_amount": amount})
+        hourly[(store_id, hour)].update(delta)
+        daily[(store_id, day)].update(delta)
+
+    cur = conn.execute("select oi.order_id::text, oi.product_id::text, oi.quantity, oi.unit_price "
+                       "from public.order_items oi join public.orders o on o.id = oi.order_id "
+                       "where o.store_id = any(%s::uuid[]) and oi.product_id is not null", (store_ids,))
+    for order_id, product_id, quantity, unit_price in cur:
+        if order_id in revenue_orders:
+            store_id, day = revenue_orders[order_id]
+            quantity = float(quantity or 0)
+            products[(store_id, day, product_id)].update(
+                {"quantity": quantity, "revenue": quantity * float(unit_price or 0), "order_lines": 1})
+    return hourly, daily, products, methods, tables
+
+
+def read_rollups(conn, store_ids: list[str]) -> tuple[dict, dict, dict, dict, dict]:
+    def rows(sql: str, keys: int, measures: tuple) -> dict:
+        out = {}
+        for row in conn.execute(sql, (store_ids,)):
+            out[tuple(row[:keys])] = Counter({m: float(v) for m, v in zip(measures, row[keys:])})
+        return out
+
+    measures = ", ".join(ROLLUP_MEASURES)
+    return (
+        rows(f"select store_id::text, bucket, {measures} from public.sales_rollup_hourly "
+             "where store_id = any(%s::uuid[])", 2, ROLLUP_MEASURES),
+        rows(f"select store_id::text, sale_date, {measures} from public.sales_rollup_daily "
+             "where store_id = any(%s::uuid[])", 2, ROLLUP_MEASURES),
+        rows("select store_id::text, sale_date, product_id::text, quantity, revenue, order_lines "
+             "from public.sales_rollup_products_daily where store_id = any(%s::uuid[])", 3, PRODUCT_MEASURES),
+        rows("select store_id::text, bucket, payment_method, paid_orders, paid_revenue "
+             "from public.sales_rollup_methods_hourly where store_id = any(%s::uuid[])", 3, METHOD_MEASURES),
+        rows("select store_id::text, sale_date, table_number, orders_count, revenue "
+             "from public.sales_rollup_tables_daily where store_id = any(%s::uuid[])", 3, TABLE_MEASURES),
+    )
+
+
+def diff(name: str, expected: dict, actual: dict, measures: tuple) -> list[str]:
+    """Rows whose measures differ; all-zero rows count as absent."""
+    problems = []
+    for key in set(expected) | set(actual):
+        want, got = expected.get(key, Counter()), actual.get(key, Counter())
+        bad = [m for m in measures if abs(want.get(m, 0) - got.get(m, 0)) > TOLERANCE]
+        if bad:
+            problems.append(f"{name} {'/'.join(str(k) for k in key)}: "
+                            + ", ".join(f"{m} {got.get(m, 0):g} != {want.get(m, 0):g}" for m in bad))
+    return sorted(problems)
+
+
+def verify(dsn: str, store_ids: list[str]) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    with psycopg.connect(dsn) as conn:
+        conn.execute("set transaction isolation level repeatable read")  # one snapshot for both sides
+        expected = recompute(conn, store_ids)
+        actual = read_rollups(conn, store_ids)
+    problems = (diff("hourly", expected[0], actual[0], ROLLUP_MEASURES)
+                + diff("daily", expected[1], actual[1], ROLLUP_MEASURES)
+                + diff("product", expected[2], actual[2], PRODUCT_MEASURES)
+                + diff("method", expected[3], actual[3], METHOD_MEASURES)
+                + diff("table", expected[4], actual[4], TABLE_MEASURES))
+    return {
+        "rows": {"hourly": len(actual[0]), "daily": len(actual[1]), "product_daily": len(actual[2]),
+                 "method_hourly": len(actual[3]), "table_daily": len(actual[4])},
+        "mismatch_count": len(problems),
+        "mismatches": problems[:100],
+    }
+
+
+class Mutator:
+    """Random order lifecycle changes through the app triggers, one transaction each."""
+
+    def __init__(self, dsn: str, store_ids: list[str], seed: int):
+        psycopg = require("psycopg", "psycopg[binary]")
+        self.dsn = dsn
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.orders: dict[str, list[str]] = {}
+        self.catalog: dict[str, list[tuple[str, float]]] = {}
+        self.counts: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.stats = LatencyStats("mutation")
+        with psycopg.connect(dsn) as conn:
+            for store_id in store_ids:
+                self.orders[store_id] = [r[0] for r in conn.execute(
+                    "select id::text from public.orders where store_id = %s order by created_at desc limit 2000",
+                    (store_id,))]
+                self.catalog[store_id] = [(r[0], float(r[1] or 1000)) for r in conn.execute(
+                    "select id::text, price from public.inventory_items where store_id = %s and is_sellable "
+                    "limit 50", (store_id,))]
+            start = conn.execute("select coalesce(max(order_number), 0) from public.orders").fetchone()[0]
+        self.order_numbers = itertools.count(int(start) + 1_000_000)
+
+    def _pick(self, store_id: str) -> Optional[str]:
+        with self.lock:
+            pool = self.orders[store_id]
+            return self.rng.choice(pool) if pool else None
+
+    def _lines(self, conn, store_id: str, order_id: str, count: int) -> float:
+        total = 0.0
+        for product_id, price in self.rng.sample(self.catalog[store_id], min(count, len(self.catalog[store_id]))):
+            quantity = self.rng.choice([1, 1, 2, 3])
+            total += quantity * price
+            conn.execute("insert into public.order_items (id, order_id, store_id, product_id, quantity, unit_price, "
+                         "total_price) values (%s, %s, %s, %s, %s, %s, %s)",
+                         (str(uuid.uuid4()), order_id, store_id, product_id, quantity, price, quantity * price))
+        return total
+
+    def _new_order(self, conn, store_id: str, status: str, paid: bool) -> str:
+        order_id = str(uuid.uuid4())
+        with self.lock:
+            number = next(self.order_numbers)
+        conn.execute(
+            "insert into public.orders (id, store_id, order_number, status, channel, payment_method, payment_status, "
+            "is_paid, subtotal, tax_amount, discount_amount, total_amount) "
+            "values (%s, %s, %s, %s, 'takeaway', %s, %s, %s, 0, 0, 0, 0)",
+            (order_id, store_id, number, status, self.rng.choice(METHODS[:5]), "paid" if paid else "pending", paid),
+        )
+        with self.lock:
+            self.orders[store_id].append(order_id)
+        return order_id
+
+    def _apply(self, conn, kind: str, store_id: str) -> None:
+        if kind == "checkout":
+            order_id = self._new_order(conn, store_id, "pending", False)
+            total = self._lines(conn, store_id, order_id, self.rng.randint(1, 3))
+            conn.execute("update public.orders set subtotal = %s, total_amount = %s where id = %s",
+                         (total, total, order_id))
+            conn.execute("update public.orders set status = 'preparing', is_paid = true, payment_status = 'paid' "
+                         "where id = %s", (order_id,))
+            return
+        if kind == "pos_sale":
+            order_id = self._new_order(conn, store_id, "delivered", True)
+            total = self._lines(conn, store_id, order_id, self.rng.randint(1, 4))
+            conn.execute("update public.orders set subtotal = %s, total_amount = %s where id = %s",
+                         (total, total, order_id))
+            return
+
+        order_id = self._pick(store_id)
+        if order_id is None:
+            return
+        if kind == "deliver":
+            conn.execute("update public.orders set status = 'delivered' where id = %s", (order_id,))
+        elif kind == "refund":
+            conn.execute("update public.orders set status = 'refunded', payment_status = 'refunded' where id = %s",
+                         (order_id,))
+        elif kind == "cancel":
+            conn.execute("update public.orders set status = 'cancelled' where id = %s", (order_id,))
+        elif kind == "reprice":
+            conn.execute("update public.orders set total_amount = round(total_amount * %s, 2) where id = %s",
+                         (self.rng.choice([0.5, 0.9, 1.1, 2.0]), order_id))
+        elif kind == "method":
+            conn.execute("update public.orders set payment_method = %s where id = %s",
+                         (self.rng.choice(METHODS), order_id))
+        elif kind == "table":
+            conn.execute("update public.orders set table_number = %s where id = %s",
+                         (self.rng.choice([None, "1", "2", "7", "12"]), order_id))
+        elif kind == "backdate":
+            conn.execute("update public.orders set created_at = created_at - %s where id = %s",
+                         (timedelta(hours=self.rng.randint(1, 72)), order_id))
+        elif kind == "add_line":
+            self._lines(conn, store_id, order_id, 1)
+        elif kind == "edit_line":
+            conn.execute("update public.order_items set quantity = quantity + 1 where id = "
+                         "(select id from public.order_items where order_id = %s limit 1)", (order_id,))
+        elif kind == "remove_line":
+            conn.execute("delete from public.order_items where id = "
+                         "(select id from public.order_items where order_id = %s limit 1)", (order_id,))
+        elif kind == "delete":
+            conn.execute("delete from public.order_items where order_id = %s", (order_id,))
+            conn.execute("delete from public.orders where id = %s", (order_id,))
+            with self.lock:
+                self.orders[store_id].remove(order_id)
+
+    def worker(self, count: int, seed: int) -> None:
+        psycopg = require("psycopg", "psycopg[binary]")
+        rng = random.Random(seed)
+        kinds, weights = list(MUTATIONS), list(MUTATIONS.values())
+        with psycopg.connect(self.dsn) as conn:
+            for _ in range(count):
+                kind = rng.choices(kinds, weights)[0]
+                store_id = rng.choice(list(self.orders))
+                started = time.perf_counter()
+                try:
+                    with conn.transaction():
+                        self._apply(conn, kind, store_id)
+                except (psycopg.Error, ValueError) as exc:
+                    code = getattr(exc, "sqlstate", None) or type(exc).__name__
+                    with self.lock:
+                        self.errors[f"{kind}:{code}"] += 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    self.counts[kind] += 1
+                    self.stats.add(elapsed)
+
+    def run(self, ops: int, workers: int) -> float:
+        per_worker = [ops // workers + (1 if i < ops % workers else 0) for i in range(workers)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(self.worker, per_worker, [self.rng.randrange(2**31) for _ in per_worker]))
+        return time.perf_counter() - started
+
+
+def check_rpcs(dsn: str, store_ids: list[str], days: int = 7) -> dict:
+    """``get_sales_summary`` / ``get_financial_metrics`` totals against the recomputed hours."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(days=days)
+    problems = []
+    with psycopg.connect(dsn) as conn:
+        conn.execute("set transaction isolation level repeatable read")
+        hourly = recompute(conn, store_ids)[0]
+        for store_id in store_ids:
+            want: Counter = Counter()
+            for (store, bucket), measures in hourly.items():
+                if store == store_id and start <= bucket <= end:
+                    want.update(measures)
+            summary = conn.execute("select public.get_sales_summary(%s, %s, %s)",
+                                   (store_id, start, end)).fetchone()[0]["totals"]
+            for measure in ROLLUP_MEASURES:
+                if abs(float(summary.get(measure, 0)) - want.get(measure, 0)) > TOLERANCE:
+                    problems.append(f"get_sales_summary {store_id} {measure}: {summary.get(measure)} != "
+                                    f"{want.get(measure, 0):g}")
+            metrics = conn.execute("select public.get_financial_metrics(%s, %s, %s)",
+                                   (start, end, store_id)).fetchone()[0]
+            for key, measure in (("gross_revenue", "paid_revenue"), ("total_orders", "paid_orders")):
+                if abs(float(metrics.get(key) or 0) - want.get(measure, 0)) > TOLERANCE:
+                    problems.append(f"get_financial_metrics {store_id} {key}: {metrics.get(key)} != "
+                                    f"{want.get(measure, 0):g}")
+    return {"window_days": days, "mismatch_count": len(problems), "mismatches": problems}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.sales_rollups", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--no-generate", action="store_true", help="verify the data already loaded")
+    parser.add_argument("--stores", type=int, default=2, help="stores mutated and verified")
+    parser.add_argument("--ops", type=int, default=2000, help="incremental mutations")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="datagen workers")
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    psycopg = require("psycopg", "psycopg[binary]")
+
+    dataset = None if args.no_generate else generate(args.dsn, args.scale, args.seed, jobs=args.jobs)
+    store_ids = [SeedTenant(i).store_id for i in range(min(args.stores, SCALES[args.scale].stores))]
+
+    started = time.perf_counter()
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        rebuilt = conn.execute("select public.rebuild_sales_rollups()").fetchone()[0]
+    rebuild = {"seconds": round(time.perf_counter() - started, 2), "rows": rebuilt, **verify(args.dsn, store_ids)}
+    print(f"rebuild: {rebuild['seconds']}s, {rebuild['mismatch_count']} mismatches", flush=True)
+
+    mutator = Mutator(args.dsn, store_ids, args.seed)
+    elapsed = mutator.run(args.ops, args.workers)
+
+    rpc = check_rpcs(args.dsn, store_ids)  # deltas still queued
+
+    started = time.perf_counter()
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        folded = conn.execute("select public.fold_sales_rollup_deltas()").fetchone()[0]
+    incremental = {
+        "seconds": round(elapsed, 2),
+        "applied": dict(mutator.counts),
+        "failed": dict(mutator.errors),
+        "latency": mutator.stats.to_dict(),
+        "fold": {"seconds": round(time.perf_counter() - started, 2), "rows": folded},
+        **verify(args.dsn, store_ids),
+    }
+    print(f"incremental: {sum(mutator.counts.values())} mutations ({sum(mutator.errors.values())} rolled back) "
+          f"in {incremental['seconds']}s, fold {incremental['fold']['seconds']}s, "
+          f"{incremental['mismatch_count']} mismatches", flush=True)
+    print(f"rpc: {rpc['mismatch_count']} mismatches")
+
+    report = {"dataset": dataset, "stores": store_ids, "rebuild": rebuild, "incremental": incremental, "rpc": rpc}
+    path = write_report("sales_rollups", report)
+    for phase in ("rebuild", "incremental", "rpc"):
+        for problem in report[phase]["mismatches"][:10]:
+            print(f"MISMATCH {phase}: {problem}")
+    print(f"report: {path}")
+    return 1 if any(report[p]["mismatch_count"] for p in ("rebuild", "incremental", "rpc")) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Rebuild the Payper schema on a bare Postgres.
+
+``supabase/migrations`` does not hold the whole schema. Core tables such as
+``stores``, ``profiles``, ``products`` and ``inventory_items`` were created
+in the dashboard and only get ALTERed by migrations. We build the schema in
+three layers:
+
+1. ``BOOTSTRAP_SQL`` sets up what a Supabase project provides: the anon,
+   authenticated and service_role roles; ``auth.users``; ``auth.uid()`` and
+   ``auth.jwt()``, which read the claims PostgREST sets; a minimal
+   ``storage`` schema; and the ``supabase_realtime`` publication.
+2. ``tables_from_types`` turns the ``Row`` types in
+   ``src/types/database.types.ts`` into ``CREATE TABLE IF NOT EXISTS``.
+   Column types are inferred: ``id``/``*_id``/``*_by`` strings become uuid,
+   ``*_at`` strings become timestamptz, and the declared enums are created.
+3. The versioned migrations (``<digits>_*.sql``, the files the Supabase CLI
+   applies) run through psql in filename order. A migration that fails is
+   retried once after the others. Failures are reported, not fatal:
+   several migrations reference extensions (pg_cron, pg_net) that a plain
+   Postgres does not have.
+"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .config import DATABASE_TYPES_PATH, MIGRATIONS_DIR
+
+BOOTSTRAP_SQL = """
+create schema if not exists extensions;
+create extension if not exists pgcrypto with schema extensions;
+create extension if not exists "uuid-ossp" with schema extensions;
+
+do $$
+begin
+  if not exists (select 1 from pg_roles where rolname = 'anon') then
+    create role anon nologin noinherit;
+  end if;
+  if not exists (select 1 from pg_roles where rolname = 'authenticated') then
+    create role authenticated nologin noinherit;
+  end if;
+  if not exists (select 1 from pg_roles where rolname = 'service_role') then
+    create role service_role nologin noinherit bypassrls;
+  end if;
+  if not exists (select 1 from pg_roles where rolname = 'authenticator') then
+    create role authenticator login noinherit;
+  end if;
+  if not exists (select 1 from pg_roles where rolname = 'supabase_admin') then
+    create role supabase_admin nologin;
+  end if;
+  if not exists (select 1 from pg_publication where pubname = 'supabase_realtime') then
+    create publication supabase_realtime;
+  end if;
+end $$;
+
+grant anon, authenticated, service_role to authenticator;
+
+create schema if not exists auth;
+create table if not exists auth.users (
+  id uuid primary key default extensions.gen_random_uuid(),
+  instance_id uuid,
+  aud text default 'authenticated',
+  role text default 'authenticated',
+  email text unique,
+  phone text,
+  encrypted_password text,
+  email_confirmed_at timestamptz,
+  last_sign_in_at timestamptz,
+  raw_app_meta_data jsonb default '{}'::jsonb,
+  raw_user_meta_data jsonb default '{}'::jsonb,
+  is_super_admin boolean,
+  created_at timestamptz default now(),
+  updated_at timestamptz default now(),
+  deleted_at timestamptz
+);
+
+create or replace function auth.jwt() returns jsonb language sql stable as $$
+  select coalesce(nullif(current_setting('request.jwt.claims', true), ''), '{}')::jsonb
+$$;
+create or replace function auth.uid() returns uuid language sql stable as $$
+  select nullif(auth.jwt() ->> 'sub', '')::uuid
+$$;
+create or replace function auth.role() returns text language sql stable as $$
+  select auth.jwt() ->> 'role'
+$$;
+create or replace function auth.email() returns text language sql stable as $$
+  select auth.jwt() ->> 'email'
+$$;
+
+create schema if not exists storage;
+create table if not exists storage.buckets (
+  id text primary key,
+  name text not null,
+  owner uuid,
+  public boolean default false,
+  created_at timestamptz default now(),
+  updated_at timestamptz default now()
+);
+create table if not exists storage.objects (
+  id uuid primary key default extensions.gen_random_uuid(),
+  bucket_id text references storage.buckets (id),
+  name text,
+  owner uuid,
+  metadata jsonb,
+  created_at timestamptz default now(),
+  updated_at timestamptz default now()
+);
+create or replace function storage.foldername(name text) returns text[] language sql immutable as $$
+  select string_to_array(name, '/')
+$$;
+
+grant usage on schema public, auth, extensions, storage to anon, authenticated, service_role;
+alter default privileges in schema public grant all on tables to anon, authenticated, service_role;
+alter default privileges in schema public grant all on sequences to anon, authenticated, service_role;
+alter default privileges in schema public grant execute on functions to anon, authenticated, service_role;
+"""
+
+POST_MIGRATION_SQL = """
+grant all on all tables in schema public to anon, authenticated, service_role;
+grant all on all sequences in schema public to anon, authenticated, service_role;
+grant execute on all functions in schema public to anon, authenticated, service_role;
+grant select on auth.users to service_role;
+notify pgrst, 'reload schema';
+"""
+
+VERSIONED_MIGRATION = re.compile(r"^\d+_.*\.sql$")
+
+_ENUM_REF = re.compile(r'Database\["public"\]\["Enums"\]\["(\w+)"\]')
+
+
+def _public_block(source: str) -> str:
+    return source[source.index("  public: {"):]
+
+
+def parse_enums(source: str) -> dict[str, list[str]]:
+    block = _public_block(source)
+    block = block[block.index("    Enums: {"):block.index("    CompositeTypes: {")]
+    enums = {}
+    for name, body in re.findall(r"\n      (\w+):((?:\s*\|?\s*\"[^\"]*\")+)", block):
+        enums[name] = re.findall(r'"([^"]*)"', body)
+    return enums
+
+
+def parse_tables(source: str) -> dict[str, list[tuple[str, str]]]:
+    block = _public_block(source)
+    block = block[block.index("    Tables: {"):block.index("    Views: {")]
+    tables = {}
+    for name, body in re.findall(r"\n      (\w+): \{\n        Row: \{\n(.*?)\n        \}", block, re.S):
+        columns = []
+        for line in body.splitlines():
+            column, _, ts_type = line.strip().partition(": ")
+            columns.append((column, ts_type))
+        tables[name] = columns
+    return tables
+
+
+def _sql_type(column: str, ts_type: str) -> tuple[str, bool]:
+    """Map a generated TS type to ``(sql_type, not_null)``."""
+    nullable = ts_type.endswith("| null")
+    base = ts_type.replace("| null", "").strip()
+
+    enum = _ENUM_REF.fullmatch(base)
+    if enum:
+        return f"public.{enum.group(1)}", not nullable
+    if base == "string[]":
+        return "text[]", not nullable
+    if base == "boolean":
+        return "boolean", not nullable
+    if base == "Json":
+        return "jsonb", not nullable
+    if base == "number":
+        return ("bigint" if column == "id" else "numeric"), not nullable
+    if base == "string":
+        external = column.startswith(("mp_", "external_", "provider_", "payment_", "nfc_"))
+        if column == "id" or ((column.endswith("_id") or column.endswith("_by")) and not external):
+            return "uuid", not nullable
+        if column.endswith("_at"):
+            return "timestamptz", not nullable
+        return "text", not nullable
+    return "text", False
+
+
+def _default(column: str, sql_type: str) -> Optional[str]:
+    if column == "id" and sql_type == "uuid":
+        return "extensions.gen_random_uuid()"
+    if column == "id" and sql_type == "bigint":
+        return None  # identity, see below
+    if column in ("created_at", "updated_at") and sql_type == "timestamptz":
+        return "now()"
+    return None
+
+
+def tables_from_types(path: Path = DATABASE_TYPES_PATH) -> str:
+    """DDL for every enum and table described in the generated Supabase types."""
+    source = path.read_text(encoding="utf-8")
+    statements = []
+    for name, values in parse_enums(source).items():
+        literals = ", ".join("'" + v.replace("'", "''") + "'" for v in values)
+        statements.append(
+            f"do $$ begin create type public.{name} as enum ({literals}); "
+            f"exception when duplicate_object then null; end $$;"
+        )
+    for table, columns in parse_tables(source).items():
+        defs = []
+        for column, ts_type in columns:
+            sql_type, not_null = _sql_type(column, ts_type)
+            parts = [f'"{column}"', sql_type]
+            if column == "id" and sql_type == "bigint":
+                parts.append("generated by default as identity")
+            default = _default(column, sql_type)
+            if default:
+                parts.append(f"default {default}")
+            if column == "id":
+                parts.append("primary key")
+            elif not_null and not default:
+                parts.append("not null")
+            defs.append(" ".join(parts))
+        statements.append(f"create table if not exists public.{table} (\n  " + ",\n  ".join(defs) + "\n);")
+    return "\n".join(statements)
+
+
+def versioned_migrations(directory: Path = MIGRATIONS_DIR) -> list[Path]:
+    return sorted(p for p in directory.iterdir() if VERSIONED_MIGRATION.match(p.name))
+
+
+@dataclass
+class MigrationResult:
+    name: str
+    ok: bool
+    error: str = ""
+
+
+def run_psql(dsn: str, sql: Optional[str] = None, path: Optional[Path] = None, psql: str = "psql") -> subprocess.CompletedProcess:
+    """Run SQL through psql, stopping at the first error.
+
+    psql is used instead of a driver because migrations contain their own
+    BEGIN/COMMIT and ``CREATE INDEX CONCURRENTLY``, exactly as the Supabase
+    CLI receives them.
+    """
+    args = [psql, dsn, "-X", "-q", "-v", "ON_ERROR_STOP=1"]
+    if path is not None:
+        args += ["-f", str(path)]
+    return subprocess.run(args, input=sql, capture_output=True, text=True)
+
+
+def apply_schema(dsn: str, migrations: Optional[list[Path]] = None, psql: str = "psql") -> list[MigrationResult]:
+    """Bootstrap, create base tables and apply migrations; return per-file results."""
+    for sql in (BOOTSTRAP_SQL, tables_from_types()):
+        done = run_psql(dsn, sql=sql, psql=psql)
+        if done.returncode != 0:
+            raise RuntimeError(f"Schema bootstrap failed: {done.stderr.strip()}")
+
+    pending = migrations if migrations is not None else versioned_migrations()
+    results: dict[str, MigrationResult] = {}
+    for _attempt in range(2):
+        failed = []
+        for path in pending:
+            done = run_psql(dsn, path=path, psql=psql)
+            if done.returncode == 0:
+                results[path.name] = MigrationResult(path.name, True)
+            else:
+                error = (done.stderr.strip().splitlines() or ["psql failed"])[-1]
+                results[path.name] = MigrationResult(path.name, False, error)
+                failed.append(path)
+        if not failed:
+            break
+        pending = failed
+
+    run_psql(dsn, sql=POST_MIGRATION_SQL, psql=psql)
+    return [results[name] for name in sorted(results)]
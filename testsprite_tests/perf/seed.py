@@ -0,0 +1,145 @@
+"""Deterministic tenant seed for the local stack.
+
+Every id comes from ``uuid5(SEED_NAMESPACE, ...)``, so seeding the same
+number of tenants twice gives the same rows and the same
+``tmp/tenants.json``. Reseeding is an upsert. Each tenant is one store with
+four users, one for each role in ``harness.auth.ROLES``:
+
+* ``owner``: profile ``store_owner``;
+* ``cashier``: profile ``staff`` with a "Cajero" store role;
+* ``staff``: profile ``staff`` with a "Mozo" store role;
+* ``client``: profile ``customer`` plus a ``clients`` row in the store.
+
+Passwords are hashed with pgcrypto bcrypt, which is what the gateway's auth
+mock checks against.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from ._deps import require
+from .config import TENANTS_PATH
+
+SEED_NAMESPACE = uuid.UUID("6f1c7a52-3b0e-4d8e-9a57-5d2c0e1f7a10")
+DEFAULT_PASSWORD = "payper-local-1"
+
+# section slug -> (can_view, can_create, can_edit, can_delete)
+STAFF_ROLES = {
+    "cashier": ("Cajero", {
+        "dashboard": (True, False, False, False),
+        "orders": (True, True, True, False),
+        "tables": (True, True, True, False),
+        "clients": (True, True, True, False),
+        "finance": (True, False, False, False),
+    }),
+    "staff": ("Mozo", {
+        "orders": (True, True, True, False),
+        "tables": (True, False, True, False),
+    }),
+}
+
+PROFILE_ROLES = {"owner": "store_owner", "cashier": "staff", "staff": "staff", "client": "customer"}
+
+
+def seed_id(*parts: object) -> str:
+    return str(uuid.uuid5(SEED_NAMESPACE, "/".join(str(p) for p in parts)))
+
+
+@dataclass(frozen=True)
+class SeedTenant:
+    index: int
+    password: str = DEFAULT_PASSWORD
+
+    @property
+    def store_id(self) -> str:
+        return seed_id("store", self.index)
+
+    @property
+    def slug(self) -> str:
+        return f"perf-store-{self.index:03d}"
+
+    def user_id(self, role: str) -> str:
+        return seed_id("user", self.index, role)
+
+    def email(self, role: str) -> str:
+        return f"{role}.{self.index:03d}@payper.local"
+
+    def to_json(self) -> dict:
+        """Entry in the ``tmp/tenants.json`` format read by ``harness.runner``."""
+        return {
+            "store_id": self.store_id,
+            "slug": self.slug,
+            "users": {role: {"email": self.email(role), "password": self.password} for role in PROFILE_ROLES},
+        }
+
+
+def _seed_tenant(conn, tenant: SeedTenant) -> None:
+    for role, profile_role in PROFILE_ROLES.items():
+        conn.execute(
+            "insert into auth.users (id, email, encrypted_password, email_confirmed_at, raw_user_meta_data) "
+            "values (%s, %s, extensions.crypt(%s, extensions.gen_salt('bf', 4)), now(), %s) "
+            "on conflict (id) do update set encrypted_password = excluded.encrypted_password",
+            (tenant.user_id(role), tenant.email(role), tenant.password,
+             json.dumps({"full_name": f"{role.title()} {tenant.index:03d}"})),
+        )
+
+    conn.execute(
+        "insert into public.stores (id, name, slug, owner_email, is_active, onboarding_status, plan, service_mode) "
+        "values (%s, %s, %s, %s, true, 'completed', 'pro', 'counter') "
+        "on conflict (id) do update set name = excluded.name, slug = excluded.slug",
+        (tenant.store_id, f"Perf Store {tenant.index:03d}", tenant.slug, tenant.email("owner")),
+    )
+
+    role_ids = {}
+    for role, (name, sections) in STAFF_ROLES.items():
+        role_ids[role] = seed_id("store_role", tenant.index, role)
+        conn.execute(
+            "insert into public.store_roles (id, store_id, name, is_system) values (%s, %s, %s, false) "
+            "on conflict (id) do nothing",
+            (role_ids[role], tenant.store_id, name),
+        )
+        for section, (view, create, edit, delete) in sections.items():
+            conn.execute(
+                "insert into public.store_role_permissions "
+                "(id, role_id, section_slug, can_view, can_create, can_edit, can_delete) "
+                "values (%s, %s, %s, %s, %s, %s, %s) on conflict (id) do nothing",
+                (seed_id("permission", tenant.index, role, section), role_ids[role], section,
+                 view, create, edit, delete),
+            )
+
+    for role, profile_role in PROFILE_ROLES.items():
+        conn.execute(
+            "insert into public.profiles (id, email, full_name, role, role_id, store_id, is_active) "
+            "values (%s, %s, %s, %s, %s, %s, true) "
+            "on conflict (id) do update set role = excluded.role, role_id = excluded.role_id, "
+            "store_id = excluded.store_id",
+            (tenant.user_id(role), tenant.email(role), f"{role.title()} {tenant.index:03d}", profile_role,
+             role_ids.get(role), tenant.store_id),
+        )
+
+    conn.execute(
+        "insert into public.clients (id, store_id, auth_user_id, email, name, full_name, "
+        "wallet_balance, loyalty_points, is_active) "
+        "values (%s, %s, %s, %s, %s, %s, 0, 0, true) on conflict (id) do nothing",
+        (seed_id("client", tenant.index), tenant.store_id, tenant.user_id("client"), tenant.email("client"),
+         f"Client {tenant.index:03d}", f"Client {tenant.index:03d}"),
+    )
+
+
+def seed_tenants(dsn: str, count: int = 4, password: str = DEFAULT_PASSWORD) -> list[SeedTenant]:
+    """Upsert ``count`` tenants in one transaction and return them."""
+    psycopg = require("psycopg", "psycopg[binary]")
+    tenants = [SeedTenant(i, password) for i in range(count)]
+    with psycopg.connect(dsn) as conn:
+        for tenant in tenants:
+            _seed_tenant(conn, tenant)
+    return tenants
+
+
+def write_tenants(tenants: list[SeedTenant], path: Path = TENANTS_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps([t.to_json() for t in tenants], indent=2) + "\n", encoding="utf-8")
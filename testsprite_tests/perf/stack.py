@@ -0,0 +1,191 @@
+"""Local Supabase stand-in: Postgres + PostgREST + GoTrue mock on localhost.
+
+    python -m perf.stack up --tenants 4     # boot, seed, print env, wait
+    python -m perf.stack schema             # migration report only
+
+From Python, ``local_supabase()`` is the fixture::
+
+    with local_supabase(tenants=2) as stack:
+        requests.post(stack.url + "/rest/v1/rpc/...", headers=stack.headers())
+
+``stack.env()`` gives the variables for the Vite dev server
+(``VITE_SUPABASE_URL``/``VITE_SUPABASE_ANON_KEY``) and for the harness.
+``PAYPER_BASE_URL`` is left to whoever serves the frontend. Seeded tenants
+are written to ``tmp/tenants.json``, so ``python -m harness.runner`` gives
+each worker its own local store.
+
+PostgREST comes from ``PAYPER_POSTGREST_BIN`` or ``PATH``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from .gateway import DEFAULT_JWT_SECRET, AuthMock, Gateway, api_key
+from .postgres import LocalPostgres, free_port, pg_binary
+from .schema import MigrationResult, apply_schema
+from .seed import SeedTenant, seed_tenants, write_tenants
+
+
+def postgrest_binary() -> str:
+    found = os.environ.get("PAYPER_POSTGREST_BIN") or shutil.which("postgrest")
+    if not found:
+        raise FileNotFoundError("postgrest not found; install it or set PAYPER_POSTGREST_BIN")
+    return found
+
+
+class LocalSupabase:
+    """Owns the Postgres cluster, the PostgREST process and the gateway."""
+
+    def __init__(self, tenants: int = 4, port: Optional[int] = None, durable: bool = False,
+                 functions_url: Optional[str] = None, jwt_secret: str = DEFAULT_JWT_SECRET):
+        self.postgres = LocalPostgres(durable=durable)
+        self.port = port or free_port()
+        self.tenant_count = tenants
+        self.functions_url = functions_url
+        self.jwt_secret = jwt_secret
+        self.anon_key = api_key("anon", jwt_secret)
+        self.service_key = api_key("service_role", jwt_secret)
+        self.migration_report: list[MigrationResult] = []
+        self.tenants: list[SeedTenant] = []
+        self._postgrest: Optional[subprocess.Popen] = None
+        self._postgrest_port = free_port()
+        self._gateway: Optional[Gateway] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def dsn(self) -> str:
+        return self.postgres.dsn
+
+    def headers(self, token: Optional[str] = None) -> dict[str, str]:
+        """Headers for a REST call; service role unless a user token is given."""
+        return {
+            "apikey": self.anon_key,
+            "Authorization": f"Bearer {token or self.service_key}",
+            "Content-Type": "application/json",
+        }
+
+    def env(self) -> dict[str, str]:
+        return {
+            "VITE_SUPABASE_URL": self.url,
+            "VITE_SUPABASE_ANON_KEY": self.anon_key,
+            "SUPABASE_URL": self.url,
+            "SUPABASE_ANON_KEY": self.anon_key,
+            "SUPABASE_SERVICE_ROLE_KEY": self.service_key,
+            "PAYPER_LOCAL_PG_DSN": self.dsn,
+        }
+
+    def start(self) -> "LocalSupabase":
+        self.postgres.start()
+        self.migration_report = apply_schema(self.dsn, psql=pg_binary("psql"))
+        self.tenants = seed_tenants(self.dsn, self.tenant_count)
+        write_tenants(self.tenants)
+        self._start_postgrest()
+        self._gateway = Gateway(
+            self.port, f"http://127.0.0.1:{self._postgrest_port}", AuthMock(self.dsn, self.jwt_secret),
+            functions_url=self.functions_url,
+        ).start()
+        return self
+
+    def _start_postgrest(self, timeout_s: float = 30) -> None:
+        env = {
+            **os.environ,
+            "PGRST_DB_URI": self.dsn,
+            "PGRST_DB_SCHEMAS": "public",
+            "PGRST_DB_ANON_ROLE": "anon",
+            "PGRST_JWT_SECRET": self.jwt_secret,
+            "PGRST_SERVER_HOST": "127.0.0.1",
+            "PGRST_SERVER_PORT": str(self._postgrest_port),
+            "PGRST_DB_POOL": "50",
+        }
+        self._postgrest = subprocess.Popen(
+            [postgrest_binary()], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            if self._postgrest.poll() is not None:
+                raise RuntimeError(f"postgrest exited: {self._postgrest.stderr.read().decode(errors='replace')}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{self._postgrest_port}/", timeout=1).close()
+                return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        raise TimeoutError("postgrest did not become ready")
+
+    def stop(self) -> None:
+        if self._gateway is not None:
+            self._gateway.stop()
+            self._gateway = None
+        if self._postgrest is not None:
+            self._postgrest.terminate()
+            self._postgrest.wait(timeout=10)
+            self._postgrest = None
+        self.postgres.stop()
+
+    def __enter__(self) -> "LocalSupabase":
+        try:
+            return self.start()
+        except BaseException:
+            self.stop()
+            raise
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+@contextmanager
+def local_supabase(tenants: int = 4, **kwargs) -> Iterator[LocalSupabase]:
+    with LocalSupabase(tenants=tenants, **kwargs) as stack:
+        yield stack
+
+
+def format_migrations(report: list[MigrationResult]) -> str:
+    failed = [r for r in report if not r.ok]
+    lines = [f"{len(report) - len(failed)}/{len(report)} migrations applied"]
+    lines += [f"  FAILED {r.name}: {r.error}" for r in failed]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.stack", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["up", "schema"])
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--functions-url", default=None)
+    parser.add_argument("--durable", action="store_true", help="keep fsync/synchronous_commit on")
+    args = parser.parse_args(argv)
+
+    if args.command == "schema":
+        with LocalPostgres() as pg:
+            report = apply_schema(pg.dsn, psql=pg_binary("psql"))
+        print(format_migrations(report))
+        return 0 if all(r.ok for r in report) else 1
+
+    with local_supabase(args.tenants, port=args.port, durable=args.durable,
+                        functions_url=args.functions_url) as stack:
+        print(format_migrations(stack.migration_report))
+        for key, value in stack.env().items():
+            print(f"export {key}={value}")
+        print(f"# {len(stack.tenants)} tenants written to tmp/tenants.json; Ctrl+C to stop", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
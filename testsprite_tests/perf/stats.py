@@ -0,0 +1,82 @@
+"""Latency and error bookkeeping shared by the perf tools."""
+
+from __future__ import annotations
+
+import json
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from .config import TMP_DIR
+
+REPORT_DIR = TMP_DIR / "perf"
+
+
+def percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list (``q`` in 0..100)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class LatencyStats:
+    name: str
+    samples_ms: list[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+    retries: Counter = field(default_factory=Counter)
+
+    def add(self, ms: float) -> None:
+        self.samples_ms.append(ms)
+
+    def error(self, code: str) -> None:
+        self.errors[code] += 1
+
+    def to_dict(self) -> dict:
+        lat = sorted(self.samples_ms)
+        total = len(lat) + sum(self.errors.values())
+
+        def r(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 1)
+
+        return {
+            "name": self.name,
+            "count": len(lat),
+            "errors": sum(self.errors.values()),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "errors_by_code": dict(self.errors),
+            "retries": dict(self.retries),
+            "p50_ms": r(percentile(lat, 50)),
+            "p95_ms": r(percentile(lat, 95)),
+            "p99_ms": r(percentile(lat, 99)),
+            "max_ms": r(lat[-1] if lat else None),
+        }
+
+
+def format_table(rows: list[dict], title: str = "") -> str:
+    """``LatencyStats.to_dict`` rows as a plain-text table."""
+    lines = [title] if title else []
+    lines.append(f"{'step':<28} {'count':>7} {'err%':>6} {'retry':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    for row in rows:
+        lines.append(
+            f"{row['name'][:28]:<28} {row['count']:7d} {row['error_rate'] * 100:6.2f} "
+            f"{sum(row['retries'].values()):6d} {ms(row['p50_ms']):>8} {ms(row['p95_ms']):>8} {ms(row['p99_ms']):>8}"
+        )
+    return "\n".join(lines)
+
+
+def write_report(name: str, payload: dict, directory: Path = REPORT_DIR) -> Path:
+    """Write ``tmp/perf/<name>.json`` with a generation timestamp."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.json"
+    payload = {"generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **payload}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return path
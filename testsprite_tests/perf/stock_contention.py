@@ -0,0 +1,381 @@
+"""Contention benchmark for the stock mutation path.
+
+    python -m perf.stock_contention                          # every op, shared + disjoint
+    python -m perf.stock_contention --ops apply_stock_delta --concurrency 1,8,32,64
+
+For each operation, mode and concurrency level, N workers (one connection
+each) call the operation ``--per-worker`` times:
+
+* ``shared``: every worker hits the same item, like milk in every latte;
+* ``disjoint``: each worker has its own item, which is the no-contention baseline.
+
+Operations:
+
+* ``apply_stock_delta``: ledger insert (through the ``stock_movements``
+  trigger ``update_inventory_from_movement``) plus a ``current_stock``
+  update under ``FOR UPDATE``;
+* ``decrease_stock_atomic``: FIFO consumption in
+  ``inventory_location_stock.open_packages`` (jsonb) and ``closed_units``;
+* ``consume_from_open_packages``: FIFO over ``open_packages`` rows;
+* ``finalize_order_stock``: the BEFORE UPDATE trigger on ``orders``, fired
+  by marking pre-built orders paid. Every order is one "latte" whose recipe
+  uses the worker's item.
+
+Per level the report gives throughput, p50/p95/p99, lock-wait time
+(sampled from ``pg_stat_activity``), deadlocks (``pg_stat_database``),
+retries and an invariant check. The final stock must equal the starting
+stock minus the sum of successful consumptions. For
+``finalize_order_stock`` the check reads the ledger rows of the run's
+orders. Fixtures live in tenant 0 (``perf.seed``), named ``bench-*``, and
+are reset before each level. Talks to Postgres directly
+(``--dsn``/``PAYPER_LOCAL_PG_DSN``), so HTTP overhead does not blur lock
+behaviour.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from ._deps import require
+from .client import RpcError, unwrap
+from .seed import SeedTenant, seed_id, seed_tenants
+from .stats import LatencyStats, write_report
+
+OPERATIONS = ("apply_stock_delta", "decrease_stock_atomic", "consume_from_open_packages", "finalize_order_stock")
+MODES = ("shared", "disjoint")
+
+INITIAL_STOCK = 10**9
+PACKAGE_SIZE = 1000
+RECIPE_QTY = 200  # ml of the item in one bench "latte"
+LOCK_SAMPLE_S = 0.005
+BENCH_ORDER_NUMBERS = itertools.count(900_000_000)  # far above any real order_number
+
+
+@dataclass(frozen=True)
+class Fixture:
+    store_id: str
+    location_id: str
+    items: list[str]  # items[0] is the shared one
+    products: list[str]  # products[i] consumes RECIPE_QTY of items[i]
+
+
+def _fixture(tenant: SeedTenant, size: int) -> Fixture:
+    return Fixture(
+        store_id=tenant.store_id,
+        location_id=seed_id("bench", "location"),
+        items=[seed_id("bench", "item", i) for i in range(size)],
+        products=[seed_id("bench", "product", i) for i in range(size)],
+    )
+
+
+def setup(conn, fixture: Fixture) -> None:
+    """(Re)create the bench items at full stock and drop earlier bench orders; idempotent."""
+    conn.execute("delete from public.order_items where order_id in (select id from public.orders "
+                 "where store_id = %s and order_number >= 900000000)", (fixture.store_id,))
+    conn.execute("delete from public.orders where store_id = %s and order_number >= 900000000", (fixture.store_id,))
+    conn.execute(
+        "insert into public.storage_locations (id, store_id, name, type, is_default, is_consumable) "
+        "values (%s, %s, 'bench-location', 'warehouse', false, true) on conflict (id) do nothing",
+        (fixture.location_id, fixture.store_id),
+    )
+    for i, (item, product) in enumerate(zip(fixture.items, fixture.products)):
+        conn.execute(
+            "insert into public.inventory_items (id, store_id, name, item_type, unit_type, current_stock, cost, "
+            "min_stock_alert, package_size, is_menu_visible) "
+            "values (%s, %s, %s, 'ingredient', 'ml', %s, 1, 0, %s, false) "
+            "on conflict (id) do update set current_stock = excluded.current_stock",
+            (item, fixture.store_id, f"bench-item-{i}", INITIAL_STOCK, PACKAGE_SIZE),
+        )
+        conn.execute(
+            "delete from public.inventory_location_stock where item_id = %s and location_id = %s",
+            (item, fixture.location_id),
+        )
+        conn.execute(
+            "insert into public.inventory_location_stock (store_id, item_id, location_id, closed_units, open_packages) "
+            "values (%s, %s, %s, %s, '[]'::jsonb)",
+            (fixture.store_id, item, fixture.location_id, INITIAL_STOCK // PACKAGE_SIZE),
+        )
+        conn.execute("delete from public.open_packages where inventory_item_id = %s", (item,))
+        conn.execute(
+            "insert into public.open_packages (store_id, inventory_item_id, location_id, package_capacity, "
+            "remaining, unit, is_active, opened_at) values (%s, %s, %s, %s, %s, 'ml', true, now())",
+            (fixture.store_id, item, fixture.location_id, INITIAL_STOCK, INITIAL_STOCK),
+        )
+        conn.execute(
+            "insert into public.products (id, store_id, name, base_price, active, is_visible, tax_rate) "
+            "values (%s, %s, %s, 1000, true, false, 0) on conflict (id) do nothing",
+            (product, fixture.store_id, f"bench-latte-{i}"),
+        )
+        conn.execute(
+            "insert into public.product_recipes (id, product_id, inventory_item_id, quantity_required) "
+            "values (%s, %s, %s, %s) on conflict (id) do nothing",
+            (seed_id("bench", "recipe", i), product, item, RECIPE_QTY),
+        )
+    conn.commit()
+
+
+def create_orders(conn, fixture: Fixture, product_index: int, count: int) -> list[str]:
+    """Unpaid single-latte orders; inserted with triggers off, finalized in the timed loop."""
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    conn.execute("set session_replication_role = replica")
+    with conn.cursor().copy(
+        "COPY public.orders (id, store_id, order_number, status, channel, payment_status, is_paid, "
+        "subtotal, tax_amount, discount_amount, total_amount, stock_deducted, source_location_id, "
+        "created_at, placed_at, updated_at) FROM STDIN"
+    ) as copy:
+        for order_id in ids:
+            copy.write_row((order_id, fixture.store_id, next(BENCH_ORDER_NUMBERS), "pending", "takeaway",
+                            "pending", False, 1000, 0, 0, 1000, False, fixture.location_id, "now", "now", "now"))
+    with conn.cursor().copy(
+        "COPY public.order_items (id, order_id, store_id, product_id, quantity, unit_price, total_price, created_at) "
+        "FROM STDIN"
+    ) as copy:
+        for order_id in ids:
+            copy.write_row((str(uuid.uuid4()), order_id, fixture.store_id, fixture.products[product_index],
+                            1, 1000, 1000, "now"))
+    conn.execute("set session_replication_role = origin")
+    conn.commit()
+    return ids
+
+
+def read_stock(conn, operation: str, fixture: Fixture, item: str, orders: Optional[list[str]] = None) -> float:
+    """The quantity each operation consumes from, so before - after = consumed."""
+    if operation == "apply_stock_delta":
+        sql, params = "select current_stock from public.inventory_items where id = %s", (item,)
+    elif operation == "decrease_stock_atomic":
+        sql = (
+            "select closed_units * %s + coalesce((select sum((p->>'remaining')::numeric) "
+            "from jsonb_array_elements(open_packages) p), 0) "
+            "from public.inventory_location_stock where item_id = %s and location_id = %s"
+        )
+        params = (PACKAGE_SIZE, item, fixture.location_id)
+    elif operation == "consume_from_open_packages":
+        sql = "select coalesce(sum(remaining), 0) from public.open_packages where inventory_item_id = %s"
+        params = (item,)
+    else:
+        # Ledger sum of the run's orders: 0 before, minus what was consumed after.
+        sql = ("select coalesce(sum(qty_delta), 0) from public.stock_movements "
+               "where inventory_item_id = %s and order_id = any(%s::uuid[])")
+        params = (item, orders or [])
+    return float(conn.execute(sql, params).fetchone()[0] or 0)
+
+
+class LockSampler:
+    """Integrates the number of lock-waiting backends over time."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock_wait_s = 0.0
+        self.max_waiting = 0
+        self._stop = asyncio.Event()
+
+    async def run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.is_set():
+            cur = await self.conn.execute(
+                "select count(*) from pg_stat_activity where wait_event_type = 'Lock' and datname = current_database()"
+            )
+            waiting = (await cur.fetchone())[0]
+            now = time.perf_counter()
+            self.lock_wait_s += waiting * (now - last)
+            self.max_waiting = max(self.max_waiting, waiting)
+            last = now
+            await asyncio.sleep(LOCK_SAMPLE_S)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+async def _deadlocks(conn) -> int:
+    cur = await conn.execute("select deadlocks from pg_stat_database where datname = current_database()")
+    return int((await cur.fetchone())[0])
+
+
+class Worker:
+    def __init__(self, conn, operation: str, fixture: Fixture, index: int, stats: LatencyStats,
+                 rng: random.Random, max_retries: int, orders: Optional[list[str]] = None):
+        self.conn = conn
+        self.operation = operation
+        self.fixture = fixture
+        self.item_index = index
+        self.item = fixture.items[index]
+        self.stats = stats
+        self.rng = rng
+        self.max_retries = max_retries
+        self.orders = orders or []
+        self.consumed = 0.0
+
+    async def _call(self, step: int) -> float:
+        f, op = self.fixture, self.operation
+        if op == "finalize_order_stock":
+            cur = await self.conn.execute(
+                "update public.orders set is_paid = true, payment_status = 'paid', status = 'preparing', "
+                "updated_at = now() where id = %s returning stock_deducted",
+                (self.orders[step],),
+            )
+            if not (await cur.fetchone())[0]:
+                raise RpcError(0, "stock_not_deducted", f"order {self.orders[step]} not deducted")
+            return RECIPE_QTY
+        qty = self.rng.randint(1, 50)
+        if op == "apply_stock_delta":
+            cur = await self.conn.execute(
+                "select public.apply_stock_delta(%s, %s, %s, 'adjustment', %s, null, 'ml', %s, null, 'bench', false)",
+                (self.item, f.store_id, -qty, f.location_id, f"bench-{uuid.uuid4()}"),
+            )
+            unwrap((await cur.fetchone())[0])
+        elif op == "decrease_stock_atomic":
+            await self.conn.execute(
+                "select public.decrease_stock_atomic(%s, %s, %s, %s, 'bench')",
+                (f.store_id, f.location_id, self.item, qty),
+            )
+        else:
+            cur = await self.conn.execute(
+                "select public.consume_from_open_packages(%s, %s, %s)", (self.item, f.store_id, qty),
+            )
+            unwrap((await cur.fetchone())[0])
+        return qty
+
+    async def run(self, count: int) -> None:
+        psycopg = require("psycopg", "psycopg[binary]")
+        for step in range(count):
+            started = time.perf_counter()
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.conn.transaction():
+                        qty = await self._call(step)
+                except psycopg.Error as exc:
+                    error = RpcError(0, exc.sqlstate or "", str(exc))
+                except RpcError as exc:
+                    error = exc
+                else:
+                    self.consumed += qty
+                    self.stats.add((time.perf_counter() - started) * 1000)
+                    break
+                reason = error.retry_reason
+                if reason and attempt < self.max_retries:
+                    self.stats.retries[reason] += 1
+                    await asyncio.sleep(self.rng.uniform(0.001, 0.01) * 2 ** attempt)
+                    continue
+                self.stats.error(reason or error.code)
+                break
+
+
+async def run_level(dsn: str, fixture: Fixture, operation: str, mode: str, concurrency: int,
+                    per_worker: int, max_retries: int, seed: int) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    indices = [0] * concurrency if mode == "shared" else list(range(1, concurrency + 1))
+
+    with psycopg.connect(dsn) as setup_conn:
+        setup(setup_conn, fixture)
+        orders = {}
+        if operation == "finalize_order_stock":
+            for w, index in enumerate(indices):
+                orders[w] = create_orders(setup_conn, fixture, index, per_worker)
+        items = sorted(set(indices))
+        run_orders = [o for ids in orders.values() for o in ids]
+        before = {i: read_stock(setup_conn, operation, fixture, fixture.items[i], run_orders) for i in items}
+
+    stats = LatencyStats(f"{operation}/{mode}/{concurrency}")
+    conns = [await psycopg.AsyncConnection.connect(dsn, autocommit=True) for _ in range(concurrency + 1)]
+    try:
+        workers = [
+            Worker(conns[w], operation, fixture, index, stats, random.Random(f"{seed}:{w}"), max_retries,
+                   orders.get(w))
+            for w, index in enumerate(indices)
+        ]
+        sampler = LockSampler(conns[-1])
+        deadlocks_before = await _deadlocks(conns[-1])
+        sampling = asyncio.create_task(sampler.run())
+        started = time.perf_counter()
+        await asyncio.gather(*(w.run(per_worker) for w in workers))
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+        await sampling
+        deadlocks = await _deadlocks(conns[-1]) - deadlocks_before
+    finally:
+        for conn in conns:
+            await conn.close()
+
+    with psycopg.connect(dsn) as check_conn:
+        after = {i: read_stock(check_conn, operation, fixture, fixture.items[i], run_orders) for i in items}
+    expected = {i: 0.0 for i in items}
+    for w in workers:
+        expected[w.item_index] += w.consumed
+    mismatches = {fixture.items[i]: (before[i] - after[i], expected[i]) for i in items
+                  if abs((before[i] - after[i]) - expected[i]) > 1e-6}
+
+    row = stats.to_dict()
+    row.update({
+        "operation": operation,
+        "mode": mode,
+        "concurrency": concurrency,
+        "throughput_per_s": round(row["count"] / elapsed, 1) if elapsed else None,
+        "lock_wait_s": round(sampler.lock_wait_s, 3),
+        "max_lock_waiters": sampler.max_waiting,
+        "deadlocks": deadlocks,
+        "stock_ok": not mismatches,
+        "stock_mismatches": {k: {"observed": v[0], "expected": v[1]} for k, v in mismatches.items()},
+    })
+    return row
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [f"{'operation':<28} {'mode':<8} {'conc':>4} {'ops/s':>8} {'p50':>7} {'p99':>8} "
+             f"{'lockwait':>8} {'dl':>3} {'retry':>5} {'err':>4} stock"]
+    for r in rows:
+        lines.append(
+            f"{r['operation']:<28} {r['mode']:<8} {r['concurrency']:4d} {r['throughput_per_s'] or 0:8.1f} "
+            f"{r['p50_ms'] or 0:7.1f} {r['p99_ms'] or 0:8.1f} {r['lock_wait_s']:8.2f} {r['deadlocks']:3d} "
+            f"{sum(r['retries'].values()):5d} {r['errors']:4d} {'ok' if r['stock_ok'] else 'MISMATCH'}"
+        )
+    return "\n".join(lines)
+
+
+async def _run(args: argparse.Namespace) -> list[dict]:
+    levels = sorted({int(c) for c in args.concurrency.split(",")})
+    tenant = seed_tenants(args.dsn, 1)[0]
+    fixture = _fixture(tenant, max(levels) + 1)
+    rows = []
+    for operation in args.ops.split(","):
+        for mode in MODES:
+            for concurrency in levels:
+                row = await run_level(args.dsn, fixture, operation, mode, concurrency, args.per_worker,
+                                      args.max_retries, args.seed)
+                rows.append(row)
+                print(format_rows([row]).splitlines()[1], flush=True)
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.stock_contention", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--ops", default=",".join(OPERATIONS))
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--per-worker", type=int, default=200, help="calls per worker per level")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    unknown = set(args.ops.split(",")) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    print(format_rows([]))
+    rows = asyncio.run(_run(args))
+    path = write_report("stock_contention", {"levels": rows})
+    print(f"report: {path}")
+    return 0 if all(r["stock_ok"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,538 @@
+"""In-process stand-ins for the third-party APIs the edge functions call.
+
+Each stub is a ``ThreadingHTTPServer`` on ``127.0.0.1`` that runs in a
+daemon thread, like ``perf.gateway``, and counts what it served. The
+functions reach a stub through their API base-URL environment variable,
+e.g. ``MP_API_URL`` for Mercado Pago.
+
+* ``MercadoPagoStub``: ``GET /v1/payments/<id>`` from an in-memory
+  registry that the load tool updates as payments change state.
+* ``CountingProxy``: a pass-through to the Supabase URL that counts
+  requests per REST table or RPC. It is placed between a function and
+  the stack to measure its round-trips.
+* ``ResendStub``: Resend's ``POST /emails``, recording every message and
+  optionally answering 429 above a request rate or 500 for a share of
+  sends.
+* ``GeminiStub``: Gemini's ``POST /v1beta/models/<model>:generateContent``
+  with an inline image. It answers a fixed extraction derived from the
+  image hash, after a delay that grows with the image size.
+* ``GeminiTextStub``: Gemini's text ``generateContent`` and
+  ``streamGenerateContent?alt=sse``. It answers a fixed reply per prompt,
+  paced like a model: a time to first token, then tokens at a set rate.
+* ``UpstashRedisStub``: the Upstash Redis REST API (``POST /`` with one
+  command, ``POST /pipeline`` with several) over an in-memory keyspace
+  with expiry. It implements the commands the rate limiters use.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse
+
+from .gateway import HOP_BY_HOP
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, status: int, payload) -> None:
+        self._send(status, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self) -> None:
+        self.server.dispatch(self)
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = do_GET
+
+
+class StubServer(ThreadingHTTPServer):
+    """Base for the stubs: lifecycle, request counting and optional latency."""
+
+    daemon_threads = True
+    name = "stub"
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        super().__init__(("127.0.0.1", port), _StubHandler)
+        self.latency_ms = latency_ms
+        self.requests: Counter = Counter()
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.requests[key] += 1
+
+    def dispatch(self, request: _StubHandler) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.route(request, urlparse(request.path).path)
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        raise NotImplementedError
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=f"payper-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class MercadoPagoStub(StubServer):
+    """Serves ``GET /v1/payments/<id>`` from ``payments``.
+
+    A payment is the dict MP returns (``status``, ``external_reference``,
+    ``transaction_amount``...). ``set_status`` changes it in place, so the
+    next fetch sees the new state, as after a real status change.
+    """
+
+    name = "mercadopago"
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        super().__init__(port, latency_ms)
+        self.payments: dict[str, dict] = {}
+
+    def add_payment(self, payment_id: str, order_ref: str, amount: float, status: str = "pending") -> dict:
+        payment = {
+            "id": int(payment_id) if payment_id.isdigit() else payment_id,
+            "status": status,
+            "status_detail": "accredited" if status == "approved" else status,
+            "external_reference": order_ref,
+            "transaction_amount": amount,
+            "currency_id": "ARS",
+            "payment_method_id": "account_money",
+            "payment_type_id": "account_money",
+            "date_approved": None,
+            "payer": {"email": "perf@payper.local"},
+        }
+        with self.lock:
+            self.payments[payment_id] = payment
+        return payment
+
+    def set_status(self, payment_id: str, status: str) -> None:
+        with self.lock:
+            payment = self.payments[payment_id]
+            payment["status"] = status
+            payment["status_detail"] = "accredited" if status == "approved" else f"cc_{status}"
+            if status == "approved":
+                payment["date_approved"] = time.strftime("%Y-%m-%dT%H:%M:%S.000-03:00")
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        if request.command == "GET" and path.startswith("/v1/payments/"):
+            payment_id = path.rsplit("/", 1)[-1]
+            self.count(f"payment:{payment_id}")
+            with self.lock:
+                payment = dict(self.payments.get(payment_id) or {})
+            if payment:
+                request._json(200, payment)
+            else:
+                request._json(404, {"message": "Payment not found", "status": 404})
+        else:
+            request._json(404, {"message": f"{request.command} {path} is not stubbed"})
+
+
+class ResendStub(StubServer):
+    """Accepts ``POST /emails`` and keeps each message in ``emails``.
+
+    ``rate_limit_per_s`` answers 429 (``rate_limit_exceeded``) once more
+    requests than that arrived in the last second, like Resend's per-key
+    limit. ``fail_share`` answers 500 for that share of sends, picked by a
+    seeded RNG. ``peak_in_flight`` is the most requests served at once.
+    """
+
+    name = "resend"
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, rate_limit_per_s: float = 0.0,
+                 fail_share: float = 0.0, seed: int = 1):
+        super().__init__(port, latency_ms)
+        self.rate_limit_per_s = rate_limit_per_s
+        self.fail_share = fail_share
+        self.rng = random.Random(seed)
+        self.emails: list[dict] = []
+        self.recent: deque = deque()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def dispatch(self, request: _StubHandler) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            super().dispatch(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        if request.command != "POST" or path.rstrip("/") != "/emails":
+            request._json(404, {"name": "not_found", "message": f"{request.command} {path} is not stubbed"})
+            return
+        message = json.loads(request._body() or b"{}")
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0] <= now - 1:
+                self.recent.popleft()
+            self.recent.append(now)
+            limited = bool(self.rate_limit_per_s) and len(self.recent) > self.rate_limit_per_s
+            failed = not limited and self.rng.random() < self.fail_share
+            if not limited and not failed:
+                self.emails.append(message)
+        if limited:
+            self.count("429")
+            request._json(429, {"name": "rate_limit_exceeded", "message": "Too many requests", "statusCode": 429})
+        elif failed:
+            self.count("500")
+            request._json(500, {"name": "application_error", "message": "Stub failure", "statusCode": 500})
+        else:
+            self.count("sent")
+            request._json(200, {"id": str(uuid.uuid4())})
+
+
+class GeminiStub(StubServer):
+    """Answers ``generateContent`` with ``extraction_for`` the inline image.
+
+    Each call takes ``latency_ms`` plus ``ms_per_mb`` per MB of image, like
+    a vision model whose cost grows with the pixels it reads. ``calls``
+    counts calls per image SHA-256 (hex) and ``image_bytes`` sums what was
+    sent. ``peak_in_flight`` is the most calls served at once.
+    """
+
+    name = "gemini"
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, ms_per_mb: float = 0.0):
+        super().__init__(port, latency_ms)
+        self.ms_per_mb = ms_per_mb
+        self.calls: Counter = Counter()
+        self.image_bytes = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @staticmethod
+    def extraction_for(image_hash: str) -> dict:
+        """The invoice the stand-in "reads" from an image, fixed per hash."""
+        rng = random.Random(image_hash)
+        items = []
+        for i in range(rng.randint(1, 8)):
+            quantity = rng.randint(1, 24)
+            price = rng.randint(100, 20000) / 10
+            items.append({"descripcion": f"Item {image_hash[:6]}-{i}", "cantidad": quantity,
+                          "unidad": rng.choice(["kg", "lt", "un"]), "precio_unitario": price,
+                          "bonificacion": 0, "total_linea": round(quantity * price, 2)})
+        subtotal = round(sum(item["total_linea"] for item in items), 2)
+        return {"proveedor": f"Proveedor {image_hash[:8]}", "fecha": "2026-10-01",
+                "nro_factura": f"A-0001-{int(image_hash[:6], 16):08d}", "subtotal": subtotal,
+                "iva": round(subtotal * 0.21, 2), "total": round(subtotal * 1.21, 2), "items": items}
+
+    def dispatch(self, request: _StubHandler) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            super().dispatch(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        if request.command != "POST" or not path.endswith(":generateContent"):
+            request._json(404, {"error": {"code": 404, "message": f"{request.command} {path} is not stubbed"}})
+            return
+        body = json.loads(request._body() or b"{}")
+        parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+        images = [base64.b64decode(part["inlineData"]["data"]) for part in parts if "inlineData" in part]
+        if not images:
+            self.count("400")
+            request._json(400, {"error": {"code": 400, "message": "no inline image"}})
+            return
+        image_hash = hashlib.sha256(images[0]).hexdigest()
+        with self.lock:
+            self.calls[image_hash] += 1
+            self.image_bytes += len(images[0])
+        if self.ms_per_mb:
+            time.sleep(self.ms_per_mb * len(images[0]) / 1_000_000 / 1000)
+        self.count("generateContent")
+        text = "```json\n" + json.dumps(self.extraction_for(image_hash), ensure_ascii=False) + "\n```"
+        request._json(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP",
+                            "index": 0}],
+            "usageMetadata": {"promptTokenCount": 258 + 300, "candidatesTokenCount": len(text) // 4},
+        })
+
+
+class GeminiTextStub(StubServer):
+    """Answers text prompts with ``reply_for`` the prompt, paced like a model.
+
+    The first chunk comes ``ttft_ms`` after the request (prefill), then
+    ``chunk_tokens`` words per chunk at ``tokens_per_s``. ``generateContent``
+    sends the whole reply once the last chunk would have been generated;
+    ``streamGenerateContent?alt=sse`` sends each chunk as an SSE event, as
+    the SDK's ``generateContentStream`` reads them. Preflight and CORS
+    headers let the browser app use it through ``VITE_GEMINI_API_BASE_URL``.
+    ``calls`` counts calls per prompt and ``peak_in_flight`` is the most
+    calls served at once.
+    """
+
+    name = "gemini-text"
+    WORDS = ("mesa", "barra", "stock", "ventas", "café", "turno", "ticket", "cliente", "recompensa", "pedido",
+             "tostado", "cremoso", "artesanal", "intenso", "suave", "notas", "cacao", "vainilla", "leche", "espuma")
+    CORS = {"Access-Control-Allow-Origin": "*", "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Methods": "POST, OPTIONS"}
+
+    def __init__(self, port: int = 0, ttft_ms: float = 400.0, tokens_per_s: float = 60.0, chunk_tokens: int = 8,
+                 reply_words: int = 60):
+        super().__init__(port)
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.chunk_tokens = chunk_tokens
+        self.reply_words = reply_words
+        self.calls: Counter = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def reply_for(self, prompt: str) -> str:
+        """The reply to ``prompt``, fixed per prompt and ``reply_words`` words long."""
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        return " ".join(rng.choice(self.WORDS) for _ in range(self.reply_words)) + "."
+
+    def _chunks(self, text: str) -> list[str]:
+        words = text.split(" ")
+        return [" ".join(words[i:i + self.chunk_tokens]) + (" " if i + self.chunk_tokens < len(words) else "")
+                for i in range(0, len(words), self.chunk_tokens)]
+
+    @staticmethod
+    def _response(text: str, final: bool) -> dict:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if final:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+    def _reply(self, request: _StubHandler, status: int, payload: dict) -> None:
+        request._send(status, json.dumps(payload).encode(), {"Content-Type": "application/json", **self.CORS})
+
+    def dispatch(self, request: _StubHandler) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            super().dispatch(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        if request.command == "OPTIONS":
+            request._send(204, headers=self.CORS)
+            return
+        stream = path.endswith(":streamGenerateContent")
+        if request.command != "POST" or not (stream or path.endswith(":generateContent")):
+            self._reply(request, 404, {"error": {"code": 404, "message": f"{request.command} {path} is not stubbed"}})
+            return
+        body = json.loads(request._body() or b"{}")
+        prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                         for part in content.get("parts", []))
+        with self.lock:
+            self.calls[prompt] += 1
+        chunks = self._chunks(self.reply_for(prompt))
+        chunk_s = self.chunk_tokens / self.tokens_per_s if self.tokens_per_s else 0.0
+        time.sleep(self.ttft_ms / 1000)
+
+        if not stream:
+            self.count("generateContent")
+            time.sleep(chunk_s * (len(chunks) - 1))
+            self._reply(request, 200, self._response("".join(chunks), True))
+            return
+
+        # Chunked transfer encoding: the length of the stream is not known up front
+        self.count("streamGenerateContent")
+        request.send_response(200)
+        for key, value in {"Content-Type": "text/event-stream", "Transfer-Encoding": "chunked", **self.CORS}.items():
+            request.send_header(key, value)
+        request.end_headers()
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(chunk_s)
+            event = f"data: {json.dumps(self._response(chunk, i == len(chunks) - 1))}\r\n\r\n".encode()
+            request.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            request.wfile.flush()
+        request.wfile.write(b"0\r\n\r\n")
+
+
+class CountingProxy(StubServer):
+    """Forwards everything to ``upstream_url`` and counts it per REST target."""
+
+    name = "counting-proxy"
+
+    def __init__(self, upstream_url: str, port: int = 0):
+        super().__init__(port)
+        self.upstream = urlparse(upstream_url)
+        self._local = threading.local()
+
+    @staticmethod
+    def target(path: str) -> str:
+        """``rpc/<name>``, the table name, or the API prefix for non-REST paths."""
+        if "/rest/v1/rpc/" in path:
+            return "rpc/" + path.rsplit("/", 1)[-1]
+        if "/rest/v1/" in path:
+            return path.split("/rest/v1/", 1)[1].split("/", 1)[0]
+        return "/".join(path.split("/")[:3])
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.upstream.scheme == "https" else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.upstream.hostname, self.upstream.port, timeout=60)
+        return conn
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        self.count(f"{request.command} {self.target(path)}")
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+        body = request._body()
+        try:
+            conn = self._conn()
+            conn.request(request.command, self.upstream.path.rstrip("/") + request.path, body=body or None,
+                         headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            self._local.conn = None
+            request._json(502, {"message": f"upstream {self.upstream.geturl()} unavailable"})
+            return
+        request._send(response.status, payload,
+                      {k: v for k, v in response.getheaders() if k.lower() not in HOP_BY_HOP})
+
+    def total(self) -> int:
+        with self.lock:
+            return sum(self.requests.values())
+
+
+class UpstashRedisStub(StubServer):
+    """Upstash REST stand-in: ``["INCR", "k"]`` in, ``{"result": 1}`` out.
+
+    Supported: ``INCR``, ``GET``, ``SET``, ``DEL``, ``EXPIRE``, ``PEXPIRE``,
+    ``PTTL`` and ``DBSIZE``. Values are strings, as Upstash returns them,
+    except ``INCR``/``DBSIZE``/TTL results. A request carrying
+    ``X-Perf-Now: <ms>`` runs its TTLs on that virtual clock instead of the
+    real one, so replayed traffic expires keys as it would have live.
+    """
+
+    name = "upstash-redis"
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        super().__init__(port, latency_ms)
+        self.data: dict[str, str] = {}
+        self.expires: dict[str, float] = {}  # key -> deadline, in seconds of the clock in use
+        self.peak_keys = 0
+        self.virtual_now: Optional[float] = None
+        self.clock_lock = threading.Lock()  # one request per clock setting
+        self._writes = 0
+
+    def _now(self) -> float:
+        return self.virtual_now if self.virtual_now is not None else time.monotonic()
+
+    def _alive(self, key: str) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and self._now() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _written(self) -> None:
+        # Expire lazily like Redis, but sweep now and then so peak_keys counts live keys
+        self._writes += 1
+        if self._writes % 1024 == 0:
+            for key in [k for k, deadline in self.expires.items() if self._now() >= deadline]:
+                self._alive(key)
+        self.peak_keys = max(self.peak_keys, len(self.data))
+
+    def command(self, args: list) -> dict:
+        name, key = str(args[0]).upper(), (str(args[1]) if len(args) > 1 else "")
+        self.count(name)
+        with self.lock:
+            if name == "INCR":
+                value = int(self.data[key]) + 1 if self._alive(key) else 1
+                self.data[key] = str(value)
+                self._written()
+                return {"result": value}
+            if name == "GET":
+                return {"result": self.data[key] if self._alive(key) else None}
+            if name == "SET":
+                self.data[key] = str(args[2])
+                self.expires.pop(key, None)
+                self._written()
+                return {"result": "OK"}
+            if name == "DEL":
+                removed = sum(1 for k in args[1:] if self._alive(str(k)) and self.data.pop(str(k), None) is not None)
+                return {"result": removed}
+            if name in ("EXPIRE", "PEXPIRE"):
+                if not self._alive(key):
+                    return {"result": 0}
+                ms = float(args[2]) * (1000 if name == "EXPIRE" else 1)
+                self.expires[key] = self._now() + ms / 1000
+                return {"result": 1}
+            if name == "PTTL":
+                if not self._alive(key):
+                    return {"result": -2}
+                deadline = self.expires.get(key)
+                return {"result": -1 if deadline is None else int((deadline - self._now()) * 1000)}
+            if name == "DBSIZE":
+                return {"result": sum(1 for k in list(self.data) if self._alive(k))}
+        return {"error": f"ERR command {name} is not stubbed"}
+
+    def route(self, request: _StubHandler, path: str) -> None:
+        if request.command != "POST":
+            request._json(405, {"error": "POST only"})
+            return
+        try:
+            body = json.loads(request._body() or b"null")
+        except ValueError:
+            request._json(400, {"error": "ERR invalid JSON"})
+            return
+        now = request.headers.get("X-Perf-Now")
+        with self.clock_lock:
+            self.virtual_now = float(now) / 1000 if now is not None else None
+            if path.rstrip("/") == "/pipeline":
+                request._json(200, [self.command(args) for args in body])
+            else:
+                request._json(200, self.command(body))
+
+    def keys(self) -> int:
+        return self.command(["DBSIZE"])["result"]
@@ -0,0 +1,471 @@
+"""Concurrency benchmark for the wallet ledger write paths.
+
+    python -m perf.wallet_ledger                             # default mix, shared + disjoint
+    python -m perf.wallet_ledger --concurrency 1,8,32 --per-worker 500
+    python -m perf.wallet_ledger --mix pay_with_wallet=1,admin_add_balance=1
+
+For each mode and concurrency level, N workers (one connection each) run
+``--per-worker`` operations drawn from ``--mix``, interleaved on the same
+wallets:
+
+* ``shared``: every worker uses one wallet, like a group on one account;
+* ``disjoint``: each worker has its own wallet, which is the no-contention baseline.
+
+Operations (every one ends in a ``wallet_ledger`` insert whose trigger
+``update_wallet_balance_from_ledger`` sets ``clients.wallet_balance``):
+
+* ``topup``: the ``create-topup`` ``wallet_transactions`` row, then the
+  ``mp-webhook`` call ``credit_wallet(txn, mp_payment_id, 'approved')``;
+  only the credit is timed;
+* ``admin_add_balance``: as a store admin;
+* ``pay_with_wallet``: as the store cashier, for a new order id;
+* ``complete_wallet_payment``: as the wallet's client, on a pre-built
+  unpaid order;
+* ``refund_on_edit`` / ``charge_on_edit``: lower or raise ``total_amount``
+  of a pre-built wallet-paid order, which fires
+  ``wallet_partial_refund_on_edit`` / ``wallet_additional_charge_on_edit``.
+
+Per level the report gives throughput, p50/p99 overall and per operation,
+lock-wait time (sampled from ``pg_stat_activity``), deadlocks, retries and
+error codes. It then checks every wallet of the level:
+
+* ``ledger``: ``clients.wallet_balance`` equals ``SUM(wallet_ledger.amount)``
+  (Test 2 of ``WALLET_LEDGER_IMPLEMENTATION_PLAN.md``);
+* ``expected``: the balance equals the opening balance plus the amounts
+  the successful operations reported, so a lost update shows up even when
+  a later entry hides it;
+* ``wallets.balance``, the cache the edit triggers read, is reported as
+  ``cache_drift`` but not gated.
+
+Each level gets fresh ``bench-wallet-*`` clients in tenant 0
+(``perf.seed``). Talks to Postgres directly (``--dsn``/``PAYPER_LOCAL_PG_DSN``)
+and sets ``role`` and ``request.jwt.claims`` per transaction as PostgREST
+does. Exits non-zero if any wallet drifts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from ._deps import require
+from .client import RpcError
+from .seed import SeedTenant, seed_id, seed_tenants
+from .stats import LatencyStats, write_report
+from .stock_contention import BENCH_ORDER_NUMBERS, LockSampler, _deadlocks
+
+OPERATIONS = ("topup", "admin_add_balance", "pay_with_wallet", "complete_wallet_payment",
+              "refund_on_edit", "charge_on_edit")
+ORDER_OPERATIONS = ("complete_wallet_payment", "refund_on_edit", "charge_on_edit")
+DEFAULT_MIX = ("topup=2,admin_add_balance=1,pay_with_wallet=4,complete_wallet_payment=2,"
+               "refund_on_edit=1,charge_on_edit=1")
+MODES = ("shared", "disjoint")
+
+OPENING_BALANCE = 10**7  # no operation should fail for lack of funds
+ORDER_PRICE = 500  # one bench product per unpaid order
+EDITED_TOTAL = 1000  # wallet-paid orders before the edit
+
+
+@dataclass(frozen=True)
+class Fixture:
+    store_id: str
+    admin_id: str  # profile role 'admin'; the seeded owner is 'store_owner', which admin_add_balance rejects
+    cashier_id: str
+    product_id: str
+
+
+@dataclass(frozen=True)
+class Wallet:
+    client_id: str
+    auth_user_id: str
+
+
+def _fixture(tenant: SeedTenant) -> Fixture:
+    return Fixture(
+        store_id=tenant.store_id,
+        admin_id=seed_id("bench", "wallet-admin"),
+        cashier_id=tenant.user_id("cashier"),
+        product_id=seed_id("bench", "wallet-product"),
+    )
+
+
+def setup(conn, fixture: Fixture) -> None:
+    """The bench admin and product; idempotent."""
+    conn.execute(
+        "insert into auth.users (id, email, email_confirmed_at) values (%s, %s, now()) on conflict (id) do nothing",
+        (fixture.admin_id, f"bench-wallet-admin@{fixture.store_id}.payper.test"),
+    )
+    conn.execute(
+        "insert into public.profiles (id, email, full_name, role, store_id, is_active) "
+        "values (%s, %s, 'bench-wallet-admin', 'admin', %s, true) "
+        "on conflict (id) do update set role = excluded.role, store_id = excluded.store_id",
+        (fixture.admin_id, f"bench-wallet-admin@{fixture.store_id}.payper.test", fixture.store_id),
+    )
+    conn.execute(
+        "insert into public.products (id, store_id, name, base_price, active, is_visible, tax_rate) "
+        "values (%s, %s, 'bench-wallet-product', %s, true, false, 0) "
+        "on conflict (id) do update set base_price = excluded.base_price, active = true",
+        (fixture.product_id, fixture.store_id, ORDER_PRICE),
+    )
+    conn.commit()
+
+
+def create_wallets(conn, fixture: Fixture, count: int) -> list[Wallet]:
+    """Fresh clients (with auth user and ``wallets`` row) holding an opening ledger entry.
+
+    Inserted with triggers off; the opening entry and ``wallet_balance`` are
+    written together so the ledger invariant holds from the start.
+    """
+    wallets = [Wallet(str(uuid.uuid4()), str(uuid.uuid4())) for _ in range(count)]
+    conn.execute("set session_replication_role = replica")
+    for w in wallets:
+        email = f"bench-wallet-{w.client_id}@payper.test"
+        conn.execute("insert into auth.users (id, email, email_confirmed_at) values (%s, %s, now())",
+                     (w.auth_user_id, email))
+        conn.execute(
+            "insert into public.clients (id, store_id, auth_user_id, email, name, full_name, "
+            "wallet_balance, loyalty_points, is_active) values (%s, %s, %s, %s, %s, %s, %s, 0, true)",
+            (w.client_id, fixture.store_id, w.auth_user_id, email, f"bench-wallet-{w.client_id[:8]}",
+             f"bench-wallet-{w.client_id[:8]}", OPENING_BALANCE),
+        )
+        conn.execute(
+            "insert into public.wallets (id, user_id, store_id, balance, last_updated) "
+            "values (%s, %s, %s, %s, now())",
+            (str(uuid.uuid4()), w.client_id, fixture.store_id, OPENING_BALANCE),
+        )
+        conn.execute(
+            "insert into public.wallet_ledger (wallet_id, store_id, amount, balance_after, entry_type, source, "
+            "description, idempotency_key) values (%s, %s, %s, %s, 'topup', 'system', 'bench opening balance', %s)",
+            (w.client_id, fixture.store_id, OPENING_BALANCE, OPENING_BALANCE, f"bench_opening_{w.client_id}"),
+        )
+    conn.execute("set session_replication_role = origin")
+    conn.commit()
+    return wallets
+
+
+def create_orders(conn, fixture: Fixture, wallet: Wallet, paid: bool, count: int) -> list[str]:
+    """Single-product orders for ``wallet``: unpaid at ORDER_PRICE, or wallet-paid at EDITED_TOTAL."""
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    if not ids:
+        return ids
+    total = EDITED_TOTAL if paid else ORDER_PRICE
+    conn.execute("set session_replication_role = replica")
+    with conn.cursor().copy(
+        "COPY public.orders (id, store_id, client_id, order_number, status, channel, payment_status, "
+        "payment_method, is_paid, subtotal, tax_amount, discount_amount, total_amount, stock_deducted, "
+        "created_at, placed_at, updated_at) FROM STDIN"
+    ) as copy:
+        for order_id in ids:
+            copy.write_row((order_id, fixture.store_id, wallet.client_id, next(BENCH_ORDER_NUMBERS),
+                            "preparing" if paid else "pending", "takeaway", "approved" if paid else "pending",
+                            "wallet" if paid else None, paid, total, 0, 0, total, paid, "now", "now", "now"))
+    with conn.cursor().copy(
+        "COPY public.order_items (id, order_id, store_id, product_id, quantity, unit_price, total_price, created_at) "
+        "FROM STDIN"
+    ) as copy:
+        for order_id in ids:
+            copy.write_row((str(uuid.uuid4()), order_id, fixture.store_id, fixture.product_id,
+                            total // ORDER_PRICE, ORDER_PRICE, total, "now"))
+    conn.execute("set session_replication_role = origin")
+    conn.commit()
+    return ids
+
+
+def _succeeded(result) -> dict:
+    """The wallet RPCs report failures as JSON; ``pay_with_wallet`` omits ``success`` on them."""
+    if not isinstance(result, dict) or result.get("success") is not True:
+        error = result.get("error") if isinstance(result, dict) else None
+        raise RpcError(200, str(error or "no_result"), json.dumps(result, default=str))
+    return result
+
+
+class Worker:
+    def __init__(self, conn, fixture: Fixture, wallet: Wallet, plan: list[str], orders: dict[str, list[str]],
+                 stats: dict[str, LatencyStats], overall: LatencyStats, rng: random.Random, max_retries: int):
+        self.conn = conn
+        self.fixture = fixture
+        self.wallet = wallet
+        self.plan = plan
+        self.orders = {op: iter(ids) for op, ids in orders.items()}
+        self.stats = stats
+        self.overall = overall
+        self.rng = rng
+        self.max_retries = max_retries
+        self.delta = 0.0  # sum of the amounts successful operations moved
+
+    async def _act_as(self, role: str, user_id: Optional[str] = None) -> None:
+        claims = {"role": role, **({"sub": user_id} if user_id else {})}
+        await self.conn.execute("select set_config('role', %s, true), set_config('request.jwt.claims', %s, true)",
+                                (role, json.dumps(claims)))
+
+    async def _prepare(self, op: str) -> tuple:
+        """Untimed work before the operation: the ``create-topup`` row, or the next pre-built order."""
+        if op == "topup":
+            amount = self.rng.randint(100, 1000)
+            cur = await self.conn.execute(
+                "insert into public.wallet_transactions (store_id, user_id, client_id, wallet_id, amount, type, "
+                "status, description) values (%s, %s, %s, null, %s, 'topup_pending', 'pending', %s) returning id",
+                (self.fixture.store_id, self.wallet.auth_user_id, self.wallet.client_id, amount,
+                 f"Recarga MP - ${amount}"),
+            )
+            return (await cur.fetchone())[0], amount
+        if op in ORDER_OPERATIONS:
+            return (next(self.orders[op]),)
+        return ()
+
+    async def _call(self, op: str, args: tuple) -> float:
+        w, f = self.wallet, self.fixture
+        if op == "topup":
+            txn, _ = args
+            await self._act_as("service_role")
+            cur = await self.conn.execute("select public.credit_wallet(%s, %s, 'approved')",
+                                          (txn, f"bench-{uuid.uuid4().hex[:12]}"))
+            return float(_succeeded((await cur.fetchone())[0])["amount"])
+        if op == "admin_add_balance":
+            amount = self.rng.randint(100, 1000)
+            await self._act_as("authenticated", f.admin_id)
+            cur = await self.conn.execute("select public.admin_add_balance(%s, %s, 'bench credit')",
+                                          (w.client_id, amount))
+            _succeeded((await cur.fetchone())[0])
+            return amount
+        if op == "pay_with_wallet":
+            amount = self.rng.randint(50, 500)
+            await self._act_as("authenticated", f.cashier_id)
+            cur = await self.conn.execute("select public.pay_with_wallet(%s, %s, %s)",
+                                          (w.client_id, amount, str(uuid.uuid4())))
+            _succeeded((await cur.fetchone())[0])
+            return -amount
+        if op == "complete_wallet_payment":
+            await self._act_as("authenticated", w.auth_user_id)
+            cur = await self.conn.execute("select public.complete_wallet_payment(%s)", args)
+            _succeeded((await cur.fetchone())[0])
+            return -ORDER_PRICE
+        # Order edits: the triggers return nothing, so read the entry they wrote.
+        change = self.rng.randint(10, 200)
+        order_id = args[0]
+        await self.conn.execute(
+            "update public.orders set total_amount = %s, updated_at = now() where id = %s",
+            (EDITED_TOTAL - change if op == "refund_on_edit" else EDITED_TOTAL + change, order_id),
+        )
+        cur = await self.conn.execute(
+            "select count(*), coalesce(sum(amount), 0) from public.wallet_ledger "
+            "where wallet_id = %s and reference_id = %s", (w.client_id, order_id),
+        )
+        entries, amount = await cur.fetchone()
+        if entries != 1:
+            raise RpcError(0, "no_ledger_entry", f"order {order_id} edit wrote {entries} ledger entries")
+        return float(amount)
+
+    async def run(self) -> None:
+        psycopg = require("psycopg", "psycopg[binary]")
+        for op in self.plan:
+            try:
+                args = await self._prepare(op)
+            except psycopg.Error as exc:
+                self.stats[op].error(f"prepare:{exc.sqlstate or 'error'}")
+                self.overall.error(f"{op}:prepare")
+                continue
+            started = time.perf_counter()
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.conn.transaction():
+                        moved = await self._call(op, args)
+                except psycopg.Error as exc:
+                    error = RpcError(0, exc.sqlstate or "", str(exc))
+                except RpcError as exc:
+                    error = exc
+                else:
+                    self.delta += moved
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    self.stats[op].add(elapsed_ms)
+                    self.overall.add(elapsed_ms)
+                    break
+                reason = error.retry_reason
+                if reason and attempt < self.max_retries:
+                    self.stats[op].retries[reason] += 1
+                    self.overall.retries[reason] += 1
+                    await asyncio.sleep(self.rng.uniform(0.001, 0.01) * 2 ** attempt)
+                    continue
+                self.stats[op].error(reason or error.code)
+                self.overall.error(f"{op}:{reason or error.code}")
+                break
+
+
+def check_wallets(conn, wallets: list[Wallet], moved: dict[str, float]) -> list[dict]:
+    """Per wallet: balance, ledger sum, expected balance and the ``wallets`` cache."""
+    rows = conn.execute(
+        "select c.id::text, coalesce(c.wallet_balance, 0), "
+        "coalesce((select sum(wl.amount) from public.wallet_ledger wl "
+        "where wl.wallet_id = c.id and wl.store_id = c.store_id), 0), "
+        "(select count(*) from public.wallet_ledger wl where wl.wallet_id = c.id), "
+        "(select w.balance from public.wallets w where w.user_id = c.id and w.store_id = c.store_id) "
+        "from public.clients c where c.id = any(%s::uuid[])",
+        ([w.client_id for w in wallets],),
+    ).fetchall()
+    out = []
+    for client_id, balance, ledger_sum, entries, cached in rows:
+        balance, ledger_sum = float(balance), float(ledger_sum)
+        expected = OPENING_BALANCE + moved[client_id]
+        out.append({
+            "client_id": client_id,
+            "entries": entries,
+            "balance": balance,
+            "ledger_sum": ledger_sum,
+            "expected": expected,
+            "ledger_ok": abs(balance - ledger_sum) <= 0.01,
+            "expected_ok": abs(balance - expected) <= 0.01,
+            "cache_drift": None if cached is None else round(float(cached) - balance, 2),
+        })
+    return out
+
+
+async def run_level(dsn: str, fixture: Fixture, mode: str, concurrency: int, per_worker: int,
+                    mix: dict[str, int], max_retries: int, seed: int) -> dict:
+    psycopg = require("psycopg", "psycopg[binary]")
+    ops, weights = list(mix), list(mix.values())
+    plans = [random.Random(f"{seed}:{mode}:{concurrency}:{w}").choices(ops, weights, k=per_worker)
+             for w in range(concurrency)]
+
+    with psycopg.connect(dsn) as setup_conn:
+        wallets = create_wallets(setup_conn, fixture, 1 if mode == "shared" else concurrency)
+        assigned = [wallets[0] if mode == "shared" else wallets[w] for w in range(concurrency)]
+        orders = []
+        for wallet, plan in zip(assigned, plans):
+            counts = Counter(plan)
+            orders.append({op: create_orders(setup_conn, fixture, wallet, op != "complete_wallet_payment", counts[op])
+                           for op in ORDER_OPERATIONS})
+
+    overall = LatencyStats(f"wallet/{mode}/{concurrency}")
+    per_op = {op: LatencyStats(f"{op}/{mode}/{concurrency}") for op in ops}
+    conns = [await psycopg.AsyncConnection.connect(dsn, autocommit=True) for _ in range(concurrency + 1)]
+    try:
+        workers = [
+            Worker(conns[w], fixture, assigned[w], plans[w], orders[w], per_op, overall,
+                   random.Random(f"{seed}:{w}"), max_retries)
+            for w in range(concurrency)
+        ]
+        sampler = LockSampler(conns[-1])
+        deadlocks_before = await _deadlocks(conns[-1])
+        sampling = asyncio.create_task(sampler.run())
+        started = time.perf_counter()
+        await asyncio.gather(*(w.run() for w in workers))
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+        await sampling
+        deadlocks = await _deadlocks(conns[-1]) - deadlocks_before
+    finally:
+        for conn in conns:
+            await conn.close()
+
+    moved = {w.client_id: 0.0 for w in wallets}
+    for worker in workers:
+        moved[worker.wallet.client_id] += worker.delta
+    with psycopg.connect(dsn) as check_conn:
+        checks = check_wallets(check_conn, wallets, moved)
+
+    row = overall.to_dict()
+    row.update({
+        "mode": mode,
+        "concurrency": concurrency,
+        "wallets": len(wallets),
+        "throughput_per_s": round(row["count"] / elapsed, 1) if elapsed else None,
+        "lock_wait_s": round(sampler.lock_wait_s, 3),
+        "max_lock_waiters": sampler.max_waiting,
+        "deadlocks": deadlocks,
+        "operations": {op: s.to_dict() for op, s in per_op.items()},
+        "ledger_ok": all(c["ledger_ok"] for c in checks),
+        "expected_ok": all(c["expected_ok"] for c in checks),
+        "max_cache_drift": max((abs(c["cache_drift"] or 0) for c in checks), default=0),
+        "drifted_wallets": [c for c in checks if not (c["ledger_ok"] and c["expected_ok"])],
+    })
+    return row
+
+
+def format_rows(rows: list[dict]) -> str:
+    lines = [f"{'mode':<8} {'conc':>4} {'ops/s':>8} {'p50':>7} {'p99':>8} {'lockwait':>8} {'maxw':>4} "
+             f"{'dl':>3} {'retry':>5} {'err':>4} {'ledger':<8} expected"]
+    for r in rows:
+        lines.append(
+            f"{r['mode']:<8} {r['concurrency']:4d} {r['throughput_per_s'] or 0:8.1f} {r['p50_ms'] or 0:7.1f} "
+            f"{r['p99_ms'] or 0:8.1f} {r['lock_wait_s']:8.2f} {r['max_lock_waiters']:4d} {r['deadlocks']:3d} "
+            f"{sum(r['retries'].values()):5d} {r['errors']:4d} {'ok' if r['ledger_ok'] else 'DRIFT':<8} "
+            f"{'ok' if r['expected_ok'] else 'DRIFT'}"
+        )
+    return "\n".join(lines)
+
+
+def format_operations(row: dict) -> str:
+    lines = []
+    for op, s in row["operations"].items():
+        errors = ", ".join(f"{code} x{n}" for code, n in s["errors_by_code"].items())
+        lines.append(f"    {op:<24} {s['count']:6d} ok  p50 {s['p50_ms'] or 0:7.1f}  p99 {s['p99_ms'] or 0:8.1f}"
+                     + (f"  errors: {errors}" if errors else ""))
+    return "\n".join(lines)
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        op, _, weight = part.partition("=")
+        mix[op.strip()] = int(weight or 1)
+    return mix
+
+
+async def _run(args: argparse.Namespace, mix: dict[str, int]) -> list[dict]:
+    psycopg = require("psycopg", "psycopg[binary]")
+    levels = sorted({int(c) for c in args.concurrency.split(",")})
+    fixture = _fixture(seed_tenants(args.dsn, 1)[0])
+    with psycopg.connect(args.dsn) as conn:
+        setup(conn, fixture)
+    rows = []
+    for mode in MODES:
+        for concurrency in levels:
+            row = await run_level(args.dsn, fixture, mode, concurrency, args.per_worker, mix,
+                                  args.max_retries, args.seed)
+            rows.append(row)
+            print(format_rows([row]).splitlines()[1], flush=True)
+            print(format_operations(row), flush=True)
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf.wallet_ledger", description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("PAYPER_LOCAL_PG_DSN"))
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight pairs")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--per-worker", type=int, default=200, help="operations per worker per level")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        parser.error("--dsn or PAYPER_LOCAL_PG_DSN is required (see python -m perf.stack up)")
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError:
+        parser.error(f"--mix must be operation=weight pairs, got {args.mix!r}")
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    print(format_rows([]))
+    rows = asyncio.run(_run(args, mix))
+    path = write_report("wallet_ledger", {"mix": mix, "opening_balance": OPENING_BALANCE, "levels": rows})
+    print(f"report: {path}")
+    drifted = [f"{r['mode']}/{r['concurrency']}" for r in rows if not (r["ledger_ok"] and r["expected_ok"])]
+    if drifted:
+        print(f"wallet balance drift at: {', '.join(drifted)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())